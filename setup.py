@@ -105,7 +105,6 @@ def setup_py(args):
       "Operating System :: BBOS"
     ],
     install_requires=[
-      "django",
       "distribute>=0.6.24",
       "networkx",
       "pyserial"
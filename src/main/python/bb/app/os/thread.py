@@ -71,6 +71,8 @@ class Thread(object):
       self.set_port(port or self.__class__.port)
     if hasattr(self.__class__, "name_format"):
       self._name_format = getattr(self.__class__, "name_format")
+    for message in messages:
+      self.register_message(message)
 
   def _set_uid(self, uid):
     if not isinstance(uid, int):
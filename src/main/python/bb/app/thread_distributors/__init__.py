@@ -3,3 +3,4 @@
 from bb.app.thread_distributors.thread_distributor import ThreadDistributor
 from bb.app.thread_distributors.dummy_thread_distributor import DummyThreadDistributor
 from bb.app.thread_distributors.roundrobin_thread_distributor import RoundrobinThreadDistributor
+from bb.app.thread_distributors.communication_aware_thread_distributor import CommunicationAwareThreadDistributor
@@ -0,0 +1,264 @@
+# Copyright (c) 2013 Sladeware LLC
+
+import itertools
+import math
+
+from bb.app.os.messenger import Messenger
+from bb.app.os.thread import Thread
+from bb.app.thread_distributors.thread_distributor import ThreadDistributor
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+class CommunicationAwareThreadDistributor(ThreadDistributor):
+  """This thread distributor places threads that communicate with each other
+  on the same core, while keeping the load of the cores balanced. Messages sent
+  between the cores go through hub memory under a single lock, so the traffic
+  that crosses the cores is kept as small as possible.
+
+  The threads communicate through messengers: a thread that supports a
+  message (see :func:`~bb.app.os.thread.Thread.register_message`) talks to
+  each :class:`~bb.app.os.messenger.Messenger` that has a handler for this
+  message. Each message exchange weights its rate, twice if the handler sends
+  a response message.
+
+  The threads are placed greedily, one by one, to the core they communicate
+  with the most. Then the placement is refined by Kernighan-Lin passes over
+  each pair of cores, that swap or move threads while it reduces the
+  cross-core traffic.
+
+  :param message_rates: A `dict` of relative rates by message label. The rate
+    of a message is 1 by default.
+  :param traffic: A `dict` of traffic by pairs of thread names, for the
+    threads that communicate without declared messages.
+  :param loads: A `dict` of relative loads by thread names. The load of a
+    thread is 1 by default.
+  :param imbalance: A fraction by which the load of a core may exceed the
+    average load of the cores. If all loads are integral, the limit is rounded
+    up, so e.g. the threads of a pair are not split because of half a thread
+    over the average.
+  :param max_passes: Max number of refinement passes over all pairs of cores.
+  """
+
+  def __init__(self, message_rates=None, traffic=None, loads=None,
+               imbalance=0.0, max_passes=8):
+    self._message_rates = dict(message_rates or {})
+    self._traffic = dict(traffic or {})
+    self._loads = dict(loads or {})
+    self._imbalance = imbalance
+    self._max_passes = max_passes
+
+  def get_message_rate(self, label):
+    """Returns relative rate of message `label`."""
+    return self._message_rates.get(label, 1)
+
+  def get_load(self, thread):
+    """Returns relative load of `thread`."""
+    return self._loads.get(thread.get_name(), 1)
+
+  def get_communication_graph(self, threads):
+    """Returns weighted graph of communication between `threads` as a `dict`,
+    where key is a thread and value is a `dict` of traffic by the threads it
+    communicates with.
+    """
+    graph = dict([(thread, {}) for thread in threads])
+    def connect(thread1, thread2, weight):
+      if thread1 is thread2 or not weight:
+        return
+      graph[thread1][thread2] = graph[thread1].get(thread2, 0) + weight
+      graph[thread2][thread1] = graph[thread2].get(thread1, 0) + weight
+    handlers = {}
+    for thread in threads:
+      if not isinstance(thread, Messenger):
+        continue
+      for handler in thread.get_message_handlers():
+        label = handler.get_target_message().get_label()
+        handlers.setdefault(label, []).append((thread, handler))
+    for thread in threads:
+      for message in thread.get_supported_messages():
+        label = message.get_label()
+        receivers = handlers.get(label, [])
+        if thread in [messenger for messenger, handler in receivers]:
+          continue
+        for messenger, handler in receivers:
+          weight = self.get_message_rate(label)
+          if handler.get_response_message():
+            weight *= 2
+          connect(thread, messenger, weight)
+    threads_by_name = dict([(thread.get_name(), thread) for thread in threads])
+    for (name1, name2), weight in self._traffic.items():
+      if name1 in threads_by_name and name2 in threads_by_name:
+        connect(threads_by_name[name1], threads_by_name[name2], weight)
+    return graph
+
+  def distribute(self, threads, processor):
+    """Distributes `threads` over `processor`'s cores.
+
+    :param threads: A list of :class:`~bb.app.os.thread.Thread` instances.
+    :param processor: A
+      :class:`~bb.app.hardware.devices.processors.processor.Processor` instance.
+
+    :returns: A `dict` instance, where key is a core and value is a list of
+      :class:`~bb.app.os.thread.Thread` instances.
+    """
+    threads = list(threads)
+    for thread in threads:
+      if not isinstance(thread, Thread):
+        raise TypeError("thread must be derived from Thread")
+    cores = processor.get_cores()
+    graph = self.get_communication_graph(threads)
+    index = dict([(thread, i) for i, thread in enumerate(threads)])
+    weights = [dict([(index[neighbor], weight) for neighbor, weight
+                     in graph[thread].items()]) for thread in threads]
+    loads = [self.get_load(thread) for thread in threads]
+    partition = _Partition(weights, loads, len(cores), self._imbalance)
+    partition.place()
+    partition.refine(self._max_passes)
+    logger.debug("Cross-core traffic of %d threads: %s of %s"
+                 % (len(threads), partition.get_cut_weight(),
+                    sum([sum(w.values()) for w in weights]) / 2))
+    distribution = {}
+    for core in cores:
+      distribution[core] = []
+    for thread, part in zip(threads, partition.get_parts()):
+      distribution[cores[part]].append(thread)
+    return distribution
+
+class _Partition(object):
+  """Partition of a graph of `weights`, a list of `dict` of edge weights by
+  vertex, and vertex `loads` into `num_parts` parts.
+  """
+
+  def __init__(self, weights, loads, num_parts, imbalance):
+    self._weights = weights
+    self._loads = loads
+    self._num_parts = num_parts
+    self._parts = [None] * len(weights)
+    self._part_loads = [0] * num_parts
+    self._capacity = 0
+    if loads:
+      self._capacity = sum(loads) * (1.0 + imbalance) / num_parts
+      if all([isinstance(load, (int, long)) for load in loads]):
+        self._capacity = int(math.ceil(self._capacity))
+      self._capacity = max(self._capacity, max(loads))
+
+  def get_parts(self):
+    """Returns a list of part by vertex."""
+    return self._parts
+
+  def get_cut_weight(self):
+    """Returns total weight of the edges between parts."""
+    return sum([weight for i, edges in enumerate(self._weights)
+                for j, weight in edges.items()
+                if i < j and self._parts[i] != self._parts[j]])
+
+  def _get_gain(self, i, part):
+    """Returns how much the cut weight decreases if vertex `i` is moved to
+    `part`.
+    """
+    gain = 0
+    for j, weight in self._weights[i].items():
+      if self._parts[j] == part:
+        gain += weight
+      elif self._parts[j] == self._parts[i]:
+        gain -= weight
+    return gain
+
+  def _move(self, i, part):
+    self._part_loads[self._parts[i]] -= self._loads[i]
+    self._part_loads[part] += self._loads[i]
+    self._parts[i] = part
+
+  def place(self):
+    """Places the vertices one by one, the most connected first, to the part
+    they are connected to the most. A vertex that fits no part goes to the
+    least loaded one.
+    """
+    order = sorted(range(len(self._weights)),
+                   key=lambda i: (-sum(self._weights[i].values()),
+                                  -self._loads[i], i))
+    for i in order:
+      connections = [0] * self._num_parts
+      for j, weight in self._weights[i].items():
+        if self._parts[j] is not None:
+          connections[self._parts[j]] += weight
+      candidates = [part for part in range(self._num_parts)
+                    if self._part_loads[part] + self._loads[i] <=
+                    self._capacity]
+      if candidates:
+        part = max(candidates, key=lambda part: (connections[part],
+                                                 -self._part_loads[part],
+                                                 -part))
+      else:
+        part = min(range(self._num_parts),
+                   key=lambda part: (self._part_loads[part], part))
+      self._parts[i] = part
+      self._part_loads[part] += self._loads[i]
+
+  def refine(self, max_passes):
+    """Runs up to `max_passes` Kernighan-Lin passes over each pair of parts.
+    Stops when a pass doesn't reduce the cut weight.
+    """
+    for i in range(max_passes):
+      improved = False
+      for a, b in itertools.combinations(range(self._num_parts), 2):
+        if self._refine_pair(a, b):
+          improved = True
+      if not improved:
+        break
+
+  def _refine_pair(self, a, b):
+    """Kernighan-Lin pass over parts `a` and `b`. A step swaps the pair of
+    unlocked vertices, or moves the single vertex, with the max gain that
+    keeps the loads within the capacity; the vertices are locked then. The
+    steps are taken till no vertex is left, and only the prefix of the steps
+    with the max total gain is kept. Returns whether the cut weight has been
+    reduced.
+    """
+    free = dict([(part, [i for i, p in enumerate(self._parts) if p == part])
+                 for part in (a, b)])
+    # Loads of the parts may exceed capacity after placement, but they are
+    # never made worse
+    capacity = max(self._capacity, self._part_loads[a], self._part_loads[b])
+    steps = []
+    total_gain = best_gain = 0
+    best_steps = 0
+    while free[a] or free[b]:
+      best = None
+      for x in free[a] + [None]:
+        for y in free[b] + [None]:
+          if x is None and y is None:
+            continue
+          load_x = x is not None and self._loads[x] or 0
+          load_y = y is not None and self._loads[y] or 0
+          load_a = self._part_loads[a] - load_x + load_y
+          load_b = self._part_loads[b] - load_y + load_x
+          if max(load_a, load_b) > capacity:
+            continue
+          gain = 0
+          if x is not None:
+            gain += self._get_gain(x, b)
+          if y is not None:
+            gain += self._get_gain(y, a)
+          if x is not None and y is not None:
+            gain -= 2 * self._weights[x].get(y, 0)
+          key = (gain, -abs(load_a - load_b))
+          if best is None or key > best[0]:
+            best = (key, x, y)
+      if best is None:
+        break
+      (gain, balance), x, y = best
+      for i, source, target in ((x, a, b), (y, b, a)):
+        if i is not None:
+          self._move(i, target)
+          free[source].remove(i)
+      steps.append((x, y))
+      total_gain += gain
+      if total_gain > best_gain + 1e-9:
+        best_gain = total_gain
+        best_steps = len(steps)
+    for x, y in reversed(steps[best_steps:]):
+      for i, part in ((x, a), (y, b)):
+        if i is not None:
+          self._move(i, part)
+    return best_gain > 0
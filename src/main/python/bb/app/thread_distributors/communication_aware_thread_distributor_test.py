@@ -0,0 +1,101 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+from bb.utils.testing import unittest
+from bb.app.hardware.devices.processors import PropellerP8X32A_Q44
+from bb.app.os.message import Message
+from bb.app.os.messenger import Messenger
+from bb.app.os.thread import Thread
+from bb.app.thread_distributors import CommunicationAwareThreadDistributor
+from bb.app.thread_distributors import RoundrobinThreadDistributor
+from bb.app.thread_distributors.communication_aware_thread_distributor \
+    import _Partition
+
+def make_pair(i):
+  """Returns a client thread and the messenger that serves it."""
+  request = ("REQUEST_%d" % i, [("value", 2)])
+  response = ("RESPONSE_%d" % i, [("status", 1)])
+  messenger = Messenger("MESSENGER_%d" % i,
+                        message_handlers=[("handle", request, response)])
+  client = Thread("CLIENT_%d" % i, messages=[Message(*request)])
+  return client, messenger
+
+def get_cut_weight(distribution, graph):
+  core_by_thread = dict([(thread, core) for core, threads
+                         in distribution.items() for thread in threads])
+  return sum([weight for thread, edges in graph.items()
+              for neighbor, weight in edges.items()
+              if core_by_thread[thread] is not core_by_thread[neighbor]]) / 2
+
+class CommunicationAwareThreadDistributorTest(unittest.TestCase):
+
+  def setup(self):
+    self.processor = PropellerP8X32A_Q44()
+
+  def test_communication_graph(self):
+    client, messenger = make_pair(0)
+    other = Thread("OTHER")
+    distributor = CommunicationAwareThreadDistributor(
+      message_rates={"REQUEST_0": 5}, traffic={("OTHER", "CLIENT_0"): 3})
+    graph = distributor.get_communication_graph([client, messenger, other])
+    # The request and the response
+    self.assert_equal(graph[client], {messenger: 10, other: 3})
+    self.assert_equal(graph[messenger], {client: 10})
+    self.assert_equal(graph[other], {client: 3})
+
+  def test_pairs_share_cores(self):
+    pairs = [make_pair(i) for i in range(8)]
+    # Round-robin places each client and its messenger on different cores
+    threads = [thread for pair in pairs for thread in pair]
+    distributor = CommunicationAwareThreadDistributor()
+    graph = distributor.get_communication_graph(threads)
+    roundrobin = RoundrobinThreadDistributor()(threads, self.processor)
+    self.assert_equal(get_cut_weight(roundrobin, graph), 16)
+    distribution = distributor(threads, self.processor)
+    self.assert_equal(get_cut_weight(distribution, graph), 0)
+    self.assert_equal(sorted(distribution.keys()),
+                      sorted(self.processor.get_cores()))
+    for core, core_threads in distribution.items():
+      self.assert_equal(len(core_threads), 2)
+    self.assert_equal(sorted([thread.get_name() for core_threads
+                              in distribution.values()
+                              for thread in core_threads]),
+                      sorted([thread.get_name() for thread in threads]))
+
+  def test_few_pairs_share_cores(self):
+    # The average load of 10 threads over 8 cores is fractional
+    pairs = [make_pair(i) for i in range(5)]
+    threads = [thread for pair in pairs for thread in pair]
+    distributor = CommunicationAwareThreadDistributor()
+    graph = distributor.get_communication_graph(threads)
+    distribution = distributor(threads, self.processor)
+    self.assert_equal(get_cut_weight(distribution, graph), 0)
+    self.assert_true(all([len(core_threads) <= 2
+                          for core_threads in distribution.values()]))
+
+  def test_load_balance(self):
+    pairs = [make_pair(i) for i in range(3)]
+    threads = [thread for pair in pairs for thread in pair]
+    # The threads of a hot pair share the core, the heavy thread takes a core
+    # alone
+    distributor = CommunicationAwareThreadDistributor(
+      message_rates={"REQUEST_1": 100}, loads={"CLIENT_0": 4}, imbalance=1.0)
+    distribution = distributor(threads, self.processor)
+    cores = dict([(thread.get_name(), core) for core, core_threads
+                  in distribution.items() for thread in core_threads])
+    self.assert_true(cores["CLIENT_1"] is cores["MESSENGER_1"])
+    self.assert_equal(len(distribution[cores["CLIENT_0"]]), 1)
+    self.assert_raises(TypeError, distributor, [object()], self.processor)
+
+  def test_refine(self):
+    weights = [{1: 10, 2: 1}, {0: 10}, {0: 1, 3: 10}, {2: 10}]
+    partition = _Partition(weights, [1, 1, 1, 1], 2, 0.0)
+    for i, part in enumerate([0, 1, 0, 1]):
+      partition._parts[i] = part
+      partition._part_loads[part] += 1
+    self.assert_equal(partition.get_cut_weight(), 20)
+    partition.refine(max_passes=4)
+    self.assert_equal(partition.get_cut_weight(), 1)
+    self.assert_equal(sorted(partition._part_loads), [2, 2])
@@ -8,8 +8,19 @@
 # __main__ alows user to run b3 package as a script:
 # $ python -m bb.tools.b3
 
+import os
 import sys
 
+# Forward the command to b3 server if it's running. The client has to be tried
+# first, before the engine with all its dependencies will be imported. Set
+# B3_NO_SERVER environment variable to run the command locally.
+from bb.tools.b3 import client
+
+if sys.argv[1:2] != ["server"] and not os.environ.get("B3_NO_SERVER"):
+  code = client.forward(os.getcwd(), sys.argv[1:])
+  if code is not None:
+    sys.exit(code)
+
 import engine
 
 sys.exit(engine.main())
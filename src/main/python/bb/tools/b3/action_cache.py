@@ -0,0 +1,218 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko <info@bionicbunny.org>
+
+"""Action cache keeps outputs of executed rules in a local content-addressed
+store, so that a rule whose inputs didn't change can be restored instead of
+being executed once again.
+
+Each rule execution is identified by an action key, a digest of everything that
+affects the result of the rule (see :func:`Rule.get_action_key`). The cache
+directory has the following layout::
+
+  <root>/actions/<key>   # JSON manifest, see below
+  <root>/blobs/<xx>/<digest>
+
+The manifest keeps a list of ``[output path, blob digest]`` and a list of
+``[input path, digest]`` of the inputs discovered by the rule during execution
+(see :func:`Rule.get_action_inputs`), e.g. the headers included by sources.
+Such inputs cannot be a part of the key, since they are known only once the
+rule has been executed, so the action is restored only if they didn't change.
+
+Blobs are stored only once, no matter how many actions refer to them.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from bb.tools.b3 import codegen
+from bb.utils import path_utils
+from bb.utils import typecheck
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+BUFFER_SIZE = 1 << 16
+
+class Digest(object):
+  """Incrementally computes a digest of strings, files and JSON-serializable
+  objects.
+  """
+
+  def __init__(self):
+    self._hash = hashlib.sha1()
+
+  def update_string(self, string):
+    if not typecheck.is_string(string):
+      raise TypeError("Has to be a string: %s" % string)
+    # Prefix each string with its length, so that ("ab", "c") and ("a", "bc")
+    # will never produce the same digest.
+    self._hash.update("%d:" % len(string))
+    self._hash.update(string)
+    return self
+
+  def update_object(self, obj):
+    """Updates digest with a JSON representation of the object. Objects that
+    cannot be serialized are represented by :func:`repr`.
+    """
+    return self.update_string(json.dumps(obj, sort_keys=True, default=repr))
+
+  def update_file(self, path):
+    """Updates digest with the path and content of the file. Missing files
+    are allowed. The content of generated files is represented by the digest
+    from :mod:`bb.tools.b3.codegen` registry.
+    """
+    self.update_string(path)
+    digest = codegen.get_digest(path)
+    if digest:
+      return self.update_string("sha1:" + digest)
+    if not path_utils.isfile(path):
+      return self.update_string("")
+    self._hash.update("%d:" % path_utils.getsize(path))
+    with open(path, "rb") as fh:
+      while True:
+        chunk = fh.read(BUFFER_SIZE)
+        if not chunk:
+          break
+        self._hash.update(chunk)
+    return self
+
+  def update_files(self, paths):
+    for path in paths:
+      self.update_file(path)
+    return self
+
+  def hexdigest(self):
+    return self._hash.hexdigest()
+
+def input_digest(path):
+  """Returns digest of the input file `path` as recorded in the manifest, or
+  ``None`` if the file doesn't exist. Generated files are represented by the
+  digest from :mod:`bb.tools.b3.codegen` registry.
+  """
+  digest = codegen.get_digest(path)
+  if digest:
+    return digest
+  if not path_utils.isfile(path):
+    return None
+  return file_digest(path)
+
+def file_digest(path):
+  """Returns digest of the file content."""
+  hash_ = hashlib.sha1()
+  with open(path, "rb") as fh:
+    while True:
+      chunk = fh.read(BUFFER_SIZE)
+      if not chunk:
+        break
+      hash_.update(chunk)
+  return hash_.hexdigest()
+
+class ActionCache(object):
+  """Content-addressed store of rule outputs located at `root` directory."""
+
+  def __init__(self, root):
+    if not typecheck.is_string(root):
+      raise TypeError("root has to be a string")
+    self._root = path_utils.abspath(root)
+    self._actions_dir = path_utils.join(self._root, "actions")
+    self._blobs_dir = path_utils.join(self._root, "blobs")
+    path_utils.mkpath(self._actions_dir)
+    path_utils.mkpath(self._blobs_dir)
+
+  def get_root(self):
+    return self._root
+
+  def _get_action_path(self, key):
+    return path_utils.join(self._actions_dir, key)
+
+  def _get_blob_path(self, digest):
+    return path_utils.join(self._blobs_dir, digest[:2], digest)
+
+  def _write_atomically(self, path, write):
+    path_utils.mkpath(path_utils.dirname(path))
+    fd, tmp_path = tempfile.mkstemp(dir=path_utils.dirname(path))
+    try:
+      with os.fdopen(fd, "wb") as fh:
+        write(fh)
+      os.rename(tmp_path, path)
+    except:
+      if path_utils.exists(tmp_path):
+        os.remove(tmp_path)
+      raise
+
+  def _copy_atomically(self, src, dst):
+    with open(src, "rb") as src_fh:
+      self._write_atomically(dst, lambda fh: shutil.copyfileobj(src_fh, fh))
+    shutil.copymode(src, dst)
+
+  def lookup(self, key):
+    """Returns a list of ``(output path, blob digest)`` tuples stored for the
+    action `key`, or ``None`` if the action wasn't cached, some of its
+    recorded inputs have been changed or some of its blobs are missing.
+    """
+    path = self._get_action_path(key)
+    if not path_utils.exists(path):
+      return None
+    try:
+      with open(path) as fh:
+        manifest = json.load(fh)
+      # Older manifests are plain lists of outputs
+      if typecheck.is_list(manifest):
+        manifest = {"outputs": manifest, "inputs": []}
+      outputs = [tuple(output) for output in manifest["outputs"]]
+      inputs = [tuple(input_) for input_ in manifest["inputs"]]
+    except (ValueError, KeyError, TypeError):
+      logger.warning("Broken action cache entry: %s" % path)
+      return None
+    for input_path, digest in inputs:
+      if input_digest(input_path) != digest:
+        logger.debug("%s has been changed" % input_path)
+        return None
+    for _, digest in outputs:
+      if not path_utils.exists(self._get_blob_path(digest)):
+        return None
+    return outputs
+
+  def restore(self, key):
+    """Restores outputs of the action `key`. Outputs that are already up to
+    date are not touched. Returns ``True`` on success, ``False`` if the action
+    is not in the cache.
+    """
+    outputs = self.lookup(key)
+    if outputs is None:
+      return False
+    for path, digest in outputs:
+      if path_utils.isfile(path) and file_digest(path) == digest:
+        continue
+      logger.debug("Restore %s" % path)
+      self._copy_atomically(self._get_blob_path(digest), path)
+    return True
+
+  def store(self, key, outputs, inputs=[]):
+    """Stores the list of output files for the action `key`, together with the
+    digests of the `inputs` discovered during execution. Returns ``True`` if
+    all the outputs exist and were stored, ``False`` otherwise.
+    """
+    entries = []
+    for path in outputs:
+      path = path_utils.abspath(path)
+      if not path_utils.isfile(path):
+        logger.debug("Cannot cache missing output %s" % path)
+        return False
+      digest = file_digest(path)
+      blob_path = self._get_blob_path(digest)
+      if not path_utils.exists(blob_path):
+        self._copy_atomically(path, blob_path)
+      entries.append((path, digest))
+    manifest = {"outputs": entries,
+                "inputs": [(path, input_digest(path)) for path in inputs]}
+    self._write_atomically(self._get_action_path(key),
+                           lambda fh: json.dump(manifest, fh))
+    return True
@@ -0,0 +1,60 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.b3.action_cache import ActionCache, Digest
+
+class DigestTest(unittest.TestCase):
+
+  def test_strings(self):
+    self.assert_not_equal(
+      Digest().update_string("ab").update_string("c").hexdigest(),
+      Digest().update_string("a").update_string("bc").hexdigest())
+    self.assert_equal(Digest().update_object({"a": 1, "b": [2]}).hexdigest(),
+                      Digest().update_object({"b": [2], "a": 1}).hexdigest())
+
+class ActionCacheTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.cache = ActionCache(os.path.join(self.tmpdir, "cache"))
+    self.output = os.path.join(self.tmpdir, "out", "a.out")
+    os.mkdir(os.path.dirname(self.output))
+    with open(self.output, "w") as fh:
+      fh.write("binary")
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_restore(self):
+    self.assert_false(self.cache.restore("key"))
+    self.assert_true(self.cache.store("key", [self.output]))
+    os.remove(self.output)
+    self.assert_true(self.cache.restore("key"))
+    with open(self.output) as fh:
+      self.assert_equal(fh.read(), "binary")
+
+  def test_inputs(self):
+    header = os.path.join(self.tmpdir, "b.h")
+    with open(header, "w") as fh:
+      fh.write("#define B 1\n")
+    self.assert_true(self.cache.store("key", [self.output], [header]))
+    self.assert_true(self.cache.restore("key"))
+    with open(header, "w") as fh:
+      fh.write("#define B 2\n")
+    self.assert_false(self.cache.restore("key"))
+    os.remove(header)
+    self.assert_is_none(self.cache.lookup("key"))
+
+  def test_missing_output(self):
+    self.assert_false(self.cache.store("key", [self.output + ".missing"]))
+    self.assert_is_none(self.cache.lookup("key"))
+
+if __name__ == "__main__":
+  unittest.main()
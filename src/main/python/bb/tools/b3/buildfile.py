@@ -8,14 +8,19 @@
 import __builtin__
 
 import collections
+import hashlib
+import json
 import os
 import re
 import copy
 import marshal
+import UserDict
+import sys
 import inspect
 import types
 import new
 import functools
+import threading
 from glob import glob1
 from contextlib import contextmanager
 import networkx
@@ -29,32 +34,49 @@ from bb.utils.containers import DictWrapper
 from bb.utils import typecheck
 from bb.tools.interpreters import python
 from bb.tools.b3 import primitives
+from bb.tools.b3 import profiler
 
 logger = logging.get_logger("bb")
 
 _addresses_by_buildfile = collections.defaultdict(set)
 _rules_by_address = dict()
 _parsed_contexts = set()
+# Maps the first BUILD file of each parsed family to the inputs read by the
+# family, see get_changed_buildfiles()
+_parsed_inputs = dict()
 _dynamic_rules = collections.defaultdict(set)
+_active_contexts = collections.deque([])
+_snapshots_enabled = True
+
+SNAPSHOT_VERSION = 3
+# Prefixes of the rule methods that don't change the rule, see
+# rule.wrap_mutators()
+QUERY_METHOD_PREFIXES = ("get_", "is_", "has_", "locate", "walk_deps")
 
 class DependencyGraph(networkx.DiGraph):
   """Read more about dependency graph:
   <http://en.wikipedia.org/wiki/Dependency_graph>
   """
 
+  def __init__(self, *args, **kwargs):
+    networkx.DiGraph.__init__(self, *args, **kwargs)
+    self._forks_lock = threading.Lock()
+
   def resolve_forks(self):
-    forks = filter(lambda node: isinstance(node, Fork), self.nodes())
-    for fork in forks:
-      for parent in self.predecessors(fork):
-        parent_lang = parent.get_property_value("programming_language")
-        remove_edge = False
-        for child in self.successors(fork):
-          child_lang = child.get_property_value("programming_language")
-          if not child_lang or parent_lang == child_lang:
-            self.add_edge(parent, child)
-            remove_edge = True
-        if remove_edge:
-          self.remove_edge(parent, fork)
+    # Rules may resolve forks while being executed by concurrent workers.
+    with self._forks_lock, profiler.span("resolve_forks", "graph"):
+      forks = filter(lambda node: isinstance(node, Fork), self.nodes())
+      for fork in forks:
+        for parent in self.predecessors(fork):
+          parent_lang = parent.get_property_value("programming_language")
+          remove_edge = False
+          for child in self.successors(fork):
+            child_lang = child.get_property_value("programming_language")
+            if not child_lang or parent_lang == child_lang:
+              self.add_edge(parent, child)
+              remove_edge = True
+          if remove_edge:
+            self.remove_edge(parent, fork)
 
   def save(self, filepath='dependency_graph.png'):
     import matplotlib.pyplot as plt
@@ -74,6 +96,9 @@ def register_primitive(primitive, name=None):
   if hasattr(primitives, name):
     logger.warning("Primitive %s will be replaced" % name)
   setattr(primitives, name, primitive)
+  # New primitives change the state visible to other BUILD files
+  if _active_contexts:
+    _active_contexts[-1].disable_snapshot()
   return primitive
 
 def unregister_primitive(name):
@@ -123,6 +148,8 @@ class RuleClassFactory(object):
     return "_".join(parts[:-1] + [parts[-1] + cls.__name__])
 
   def gen(self, *args, **kwargs):
+    if _active_contexts:
+      _active_contexts[-1].disable_snapshot()
     bases = [self._rule_cls]
     target = len(args) and args[0] or kwargs.get("target", None)
     if not target:
@@ -149,10 +176,11 @@ class RuleClassFactory(object):
                      ctx=Context.locate(),
                      args=args,
                      kwargs=kwargs)
-    try:
-      exec result in namespace
-    except SyntaxError, e:
-      raise SyntaxError(e.message + ':\n' + self.template.format(namespace))
+    with profiler.span(name, "rule_class"):
+      try:
+        exec result in namespace
+      except SyntaxError, e:
+        raise SyntaxError(e.message + ':\n' + self.template.format(namespace))
     klass = namespace[name]
     _rule_classes[name] = klass
     if not klass.abstract:
@@ -304,7 +332,11 @@ class RuleWithSources(object):
         required_args = [self, self.get_target()]
     else:
       required_args = [self, self.get_target()]
-    extra_sources = func(*required_args)
+    name = getattr(func, "__name__", None) or \
+        getattr(getattr(func, "func", None), "__name__", str(func))
+    with profiler.span(name, "generate", rule=str(self)) as args:
+      extra_sources = func(*required_args)
+      args["outputs"] = extra_sources
     if extra_sources:
       extra_sources = typecheck.is_list(extra_sources) and extra_sources or \
           [extra_sources]
@@ -381,11 +413,66 @@ class rule(type):
       register_primitive(factory, "%s_factory" % name)
     return cls
 
+  def __init__(cls, name, bases, d):
+    type.__init__(cls, name, bases, d)
+    cls.wrap_mutators()
+
+  def wrap_mutators(cls):
+    """Wraps public methods of the rule class, including the methods inherited
+    from mixins, that may change the rule. Once such method is called by a
+    BUILD file for a rule that has been already created, the rule cannot be
+    restored from the recorded constructor call and the snapshot is disabled.
+    """
+    for name in dir(cls):
+      if name.startswith("_") or name.startswith(QUERY_METHOD_PREFIXES):
+        continue
+      method = getattr(cls, name)
+      if not isinstance(method, types.MethodType) or \
+            method.im_self is not None or \
+            getattr(method, "disables_snapshot", False):
+        continue
+      setattr(cls, name, _disables_snapshot(method.im_func))
+
+  def __call__(cls, *args, **kwargs):
+    """Records rules created directly by a BUILD file, so the BUILD file can be
+    restored from a snapshot next time. See :class:`Snapshot`.
+    """
+    context = _active_contexts and _active_contexts[-1] or None
+    if not context or context._records is None:
+      return type.__call__(cls, *args, **kwargs)
+    context._rule_depth += 1
+    try:
+      rule = type.__call__(cls, *args, **kwargs)
+    finally:
+      context._rule_depth -= 1
+    if not context._rule_depth:
+      context.record_rule(cls, args, kwargs)
+    return rule
+
   @staticmethod
   def gen_primitive_name(cls):
     s1 = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', cls.__name__)
     return re.sub('([a-z0-9])([A-Z])', r'\1_\2', s1).lower()
 
+def _get_evaluating_context():
+  """Returns the context whose BUILD file code is being evaluated right now,
+  outside of any rule constructor, or ``None``.
+  """
+  context = _active_contexts and _active_contexts[-1] or None
+  if context and context._evaluating and not context._rule_depth:
+    return context
+  return None
+
+def _disables_snapshot(method):
+  @functools.wraps(method)
+  def wrapper(self, *args, **kwargs):
+    context = _get_evaluating_context()
+    if context:
+      context.disable_snapshot()
+    return method(self, *args, **kwargs)
+  wrapper.disables_snapshot = True
+  return wrapper
+
 class Rule(Primitive):
   """Within a BUILD file we have a number of named rules describing the build
   outputs.
@@ -421,6 +508,8 @@ class Rule(Primitive):
     self._dependencies = [] # TODO: deprecated
     self._properties = dict()
     self._build_dir = None
+    self._executed = False
+    self._execute_lock = threading.Lock()
     # TODO: test on windows and other systems!
     self.set_build_dir(path_utils.join(
         bb.config.user_settings.get("b3", "builddir"), os.getcwd()[1:]))
@@ -440,6 +529,12 @@ class Rule(Primitive):
         (self.get_address() == other.get_address())
     return result
 
+  def __setattr__(self, name, value):
+    context = _get_evaluating_context()
+    if context:
+      context.disable_snapshot()
+    object.__setattr__(self, name, value)
+
   def __hash__(self):
     return hash(self.get_address())
 
@@ -521,10 +616,57 @@ class Rule(Primitive):
   def execute(self):
     raise NotImplementedError()
 
+  def is_executed(self):
+    """Returns ``True`` if this rule has been already executed."""
+    return self._executed
+
+  def get_action_key(self):
+    """Returns a string that identifies all the inputs of this rule, so the
+    outputs of the rule can be cached. Returns ``None`` by default, which means
+    that the rule cannot be cached.
+    """
+    return None
+
+  def get_outputs(self):
+    """Returns a list of files produced by this rule."""
+    return []
+
+  def get_action_inputs(self):
+    """Returns a list of input files discovered by the last execution of this
+    rule that are not covered by the action key, e.g. included headers. The
+    cached outputs are restored only while these files stay the same. Returns
+    ``None`` if the inputs cannot be discovered, thus the outputs cannot be
+    cached. Returns an empty list by default.
+    """
+    return []
+
+  def execute_once(self, action_cache=None):
+    """Executes this rule unless it has been already executed. If
+    `action_cache` was provided and the rule has a valid action key, the
+    outputs will be restored from the cache instead of executing the rule.
+    Returns ``True`` if the rule was executed by this call, ``False``
+    otherwise.
+    """
+    with self._execute_lock:
+      if self._executed:
+        return False
+      with profiler.span(str(self), "rule", key=self) as args:
+        key = action_cache and self.get_action_key()
+        args["cached"] = bool(key and action_cache.restore(key))
+        if args["cached"]:
+          logger.info("%s is up to date" % self)
+        else:
+          self.execute()
+          if key:
+            inputs = self.get_action_inputs()
+            if inputs is not None:
+              action_cache.store(key, self.get_outputs(), inputs)
+      self._executed = True
+      return True
+
   def resolve(self):
     for dep in self.get_dependencies():
-      #dep.resolve()
-      dep.execute()
+      dep.execute_once()
 
   def get_dependency_graph(self):
     """Returns directed dependency tree."""
@@ -638,6 +780,9 @@ class Fork(Rule):
   def __init__(self, target=None, name=None, deps=[]):
     Rule.__init__(self, target, name, deps=deps)
 
+  def execute(self):
+    pass
+
 class ContextError(Exception):
   """Inidicates an action that requires a BUILD file parse context was attempted
   outside any.
@@ -648,11 +793,19 @@ class Context(object):
   mechanism for rules to discover their content when invoked via eval.
   """
 
-  _active = collections.deque([])
+  _active = _active_contexts
 
   def __init__(self, buildfile):
     self.buildfile = buildfile
     self._parsed = False
+    # A list of rules created by the BUILD file while it's being evaluated or
+    # None if the BUILD file cannot be snapshotted.
+    self._records = None
+    # Directory listings, files and environment variables read by the BUILD
+    # file, see _watch_inputs()
+    self._inputs = None
+    self._rule_depth = 0
+    self._evaluating = False
 
   @staticmethod
   def locate():
@@ -663,6 +816,34 @@ class Context(object):
       raise ContextError('No parse context active.')
     return Context._active[-1]
 
+  def disable_snapshot(self):
+    self._records = None
+
+  def record_input(self, kind, key, value):
+    """Records that the BUILD file has read an input of the given `kind`
+    ("dirs", "paths", "files" or "environ"), so the snapshot will be valid
+    only while the input has the same value.
+    """
+    if self._inputs is not None:
+      self._inputs[kind][key] = value
+
+  def record_rule(self, cls, args, kwargs):
+    """Records rule created by the BUILD file. Only rules with importable
+    classes and plain data arguments can be recorded, otherwise snapshot will be
+    disabled for this context.
+    """
+    if self._records is None:
+      return
+    module = sys.modules.get(cls.__module__, None)
+    if getattr(module, cls.__name__, None) is not cls \
+          or not is_plain_data(list(args)) or not is_plain_data(kwargs):
+      logger.debug("%s cannot be snapshotted because of %s" %
+                   (self.buildfile, cls.__name__))
+      self.disable_snapshot()
+      return
+    self._records.append([self.buildfile.relpath, cls.__module__, cls.__name__,
+                          copy.deepcopy(list(args)), copy.deepcopy(kwargs)])
+
   def on_context_exit(self, func, *args, **kwargs):
     """ Registers a command to invoke just before this parse context is
     exited. It is an error to attempt to register an on_context_exit action
@@ -699,29 +880,85 @@ class Context(object):
     kwargs.  As rule methods are parsed they can examine the stack to find these
     globals and thus locate themselves for the purposes of finding files (see
     locate() and bind()).
+
+    If the BUILD file family didn't change since the last parse and consists of
+    plain rules only, the rules are restored from the snapshot instead of
+    evaluating the BUILD files.
     """
     if self.buildfile not in _parsed_contexts:
-      buildfile_family = tuple(self.buildfile.family())
-      _parsed_contexts.update(buildfile_family)
-      pants_context = {}
-      # Inject b3 primitives
-      ast = compile("from bb.tools.b3.primitives import *", "<string>", "exec")
-      python.Compatibility.exec_function(ast, pants_context)
-      with Context.activate(self):
-        start = os.path.abspath(os.curdir)
-        try:
-          os.chdir(self.buildfile.parent_path)
-          for buildfile in buildfile_family:
+      with profiler.span(str(self.buildfile), "parse") as args:
+        args["snapshot"] = self._parse(globalargs)
+
+  def _parse(self, globalargs):
+    """Parses the BUILD file family. Returns ``True`` if the rules were restored
+    from the snapshot.
+    """
+    # Parsing another BUILD file directly from a BUILD file (e.g. with
+    # require()) is a side effect that cannot be snapshotted. Parsing caused
+    # by a rule, that refers to another BUILD file, will be repeated once the
+    # rule is restored.
+    if Context._active and Context._active[-1]._evaluating and \
+          not Context._active[-1]._rule_depth:
+      Context._active[-1].disable_snapshot()
+    buildfile_family = tuple(self.buildfile.family())
+    _parsed_contexts.update(buildfile_family)
+    snapshot = None
+    if _snapshots_enabled and not globalargs:
+      snapshot = Snapshot(self.buildfile, buildfile_family)
+      if snapshot.load():
+        logger.debug("Restore %s from snapshot" % self.buildfile)
+        self._restore(snapshot)
+        _parsed_inputs[buildfile_family[0]] = snapshot.inputs
+        return True
+      self._records = []
+    # The inputs are recorded even if the family cannot be snapshotted, so the
+    # build server knows when it has to be parsed again
+    self._inputs = {"dirs": {}, "paths": {}, "files": {}, "environ": {}}
+    pants_context = {}
+    # Inject b3 primitives
+    ast = compile("from bb.tools.b3.primitives import *", "<string>", "exec")
+    python.Compatibility.exec_function(ast, pants_context)
+    with Context.activate(self):
+      start = os.path.abspath(os.curdir)
+      self._evaluating = True
+      try:
+        os.chdir(self.buildfile.parent_path)
+        # Loading of the code checks and writes the bytecode files, that must
+        # not be recorded as inputs
+        codes = [buildfile.code() for buildfile in buildfile_family]
+        with _watch_inputs():
+          for buildfile, code in zip(buildfile_family, codes):
             self.buildfile = buildfile
             eval_globals = copy.copy(pants_context)
             eval_globals.update({
               'ROOT_DIR': buildfile.root_dir,
               '__file__': buildfile.full_path,
+              'open': _open,
             })
             eval_globals.update(globalargs)
-            python.Compatibility.exec_function(buildfile.code(), eval_globals)
-        finally:
-          os.chdir(start)
+            python.Compatibility.exec_function(code, eval_globals)
+      finally:
+        self._evaluating = False
+        os.chdir(start)
+    _parsed_inputs[buildfile_family[0]] = self._inputs
+    if snapshot:
+      snapshot.save(self._records, self._inputs)
+    self._records = self._inputs = None
+    return False
+
+  def _restore(self, snapshot):
+    buildfiles = dict([(buildfile.relpath, buildfile)
+                       for buildfile in snapshot.buildfile_family])
+    with Context.activate(self):
+      start = os.path.abspath(os.curdir)
+      try:
+        os.chdir(self.buildfile.parent_path)
+        for relpath, module, name, args, kwargs in snapshot.records:
+          self.buildfile = buildfiles[relpath]
+          __import__(module)
+          getattr(sys.modules[module], name)(*args, **kwargs)
+      finally:
+        os.chdir(start)
 
   def do_in_context(self, work):
     """Executes the callable work in this parse context."""
@@ -758,6 +995,8 @@ class BuildFile(object):
     self.parent_path = os.path.dirname(self.full_path)
     self._bytecode_path = os.path.join(self.parent_path, '.%s.%s.pyc' %
                                        (self.name, python.PythonIdentity.get()))
+    self.snapshot_path = os.path.join(self.parent_path, '.%s.%s.snapshot' %
+                                      (self.name, python.PythonIdentity.get()))
     self.relpath = os.path.relpath(self.full_path, self.root_dir)
     self.canonical_relpath = os.path.join(os.path.dirname(self.relpath),
                                           BuildFile._CANONICAL_NAME)
@@ -824,3 +1063,316 @@ class BuildFile(object):
     yield self
     for sibling in self.siblings():
       yield sibling
+
+def enable_snapshots():
+  """Enables restoring of unchanged BUILD files from snapshots."""
+  global _snapshots_enabled
+  _snapshots_enabled = True
+
+def disable_snapshots():
+  """Disables snapshots, so every BUILD file will be evaluated."""
+  global _snapshots_enabled
+  _snapshots_enabled = False
+
+def is_plain_data(obj):
+  """Returns ``True`` if `obj` consists of strings, numbers, lists and dicts
+  only and thus can be restored from JSON as is.
+  """
+  if obj is None or typecheck.is_string(obj) or typecheck.is_bool(obj) or \
+        type(obj) in (int, long, float):
+    return True
+  elif typecheck.is_list(obj):
+    return all([is_plain_data(item) for item in obj])
+  elif typecheck.is_dict(obj):
+    return all([typecheck.is_string(key) and is_plain_data(value)
+                for key, value in obj.items()])
+  return False
+
+def _decode_plain_data(obj):
+  """JSON decoder returns unicode strings, while rules expect str."""
+  if isinstance(obj, unicode):
+    return obj.encode("utf-8")
+  elif typecheck.is_list(obj):
+    return [_decode_plain_data(item) for item in obj]
+  elif typecheck.is_dict(obj):
+    return dict([(_decode_plain_data(key), _decode_plain_data(value))
+                 for key, value in obj.items()])
+  return obj
+
+def _get_recording_context():
+  context = _get_evaluating_context()
+  if context and context._inputs is not None:
+    return context
+  return None
+
+# Bytecode and snapshots of BUILD files, that b3 writes next to them
+_BUILDFILE_CACHE_RE = re.compile(r"^\..+\.(pyc|snapshot)$")
+# Functions and objects replaced by _watch_inputs()
+_os_listdir = os.listdir
+_os_environ = os.environ
+_os_path_checks = dict([(name, getattr(os.path, name))
+                        for name in ("exists", "isdir", "isfile")])
+_input_watchers = 0
+_input_watchers_lock = threading.Lock()
+
+def _digest_dir(path, names=None):
+  """Returns digest of the listing of directory `path`: the names of its
+  entries and whether each entry is a directory. Returns ``None`` if the
+  directory cannot be listed.
+  """
+  if names is None:
+    try:
+      names = _os_listdir(path)
+    except OSError:
+      return None
+  entries = []
+  for name in names:
+    if _BUILDFILE_CACHE_RE.match(name):
+      continue
+    if _os_path_checks["isdir"](os.path.join(path, name)):
+      name += os.sep
+    entries.append(name)
+  return hashlib.sha1("\0".join(sorted(entries))).hexdigest()
+
+def _digest_file(path):
+  try:
+    with __builtin__.open(path, "rb") as fh:
+      return hashlib.sha1(fh.read()).hexdigest()
+  except IOError:
+    return None
+
+def _digest_environ(environ):
+  return hashlib.sha1(json.dumps(sorted(environ.items()))).hexdigest()
+
+def _listdir(path):
+  """Replaces :func:`os.listdir` (and thus :func:`glob.glob` and
+  :func:`os.walk`) while BUILD files are evaluated.
+  """
+  names = None
+  try:
+    names = _os_listdir(path)
+  finally:
+    context = _get_recording_context()
+    if context:
+      digest = None
+      if names is not None:
+        digest = _digest_dir(path, names)
+      context.record_input("dirs", os.path.abspath(path), digest)
+  return names
+
+def _watch_path_check(name):
+  """Returns replacement of :func:`os.path.exists`, :func:`os.path.isdir` or
+  :func:`os.path.isfile`.
+  """
+  check = _os_path_checks[name]
+  @functools.wraps(check)
+  def watched_check(path):
+    result = check(path)
+    context = _get_recording_context()
+    if context:
+      context.record_input("paths", "%s:%s" % (name, os.path.abspath(path)),
+                           result)
+    return result
+  return watched_check
+
+def _open(name, mode="r", *args, **kwargs):
+  """Replaces :func:`open` for BUILD files. Records the content of the files
+  read by the BUILD file; writing a file disables the snapshot.
+  """
+  context = _get_evaluating_context()
+  if context and any([flag in mode for flag in "wa+"]):
+    context.disable_snapshot()
+  elif context:
+    context.record_input("files", os.path.abspath(name), _digest_file(name))
+  return __builtin__.open(name, mode, *args, **kwargs)
+
+class _Environ(UserDict.DictMixin):
+  """Replaces :data:`os.environ` while BUILD files are evaluated. Records the
+  variables read by the BUILD file; iteration over the environment records
+  the whole environment. Changing the environment disables the snapshot.
+  """
+
+  def __init__(self, environ):
+    self.environ = environ
+
+  def __getitem__(self, key):
+    context = _get_recording_context()
+    if context:
+      context.record_input("environ", key, self.environ.get(key, None))
+    return self.environ[key]
+
+  def __setitem__(self, key, value):
+    context = _get_evaluating_context()
+    if context:
+      context.disable_snapshot()
+    self.environ[key] = value
+
+  def __delitem__(self, key):
+    context = _get_evaluating_context()
+    if context:
+      context.disable_snapshot()
+    del self.environ[key]
+
+  def keys(self):
+    context = _get_recording_context()
+    if context:
+      context.record_input("environ", "*", _digest_environ(self.environ))
+    return self.environ.keys()
+
+  def copy(self):
+    return dict(self.iteritems())
+
+@contextmanager
+def _watch_inputs(enabled=True):
+  """Replaces :func:`os.listdir`, :func:`os.path.exists`,
+  :func:`os.path.isdir`, :func:`os.path.isfile` and :data:`os.environ` to
+  record the inputs read by BUILD files, see :func:`are_inputs_valid`. The
+  files opened with :func:`open` are recorded by :func:`_open`, which is
+  injected into BUILD files. Other reads, e.g. :func:`os.stat`, are not
+  watched; a BUILD file that depends on them has to call
+  ``disable_snapshot()``.
+  """
+  global _input_watchers
+  if not enabled:
+    yield
+    return
+  with _input_watchers_lock:
+    if not _input_watchers:
+      os.listdir = _listdir
+      os.environ = _Environ(_os_environ)
+      for name in _os_path_checks:
+        setattr(os.path, name, _watch_path_check(name))
+    _input_watchers += 1
+  try:
+    yield
+  finally:
+    with _input_watchers_lock:
+      _input_watchers -= 1
+      if not _input_watchers:
+        os.listdir = _os_listdir
+        os.environ = _os_environ
+        for name, check in _os_path_checks.items():
+          setattr(os.path, name, check)
+
+def are_inputs_valid(inputs, environ=None):
+  """Returns ``True`` if the inputs recorded while a BUILD file family was
+  evaluated (see :func:`_watch_inputs`) still have the same values. The
+  variables are looked up in `environ`, the current environment by default.
+  """
+  if environ is None:
+    environ = _os_environ
+  for path, digest in inputs.get("dirs", {}).items():
+    if _digest_dir(path) != digest:
+      return False
+  for key, result in inputs.get("paths", {}).items():
+    name, _, path = key.partition(":")
+    if name not in _os_path_checks or _os_path_checks[name](path) != result:
+      return False
+  for path, digest in inputs.get("files", {}).items():
+    if _digest_file(path) != digest:
+      return False
+  for key, value in inputs.get("environ", {}).items():
+    if key == "*":
+      if _digest_environ(environ) != value:
+        return False
+    elif environ.get(key, None) != value:
+      return False
+  return True
+
+def get_changed_buildfiles(environ=None):
+  """Returns a sorted list of the first BUILD files of the parsed families,
+  whose recorded inputs (see :func:`are_inputs_valid`) have been changed since
+  they were parsed. The variables are looked up in `environ`, the current
+  environment by default.
+  """
+  return sorted([buildfile for buildfile, inputs in _parsed_inputs.items()
+                 if not are_inputs_valid(inputs, environ)],
+                key=lambda buildfile: buildfile.full_path)
+
+def _disable_snapshot():
+  """Lets the BUILD file being evaluated opt out of snapshots, e.g. when it
+  reads inputs that are not watched by :func:`_watch_inputs`.
+  """
+  if _active_contexts:
+    _active_contexts[-1].disable_snapshot()
+
+setattr(primitives, "disable_snapshot", _disable_snapshot)
+
+class Snapshot(object):
+  """Snapshot of the rules created by a BUILD file family. The snapshot stays
+  valid while the family consists of the same BUILD files, their content
+  didn't change, and the directory listings and environment variables read
+  by the BUILD files are the same. The modification time and size of each
+  BUILD file is checked first, the content digest is compared only if they
+  differ.
+  """
+
+  def __init__(self, buildfile, buildfile_family):
+    self.buildfile = buildfile
+    self.buildfile_family = buildfile_family
+    self.records = None
+    self.inputs = None
+
+  @staticmethod
+  def _stat(buildfile):
+    stat = os.stat(buildfile.full_path)
+    return stat.st_mtime, stat.st_size
+
+  @staticmethod
+  def _digest(buildfile):
+    with open(buildfile.full_path, "rb") as fh:
+      return hashlib.sha1(fh.read()).hexdigest()
+
+  def _is_valid(self, files):
+    if [relpath for relpath, _, _, _ in files] != \
+          [buildfile.relpath for buildfile in self.buildfile_family]:
+      return False
+    for buildfile, (_, mtime, size, digest) in zip(self.buildfile_family,
+                                                   files):
+      if self._stat(buildfile) == (mtime, size):
+        continue
+      if self._digest(buildfile) != digest:
+        return False
+    return True
+
+  def load(self):
+    """Loads the snapshot. Returns ``True`` if the snapshot exists and is still
+    valid, ``False`` otherwise.
+    """
+    if not os.path.exists(self.buildfile.snapshot_path):
+      return False
+    try:
+      with open(self.buildfile.snapshot_path) as fh:
+        data = _decode_plain_data(json.load(fh))
+    except ValueError:
+      return False
+    if data.get("version", None) != SNAPSHOT_VERSION or \
+          data.get("records", None) is None or \
+          not self._is_valid(data.get("files", [])) or \
+          not are_inputs_valid(data.get("inputs", {})):
+      return False
+    self.records = data["records"]
+    self.inputs = data.get("inputs", {})
+    return True
+
+  def save(self, records, inputs=None):
+    """Saves the snapshot if records were provided, otherwise removes the
+    outdated snapshot.
+    """
+    if records is None:
+      if os.path.exists(self.buildfile.snapshot_path):
+        os.remove(self.buildfile.snapshot_path)
+      return
+    files = []
+    for buildfile in self.buildfile_family:
+      mtime, size = self._stat(buildfile)
+      files.append([buildfile.relpath, mtime, size, self._digest(buildfile)])
+    try:
+      with open(self.buildfile.snapshot_path, "w") as fh:
+        json.dump({"version": SNAPSHOT_VERSION, "files": files,
+                   "inputs": inputs or {}, "records": records}, fh)
+    except IOError, e:
+      logger.debug("Cannot save snapshot of %s: %s" % (self.buildfile, e))
+    self.records = records
+    self.inputs = inputs
+
@@ -0,0 +1,186 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.b3 import buildfile
+from bb.tools.b3.rules import cc
+
+class SnapshotTest(unittest.TestCase):
+
+  def setup(self):
+    self.root_dir = tempfile.mkdtemp()
+    with open(os.path.join(self.root_dir, "BUILD"), "w") as fh:
+      fh.write("cc_binary(name='hello', srcs=['hello.c'])\n")
+    self.buildfile = buildfile.BuildFile(self.root_dir, ".")
+
+  def teardown(self):
+    shutil.rmtree(self.root_dir)
+
+  def new_snapshot(self):
+    return buildfile.Snapshot(self.buildfile, tuple(self.buildfile.family()))
+
+  def test_plain_data(self):
+    self.assert_true(buildfile.is_plain_data({"srcs": ["a.c"], "x": 1}))
+    self.assert_false(buildfile.is_plain_data({"srcs": [lambda: "a.c"]}))
+    self.assert_false(buildfile.is_plain_data(("a", "b")))
+
+  def test_save_and_load(self):
+    records = [["BUILD", "bb.tools.b3.rules.cc", "CCBinary", [],
+                {"name": "hello", "srcs": ["hello.c"]}]]
+    self.assert_false(self.new_snapshot().load())
+    self.new_snapshot().save(records)
+    snapshot = self.new_snapshot()
+    self.assert_true(snapshot.load())
+    self.assert_equal(snapshot.records, records)
+    self.assert_true(all([type(src) is str
+                          for src in snapshot.records[0][4]["srcs"]]))
+
+  def test_invalidation(self):
+    self.new_snapshot().save([])
+    with open(self.buildfile.full_path, "a") as fh:
+      fh.write("# changed\n")
+    self.assert_false(self.new_snapshot().load())
+
+  def test_removal(self):
+    self.new_snapshot().save([])
+    self.new_snapshot().save(None)
+    self.assert_false(os.path.exists(self.buildfile.snapshot_path))
+
+class SnapshotParseTest(unittest.TestCase):
+
+  def setup(self):
+    self.root_dir = tempfile.mkdtemp()
+    for filename in ("lib.c", "main.c"):
+      self.write(filename, "")
+
+  def teardown(self):
+    self.reset()
+    os.environ.pop("B3_SNAPSHOT_TEST", None)
+    shutil.rmtree(self.root_dir)
+
+  def write(self, filename, content):
+    with open(os.path.join(self.root_dir, filename), "w") as fh:
+      fh.write(content)
+
+  def reset(self):
+    buildfile._parsed_contexts.clear()
+    buildfile._rules_by_address.clear()
+    buildfile._addresses_by_buildfile.clear()
+    buildfile.dependency_graph.clear()
+    buildfile._parsed_inputs.clear()
+
+  def parse(self):
+    """Parses the BUILD file from scratch. Returns whether the rules were
+    restored from the snapshot and the ``app`` rule.
+    """
+    self.reset()
+    context = buildfile.Context(buildfile.BuildFile(self.root_dir, "."))
+    restored = context._parse({})
+    return restored, buildfile.get_rule(buildfile.get_address(self.root_dir,
+                                                              ":app", False))
+
+  def test_restore(self):
+    self.write("BUILD", "cc_library(name='lib', srcs=['lib.c'])\n"
+               "cc_binary(name='app', srcs=['main.c'], deps=[':lib'])\n")
+    restored, app = self.parse()
+    self.assert_false(restored)
+    restored, app = self.parse()
+    self.assert_true(restored)
+    self.assert_equal([dep.get_name() for dep in app.get_dependencies()],
+                      ["lib"])
+
+  def test_mutation_after_construction(self):
+    self.write("BUILD", "cc_library(name='lib', srcs=['lib.c'])\n"
+               "app = cc_binary(name='app', srcs=['main.c'])\n"
+               "app.set_description('app')\n"
+               "app.add_dependency(':lib')\n"
+               "app.set_copts(['-O2'])\n")
+    for i in range(2):
+      restored, app = self.parse()
+      self.assert_false(restored)
+      self.assert_equal(app._description, "app")
+      self.assert_equal([dep.get_name() for dep in app.get_dependencies()],
+                        ["lib"])
+      self.assert_equal(app.get_copts(), ["-O2"])
+
+  def test_listdir_invalidation(self):
+    self.write("BUILD", "import glob\n"
+               "cc_binary(name='app', srcs=sorted(glob.glob('*.c')))\n")
+    restored, app = self.parse()
+    restored, app = self.parse()
+    self.assert_true(restored)
+    self.write("extra.c", "")
+    restored, app = self.parse()
+    self.assert_false(restored)
+    self.assert_equal([os.path.basename(src) for src in app.get_sources()],
+                      ["extra.c", "lib.c", "main.c"])
+
+  def test_isdir_invalidation(self):
+    self.write("BUILD", "import os\n"
+               "cc_binary(name='app', srcs=['main.c'],\n"
+               "          copts=sorted(filter(os.path.isdir, "
+               "os.listdir('.'))))\n")
+    self.write("sub", "")
+    restored, app = self.parse()
+    restored, app = self.parse()
+    self.assert_true(restored)
+    self.assert_equal(app.get_copts(), [])
+    # The same names, but the file became a directory
+    os.remove(os.path.join(self.root_dir, "sub"))
+    os.mkdir(os.path.join(self.root_dir, "sub"))
+    restored, app = self.parse()
+    self.assert_false(restored)
+    self.assert_equal(app.get_copts(), ["sub"])
+
+  def test_open_invalidation(self):
+    self.write("BUILD", "cc_binary(name='app', srcs=['main.c'],\n"
+               "          copts=open('copts.txt').read().split())\n")
+    self.write("copts.txt", "-O0")
+    restored, app = self.parse()
+    restored, app = self.parse()
+    self.assert_true(restored)
+    self.write("copts.txt", "-O2")
+    restored, app = self.parse()
+    self.assert_false(restored)
+    self.assert_equal(app.get_copts(), ["-O2"])
+
+  def test_disable_snapshot(self):
+    self.write("BUILD", "disable_snapshot()\n"
+               "cc_binary(name='app', srcs=['main.c'])\n")
+    restored, app = self.parse()
+    restored, app = self.parse()
+    self.assert_false(restored)
+
+  def test_environ_invalidation(self):
+    self.write("BUILD", "import os\n"
+               "cc_binary(name='app', srcs=['main.c'],\n"
+               "          copts=[os.environ.get('B3_SNAPSHOT_TEST', '-O0')])\n")
+    restored, app = self.parse()
+    restored, app = self.parse()
+    self.assert_true(restored)
+    os.environ["B3_SNAPSHOT_TEST"] = "-O2"
+    restored, app = self.parse()
+    self.assert_false(restored)
+    self.assert_equal(app.get_copts(), ["-O2"])
+
+  def test_changed_buildfiles(self):
+    self.write("BUILD", "import glob, os\n"
+               "disable_snapshot()\n"
+               "cc_binary(name='app', srcs=sorted(glob.glob('*.c')),\n"
+               "          copts=[os.environ.get('B3_SNAPSHOT_TEST', '-O0')])\n")
+    self.parse()
+    family = [buildfile.BuildFile(self.root_dir, ".")]
+    self.assert_equal(buildfile.get_changed_buildfiles(), [])
+    environ = dict(os.environ, B3_SNAPSHOT_TEST="-O2")
+    self.assert_equal(buildfile.get_changed_buildfiles(environ), family)
+    self.write("extra.c", "")
+    self.assert_equal(buildfile.get_changed_buildfiles(), family)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko <info@bionicbunny.org>
+
+"""Thin client of the b3 build server (see :mod:`bb.tools.b3.server`). Once the
+server is running for the current build root, b3 forwards commands to it
+instead of starting from scratch::
+
+  $ b3 server &
+  $ b3 build :app    # executed by the server
+
+This module has to stay light: it must not import b3 engine, rules or
+configuration, since that's exactly the startup cost the server saves.
+
+Protocol: the client sends a single JSON line
+``{"argv": [...], "cwd": "...", "environ": {...}}`` or ``{"stop": true}``. The
+command is executed in the client working directory and environment. The
+server replies with the raw command output followed by :const:`EXIT_MARKER`
+and the exit code, and closes the connection.
+"""
+
+from __future__ import print_function
+
+import errno
+import hashlib
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+
+EXIT_MARKER = "\0b3-exit:"
+# Exit code sent by the server that is going to restart, since the files that
+# the warm state depends on have been changed. The client has to retry.
+RESTART_EXIT_CODE = 255
+# Max time to wait for the server after restart, in seconds
+RESTART_TIMEOUT = 30.0
+BUFFER_SIZE = 4096
+
+def get_socket_path(root_dir):
+  """Returns path to the server socket for the build root `root_dir`."""
+  digest = hashlib.sha1(os.path.abspath(root_dir)).hexdigest()[:16]
+  return os.path.join(tempfile.gettempdir(),
+                      "b3-%d-%s.sock" % (os.getuid(), digest))
+
+def connect(root_dir):
+  """Returns socket connected to the server, or ``None`` if the server is not
+  running.
+  """
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    sock.connect(get_socket_path(root_dir))
+  except socket.error, e:
+    sock.close()
+    if e.errno in (errno.ENOENT, errno.ECONNREFUSED):
+      return None
+    raise
+  return sock
+
+def is_server_running(root_dir):
+  sock = connect(root_dir)
+  if not sock:
+    return False
+  sock.close()
+  return True
+
+def _request(sock, request, output):
+  """Sends request and writes server output to `output`. Returns exit code or
+  ``None`` if the connection was lost before the exit code was received.
+  """
+  sock.sendall(json.dumps(request) + "\n")
+  # Hold back the tail of the stream, so the exit marker will never be printed
+  hold = len(EXIT_MARKER) + 8
+  tail = ""
+  while True:
+    chunk = sock.recv(BUFFER_SIZE)
+    if not chunk:
+      break
+    tail += chunk
+    if len(tail) > hold:
+      output.write(tail[:-hold])
+      output.flush()
+      tail = tail[-hold:]
+  sock.close()
+  i = tail.rfind(EXIT_MARKER)
+  if i < 0:
+    output.write(tail)
+    return None
+  output.write(tail[:i])
+  output.flush()
+  return int(tail[i + len(EXIT_MARKER):].strip())
+
+def forward(root_dir, argv, output=sys.stdout):
+  """Forwards command to the server. Returns the command exit code, or
+  ``None`` if the server is not running.
+  """
+  sock = connect(root_dir)
+  if not sock:
+    return None
+  request = {"argv": argv, "cwd": os.getcwd(), "environ": dict(os.environ)}
+  code = _request(sock, request, output)
+  deadline = time.time() + RESTART_TIMEOUT
+  while code == RESTART_EXIT_CODE and time.time() < deadline:
+    time.sleep(0.1)
+    sock = connect(root_dir)
+    if sock:
+      code = _request(sock, request, output)
+  if code is None:
+    print("b3 server closed connection unexpectedly", file=sys.stderr)
+    return 1
+  return code
+
+def stop_server(root_dir):
+  """Stops the server. Returns ``True`` if the server was running."""
+  sock = connect(root_dir)
+  if not sock:
+    return False
+  _request(sock, {"stop": True}, sys.stdout)
+  return True
@@ -0,0 +1,33 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import socket
+import StringIO
+
+from bb.utils.testing import unittest
+from bb.tools.b3 import client
+
+class RequestTest(unittest.TestCase):
+
+  def request(self, reply):
+    sock, server = socket.socketpair()
+    server.sendall(reply)
+    server.shutdown(socket.SHUT_WR)
+    output = StringIO.StringIO()
+    code = client._request(sock, {"argv": ["build"]}, output)
+    server.close()
+    return code, output.getvalue()
+
+  def test_exit_code(self):
+    self.assert_equal(self.request("hello\n" * 1000 + client.EXIT_MARKER +
+                                   "3\n"),
+                      (3, "hello\n" * 1000))
+    self.assert_equal(self.request(client.EXIT_MARKER + "0\n"), (0, ""))
+
+  def test_lost_connection(self):
+    self.assert_equal(self.request("hello"), (None, "hello"))
+
+if __name__ == "__main__":
+  unittest.main()
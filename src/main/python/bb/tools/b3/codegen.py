@@ -0,0 +1,96 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko <info@bionicbunny.org>
+
+"""Support for the files generated by BUILD files. The generator renders the
+file content in memory and passes it to :func:`write_file`, that rewrites the
+file only if its content has been changed::
+
+  from bb.tools.b3 import codegen
+
+  def gen_config_h(rule, os):
+    output_fn = rule.buildpath(["bb", "os", "config_autogen.h"])
+    codegen.write_file(output_fn, template.render(context))
+
+Thus the modification time of unchanged files is preserved and the objects
+that depend on them are not recompiled.
+
+All the generated files are kept in the registry together with digests of
+their content, so their content doesn't have to be read again to compute
+action keys. The digest is trusted only while the size and modification time
+of the file are the same as right after :func:`write_file`, thus a file that
+has been changed outside of the generator is read again.
+"""
+
+import hashlib
+import os
+import threading
+
+from bb.tools.b3 import profiler
+from bb.utils import logging
+from bb.utils import path_utils
+
+logger = logging.get_logger("bb")
+
+# Maps absolute path of the generated file to a tuple of the digest of its
+# content and its (size, mtime)
+_registry = dict()
+_lock = threading.Lock()
+
+def _stat(path):
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return stat.st_size, stat.st_mtime
+
+def get_digest(path):
+  """Returns digest of the content of generated file `path`, or ``None`` if
+  the file wasn't generated or has been changed since.
+  """
+  path = os.path.abspath(path)
+  digest, stat = _registry.get(path, (None, None))
+  if digest is None or _stat(path) != stat:
+    return None
+  return digest
+
+def is_generated(path):
+  return os.path.abspath(path) in _registry
+
+def get_generated_files():
+  """Returns a sorted list of the files generated so far."""
+  return sorted(_registry.keys())
+
+def _read_file(path):
+  try:
+    with open(path, "rb") as fh:
+      return fh.read()
+  except IOError:
+    return None
+
+def write_file(path, content):
+  """Writes generated `content` to the file `path`, unless the file already has
+  exactly the same content. Returns ``True`` if the file has been written.
+  """
+  path = os.path.abspath(path)
+  if isinstance(content, unicode):
+    content = content.encode("utf-8")
+  digest = hashlib.sha1(content).hexdigest()
+  with profiler.span(os.path.basename(path), "generate", path=path) as args:
+    changed = _read_file(path) != content
+    if changed:
+      logger.info("Generating %s" % path)
+      path_utils.mkpath(os.path.dirname(path))
+      tmp_path = "%s.tmp%d" % (path, os.getpid())
+      with open(tmp_path, "wb") as fh:
+        fh.write(content)
+      os.rename(tmp_path, path)
+    else:
+      logger.debug("%s is up to date" % path)
+    args["changed"] = changed
+  with _lock:
+    _registry[path] = (digest, _stat(path))
+  return changed
@@ -0,0 +1,52 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.b3 import codegen
+from bb.tools.b3.action_cache import Digest
+
+class CodegenTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmpdir, "bb", "os", "config_autogen.h")
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_write_if_changed(self):
+    self.assert_true(codegen.write_file(self.path, "#define A 1\n"))
+    os.utime(self.path, (0, 0))
+    self.assert_false(codegen.write_file(self.path, u"#define A 1\n"))
+    self.assert_equal(os.path.getmtime(self.path), 0)
+    self.assert_true(codegen.write_file(self.path, "#define A 2\n"))
+    with open(self.path) as fh:
+      self.assert_equal(fh.read(), "#define A 2\n")
+    self.assert_equal(os.listdir(os.path.dirname(self.path)),
+                      ["config_autogen.h"])
+
+  def test_registry(self):
+    self.assert_false(codegen.is_generated(self.path))
+    codegen.write_file(self.path, "#define A 1\n")
+    self.assert_true(codegen.is_generated(self.path))
+    self.assert_true(self.path in codegen.get_generated_files())
+    digest = Digest().update_file(self.path).hexdigest()
+    self.assert_equal(codegen.get_digest(self.path),
+                      hashlib.sha1("#define A 1\n").hexdigest())
+    # The file changed outside of the generator is read again
+    with open(self.path, "w") as fh:
+      fh.write("#define A 2\n")
+    os.utime(self.path, (0, 0))
+    self.assert_is_none(codegen.get_digest(self.path))
+    self.assert_true(codegen.is_generated(self.path))
+    self.assert_not_equal(Digest().update_file(self.path).hexdigest(), digest)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -14,15 +14,23 @@ from __future__ import print_function
 
 import sys
 import os
+import threading
 import traceback
 
 import bb.config
 from bb.tools.b3.commands.command import Command
 from bb.tools.b3 import buildfile
+from bb.tools.b3 import profiler
+from bb.tools.b3.action_cache import ActionCache
+from bb.tools.b3.executor import Executor
+from bb.tools.b3.rules.propeller import PropellerLoad
+from bb.tools.compilers.custom_c_compiler import CustomCCompiler
+from bb.tools.compilers.object_cache import ObjectCache
 from bb.utils import path_utils
 from bb.utils import logging
 
 DEFAULT_TARGET = ":all"
+ACTION_CACHE_DIR = ".b3cache"
 
 logger = logging.get_logger("bb")
 
@@ -31,6 +39,10 @@ class Build(Command):
 
   def __init__(self, root_dir, parser, argv):
     Command.__init__(self, root_dir, parser, argv)
+    if self.options.profile:
+      profiler.start()
+    if not self.options.use_cache:
+      buildfile.disable_snapshots()
     if not self.args:
       self.args = [DEFAULT_TARGET]
     self.rules = []
@@ -72,6 +84,26 @@ class Build(Command):
                       default=False, help="Don't output result of empty rules")
     parser.add_option("--list-rules", action="store_true", dest="list_rules",
                       default=False, help="List existed rules")
+    parser.add_option("-j", "--jobs", type="int", dest="jobs", default=1,
+                      metavar="N", help="Execute up to N independent rules "
+                      "and compile up to N objects of a rule simultaneously")
+    parser.add_option("--no-cache", action="store_false", dest="use_cache",
+                      default=True, help="Evaluate all the BUILD files and "
+                      "execute all the rules, even if they can be restored "
+                      "from snapshots and the action cache")
+    parser.add_option("--force-upload", action="store_true",
+                      dest="force_upload", default=False,
+                      help="Write binaries to EEPROM even if the same binary "
+                      "is recorded as already written to the board")
+    parser.add_option("--profile", dest="profile", metavar="FILE",
+                      help="Write Chrome trace of the build to FILE")
+    parser.add_option("--object-cache", dest="object_cache", metavar="DIR",
+                      help="Reuse objects compiled by previous builds from "
+                      "object cache located at DIR")
+    parser.add_option("--object-cache-size", type="int",
+                      dest="object_cache_size", default=1024, metavar="MB",
+                      help="Max size of the object cache in megabytes "
+                      "[default: %default]")
     parser.epilog = "Builds the specified rule(s). Currently any additional" \
         "arguments are passed straight through to the ant build" \
         "system."
@@ -82,6 +114,37 @@ class Build(Command):
       for rule in self.rules:
         print("\t", rule.name)
       return
-    for rule in self.rules:
-      logger.debug("Execute %s" % rule)
-      rule.execute()
+    if self.options.jobs < 1:
+      self.error("Number of jobs has to be positive: %d" % self.options.jobs)
+    action_cache = None
+    if self.options.use_cache:
+      action_cache = ActionCache(path_utils.join(
+          bb.config.user_settings.get("b3", "builddir"), ACTION_CACHE_DIR))
+    object_cache = None
+    if self.options.object_cache:
+      if self.options.object_cache_size < 0:
+        self.error("Object cache size has to be non-negative: %d" %
+                   self.options.object_cache_size)
+      object_cache = ObjectCache(self.options.object_cache,
+                                 self.options.object_cache_size << 20)
+    # Running rules and the objects compiled by their compilers share the
+    # same limit, so there are never more than --jobs of them
+    job_slots = threading.BoundedSemaphore(self.options.jobs)
+    for rule in buildfile.dependency_graph.nodes():
+      compiler = getattr(rule, "compiler", None)
+      if isinstance(compiler, CustomCCompiler):
+        compiler.set_num_jobs(self.options.jobs)
+        compiler.set_job_slots(job_slots)
+        compiler.set_object_cache(object_cache)
+      if isinstance(rule, PropellerLoad) and \
+            (self.options.force_upload or not self.options.use_cache):
+        rule.set_force_upload(True)
+    executor = Executor(buildfile.dependency_graph,
+                        num_workers=self.options.jobs,
+                        action_cache=action_cache, job_slots=job_slots)
+    try:
+      executor.execute(self.rules)
+    finally:
+      if self.options.profile:
+        profiler.stop().save(self.options.profile, buildfile.dependency_graph,
+                             self.rules)
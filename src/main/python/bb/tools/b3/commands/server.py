@@ -0,0 +1,49 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+
+"""The server command starts b3 build server for the current build root::
+
+  $ b3 server
+
+While the server is running, all the other b3 commands started from the same
+directory are forwarded to the server. To stop the server::
+
+  $ b3 server --stop
+"""
+
+from __future__ import print_function
+
+from bb.tools.b3.commands.command import Command
+from bb.tools.b3 import client
+
+class Server(Command):
+  """This class represents server command."""
+
+  def setup_parser(self, parser, args):
+    parser.set_usage("\n"
+                     "  %prog server (options)")
+    parser.add_option("--stop", action="store_true", dest="stop",
+                      default=False, help="Stop running server")
+    parser.add_option("--status", action="store_true", dest="status",
+                      default=False, help="Check whether server is running")
+    parser.epilog = "Runs b3 build server that keeps parsed BUILD files in " \
+        "memory and executes commands forwarded by b3."
+
+  def execute(self):
+    if self.options.stop:
+      if not client.stop_server(self.root_dir):
+        print("b3 server is not running")
+      return 0
+    if self.options.status:
+      if client.is_server_running(self.root_dir):
+        print("b3 server is running: %s" %
+              client.get_socket_path(self.root_dir))
+        return 0
+      print("b3 server is not running")
+      return 0
+    # The server module requires the engine, import it on demand
+    from bb.tools.b3.server import BuildServer
+    BuildServer(self.root_dir).serve_forever()
+    return 0
@@ -91,13 +91,16 @@ def register_rules():
       if issubclass(cls, buildfile.Rule):
         setattr(sys.modules[__name__], cls.__name__, cls)
 
+def new_command(rootdir, args):
+  """Creates and returns a new command instance described by args."""
+  command_class, command_args = parse_command(rootdir, args)
+  parser = optparse.OptionParser(version='b3 %s' % get_version())
+  return command_class(rootdir, parser, command_args)
+
 def run():
-  version = get_version()
   rootdir = get_build_root()
-  print("b3 v%s" % version)
-  command_class, command_args = parse_command(rootdir, sys.argv[1:])
-  parser = optparse.OptionParser(version='b3 %s' % version)
-  command = command_class(rootdir, parser, command_args)
+  print("b3 v%s" % get_version())
+  command = new_command(rootdir, sys.argv[1:])
   if command.serialized():
     raise NotImplementedError()
   else:
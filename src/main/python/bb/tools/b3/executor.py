@@ -0,0 +1,162 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko <info@bionicbunny.org>
+
+"""The executor walks the dependency graph of the requested rules and executes
+every reachable rule exactly once, dependencies first. Independent rules can be
+executed concurrently on a pool of worker threads::
+
+  executor = Executor(buildfile.dependency_graph, num_workers=8)
+  executor.execute(rules)
+
+When an :class:`~bb.tools.b3.action_cache.ActionCache` is provided, cacheable
+rules with unchanged inputs are restored from the cache instead.
+
+When `job_slots` semaphore is provided, each running rule holds one slot. The
+semaphore can be shared with the compilers (see
+:func:`~bb.tools.compilers.custom_c_compiler.CustomCCompiler.set_job_slots`),
+so the rules and the compilers they spawn never exceed the same limit.
+
+Threads are used instead of processes since the rule classes are generated at
+parse time and cannot be pickled, while most of the time is spent waiting for
+spawned compilers anyway.
+"""
+
+import collections
+import sys
+import threading
+import Queue
+
+from bb.utils import typecheck
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+class ExecutionError(Exception):
+  """Execution error."""
+
+class CycleError(ExecutionError):
+  """Indicates that the rules to execute form a dependency cycle."""
+
+class Executor(object):
+  """Executes rules from a dependency graph, where an edge ``(a, b)`` means
+  that rule ``a`` depends on rule ``b``.
+  """
+
+  def __init__(self, graph, num_workers=1, action_cache=None, job_slots=None):
+    if not typecheck.is_int(num_workers) or num_workers < 1:
+      raise TypeError("num_workers has to be a positive integer")
+    self._graph = graph
+    self._num_workers = num_workers
+    self._action_cache = action_cache
+    self._job_slots = job_slots
+
+  def get_num_workers(self):
+    return self._num_workers
+
+  def get_plan(self, rules):
+    """Returns a tuple ``(deps, parents)`` that describes the subgraph reachable
+    from the given rules. Both are dicts: `deps` maps a rule to the set of rules
+    it depends on, `parents` maps a rule to the set of rules depending on it.
+    """
+    deps = dict()
+    parents = collections.defaultdict(set)
+    stack = list(rules)
+    while stack:
+      rule = stack.pop()
+      if rule in deps:
+        continue
+      deps[rule] = set(self._graph.successors(rule))
+      for dep in deps[rule]:
+        parents[dep].add(rule)
+        stack.append(dep)
+    return deps, parents
+
+  def execute(self, rules):
+    """Executes the given rules and all their dependencies. Raises the first
+    error occured during execution; once an error occured no new rules will be
+    started.
+    """
+    if hasattr(self._graph, "resolve_forks"):
+      self._graph.resolve_forks()
+    deps, parents = self.get_plan(rules)
+    pending = dict((rule, len(rule_deps)) for rule, rule_deps in deps.items())
+    ready = collections.deque([rule for rule, n in pending.items() if not n])
+    if self._num_workers == 1:
+      self._execute_serially(ready, pending, parents)
+    else:
+      self._execute_concurrently(ready, pending, parents)
+    if pending:
+      raise CycleError("Dependency cycle between: %s" %
+                       ", ".join(sorted([str(rule) for rule in pending])))
+
+  def _complete(self, rule, ready, pending, parents):
+    del pending[rule]
+    for parent in parents.get(rule, ()):
+      pending[parent] -= 1
+      if not pending[parent]:
+        ready.append(parent)
+
+  def _execute_serially(self, ready, pending, parents):
+    while ready:
+      rule = ready.popleft()
+      logger.debug("Execute %s" % rule)
+      if self._job_slots:
+        self._job_slots.acquire()
+      try:
+        rule.execute_once(self._action_cache)
+      finally:
+        if self._job_slots:
+          self._job_slots.release()
+      self._complete(rule, ready, pending, parents)
+
+  def _execute_concurrently(self, ready, pending, parents):
+    tasks = Queue.Queue()
+    results = Queue.Queue()
+    def work():
+      while True:
+        rule = tasks.get()
+        if rule is None:
+          return
+        try:
+          rule.execute_once(self._action_cache)
+          results.put((rule, None))
+        except BaseException:
+          results.put((rule, sys.exc_info()))
+    workers = [threading.Thread(target=work, name="b3-worker-%d" % i)
+               for i in range(self._num_workers)]
+    for worker in workers:
+      worker.daemon = True
+      worker.start()
+    in_flight = 0
+    error = None
+    try:
+      while True:
+        while ready and not error:
+          # Wait for a slot only if there is nothing else to wait for
+          if self._job_slots and not self._job_slots.acquire(not in_flight):
+            break
+          rule = ready.popleft()
+          logger.debug("Execute %s" % rule)
+          tasks.put(rule)
+          in_flight += 1
+        if not in_flight:
+          break
+        # NOTE: get() without timeout cannot be interrupted by KeyboardInterrupt
+        # in Python 2.
+        rule, exc_info = results.get(True, sys.maxint)
+        in_flight -= 1
+        if self._job_slots:
+          self._job_slots.release()
+        if exc_info:
+          error = error or exc_info
+          continue
+        self._complete(rule, ready, pending, parents)
+    finally:
+      for _ in workers:
+        tasks.put(None)
+    if error:
+      raise error[0], error[1], error[2]
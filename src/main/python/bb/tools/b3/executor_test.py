@@ -0,0 +1,95 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import threading
+import time
+
+import networkx
+
+from bb.utils.testing import unittest
+from bb.tools.b3.executor import Executor, CycleError
+
+class FakeRule(object):
+
+  def __init__(self, name, log, fail=False):
+    self.name = name
+    self.log = log
+    self.fail = fail
+    self.lock = threading.Lock()
+
+  def execute_once(self, action_cache=None):
+    if self.fail:
+      raise RuntimeError(self.name)
+    with self.lock:
+      self.log.append(self.name)
+
+  def __repr__(self):
+    return self.name
+
+def diamond(log, fail=None):
+  rules = dict([(name, FakeRule(name, log, name == fail))
+                for name in ("app", "left", "right", "os")])
+  graph = networkx.DiGraph()
+  graph.add_edge(rules["app"], rules["left"])
+  graph.add_edge(rules["app"], rules["right"])
+  graph.add_edge(rules["left"], rules["os"])
+  graph.add_edge(rules["right"], rules["os"])
+  return graph, rules
+
+class ExecutorTest(unittest.TestCase):
+
+  def test_serial_order(self):
+    log = []
+    graph, rules = diamond(log)
+    Executor(graph).execute([rules["app"]])
+    self.assert_equal(len(log), 4)
+    self.assert_equal(log[0], "os")
+    self.assert_equal(log[-1], "app")
+
+  def test_parallel_executes_each_rule_once(self):
+    log = []
+    graph, rules = diamond(log)
+    Executor(graph, num_workers=4).execute([rules["app"], rules["left"]])
+    self.assert_equal(sorted(log), ["app", "left", "os", "right"])
+    self.assert_equal(log[0], "os")
+    self.assert_equal(log[-1], "app")
+
+  def test_job_slots(self):
+    running = []
+    max_running = []
+    lock = threading.Lock()
+    def execute_once(action_cache=None):
+      with lock:
+        running.append(None)
+        max_running.append(len(running))
+      time.sleep(0.01)
+      with lock:
+        running.pop()
+    log = []
+    graph, rules = diamond(log)
+    for rule in rules.values():
+      rule.execute_once = execute_once
+    job_slots = threading.BoundedSemaphore(1)
+    Executor(graph, num_workers=4, job_slots=job_slots).execute([rules["app"]])
+    self.assert_equal(max(max_running), 1)
+    self.assert_equal(len(max_running), 4)
+    # All the slots have been released
+    self.assert_true(job_slots.acquire(False))
+
+  def test_failure(self):
+    log = []
+    graph, rules = diamond(log, fail="left")
+    executor = Executor(graph, num_workers=2)
+    self.assert_raises(RuntimeError, executor.execute, [rules["app"]])
+    self.assert_false("app" in log)
+
+  def test_cycle(self):
+    log = []
+    graph, rules = diamond(log)
+    graph.add_edge(rules["os"], rules["app"])
+    self.assert_raises(CycleError, Executor(graph).execute, [rules["app"]])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko <info@bionicbunny.org>
+
+"""The profiler records a timeline of b3 activity: BUILD file parsing, rule
+execution, spawned processes and generated files. The timeline is saved in
+Chrome trace event format, that can be opened with ``chrome://tracing`` or
+Perfetto::
+
+  $ b3 build --profile=out.json :app
+
+The instrumented code uses :func:`span`, which does nothing unless the
+profiler has been started with :func:`start`::
+
+  with profiler.span("BUILD", "parse"):
+    ...
+"""
+
+from __future__ import print_function
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from bb.utils import logging
+from bb.utils import process
+
+logger = logging.get_logger("bb")
+
+_active = None
+
+def get_profiler():
+  """Returns the active profiler or ``None``."""
+  return _active
+
+def start():
+  """Starts and returns a new active profiler."""
+  global _active
+  stop()
+  _active = Profiler()
+  process.add_observer(_active.add_process)
+  return _active
+
+def stop():
+  """Stops the active profiler, if any, and returns it."""
+  global _active
+  profiler = _active
+  if profiler:
+    process.remove_observer(profiler.add_process)
+    _active = None
+  return profiler
+
+@contextlib.contextmanager
+def span(name, category, key=None, **args):
+  """Records the time spent in the with-block as an event of the active
+  profiler. The block gets a dict of event arguments, that can be updated
+  until the end of the block. If `key` is provided, the duration can be
+  retrieved later with :func:`Profiler.get_duration`.
+  """
+  profiler = _active
+  if not profiler:
+    yield args
+    return
+  start_time = time.time()
+  try:
+    yield args
+  finally:
+    profiler.add_span(name, category, start_time, time.time(), key=key,
+                      **args)
+
+class Profiler(object):
+  """Collects trace events. Thread-safe."""
+
+  def __init__(self):
+    self._start_time = time.time()
+    self._events = []
+    self._durations = dict()
+    self._threads = dict()
+    self._lock = threading.Lock()
+
+  def _get_tid(self):
+    thread = threading.current_thread()
+    with self._lock:
+      if thread.ident not in self._threads:
+        self._threads[thread.ident] = thread.name
+    return thread.ident
+
+  def _to_us(self, t):
+    return int((t - self._start_time) * 1000000)
+
+  def add_span(self, name, category, start_time, end_time, key=None, **args):
+    """Adds complete event that took place between `start_time` and
+    `end_time`, as returned by :func:`time.time`.
+    """
+    event = {
+      "name": name,
+      "cat": category,
+      "ph": "X",
+      "ts": self._to_us(start_time),
+      "dur": self._to_us(end_time) - self._to_us(start_time),
+      "pid": os.getpid(),
+      "tid": self._get_tid(),
+    }
+    if args:
+      event["args"] = args
+    with self._lock:
+      self._events.append(event)
+      if key is not None:
+        self._durations[key] = end_time - start_time
+
+  def add_process(self, result):
+    """Adds event for the finished process described by
+    :class:`bb.utils.process.ProcessResult`.
+    """
+    self.add_span(os.path.basename(result.cmd[0]), "process",
+                  result.start_time, result.end_time,
+                  cmd=" ".join(result.cmd),
+                  exit_code=result.get_exit_code(),
+                  user_time=result.user_time,
+                  system_time=result.system_time,
+                  max_rss_kb=result.max_rss)
+
+  def get_events(self):
+    with self._lock:
+      return list(self._events)
+
+  def get_duration(self, key):
+    """Returns duration in seconds of the span recorded with `key`, or
+    ``None``.
+    """
+    return self._durations.get(key)
+
+  def get_critical_path(self, graph, rules):
+    """Returns a tuple ``(path, duration)`` that describes the longest chain of
+    dependent rules reachable from `rules` in the dependency `graph`, where
+    ``(a, b)`` edge means that rule ``a`` depends on ``b``. The path starts
+    from the rule executed last.
+    """
+    costs = dict()
+    def get_cost(rule):
+      if rule not in costs:
+        costs[rule] = (0, None) # protects from cycles
+        best = max([(get_cost(dep)[0], dep) for dep in graph.successors(rule)]
+                   or [(0, None)], key=lambda cost: cost[0])
+        costs[rule] = ((self.get_duration(rule) or 0) + best[0], best[1])
+      return costs[rule]
+    if not rules:
+      return [], 0
+    duration, rule = max([(get_cost(rule)[0], rule) for rule in rules],
+                         key=lambda cost: cost[0])
+    path = []
+    while rule is not None:
+      path.append(rule)
+      rule = costs[rule][1]
+    return path, duration
+
+  def get_summary(self):
+    """Returns a dict that maps event category to the total duration of its
+    events in seconds.
+    """
+    totals = dict()
+    for event in self.get_events():
+      totals[event["cat"]] = totals.get(event["cat"], 0) + event["dur"] / 1e6
+    return totals
+
+  def save(self, path, graph=None, rules=None):
+    """Writes the trace to `path`. The critical path through the `graph` is
+    added to the trace metadata and logged.
+    """
+    events = self.get_events()
+    pid = os.getpid()
+    for tid, name in self._threads.items():
+      events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                     "args": {"name": name}})
+    metadata = {"summary": self.get_summary()}
+    if graph is not None and rules:
+      critical_path, duration = self.get_critical_path(graph, rules)
+      metadata["critical_path"] = [str(rule) for rule in critical_path]
+      metadata["critical_path_time"] = duration
+      logger.info("Critical path, %.3fs: %s" %
+                  (duration, " <- ".join(metadata["critical_path"])))
+    with open(path, "w") as fh:
+      json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                 "otherData": metadata}, fh, default=str)
+    logger.info("Profile has been saved to %s" % path)
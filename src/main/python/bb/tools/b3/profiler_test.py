@@ -0,0 +1,59 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import json
+import os
+import shutil
+import tempfile
+
+import networkx
+
+from bb.utils.testing import unittest
+from bb.utils import process
+from bb.tools.b3 import profiler
+
+class ProfilerTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def teardown(self):
+    profiler.stop()
+    shutil.rmtree(self.tmpdir)
+
+  def test_inactive(self):
+    with profiler.span("noop", "test") as args:
+      args["x"] = 1
+    self.assert_is_none(profiler.get_profiler())
+
+  def test_spans_and_processes(self):
+    p = profiler.start()
+    with profiler.span("work", "test", key="work") as args:
+      args["result"] = 42
+      process.run(["true"])
+    profiler.stop()
+    process.run(["true"])
+    events = p.get_events()
+    self.assert_equal(sorted([event["cat"] for event in events]),
+                      ["process", "test"])
+    self.assert_equal(events[-1]["args"], {"result": 42})
+    self.assert_true(p.get_duration("work") >= 0)
+    path = os.path.join(self.tmpdir, "trace.json")
+    p.save(path)
+    with open(path) as fh:
+      self.assert_equal(len(json.load(fh)["traceEvents"]), 3)
+
+  def test_critical_path(self):
+    p = profiler.Profiler()
+    graph = networkx.DiGraph()
+    graph.add_edges_from([("app", "os"), ("app", "drivers"),
+                          ("drivers", "os")])
+    for rule, duration in (("app", 1), ("os", 2), ("drivers", 3)):
+      p.add_span(rule, "rule", 0, duration, key=rule)
+    self.assert_equal(p.get_critical_path(graph, ["app"]),
+                      (["app", "drivers", "os"], 6))
+
+if __name__ == "__main__":
+  unittest.main()
@@ -9,29 +9,96 @@
 
 from __future__ import print_function
 
+import os
 import sys
 
+import bb.app.object
+import bb.object
 from bb.tools.b3 import buildfile
+from bb.tools.b3 import codegen
+from bb.tools.b3.action_cache import Digest
 from bb.tools.b3.rules.binary import Binary
 from bb.tools.b3.rules.library import Library
 from bb.tools.b3.rules.fileset import Fileset
 from bb.tools.compilers import GCC
+from bb.tools.compilers.custom_c_compiler import parse_dependency_file
+from bb.utils import path_utils
 from bb.utils import typecheck
 from bb.utils import logging
 
 logger = logging.get_logger("bb")
 
+# Extensions of the files that can be included by sources, see
+# CCBinary.get_prerequisites()
+HEADER_EXTENSIONS = (".h", ".hh", ".hpp", ".hxx", ".inc", ".inl", ".def", ".c")
+# Extensions of the sources that can be merged by unity build
+UNITY_EXTENSIONS = (".c",)
+DEFAULT_UNITY_BATCH_SIZE = 8
+
+def find_headers(include_dirs):
+  """Returns a sorted list of files that can be included (see
+  :const:`HEADER_EXTENSIONS`) located within the given include directories.
+  """
+  headers = set()
+  for include_dir in include_dirs:
+    if not path_utils.isdir(include_dir):
+      continue
+    for dirpath, _, filenames in os.walk(include_dir):
+      for filename in filenames:
+        if path_utils.splitext(filename)[1] in HEADER_EXTENSIONS:
+          headers.add(path_utils.join(dirpath, filename))
+  return sorted(headers)
+
+def group_unity_sources(sources, batch_size):
+  """Splits `sources` into batches of up to `batch_size` C files that can be
+  compiled as one translation unit. Returns a list, where each batch is a list
+  of sources and the other sources are left as is.
+  """
+  groups = []
+  batch = None
+  for src in sources:
+    if path_utils.splitext(src)[1] not in UNITY_EXTENSIONS:
+      groups.append(src)
+      continue
+    if batch is None or len(batch) >= batch_size:
+      batch = []
+      groups.append(batch)
+    batch.append(src)
+  return [typecheck.is_list(group) and len(group) == 1 and group[0] or group
+          for group in groups]
+
+def gen_unity_source(path, sources, rule):
+  """Writes amalgamation file `path` that includes all the `sources` of the
+  `rule`.
+  """
+  lines = ["/* Unity build of %s. Generated by b3, do not edit. */" %
+           rule.get_name()]
+  for src in sources:
+    lines.append("#include \"%s\"" % src.replace("\\", "\\\\"))
+  codegen.write_file(path, "\n".join(lines) + "\n")
+  return path
+
 class CCLikeRule(object):
+  """Options common to C rules. If `unity` is ``True``, the C sources of the
+  rule are compiled in batches of up to `unity_batch_size` files: each batch is
+  included by a generated amalgamation file, that is compiled as a single
+  translation unit. The batches never mix sources of different rules.
+  """
 
   properties = (("programming_language", "c"),)
 
-  def __init__(self, includes=[], copts=[]):
+  def __init__(self, includes=[], copts=[], unity=False,
+               unity_batch_size=DEFAULT_UNITY_BATCH_SIZE):
     self._includes = []
     self._copts = []
+    self._unity = False
+    self._unity_batch_size = DEFAULT_UNITY_BATCH_SIZE
     if includes:
       self.set_includes(includes)
     if copts:
       self.set_copts(copts)
+    self.set_unity(unity)
+    self.set_unity_batch_size(unity_batch_size)
 
   def set_includes(self, includes):
     if not typecheck.is_list(includes):
@@ -49,6 +116,22 @@ class CCLikeRule(object):
   def get_copts(self):
     return self._copts
 
+  def set_unity(self, true_or_false):
+    if not typecheck.is_bool(true_or_false):
+      raise TypeError("'true_or_false' has to be boolean")
+    self._unity = true_or_false
+
+  def is_unity_enabled(self):
+    return self._unity
+
+  def set_unity_batch_size(self, size):
+    if not typecheck.is_int(size) or size < 1:
+      raise TypeError("'size' has to be a positive integer")
+    self._unity_batch_size = size
+
+  def get_unity_batch_size(self):
+    return self._unity_batch_size
+
 class CCLibrary(Library, CCLikeRule):
 
   def __init__(self, target=None, name=None, srcs=[], deps=[], **kwargs):
@@ -68,27 +151,204 @@ class CCBinary(Binary, CCLikeRule):
                     compiler_class=compiler_class)
     CCLikeRule.__init__(self, **kwargs)
 
-  def execute(self):
-    print("Build cc binary '%s' with '%s'" %
-          (self.get_name(), self.compiler.__class__.__name__))
-    buildfile.dependency_graph.resolve_forks()
-    # NOTE: this has to be fixed
-    self.compiler.add_include_dir(self.get_build_dir())
+  def get_output_filename(self):
+    return path_utils.abspath(self.get_name())
+
+  def _get_sources_by_rule(self):
+    """Returns a list of ``(rule, sources)`` tuples for this binary and
+    libraries it depends on.
+    """
+    sources = []
     for src in self.get_sources():
       if typecheck.is_string(src):
-        self.compiler.add_file(src)
+        sources.append(src)
       elif isinstance(src, Fileset):
-        self.compiler.add_files(src.get_sources())
+        sources.extend(src.get_sources())
+    groups = [(self, sources)]
     for dep in self.get_dependencies():
       if isinstance(dep, CCLibrary):
-        self.compiler.add_files(dep.get_sources())
-        self.compiler.add_include_dirs(dep.get_includes())
-    if not self.compiler.get_files():
+        groups.append((dep, dep.get_sources()))
+    return groups
+
+  def get_all_sources(self):
+    """Returns a list of sources of this binary and libraries it depends on."""
+    sources = []
+    for _, rule_sources in self._get_sources_by_rule():
+      sources.extend(rule_sources)
+    return sources
+
+  def get_unity_source_path(self, i):
+    return path_utils.join(self.get_build_dir(), "%s.unity" % self.get_name(),
+                           "unity%d.c" % i)
+
+  def _plan_compile_groups(self):
+    """Returns a tuple of the compile groups (see :func:`get_compile_groups`)
+    and the unity sources (see :func:`get_unity_sources`). Nothing is written.
+    """
+    groups = []
+    unity_sources = []
+    num_sources = 0
+    for rule, rule_sources in self._get_sources_by_rule():
+      if not rule.is_unity_enabled():
+        groups.append((rule, list(rule_sources)))
+        num_sources += len(rule_sources)
+        continue
+      sources = []
+      for group in group_unity_sources(rule_sources,
+                                       rule.get_unity_batch_size()):
+        if typecheck.is_string(group):
+          sources.append(group)
+        else:
+          path = self.get_unity_source_path(num_sources + len(sources))
+          unity_sources.append((path, group, rule))
+          sources.append(path)
+      groups.append((rule, sources))
+      num_sources += len(sources)
+    return groups, unity_sources
+
+  def get_compile_groups(self):
+    """Returns a list of ``(rule, sources)`` tuples, where `sources` is a list
+    of sources of `rule` to be compiled. Rules with unity build enabled
+    contribute amalgamation files instead of their C sources, the files are
+    generated by :func:`execute`.
+    """
+    return self._plan_compile_groups()[0]
+
+  def get_unity_sources(self):
+    """Returns a list of ``(path, sources, rule)`` tuples, one for each
+    amalgamation file to be generated: `path` includes the `sources` of
+    `rule`, see :func:`gen_unity_source`.
+    """
+    return self._plan_compile_groups()[1]
+
+  def get_compile_sources(self):
+    """Returns a list of sources to be compiled, see
+    :func:`get_compile_groups`.
+    """
+    sources = []
+    for _, rule_sources in self.get_compile_groups():
+      sources.extend(rule_sources)
+    return sources
+
+  def get_all_includes(self):
+    """Returns a list of include directories of this binary and libraries it
+    depends on.
+    """
+    # NOTE: this has to be fixed
+    includes = [self.get_build_dir()]
+    for dep in self.get_dependencies():
+      if isinstance(dep, CCLibrary):
+        includes.extend(dep.get_includes())
+    includes.extend(self.get_includes())
+    return includes
+
+  def get_rule_includes(self, rule):
+    """Returns a list of include directories to compile sources of `rule`, this
+    binary or a library it depends on. The includes of `rule` go first. The
+    includes of the libraries are visible to all the sources, since that's how
+    the libraries export their headers, while the includes of the binary are
+    used for its own sources only.
+    """
+    includes = [self.get_build_dir()] + list(rule.get_includes())
+    for dep in self.get_dependencies():
+      if isinstance(dep, CCLibrary) and dep is not rule:
+        includes.extend(dep.get_includes())
+    return includes
+
+  def get_prerequisites(self):
+    """Returns a sorted list of files the objects of this binary depend on:
+    the sources and every file they include, as recorded by the compiler in
+    the dependency files on the last compilation. Returns ``None`` if the
+    compiler doesn't write dependency files or some object hasn't been
+    compiled yet.
+    """
+    if not self.writes_dependency_files():
+      return None
+    prerequisites = set()
+    try:
+      for obj in self.compiler.get_object_filenames(self.get_compile_sources()):
+        prerequisites.update(parse_dependency_file(
+            self.compiler.get_dependency_filename(obj)))
+    except (IOError, OSError):
+      return None
+    return sorted(prerequisites)
+
+  def writes_dependency_files(self):
+    return bool(getattr(self.compiler, "dependency_options", None))
+
+  def get_action_key(self):
+    """The binary has to be rebuilt once any source or header file, option or
+    compiler has been changed. If the compiler writes dependency files, the
+    included files are checked by the action cache instead (see
+    :func:`get_action_inputs`), otherwise any file that can be included is a
+    part of the key.
+    """
+    digest = Digest()
+    digest.update_object([bb.object.get_class_fullname(self.__class__),
+                          self.get_output_filename(), self.get_copts(),
+                          self.compiler.get_signature()])
+    digest.update_object([(rule.is_unity_enabled(),
+                           rule.get_unity_batch_size(), rule.get_copts(),
+                           self.get_rule_includes(rule))
+                          for rule, _ in self._get_sources_by_rule()])
+    target = self.get_target()
+    if isinstance(target, bb.app.object.Object):
+      try:
+        digest.update_string(target.serialize())
+      except NotImplementedError:
+        pass
+    sources = self.get_all_sources()
+    if not all([typecheck.is_string(src) for src in sources]):
+      return None
+    includes = self.get_all_includes()
+    digest.update_object(includes)
+    digest.update_files(sources)
+    # The amalgamation files may not be generated yet, so their members are
+    # hashed instead
+    digest.update_object([(path, unity_sources) for path, unity_sources, _
+                          in self.get_unity_sources()])
+    if not self.writes_dependency_files():
+      # Any file within include directories or next to the sources can be
+      # included
+      source_dirs = set([path_utils.dirname(path_utils.abspath(src))
+                         for src in sources])
+      digest.update_files(find_headers(includes + sorted(source_dirs)))
+    return digest.hexdigest()
+
+  def get_action_inputs(self):
+    """Returns the files included by the sources, as recorded by the compiler
+    in the dependency files of the objects just compiled.
+    """
+    if not self.writes_dependency_files():
+      return []
+    return self.get_prerequisites()
+
+  def get_outputs(self):
+    return [self.get_output_filename()]
+
+  def execute(self):
+    print("Build cc binary '%s' with '%s'" %
+          (self.get_name(), self.compiler.__class__.__name__))
+    buildfile.dependency_graph.resolve_forks()
+    sources = self.get_all_sources()
+    if not sources:
       print("No source files", file=sys.stderr)
       exit(0)
-    self.compiler.add_include_dirs(self.get_includes())
-    self.compiler.set_output_filename(self.get_name())
+    self.compiler.set_output_filename(self.get_output_filename())
+    groups, unity_sources = self._plan_compile_groups()
+    for path, rule_sources, rule in unity_sources:
+      gen_unity_source(path, rule_sources, rule)
     try:
-      self.compiler.compile()
+      # Each rule is compiled with its own options, then all the objects are
+      # linked together
+      objects = []
+      for rule, rule_sources in groups:
+        if not rule_sources:
+          continue
+        objects.extend(self.compiler.compile(
+            files=rule_sources, include_dirs=self.get_rule_includes(rule),
+            extra_preopts=rule.get_copts(), link=False))
+      self.compiler.link(objects, self.get_output_filename())
     except Exception, e:
       logger.error(e)
+      raise
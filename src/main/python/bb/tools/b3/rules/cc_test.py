@@ -0,0 +1,90 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.b3 import buildfile
+from bb.tools.b3.rules.cc import group_unity_sources, gen_unity_source
+from bb.tools.b3.rules.cc import find_headers
+from bb.tools.compilers.cc import CC
+
+class FakeRule(object):
+
+  def get_name(self):
+    return "app"
+
+class UnityBuildTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def write(self, filename, content):
+    path = os.path.join(self.tmpdir, filename)
+    with open(path, "w") as fh:
+      fh.write(content)
+    return path
+
+  def test_group_unity_sources(self):
+    sources = ["a.c", "b.c", "start.S", "c.c", "d.c", "e.c"]
+    self.assert_equal(group_unity_sources(sources, 2),
+                      [["a.c", "b.c"], "start.S", ["c.c", "d.c"], "e.c"])
+    self.assert_equal(group_unity_sources(sources, 1), sources)
+    self.assert_equal(group_unity_sources([], 8), [])
+
+  def test_find_headers(self):
+    table_inc = self.write("table.inc", "{1, 2}\n")
+    config_h = self.write("config.h", "#define N 2\n")
+    self.write("notes.txt", "")
+    self.assert_equal(find_headers([self.tmpdir]), sorted([table_inc,
+                                                           config_h]))
+
+  def test_compile_unity_source(self):
+    main_c = self.write("main.c", "#include <stdio.h>\n"
+                        "void hello(void);\n"
+                        "int main() { hello(); return 0; }\n")
+    hello_c = self.write("hello.c", "#include <stdio.h>\n"
+                         "void hello(void) { printf(\"hello\"); }\n")
+    unity_c = gen_unity_source(os.path.join(self.tmpdir, "unity", "unity0.c"),
+                               [main_c, hello_c], FakeRule())
+    compiler = CC()
+    compiler.set_output_dir(os.path.join(self.tmpdir, "build"))
+    compiler.set_output_filename(os.path.join(self.tmpdir, "a.out"))
+    self.assert_equal(len(compiler.compile(files=[unity_c])), 1)
+    self.assert_equal(subprocess.check_output([os.path.join(self.tmpdir,
+                                                            "a.out")]),
+                      "hello")
+
+  def test_plan_unity_sources(self):
+    self.write("a.c", "")
+    self.write("b.c", "")
+    self.write("BUILD", "cc_binary(name='app', srcs=['a.c', 'b.c'], "
+               "unity=True)\n")
+    try:
+      buildfile.Context(buildfile.BuildFile(self.tmpdir, "."))._parse({})
+      app = buildfile.get_rule(buildfile.get_address(self.tmpdir, ":app",
+                                                     False))
+      self.assert_not_equal(app.get_action_key(), None)
+      [(path, sources, rule)] = app.get_unity_sources()
+      self.assert_equal(sources, [os.path.join(self.tmpdir, "a.c"),
+                                  os.path.join(self.tmpdir, "b.c")])
+      self.assert_equal(app.get_compile_sources(), [path])
+      # The amalgamation file is generated by execute() only
+      self.assert_false(os.path.exists(path))
+    finally:
+      buildfile._parsed_contexts.clear()
+      buildfile._parsed_inputs.clear()
+      buildfile._rules_by_address.clear()
+      buildfile._addresses_by_buildfile.clear()
+      buildfile.dependency_graph.clear()
+
+if __name__ == "__main__":
+  unittest.main()
@@ -16,3 +16,6 @@ class Library(Rule, Rule.WithSources):
   def __init__(self, target=None, name=None, srcs=[], deps=[]):
     Rule.__init__(self, target=target, name=name, deps=deps)
     Rule.WithSources.__init__(self, srcs=srcs)
+
+  def execute(self):
+    pass
@@ -5,9 +5,12 @@
 #
 # Author: Oleksandr Sviridenko <info@bionicbunny.org>
 
+import json
+
 from bb.tools.b3.buildfile import Rule
 from bb.tools.b3.rules.cc import CCBinary
 from bb.tools.compilers import PropGCC
+from bb.tools.compilers.custom_c_compiler import get_output_fingerprint
 from bb.tools.loaders import propler
 from bb.utils import path_utils
 from bb.utils import typecheck
@@ -15,23 +18,42 @@ from bb.utils import typecheck
 class PropellerBinary(CCBinary):
 
   def __init__(self, target=None, name=None, srcs=[], deps=[],
-               compiler_class=None):
+               compiler_class=None, **kwargs):
     if not compiler_class:
       compiler_class = PropGCC
     CCBinary.__init__(self, target=target, name=name, srcs=srcs, deps=deps,
-                      compiler_class=compiler_class)
+                      compiler_class=compiler_class, **kwargs)
 
 class PropellerLoad(Rule):
+  """Uploads the binary to the Propeller. The binary can be loaded to many
+  boards at once: `ports` is a list of ports or patterns such as
+  ``"/dev/ttyUSB*"``, and `binaries` maps ports to binaries that differ from
+  `binary`. The boards are loaded concurrently and a board that failed doesn't
+  stop the others.
+
+  The fingerprint of the binary written to EEPROM is remembered per port, so
+  the same binary is not written to the same board again. Loads to RAM are
+  always done, since RAM doesn't survive reset.
+
+  The skip trusts the local record of uploads: b3 cannot read the EEPROM back,
+  so it doesn't notice that another board has been connected to the port, or
+  the EEPROM has been rewritten by other tools. Set `force_upload` (or run
+  ``b3 build --force-upload`` or ``--no-cache``) to write the binary anyway.
+  """
 
   def __init__(self, name=None, target=None, binary=None, deps=[], port=None,
-               baudrate=None, eeprom=False, timeout=None, terminal_mode=False):
+               baudrate=None, eeprom=False, timeout=None, terminal_mode=False,
+               ports=None, binaries=None, force_upload=False):
     Rule.__init__(self, name=name, target=target, deps=deps)
     self._binary = binary
     self._port = None
+    self._ports = ports or []
+    self._binaries = dict(binaries or {})
     self._baudrate = baudrate
     self._eeprom = eeprom
     self._timeout = timeout
     self._terminal_mode = terminal_mode
+    self._force_upload = force_upload
     if port:
       self.set_port(port)
 
@@ -43,16 +65,112 @@ class PropellerLoad(Rule):
   def get_port(self):
     return self._port
 
+  def set_force_upload(self, true_or_false):
+    """Writes the binary to EEPROM even if it's recorded as uploaded."""
+    self._force_upload = true_or_false
+
+  def is_force_upload_enabled(self):
+    return self._force_upload
+
+  def get_port_binaries(self):
+    """Returns a dict that maps each port to the binary to be loaded."""
+    port_binaries = dict()
+    if self.get_port():
+      port_binaries[self.get_port()] = self._binary
+    for port in propler.expand_ports(self._ports):
+      port_binaries[port] = self._binary
+    port_binaries.update(self._binaries)
+    return port_binaries
+
+  def get_binary_fingerprint(self, binary=None):
+    """Returns digest of the binary content, see
+    :func:`bb.tools.compilers.custom_c_compiler.get_output_fingerprint`.
+    """
+    return get_output_fingerprint(binary or self._binary)
+
+  def _get_uploads_filename(self):
+    return path_utils.join(self.get_build_dir(),
+                           ".%s.uploads" % self.get_name())
+
+  def _read_uploads(self):
+    """Returns a dict that maps port to the fingerprint of the binary written
+    to EEPROM of the board connected to this port.
+    """
+    try:
+      with open(self._get_uploads_filename()) as fh:
+        return json.load(fh)
+    except (IOError, ValueError):
+      return dict()
+
+  def is_binary_uploaded(self, port=None, binary=None):
+    """Returns ``True`` if the binary has been already written to EEPROM of
+    the board connected to the port, according to the local record of
+    uploads. Always returns ``False`` in force upload mode.
+    """
+    port = port or self.get_port()
+    if not self._eeprom or not port or self.is_force_upload_enabled():
+      return False
+    fingerprint = self.get_binary_fingerprint(binary)
+    return bool(fingerprint) and self._read_uploads().get(port) == fingerprint
+
+  def _save_uploads(self, port_binaries):
+    if not self._eeprom or not port_binaries:
+      return
+    uploads = self._read_uploads()
+    for port, binary in port_binaries.items():
+      uploads[port] = self.get_binary_fingerprint(binary)
+    path_utils.mkpath(self.get_build_dir())
+    with open(self._get_uploads_filename(), "w") as fh:
+      json.dump(uploads, fh)
+
   def execute(self):
     print("Load propeller binary: %s" % self)
     self.resolve()
+    if self._ports or self._binaries:
+      self._load_many(self.get_port_binaries())
+      return
     if not self._binary or not path_utils.exists(self._binary):
       raise IOError()
-    uploader = propler.SPIUploader(port=self.get_port(),
-                                   baudrate=self._baudrate)
-    if not uploader.connect():
-      return
-    uploader.upload_file(self._binary, eeprom=self._eeprom)
+    if self.is_binary_uploaded():
+      print("Binary %s is already in EEPROM at %s" %
+            (self._binary, self.get_port()))
+      uploader = None
+    else:
+      uploader = propler.SPIUploader(port=self.get_port(),
+                                     baudrate=self._baudrate)
+      if not uploader.connect():
+        raise Exception("Failed to connect to %s" % self.get_port())
+      if not uploader.upload_file(self._binary, eeprom=self._eeprom):
+        uploader.disconnect()
+        raise Exception("Failed to load %s to %s" %
+                        (self._binary, self.get_port()))
+      self._save_uploads({self.get_port(): self._binary})
     if self._terminal_mode:
       propler.terminal_mode(port=self.get_port(), baudrate=self._baudrate)
-    uploader.disconnect()
+    if uploader:
+      uploader.disconnect()
+
+  def _load_many(self, port_binaries):
+    if not port_binaries:
+      raise Exception("No ports match %s" % self._ports)
+    pending = dict()
+    for port, binary in sorted(port_binaries.items()):
+      if not binary or not path_utils.exists(binary):
+        raise IOError("Binary for '%s' doesn't exist: %s" % (port, binary))
+      if self.is_binary_uploaded(port, binary):
+        print("Binary %s is already in EEPROM at %s" % (binary, port))
+      else:
+        pending[port] = binary
+    if not pending:
+      return
+    results = propler.upload_to_ports(pending, baudrate=self._baudrate,
+                                      eeprom=self._eeprom)
+    propler.print_results(results)
+    self._save_uploads(dict([(result.port, result.filename)
+                             for result in results if result.ok]))
+    failed = [result.port for result in results if not result.ok]
+    if failed:
+      raise Exception("Failed to load %d of %d board(s): %s" %
+                      (len(failed), len(results), ", ".join(failed)))
+    if self._terminal_mode:
+      print("Terminal mode is not supported for many boards")
@@ -0,0 +1,276 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko <info@bionicbunny.org>
+
+"""The build server keeps b3 warm between invocations: the interpreter with all
+the imported modules, registered rules and commands, and the parsed dependency
+graph with the compilers created by the rules.
+
+The server parses BUILD files for each command by itself, so the parsed graph
+stays in the server, and then forks a child process to execute the command.
+The child works on a copy of the warm state and sends its output directly to
+the client, so the state of the server is never affected by execution. The
+server takes the environment of the client before each command, so BUILD
+files are parsed in it, and the child switches to the working directory of the
+client.
+
+The server watches the parsed BUILD files and the Python modules it has loaded
+from the build root or ``bb`` package, and the inputs read by the BUILD files:
+directory listings, files and environment variables (see
+:func:`bb.tools.b3.buildfile.get_changed_buildfiles`). Once any of them has
+been changed, the server restarts itself, since the modules cannot be safely
+reloaded. Changes in
+C sources and headers are handled by the action cache.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import select
+import socket
+import sys
+import traceback
+
+import bb
+from bb.tools.b3 import buildfile
+from bb.tools.b3 import client
+from bb.tools.b3 import engine
+from bb.tools.b3 import profiler
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+# How often to look for changed files while the server is idle, in seconds
+POLL_INTERVAL = 1.0
+
+def get_exit_code(exc):
+  """Returns exit code of :class:`SystemExit` exception."""
+  if exc.code is None:
+    return 0
+  elif isinstance(exc.code, int):
+    return exc.code
+  print(exc.code, file=sys.stderr)
+  return 1
+
+class Watcher(object):
+  """Keeps modification times of the files the server state depends on."""
+
+  def __init__(self, roots):
+    self._roots = [os.path.abspath(root) + os.sep for root in roots]
+    self._mtimes = dict()
+
+  def _get_mtime(self, path):
+    try:
+      return os.stat(path).st_mtime
+    except OSError:
+      return None
+
+  def get_paths(self):
+    """Returns a set of watched files: parsed BUILD files and modules located
+    within the roots.
+    """
+    paths = set([bf.full_path for bf in buildfile._parsed_contexts])
+    for module in sys.modules.values():
+      path = getattr(module, "__file__", None)
+      if not path:
+        continue
+      path = os.path.abspath(path)
+      if path.endswith((".pyc", ".pyo")) and os.path.exists(path[:-1]):
+        path = path[:-1]
+      if any([path.startswith(root) for root in self._roots]):
+        paths.add(path)
+    return paths
+
+  def update(self):
+    """Starts watching new files."""
+    for path in self.get_paths():
+      if path not in self._mtimes:
+        self._mtimes[path] = self._get_mtime(path)
+
+  def get_changes(self):
+    """Returns a list of watched files that have been changed, and the BUILD
+    files whose inputs have been changed.
+    """
+    changes = [path for path, mtime in self._mtimes.items()
+               if self._get_mtime(path) != mtime]
+    changes.extend([bf.full_path for bf in buildfile.get_changed_buildfiles()])
+    return changes
+
+class BuildServer(object):
+  """Serves b3 commands for the build root `root_dir` over a Unix socket."""
+
+  def __init__(self, root_dir):
+    self._root_dir = os.path.abspath(root_dir)
+    self._socket_path = client.get_socket_path(self._root_dir)
+    self._socket = None
+    self._watcher = Watcher([self._root_dir,
+                             os.path.dirname(os.path.abspath(bb.__file__))])
+    self._stopped = False
+    # The state is broken, e.g. some BUILD file wasn't parsed completely
+    self._dirty = False
+
+  def get_socket_path(self):
+    return self._socket_path
+
+  def _bind(self):
+    if client.is_server_running(self._root_dir):
+      raise Exception("b3 server is already running for %s" % self._root_dir)
+    if os.path.exists(self._socket_path):
+      os.remove(self._socket_path)
+    self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    self._socket.bind(self._socket_path)
+    self._socket.listen(5)
+
+  def _close(self):
+    if self._socket:
+      self._socket.close()
+      self._socket = None
+    if os.path.exists(self._socket_path):
+      os.remove(self._socket_path)
+
+  def serve_forever(self):
+    self._bind()
+    print("b3 server is listening on %s" % self._socket_path)
+    self._watcher.update()
+    try:
+      while not self._stopped:
+        readable, _, _ = select.select([self._socket], [], [], POLL_INTERVAL)
+        if not readable:
+          if self._watcher.get_changes():
+            self.restart()
+          continue
+        conn, _ = self._socket.accept()
+        try:
+          self.handle(conn)
+        finally:
+          conn.close()
+    finally:
+      self._close()
+
+  def restart(self):
+    """Replaces the server process with a new one."""
+    changes = self._watcher.get_changes()
+    if changes:
+      print("Restart b3 server, changed: %s" % ", ".join(sorted(changes)))
+    else:
+      print("Restart b3 server")
+    self._close()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.chdir(self._root_dir)
+    os.execv(sys.executable, [sys.executable, "-m", "bb.tools.b3"] +
+             sys.argv[1:])
+
+  def _reply_exit_code(self, conn, code):
+    conn.sendall("%s%d\n" % (client.EXIT_MARKER, code))
+
+  def handle(self, conn):
+    fh = conn.makefile("r")
+    try:
+      request = json.loads(fh.readline())
+    except ValueError:
+      return
+    finally:
+      fh.close()
+    if request.get("stop", False):
+      print("Stop b3 server")
+      self._stopped = True
+      self._reply_exit_code(conn, 0)
+      return
+    # The environment is inherited by the server after restart
+    self._apply_client_state(None, request.get("environ", None))
+    if self._watcher.get_changes():
+      self._reply_exit_code(conn, client.RESTART_EXIT_CODE)
+      conn.close()
+      self.restart()
+    argv = [str(arg) for arg in request.get("argv", [])]
+    if argv[:1] == ["server"]:
+      conn.sendall("Cannot run server by the server\n")
+      self._reply_exit_code(conn, 1)
+      return
+    code = self.run_command(conn, argv, request.get("cwd", None),
+                            request.get("environ", None))
+    self._reply_exit_code(conn, code)
+    if self._dirty:
+      conn.close()
+      self.restart()
+    self._watcher.update()
+
+  def _redirect_output(self, fd):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = (os.dup(1), os.dup(2))
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    return saved
+
+  def _restore_output(self, saved):
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(saved[0], 1)
+    os.dup2(saved[1], 2)
+    os.close(saved[0])
+    os.close(saved[1])
+
+  def run_command(self, conn, argv, cwd=None, environ=None):
+    """Creates command in the server, so the BUILD files will be parsed once,
+    and runs it in a child process within the client working directory `cwd`
+    and environment `environ`. Returns exit code.
+    """
+    saved = self._redirect_output(conn.fileno())
+    try:
+      try:
+        command = engine.new_command(self._root_dir, argv)
+      except SystemExit, e:
+        return get_exit_code(e)
+      except Exception:
+        traceback.print_exc()
+        self._dirty = True
+        return 1
+      finally:
+        # Command options must not affect following commands
+        buildfile.enable_snapshots()
+        os.chdir(self._root_dir)
+      sys.stdout.flush()
+      sys.stderr.flush()
+      pid = os.fork()
+      if not pid:
+        self._socket.close()
+        os._exit(self._run_child(command, cwd, environ))
+    finally:
+      # The profiler, if any, has been passed to the child
+      profiler.stop()
+      self._restore_output(saved)
+    _, status = os.waitpid(pid, 0)
+    if os.WIFSIGNALED(status):
+      return 128 + os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+  def _apply_client_state(self, cwd, environ):
+    if environ is not None:
+      os.environ.clear()
+      os.environ.update([(name.encode("utf-8"), value.encode("utf-8"))
+                         for name, value in environ.items()])
+    if cwd:
+      os.chdir(cwd.encode("utf-8"))
+
+  def _run_child(self, command, cwd=None, environ=None):
+    code = 0
+    try:
+      self._apply_client_state(cwd, environ)
+      code = command.run(None) or 0
+    except SystemExit, e:
+      code = get_exit_code(e)
+    except KeyboardInterrupt:
+      command.cleanup()
+      code = 1
+    except:
+      traceback.print_exc()
+      code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    return code
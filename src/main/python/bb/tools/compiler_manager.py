@@ -47,7 +47,7 @@ def new_compiler(name, args={}):
   """
   if not typecheck.is_string(name):
     raise Exception("Must be string")
-  name = _fix_compiler_name()
+  name = _fix_compiler_name(name)
   class_ = _COMPILER_CLASSES.get(name, None)
   if not class_:
     print "Compiler '%s' is not supported" % name
@@ -29,6 +29,11 @@ class CatalinaCompiler(CC):
 
   DEFAULT_SOURCE_EXTENSIONS = [".c", ".C", ".spin"]
 
+  # LCC cannot write dependency files
+  dependency_options = None
+  # -D defines SPIN symbol, that is used not only by preprocessor
+  preprocessor_option_prefixes = ("-W-D", "-W-U", "-I")
+
   DEFAULT_EXECUTABLES = {
     "compiler"     : ["catalina"],
     "linker_exe"   : ["catalina"]
@@ -17,9 +17,15 @@
 #
 # Author: Oleksandr Sviridenko
 
+import hashlib
+import json
+import os
+import tempfile
+
 from bb.tools.compilers.custom_c_compiler import CustomCCompiler, Linker
-from bb.utils import spawn
 from bb.utils import path_utils
+from bb.utils import probe_cache
+from bb.utils import process
 from bb.utils import executable
 
 class LD(Linker):
@@ -46,20 +52,106 @@ class CC(CustomCCompiler):
   source_extensions = [".c", ".C", ".cc", ".cxx", ".cpp"]
   object_extension = ".o"
   executable = "cc"
+  dependency_options = ["-MMD"]
+  # Options that affect preprocessing only. They are not the part of the object
+  # cache key, since the key already includes preprocessed source.
+  preprocessor_option_prefixes = ("-D", "-U", "-I")
 
   def __init__(self, verbose=None, dry_run=False):
     CustomCCompiler.__init__(self, verbose, dry_run)
     self.set_linker(LD())
 
+  def _gen_compile_command(self, obj, src, cc_args, extra_postargs):
+    return [self.get_executable()] + cc_args + [src, '-o', obj] + \
+        extra_postargs
+
+  def _gen_preprocess_command(self, output, src, cc_args, extra_postargs):
+    """Returns command that writes preprocessed `src` to `output`."""
+    cc_args = [arg == "-c" and "-E" or arg for arg in cc_args
+               if arg not in (self.dependency_options or [])]
+    return self._gen_compile_command(output, src, cc_args, extra_postargs)
+
   def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
-    compiler = self.get_executable()
     try:
-      spawn.spawn([compiler] + cc_args + [src, '-o', obj] + extra_postargs,
-                  debug=self.get_verbosity_level(),
+      process.run(self._gen_compile_command(obj, src, cc_args, extra_postargs),
+                  output=self.get_compile_output(),
                   dry_run=self.is_dry_run_mode_enabled())
-    except spawn.ExecutionError, msg:
+    except process.ExecutionError, msg:
       raise Exception(msg) # CompileError
 
+  def get_toolchain_version(self):
+    """Returns the version reported by the compiler executable, or ``None`` if
+    the executable cannot be found. See :mod:`bb.utils.probe_cache`.
+    """
+    def get_version(path):
+      try:
+        return process.run([path, "--version"], capture_output=True).output
+      except process.ExecutionError:
+        return None
+    return probe_cache.probe(self.get_executable(), "version", get_version)
+
+  def get_default_include_dirs(self):
+    """Returns a list of directories the compiler searches for system headers
+    by default.
+    """
+    def get_include_dirs(path):
+      try:
+        output = process.run([path, "-E", "-Wp,-v", "-xc", os.devnull],
+                             capture_output=True).output
+      except process.ExecutionError:
+        return []
+      dirs = []
+      in_list = False
+      for line in output.splitlines():
+        if line.startswith("#include <...> search starts here:"):
+          in_list = True
+        elif line.startswith("End of search list."):
+          break
+        elif in_list and line.startswith(" "):
+          dirs.append(path_utils.normpath(line.strip()))
+      return dirs
+    return probe_cache.probe(self.get_executable(), "include_dirs",
+                             get_include_dirs) or []
+
+  def get_object_cache_key(self, obj, src, cc_args, extra_postargs):
+    """The key is a digest of the preprocessed source, the compile command
+    without preprocessor options and file names, and the toolchain version.
+    Returns ``None`` if the source cannot be preprocessed.
+    """
+    version = self.get_toolchain_version()
+    if version is None:
+      return None
+    command = []
+    for arg in self._gen_compile_command(obj, src, cc_args, extra_postargs):
+      if arg in (obj, src) or arg in (self.dependency_options or []):
+        continue
+      if arg.startswith(self.preprocessor_option_prefixes):
+        continue
+      command.append(arg)
+    command[0] = path_utils.basename(command[0])
+    if "-g" in command:
+      # Debug information refers to the working directory
+      command.append(os.getcwd())
+    digest = hashlib.sha1(json.dumps([version, command]))
+    fd, output = tempfile.mkstemp(suffix=".i", dir=path_utils.dirname(obj))
+    os.close(fd)
+    try:
+      process.run(self._gen_preprocess_command(output, src, cc_args,
+                                               extra_postargs),
+                  capture_output=True)
+      with open(output, "rb") as fh:
+        while True:
+          chunk = fh.read(1 << 16)
+          if not chunk:
+            break
+          digest.update(chunk)
+    except process.ExecutionError:
+      # The compiler will report the problem
+      return None
+    finally:
+      os.remove(output)
+    return digest.hexdigest()
+
   def _link(self, objects, output_dir=None, libraries=None, library_dirs=None,
               debug=False, extra_preargs=None, extra_postargs=None,
               target_lang=None):
@@ -86,7 +178,7 @@ class CC(CustomCCompiler):
           i = i + 1
       # TODO: resolve this
       #linker[i] = self.get_executable('compiler_cxx')[i]
-      spawn.spawn([linker] + ld_options, debug=self.get_verbosity_level(),
+      process.run([linker] + ld_options,
                   dry_run=self.is_dry_run_mode_enabled())
     except Exception, e:
       raise Exception, e
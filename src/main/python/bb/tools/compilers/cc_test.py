@@ -4,13 +4,21 @@
 # Author: Oleksandr Sviridenko
 
 import os
+import shutil
 import tempfile
 import subprocess
+import time
 
 from bb.utils.testing import unittest
 from bb.utils import path_utils
 from bb.utils import logging
+from bb.utils import probe_cache
 from bb.tools.compilers.cc import CC
+from bb.tools.compilers.custom_c_compiler import parse_dependency_file
+from bb.tools.compilers.custom_c_compiler import write_dependency_file
+from bb.tools.compilers.custom_c_compiler import get_output_fingerprint
+from bb.tools.compilers.custom_c_compiler import read_fingerprint
+from bb.tools.compilers.object_cache import ObjectCache
 
 HELLO_WORLD_PROGRAM_MESSAGE = "Hello world!"
 HELLO_WORLD_PROGRAM = """
@@ -29,6 +37,16 @@ logger.propagate = False
 
 class CCTest(unittest.TestCase):
 
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    # The probes must not go to the cache of the user
+    probe_cache.set_probe_cache(probe_cache.ProbeCache(
+        os.path.join(self.tmpdir, "probes")))
+
+  def teardown(self):
+    probe_cache.set_probe_cache(None)
+    shutil.rmtree(self.tmpdir)
+
   def test_compile(self):
     input_fh = tempfile.NamedTemporaryFile(suffix=".c", delete=True)
     output_fh = tempfile.NamedTemporaryFile(suffix=".out", delete=False)
@@ -53,3 +71,178 @@ class CCTest(unittest.TestCase):
     os.remove(output_fh.name)
     self.assert_true(ok)
     #path_utils.remove_tree(compiler.get_build_dir_path())
+
+  def test_toolchain_probes(self):
+    compiler = CC()
+    self.assert_true(compiler.get_toolchain_version())
+    include_dirs = compiler.get_default_include_dirs()
+    self.assert_true(include_dirs)
+    self.assert_true(all([os.path.isdir(path) for path in include_dirs]))
+    self.assert_true(os.path.exists(os.path.join(self.tmpdir, "probes")))
+
+class CountingCC(CC):
+
+  def __init__(self, *args, **kwargs):
+    CC.__init__(self, *args, **kwargs)
+    self.compiled = []
+    self.linked = 0
+
+  def _compile(self, obj, src, *args):
+    self.compiled.append(path_utils.basename(src))
+    CC._compile(self, obj, src, *args)
+
+  def _link(self, *args, **kwargs):
+    self.linked += 1
+    CC._link(self, *args, **kwargs)
+
+class IncrementalCompilationTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    # Simulated clock, so the test doesn't depend on timestamp resolution
+    self.clock = time.time() - 1000
+    self.write("config.h", "#define MESSAGE \"%s\"\n" %
+               HELLO_WORLD_PROGRAM_MESSAGE)
+    self.write("main.c", "#include <stdio.h>\n"
+               "#include \"config.h\"\n"
+               "void hello(void);\n"
+               "int main() { hello(); return 0; }\n")
+    self.write("hello.c", "#include <stdio.h>\n"
+               "void hello(void) { printf(\"hello\"); }\n")
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def write(self, filename, content):
+    path = os.path.join(self.tmpdir, filename)
+    with open(path, "w") as fh:
+      fh.write(content)
+    self.touch(path)
+    return path
+
+  def touch(self, path):
+    self.clock += 1
+    os.utime(path, (self.clock, self.clock))
+
+  def compile(self, num_jobs=1, object_cache=None, **kwargs):
+    compiler = CountingCC()
+    compiler.set_num_jobs(num_jobs)
+    compiler.set_object_cache(object_cache)
+    compiler.set_output_dir(os.path.join(self.tmpdir, "build"))
+    compiler.add_include_dir(self.tmpdir)
+    for option, value in kwargs.items():
+      compiler.define_macro(option, value)
+    files = [os.path.join(self.tmpdir, name) for name in ("main.c", "hello.c")]
+    compiler.set_output_filename(os.path.join(self.tmpdir, "a.out"))
+    for obj in compiler.compile(files=files):
+      self.touch(obj)
+    self.linked = compiler.linked
+    return sorted(compiler.compiled)
+
+  def test_recompile_changed_objects_only(self):
+    self.assert_equal(self.compile(), ["hello.c", "main.c"])
+    self.assert_equal(self.compile(), [])
+    self.write("config.h", "#define MESSAGE \"Hi\"\n")
+    self.assert_equal(self.compile(), ["main.c"])
+    self.write("hello.c", "void hello(void) {}\n")
+    self.assert_equal(self.compile(), ["hello.c"])
+    self.assert_equal(self.compile(DEBUG=None), ["hello.c", "main.c"])
+
+  def test_link_avoidance(self):
+    binary = os.path.join(self.tmpdir, "a.out")
+    self.compile()
+    self.assert_equal(self.linked, 1)
+    fingerprint = read_fingerprint(binary)
+    self.assert_equal(get_output_fingerprint(binary), fingerprint["output"])
+    self.compile()
+    self.assert_equal(self.linked, 0)
+    # Recompiled object with the same content doesn't require relinking
+    self.touch(os.path.join(self.tmpdir, "hello.c"))
+    self.assert_equal(self.compile(), ["hello.c"])
+    self.assert_equal(self.linked, 0)
+    self.write("hello.c", "void hello(void) {}\n")
+    self.compile()
+    self.assert_equal(self.linked, 1)
+    self.assert_not_equal(get_output_fingerprint(binary),
+                          fingerprint["output"])
+    # The binary has been changed outside
+    with open(binary, "a") as fh:
+      fh.write("\0")
+    self.assert_is_none(read_fingerprint(binary))
+    self.compile()
+    self.assert_equal(self.linked, 1)
+
+  def test_link_libraries(self):
+    os.mkdir(os.path.join(self.tmpdir, "lib"))
+    libfoo = self.write(os.path.join("lib", "libfoo.a"), "foo")
+    libbar = self.write(os.path.join("lib", "libbar.so"), "bar")
+    compiler = CC()
+    compiler.add_library("foo")
+    compiler.add_library("m")
+    compiler.add_library_dir(os.path.join(self.tmpdir, "lib"))
+    self.assert_equal(compiler.get_link_libraries(), [libfoo])
+    self.assert_equal(compiler.get_link_libraries(extra_postargs=["-lbar"]),
+                      [libfoo, libbar])
+    fingerprint = compiler.get_link_fingerprint([], "a.out")
+    self.write(os.path.join("lib", "libfoo.a"), "foo2")
+    self.assert_not_equal(compiler.get_link_fingerprint([], "a.out"),
+                          fingerprint)
+
+  def test_compile_options(self):
+    os.mkdir(os.path.join(self.tmpdir, "include"))
+    self.write(os.path.join("include", "value.h"), "#define VALUE 3\n")
+    src = self.write("options.c", "#include \"value.h\"\n"
+                     "#if VALUE != 3 || !defined(EXTRA)\n"
+                     "#error wrong options\n"
+                     "#endif\n")
+    compiler = CC()
+    compiler.set_output_dir(os.path.join(self.tmpdir, "build"))
+    objects = compiler.compile(files=[src], link=False,
+                               include_dirs=[os.path.join(self.tmpdir,
+                                                          "include")],
+                               extra_preopts=["-DEXTRA"])
+    self.assert_equal(len(objects), 1)
+    self.assert_true(os.path.exists(objects[0]))
+    self.assert_raises(Exception, compiler.compile, files=[src], link=False,
+                       include_dirs=[os.path.join(self.tmpdir, "include")])
+
+  def test_parallel_compilation(self):
+    self.assert_equal(self.compile(num_jobs=4), ["hello.c", "main.c"])
+    self.assert_equal(subprocess.check_output([os.path.join(self.tmpdir,
+                                                            "a.out")]),
+                      "hello")
+    self.assert_equal(self.compile(num_jobs=4), [])
+
+  def test_parallel_compilation_failure(self):
+    self.write("hello.c", "syntax error\n")
+    self.assert_raises(Exception, self.compile, num_jobs=4)
+    self.assert_false(os.path.exists(os.path.join(self.tmpdir, "a.out")))
+
+  def test_object_cache(self):
+    cache = ObjectCache(os.path.join(self.tmpdir, "cache"))
+    self.assert_equal(self.compile(object_cache=cache), ["hello.c", "main.c"])
+    shutil.rmtree(os.path.join(self.tmpdir, "build"))
+    self.assert_equal(self.compile(object_cache=cache), [])
+    self.assert_equal(subprocess.check_output([os.path.join(self.tmpdir,
+                                                            "a.out")]),
+                      "hello")
+    self.write("hello.c", "void hello(void) {}\n")
+    self.assert_equal(self.compile(object_cache=cache), ["hello.c"])
+    self.write("hello.c", "#include <stdio.h>\n"
+               "void hello(void) { printf(\"hello\"); }\n")
+    self.assert_equal(self.compile(object_cache=cache), [])
+    # The macro isn't used, so the preprocessed source is the same
+    self.write("config.h", "#define MESSAGE \"Hi\"\n")
+    self.assert_equal(self.compile(object_cache=cache), [])
+
+  def test_parse_dependency_file(self):
+    path = self.write("main.d", "main.o: main.c /usr/include/stdio.h \\\n"
+                      " my\\ config.h\n")
+    self.assert_equal(parse_dependency_file(path),
+                      ["main.c", "/usr/include/stdio.h", "my config.h"])
+
+  def test_write_dependency_file(self):
+    path = os.path.join(self.tmpdir, "main.d")
+    prerequisites = ["main.c", "my config.h", "$(HOME).h"]
+    write_dependency_file(path, "main.o", prerequisites)
+    self.assert_equal(parse_dependency_file(path), prerequisites)
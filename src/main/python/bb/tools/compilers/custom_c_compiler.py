@@ -18,20 +18,130 @@
 # TODO: Move linker specific API from Compiler class to Linker class and start
 # using it.
 
+import hashlib
+import json
 import os
 import os.path
 import sys
+import tempfile
+import threading
 import time
+import Queue
 
 import bb.config
+import bb.object
 from bb.tools.compilers.compiler import Compiler
 from bb.utils import path_utils
+from bb.utils import probe_cache
 from bb.utils import typecheck
 from bb.utils import logging
 from bb.utils import executable
 
 logger = logging.get_logger("bb")
 
+# Keeps the file that captures output of the object being compiled by the
+# current thread, see CustomCCompiler.get_compile_output().
+_compile_job = threading.local()
+
+def parse_dependency_file(path):
+  """Parses make-style dependency file written by the compiler (e.g. with
+  ``-MMD`` option) and returns a list of prerequisites: the source file and all
+  the included headers.
+  """
+  with open(path) as fh:
+    content = fh.read()
+  # Join continued lines and keep escaped spaces within the file names
+  content = content.replace("\\\n", " ").replace("\\ ", "\0")
+  prerequisites = []
+  for line in content.splitlines():
+    target, sep, deps = line.partition(": ")
+    if not sep:
+      continue
+    for dep in deps.split():
+      prerequisites.append(dep.replace("\0", " ").replace("$$", "$"))
+  return prerequisites
+
+def write_dependency_file(path, target, prerequisites):
+  """Writes make-style dependency file that can be read by
+  :func:`parse_dependency_file`.
+  """
+  escape = lambda name: name.replace("$", "$$").replace(" ", "\\ ")
+  with open(path, "w") as fh:
+    fh.write("%s: %s\n" % (escape(target),
+                           " \\\n ".join([escape(p) for p in prerequisites])))
+
+def get_fingerprint_filename(output_filename):
+  """Returns path to the file that keeps fingerprint of the binary
+  `output_filename`, see :func:`read_fingerprint`.
+  """
+  dirname, basename = path_utils.split(output_filename)
+  return path_utils.join(dirname, ".%s.fingerprint" % basename)
+
+def _file_digest(path):
+  hash_ = hashlib.sha1()
+  with open(path, "rb") as fh:
+    while True:
+      chunk = fh.read(1 << 16)
+      if not chunk:
+        break
+      hash_.update(chunk)
+  return hash_.hexdigest()
+
+def read_fingerprint(output_filename):
+  """Returns a dict that describes the last link of the binary
+  `output_filename`: digest of the link inputs (``"inputs"``) and of the binary
+  itself (``"output"``). Returns ``None`` if the binary wasn't linked by
+  :class:`CustomCCompiler` or has been changed since.
+  """
+  try:
+    with open(get_fingerprint_filename(output_filename)) as fh:
+      fingerprint = json.load(fh)
+    stat = os.stat(output_filename)
+    if fingerprint["stamp"] != [stat.st_size, stat.st_mtime]:
+      return None
+  except (IOError, OSError, ValueError, KeyError, TypeError):
+    return None
+  return fingerprint
+
+def write_fingerprint(output_filename, inputs_digest):
+  stat = os.stat(output_filename)
+  fingerprint = {"inputs": inputs_digest,
+                 "output": _file_digest(output_filename),
+                 "stamp": [stat.st_size, stat.st_mtime]}
+  with open(get_fingerprint_filename(output_filename), "w") as fh:
+    json.dump(fingerprint, fh)
+  return fingerprint
+
+def get_output_fingerprint(output_filename):
+  """Returns digest of the content of binary `output_filename`, or ``None``
+  if the binary doesn't exist. The digest is taken from the fingerprint saved
+  by the last link, if the binary hasn't been changed since.
+  """
+  fingerprint = read_fingerprint(output_filename)
+  if fingerprint:
+    return fingerprint["output"]
+  if not path_utils.isfile(output_filename):
+    return None
+  return _file_digest(output_filename)
+
+# Files a library specified with -l<name> can be linked from, in the order the
+# linker prefers them
+LIBRARY_FILENAME_FORMATS = ("lib%s.so", "lib%s.a")
+
+def find_library(name, library_dirs):
+  """Returns path to the file of library `name` (as in ``-l<name>``, or a path
+  to the file itself) within `library_dirs`, or ``None`` if the library wasn't
+  found there, e.g. it comes from the default search path of the linker.
+  """
+  if os.sep in name:
+    return path_utils.isfile(name) and name or None
+  for library_dir in library_dirs:
+    for filename_format in LIBRARY_FILENAME_FORMATS:
+      path = path_utils.join(library_dir, filename_format % name)
+      if path_utils.isfile(path):
+        return path
+  return None
+
 class Linker(object):
   """Base linker class."""
 
@@ -92,6 +202,12 @@ class CustomCCompiler(Compiler):
   default_output_filename = "a.out"
   source_extensions = None
   object_extension = None
+  # Options that make the compiler write make-style dependency file next to the
+  # object file, see :func:`get_dependency_filename`. If the compiler doesn't
+  # support them, all the objects will be recompiled each time.
+  dependency_options = None
+  dependency_extension = ".d"
+  command_extension = ".cmd"
 
   def __init__(self, verbose=0, dry_run=False):
     Compiler.__init__(self, verbose, dry_run)
@@ -117,6 +233,10 @@ class CustomCCompiler(Compiler):
     self._extra_preopts = list()
     self._extra_postopts = list()
     self._linker = None
+    self._force = False
+    self._num_jobs = 1
+    self._job_slots = None
+    self._object_cache = None
 
   def set_output_dir(self, path):
     if not typecheck.is_string(path):
@@ -155,6 +275,57 @@ class CustomCCompiler(Compiler):
         # Default to Unix compiler
     return UnixCCompiler
 
+  def set_force_mode(self, true_or_false):
+    """Rebuild all the objects regardless of dependencies."""
+    self._force = true_or_false
+
+  def is_force_mode_enabled(self):
+    return self._force
+
+  def set_num_jobs(self, num_jobs):
+    """Sets max number of objects that can be compiled simultaneously."""
+    if not typecheck.is_int(num_jobs) or num_jobs < 1:
+      raise TypeError("'num_jobs' must be a positive integer")
+    self._num_jobs = num_jobs
+
+  def get_num_jobs(self):
+    return self._num_jobs
+
+  def set_job_slots(self, job_slots):
+    """Sets semaphore that limits the number of objects compiled
+    simultaneously by all the compilers, or ``None`` to disable the limit.
+    The caller of :func:`compile` is supposed to hold one slot, thus the first
+    object is compiled without a slot, and each additional object compiled in
+    parallel takes a slot.
+    """
+    self._job_slots = job_slots
+
+  def get_job_slots(self):
+    return self._job_slots
+
+  def set_object_cache(self, cache):
+    """Sets :class:`bb.tools.compilers.object_cache.ObjectCache` that will be
+    used to reuse objects compiled before, or ``None`` to disable it.
+    """
+    self._object_cache = cache
+
+  def get_object_cache(self):
+    return self._object_cache
+
+  def get_object_cache_key(self, obj, src, cc_args, extra_postargs):
+    """Returns the key that identifies the object `obj` compiled from `src` in
+    the object cache, or ``None`` if the object cannot be cached. By default
+    objects are not cached.
+    """
+    return None
+
+  def get_compile_output(self):
+    """Returns file object that captures the output of the compiler for the
+    object being compiled in the current thread, or ``None`` if the output
+    goes straight to the standard output.
+    """
+    return getattr(_compile_job, "output", None)
+
   def get_linker(self):
     return self._linker
 
@@ -447,36 +618,194 @@ class CustomCCompiler(Compiler):
   def get_extra_postopts(self):
     return self._extra_postopts
 
+  def get_signature(self):
+    """Returns a list that identifies this compiler and the settings common to
+    all compile and link steps driven by it. Files and include directories are
+    not the part of signature.
+    """
+    executable = self.get_executable()
+    path = executable and probe_cache.which(executable)
+    return [bb.object.get_class_fullname(self.__class__), executable, path,
+            path and probe_cache.get_stamp(path), self.get_options(),
+            self.macros, self.libraries, self.library_dirs,
+            self.get_extra_preopts(), self.get_extra_postopts(),
+            self.get_linker() and self.get_linker().get_opts()]
+
+  def get_dependency_filename(self, obj):
+    """Returns path to dependency file of the object file `obj`."""
+    return path_utils.splitext(obj)[0] + self.dependency_extension
+
+  def get_command_filename(self, obj):
+    """Returns path to the file that keeps digest of command line used to
+    compile the object file `obj`.
+    """
+    return path_utils.splitext(obj)[0] + self.command_extension
+
+  def get_command_digest(self, src, cc_options, extra_postopts):
+    """Returns digest of everything that affects compilation of `src`, except
+    the files.
+    """
+    command = [self.get_signature(), src, cc_options, extra_postopts]
+    return hashlib.sha1(json.dumps(command, default=repr)).hexdigest()
+
+  def is_object_outdated(self, obj, command_digest, depends=None):
+    """Returns ``True`` if the object file `obj` has to be recompiled: it
+    doesn't exist, was compiled by another command or older than its source,
+    any of the included headers or files from `depends`.
+    """
+    if self.is_force_mode_enabled() or not self.dependency_options:
+      return True
+    try:
+      obj_mtime = os.stat(obj).st_mtime
+      with open(self.get_command_filename(obj)) as fh:
+        if fh.read().strip() != command_digest:
+          return True
+      prerequisites = parse_dependency_file(self.get_dependency_filename(obj))
+      for path in prerequisites + list(depends or []):
+        if os.stat(path).st_mtime > obj_mtime:
+          return True
+    except (IOError, OSError):
+      return True
+    return False
+
   def compile(self, files=[], output_file=None, macros=None,
               include_dirs=[], debug=False, extra_preopts=None,
               extra_postopts=[], depends=None, link=True):
     if not typecheck.is_list(files):
       raise TypeError("'sources' must be a list")
     files = files + self.get_files()
-    # Play with extra preopts and postopts
-    extra_preopts = self.get_extra_preopts()
-    extra_postopts = self.get_extra_postopts()
+    # Options passed to this call follow the options of the compiler, so they
+    # take precedence
+    extra_preopts = self.get_extra_preopts() + list(extra_preopts or [])
+    extra_postopts = self.get_extra_postopts() + list(extra_postopts or [])
     # Setup compilation process first
     if output_file:
       self.set_output_file(output_file)
-    include_dirs = set(include_dirs).update(set(self.get_include_dirs()))
     macros, objects, extra_postopts, pp_options, build = \
         self._setup_compile(files, macros, include_dirs, extra_postopts, depends)
     cc_options = self._gen_cc_options(pp_options, debug, extra_preopts)
+    if self.dependency_options:
+      cc_options += self.dependency_options
+    jobs = []
     for obj in objects:
       try:
         src, ext = build[obj]
       except KeyError:
         continue
-      logger.info("Compiling %s" % src)
-      # Note: we pass a copy of files, options, etc. since we
-      # need to privent their modification
-      if not self.is_dry_run_mode_enabled():
-        self._compile(obj, src, ext, list(cc_options), extra_postopts, pp_options)
+      command_digest = self.get_command_digest(src, cc_options, extra_postopts)
+      if not self.is_object_outdated(obj, command_digest, depends):
+        logger.debug("%s is up to date" % obj)
+        continue
+      jobs.append((obj, src, ext, command_digest))
+    def compile_object(obj, src, ext, command_digest):
+      cache = self.get_object_cache()
+      key = cache and self.get_object_cache_key(obj, src, list(cc_options),
+                                                list(extra_postopts))
+      if not key or not self._restore_object(key, obj):
+        # Note: we pass a copy of files, options, etc. since we
+        # need to privent their modification
+        self._compile(obj, src, ext, list(cc_options), list(extra_postopts),
+                      pp_options)
+        if key:
+          self._store_object(key, obj)
+      with open(self.get_command_filename(obj), "w") as fh:
+        fh.write(command_digest + "\n")
+    if self.is_dry_run_mode_enabled():
+      for obj, src, ext, command_digest in jobs:
+        logger.info("Compiling %s" % src)
+    elif self.get_num_jobs() == 1 or len(jobs) < 2:
+      for job in jobs:
+        logger.info("Compiling %s" % job[1])
+        compile_object(*job)
+    else:
+      self._compile_concurrently(jobs, compile_object)
     if link is True:
       self.link(objects, self.get_output_filename())
     return objects
 
+  def _restore_object(self, key, obj):
+    """Restores the object file `obj` and its dependency file from the object
+    cache. Returns ``True`` on success.
+    """
+    prerequisites = self.get_object_cache().restore(key, obj)
+    if prerequisites is None:
+      return False
+    if self.dependency_options:
+      write_dependency_file(self.get_dependency_filename(obj), obj,
+                            prerequisites)
+    return True
+
+  def _store_object(self, key, obj):
+    prerequisites = []
+    if self.dependency_options:
+      prerequisites = parse_dependency_file(self.get_dependency_filename(obj))
+    self.get_object_cache().store(key, obj, prerequisites)
+
+  def _compile_concurrently(self, jobs, compile_object):
+    """Compiles objects on :func:`get_num_jobs` worker threads. Each worker but
+    the first one takes a job slot (see :func:`set_job_slots`) per object. The
+    output of each compiler is captured and logged in the order of `jobs`, as
+    if the objects were compiled one by one. Once an object failed to compile
+    no new objects will be started, and the first error in order is raised when
+    the running compilers are finished.
+    """
+    tasks = Queue.Queue()
+    failed = threading.Event()
+    results = [None] * len(jobs)
+    done = [threading.Event() for _ in jobs]
+    job_slots = self.get_job_slots()
+    def work(job_slots):
+      while True:
+        if job_slots:
+          job_slots.acquire()
+        try:
+          i = tasks.get()
+          if i is None:
+            return
+          output = None
+          exc_info = None
+          if not failed.is_set():
+            output = tempfile.TemporaryFile()
+            _compile_job.output = output
+            try:
+              compile_object(*jobs[i])
+            except BaseException:
+              exc_info = sys.exc_info()
+              failed.set()
+            finally:
+              _compile_job.output = None
+        finally:
+          if job_slots:
+            job_slots.release()
+        results[i] = (output, exc_info)
+        done[i].set()
+    workers = [threading.Thread(target=work, name="cc-worker-%d" % i,
+                                args=(i and job_slots or None,))
+               for i in range(min(self.get_num_jobs(), len(jobs)))]
+    for i in range(len(jobs)):
+      tasks.put(i)
+    for worker in workers:
+      worker.daemon = True
+      worker.start()
+      tasks.put(None)
+    error = None
+    for i, job in enumerate(jobs):
+      # NOTE: wait() without timeout cannot be interrupted by KeyboardInterrupt
+      # in Python 2.
+      done[i].wait(sys.maxint)
+      output, exc_info = results[i]
+      if not output:
+        continue
+      logger.info("Compiling %s" % job[1])
+      output.seek(0)
+      sys.stdout.write(output.read())
+      sys.stdout.flush()
+      output.close()
+      if exc_info and not error:
+        error = exc_info
+    if error:
+      raise error[0], error[1], error[2]
+
   def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
     """Compile source to product objects."""
     raise NotImplemented
@@ -510,14 +839,68 @@ class CustomCCompiler(Compiler):
       build[obj] = (src, ext)
     return macros, objects, extra, pp_options, build
 
+  def get_link_libraries(self, *list_args, **dict_args):
+    """Returns a list of library files the link with the given arguments
+    depends on. The libraries added to the compiler or passed to the link,
+    including ``-l<name>`` options, are looked up in the library directories
+    (see :func:`find_library`). Libraries from the default search path of the
+    linker are not included.
+    """
+    libraries = list(self.libraries) + list(dict_args.get("libraries") or [])
+    library_dirs = list(self.library_dirs) + \
+        list(dict_args.get("library_dirs") or [])
+    for name in ("extra_preargs", "extra_postargs"):
+      for opt in dict_args.get(name) or []:
+        if opt.startswith("-l") and len(opt) > 2:
+          libraries.append(opt[2:])
+        elif opt.startswith("-L") and len(opt) > 2:
+          library_dirs.append(opt[2:])
+    paths = []
+    for library in libraries:
+      path = find_library(library, library_dirs)
+      if path and path not in paths:
+        paths.append(path)
+    return paths
+
+  def get_link_fingerprint(self, objects, output_filename, *list_args,
+                           **dict_args):
+    """Returns digest of everything that affects the link of
+    `output_filename`: compiler signature, link arguments, and the content of
+    the objects and libraries (see :func:`get_link_libraries`).
+    """
+    hash_ = hashlib.sha1(json.dumps([self.get_signature(), output_filename,
+                                     list_args, dict_args, self.libraries,
+                                     self.library_dirs],
+                                    sort_keys=True, default=repr))
+    for path in list(objects) + self.get_link_libraries(*list_args,
+                                                        **dict_args):
+      hash_.update("%s:%s\n" % (path, _file_digest(path)))
+    return hash_.hexdigest()
+
   def link(self, objects, output_filename, *list_args, **dict_args):
-    """Start linking process."""
+    """Start linking process. The link is skipped if the binary was linked
+    from exactly the same inputs and hasn't been changed since, see
+    :func:`read_fingerprint`.
+    """
     # Adopt output file name to output directory
     if not output_filename:
       raise Exception("output_filename must be provided")
     binary_filename = output_filename
+    inputs_digest = None
+    if not self.is_dry_run_mode_enabled():
+      inputs_digest = self.get_link_fingerprint(objects, output_filename,
+                                                *list_args, **dict_args)
+      fingerprint = read_fingerprint(binary_filename)
+      if (not self.is_force_mode_enabled() and fingerprint and
+          fingerprint["inputs"] == inputs_digest):
+        logger.info("Binary %s is up to date, %d byte(s)" %
+                    (binary_filename, fingerprint["stamp"][0]))
+        return
     logger.info("Linking executable '%s'" % binary_filename)
     self._link(objects, *list_args, **dict_args)
+    if self.is_dry_run_mode_enabled():
+      return
+    write_fingerprint(binary_filename, inputs_digest)
     logger.info("Binary %s, %d byte(s)" % (binary_filename,
                                      os.path.getsize(binary_filename)))
 
@@ -0,0 +1,181 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Object cache keeps compiled objects in a local directory shared by all the
+builds, so an object whose translation unit has been already compiled with the
+same options and toolchain is copied from the cache instead of being compiled
+once again, e.g. after cleaning the build directory or switching branches::
+
+  $ b3 build --object-cache=~/.b3/objects :app
+
+The key of each object is computed by the compiler, see
+:func:`bb.tools.compilers.cc.CC.get_object_cache_key`. The cache directory has
+the following layout::
+
+  <root>/<xx>/<key>.o     # the object file
+  <root>/<xx>/<key>.json  # a list of the headers the object depends on
+
+The cache is bounded by size. Once it becomes too big, the least recently used
+objects are removed.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+from bb.utils import path_utils
+from bb.utils import typecheck
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+DEFAULT_MAX_SIZE = 1 << 30 # 1 GB
+# Fraction of the max size the cache is reduced to by cleanup, so the cleanup
+# doesn't happen on every new object
+CLEANUP_RATIO = 0.8
+
+class ObjectCache(object):
+  """Size-bounded store of compiled objects located at `root` directory. Can be
+  shared by multiple threads and processes.
+  """
+
+  def __init__(self, root, max_size=DEFAULT_MAX_SIZE):
+    if not typecheck.is_string(root):
+      raise TypeError("root has to be a string")
+    if not typecheck.is_int(max_size) or max_size < 0:
+      raise TypeError("max_size has to be a non-negative integer")
+    self._root = path_utils.abspath(path_utils.expanduser(root))
+    self._max_size = max_size
+    # Total size of the cache, computed on demand
+    self._size = None
+    self._lock = threading.Lock()
+    path_utils.mkpath(self._root)
+
+  def get_root(self):
+    return self._root
+
+  def get_max_size(self):
+    return self._max_size
+
+  def _get_object_path(self, key):
+    return path_utils.join(self._root, key[:2], key + ".o")
+
+  def _get_manifest_path(self, key):
+    return path_utils.join(self._root, key[:2], key + ".json")
+
+  def _write_atomically(self, path, write):
+    path_utils.mkpath(path_utils.dirname(path))
+    fd, tmp_path = tempfile.mkstemp(dir=path_utils.dirname(path))
+    try:
+      with os.fdopen(fd, "wb") as fh:
+        write(fh)
+      os.rename(tmp_path, path)
+    except:
+      if path_utils.exists(tmp_path):
+        os.remove(tmp_path)
+      raise
+
+  def _copy_atomically(self, src, dst):
+    with open(src, "rb") as src_fh:
+      self._write_atomically(dst, lambda fh: shutil.copyfileobj(src_fh, fh))
+
+  def restore(self, key, obj):
+    """Copies object `key` from the cache to the file `obj`. Returns a list of
+    headers stored with the object, or ``None`` if the object is not in the
+    cache.
+    """
+    manifest_path = self._get_manifest_path(key)
+    object_path = self._get_object_path(key)
+    try:
+      with open(manifest_path) as fh:
+        prerequisites = json.load(fh)
+      self._copy_atomically(object_path, obj)
+      # Mark the object as recently used
+      os.utime(object_path, None)
+    except (IOError, OSError, ValueError):
+      return None
+    logger.debug("Restore %s from object cache" % obj)
+    return [str(path) for path in prerequisites]
+
+  def store(self, key, obj, prerequisites=None):
+    """Stores the object file `obj` together with the list of `prerequisites`
+    as object `key`. Removes the least recently used objects if the cache has
+    become too big.
+    """
+    object_path = self._get_object_path(key)
+    self._copy_atomically(obj, object_path)
+    # The manifest is written last, since restore() starts from it
+    self._write_atomically(self._get_manifest_path(key),
+                           lambda fh: json.dump(list(prerequisites or []), fh))
+    size = (path_utils.getsize(object_path) +
+            path_utils.getsize(self._get_manifest_path(key)))
+    with self._lock:
+      if self._size is None:
+        self._size = self.get_size()
+      else:
+        self._size += size
+      if self._size > self._max_size:
+        self._size = self.cleanup(int(self._max_size * CLEANUP_RATIO))
+
+  def _get_entries(self):
+    """Returns a list of ``(last use time, key, size)`` tuples, one per
+    object.
+    """
+    entries = dict()
+    for dirpath, _, filenames in os.walk(self._root):
+      for filename in filenames:
+        key, ext = path_utils.splitext(filename)
+        if ext not in (".o", ".json"):
+          continue
+        try:
+          stat = os.stat(path_utils.join(dirpath, filename))
+        except OSError:
+          continue
+        mtime, size = entries.get(key, (0, 0))
+        if ext == ".o":
+          mtime = stat.st_mtime
+        entries[key] = (mtime, size + stat.st_size)
+    return [(mtime, key, size) for key, (mtime, size) in entries.items()]
+
+  def get_size(self):
+    """Returns total size of the cached objects in bytes."""
+    return sum([size for _, _, size in self._get_entries()])
+
+  def cleanup(self, max_size=None):
+    """Removes the least recently used objects until the cache size is not
+    greater than `max_size` (or the max size of the cache). Returns the new
+    size of the cache.
+    """
+    if max_size is None:
+      max_size = self._max_size
+    entries = sorted(self._get_entries())
+    size = sum([entry[2] for entry in entries])
+    for _, key, entry_size in entries:
+      if size <= max_size:
+        break
+      logger.debug("Remove object %s from object cache" % key)
+      for path in (self._get_manifest_path(key), self._get_object_path(key)):
+        try:
+          os.remove(path)
+        except OSError:
+          pass
+      size -= entry_size
+    return size
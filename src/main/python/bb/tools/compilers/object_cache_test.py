@@ -0,0 +1,55 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.compilers.object_cache import ObjectCache
+
+class ObjectCacheTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.obj = os.path.join(self.tmpdir, "main.o")
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def write_object(self, content):
+    with open(self.obj, "wb") as fh:
+      fh.write(content)
+
+  def read_object(self):
+    with open(self.obj, "rb") as fh:
+      return fh.read()
+
+  def test_store_and_restore(self):
+    cache = ObjectCache(os.path.join(self.tmpdir, "cache"))
+    self.assert_is_none(cache.restore("aa11", self.obj))
+    self.write_object("\x7fELF1")
+    cache.store("aa11", self.obj, ["main.c", "config.h"])
+    os.remove(self.obj)
+    self.assert_equal(cache.restore("aa11", self.obj), ["main.c", "config.h"])
+    self.assert_equal(self.read_object(), "\x7fELF1")
+
+  def test_least_recently_used_objects_are_removed(self):
+    cache = ObjectCache(os.path.join(self.tmpdir, "cache"), max_size=1000)
+    for i, key in enumerate(("aa11", "bb22", "cc33")):
+      self.write_object("x" * 300)
+      cache.store(key, self.obj)
+      os.utime(os.path.join(cache.get_root(), key[:2], key + ".o"), (i, i))
+    # aa11 becomes the most recently used object
+    self.assert_equal(cache.restore("aa11", self.obj), [])
+    self.write_object("x" * 300)
+    cache.store("dd44", self.obj)
+    self.assert_true(cache.get_size() <= 1000)
+    self.assert_is_none(cache.restore("bb22", self.obj))
+    self.assert_equal(cache.restore("aa11", self.obj), [])
+    self.assert_equal(cache.restore("dd44", self.obj), [])
+
+if __name__ == "__main__":
+  unittest.main()
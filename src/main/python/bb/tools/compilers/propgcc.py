@@ -27,6 +27,8 @@
 """
 
 from bb.tools.compilers.gcc import GCC
+from bb.utils import probe_cache
+from bb.utils import process
 from bb.utils import typecheck
 
 class PropGCC(GCC):
@@ -45,6 +47,9 @@ class PropGCC(GCC):
   """
 
   executable = "propeller-elf-gcc"
+  memory_models = ("cog", "lmm", "cmm", "xmmc", "xmm", "xmm-single",
+                   "xmm-split")
+  default_memory_model = "lmm"
 
   def __init__(self, *args, **kargs):
     GCC.__init__(self, *args, **kargs)
@@ -91,10 +96,34 @@ class PropGCC(GCC):
     """Return memory model. See :func:`set_memory_model`."""
     return self._memory_model
 
-  def _compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts):
+  def get_supported_memory_models(self):
+    """Returns a sorted list of memory models the installed compiler has
+    libraries for, or an empty list if the compiler cannot be found.
+    """
+    def get_memory_models(path):
+      try:
+        output = process.run([path, "-print-multi-lib"],
+                             capture_output=True).output
+      except process.ExecutionError:
+        return []
+      # Each line looks like "xmmc/short-doubles;@mxmmc@m32bit-doubles", the
+      # libraries of the default model are in "."
+      models = set([self.default_memory_model])
+      for line in output.splitlines():
+        for option in line.partition(";")[2].split("@"):
+          if option.startswith("m") and option[1:] in self.memory_models:
+            models.add(option[1:])
+      return sorted(models)
+    return probe_cache.probe(self.get_executable(), "memory_models",
+                             get_memory_models) or []
+
+  def get_signature(self):
+    return GCC.get_signature(self) + [self.get_memory_model()]
+
+  def _gen_compile_command(self, obj, src, cc_args, extra_postargs):
     if self.get_memory_model():
-      cc_args.append("-m%s" % self.get_memory_model())
-    GCC._compile(self, obj, src, ext, cc_args, extra_postargs, pp_opts)
+      cc_args = cc_args + ["-m%s" % self.get_memory_model()]
+    return GCC._gen_compile_command(self, obj, src, cc_args, extra_postargs)
 
   def _link(self, objects, output_dir=None, libraries=None, library_dirs=None,
             debug=False, extra_preargs=None, extra_postargs=None,
@@ -120,6 +120,6 @@ class BSTLLoader(Loader):
     flags.extend(['-p', self.get_mode()])
     # Spawn!
     try:
-      spawn(loader + flags + [filename], verbose=self.verbose)
+      spawn(loader + flags + [filename], debug=self.verbose)
     except BuilderExecutionError, msg:
       raise LoaderError, msg
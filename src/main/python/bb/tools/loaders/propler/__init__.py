@@ -38,18 +38,23 @@ __author__ = "Oleksandr Sviridenko"
 import sys
 
 from bb.tools.loaders.propler import gen_ld_script
+from bb.tools.loaders.propler.capture import *
 from bb.tools.loaders.propler.image import *
+from bb.tools.loaders.propler.multiport import *
 from bb.tools.loaders.propler.disasm import *
+from bb.tools.loaders.propler.symbols import *
 from bb.tools.loaders.propler.terminal import *
 from bb.tools.loaders.propler.uploader import *
 
-def terminal_mode(port="/dev/ttyUSB0", baudrate=115200):
-  """Enter propler to terminal mode."""
+def terminal_mode(port="/dev/ttyUSB0", baudrate=115200, capture=None):
+  """Enter propler to terminal mode. The received data is also written to
+  capture file `capture` if it's provided, see :class:`CaptureFile`.
+  """
   print "Enter to terminal mode on '%s' with baudrate=%d" \
       % (port, baudrate)
   print "_" * 70
   print
-  term = Terminal(port, baudrate=baudrate)
+  term = Terminal(port, baudrate=baudrate, capture=capture)
   term.start()
   print
   print "\r", "_" * 70
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Measures latency and throughput of the uploaders against
+:class:`~bb.tools.loaders.propler.emulator.PropellerEmulator`, so loader
+performance can be tracked on machines without boards::
+
+  $ python -m bb.tools.loaders.propler.benchmark --baudrate=115200 \\
+      --size=4096 --size=16384
+
+Without ``--baudrate`` the emulator is not limited by a serial line, which
+shows the overhead of the uploaders themselves.
+"""
+
+import contextlib
+import optparse
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+from bb.tools.loaders.propler.emulator import PropellerEmulator
+from bb.tools.loaders.propler.uploader import DEFAULT_WINDOW_SIZE
+from bb.tools.loaders.propler.uploader import LOCKSTEP_PROTOCOL_VERSION
+from bb.tools.loaders.propler.uploader import MulticogSPIUploader
+from bb.tools.loaders.propler.uploader import SPIUploader
+from bb.tools.loaders.propler.uploader import WINDOWED_PROTOCOL_VERSION
+
+DEFAULT_SIZES = (4096, 16384)
+
+def make_spin_image(size):
+  """Returns a valid Spin image of `size` bytes with a pseudo-random body."""
+  header = struct.pack("<IBB", 80000000, 0x6F, 0) + "\x00" * 10
+  body = bytearray((i * 31 + (i >> 8)) & 0xFF
+                   for i in range(size - len(header)))
+  image = bytearray(header) + body
+  # The sum of the image and the stack markers has to be 0, see
+  # SPIUploader.verify_image()
+  image[5] = (-(sum(image) + 2 * (0xFF + 0xFF + 0xF9 + 0xFF))) & 0xFF
+  return str(image)
+
+@contextlib.contextmanager
+def _quiet():
+  """Hides what uploaders print."""
+  stdout = sys.stdout
+  sys.stdout = open(os.devnull, "w")
+  try:
+    yield
+  finally:
+    sys.stdout.close()
+    sys.stdout = stdout
+
+class BenchmarkResult(object):
+  """Times are in seconds."""
+
+  def __init__(self, name, size, connect_time, upload_time):
+    self.name = name
+    self.size = size
+    self.connect_time = connect_time
+    self.upload_time = upload_time
+
+  def get_throughput(self):
+    """Returns upload throughput in bytes per second."""
+    return self.size / max(self.upload_time, 1e-6)
+
+def benchmark_spi_uploader(size, baudrate=None, eeprom=False):
+  image = make_spin_image(size)
+  with PropellerEmulator(baudrate=baudrate) as emulator:
+    uploader = SPIUploader(port=emulator.get_port())
+    with _quiet():
+      start_time = time.time()
+      if not uploader.connect():
+        raise Exception("Cannot connect to emulator")
+      connect_time = time.time() - start_time
+      start_time = time.time()
+      ok = uploader.upload_image(image, eeprom=eeprom, progress=False)
+      upload_time = time.time() - start_time
+      uploader.disconnect()
+  if not ok:
+    raise Exception("Image was not verified")
+  name = "SPIUploader (%s)" % (eeprom and "EEPROM" or "RAM")
+  return BenchmarkResult(name, size, connect_time, upload_time)
+
+def benchmark_multicog_uploader(size, baudrate=None,
+                                bootloader_version=WINDOWED_PROTOCOL_VERSION,
+                                window_size=DEFAULT_WINDOW_SIZE):
+  """Uploads two images of `size` bytes in total to two cogs."""
+  tmpdir = tempfile.mkdtemp()
+  try:
+    mapping = dict()
+    for cogid in (1, 2):
+      mapping[cogid] = os.path.join(tmpdir, "cog%d.binary" % cogid)
+      with open(mapping[cogid], "wb") as fh:
+        fh.write(make_spin_image(size // 2))
+    with PropellerEmulator(baudrate=baudrate,
+                           bootloader_version=bootloader_version) as emulator:
+      uploader = MulticogSPIUploader(port=emulator.get_port(),
+                                     window_size=window_size)
+      uploader.serial.open()
+      with _quiet():
+        start_time = time.time()
+        uploader.upload(mapping, progress=False)
+        upload_time = time.time() - start_time
+      uploader.serial.close()
+  finally:
+    shutil.rmtree(tmpdir)
+  name = "MulticogSPIUploader (v%d" % bootloader_version
+  if bootloader_version >= WINDOWED_PROTOCOL_VERSION:
+    name += ", window %d" % window_size
+  return BenchmarkResult(name + ")", size, 0.0, upload_time)
+
+def run_benchmarks(sizes=DEFAULT_SIZES, baudrate=None):
+  """Returns a list of :class:`BenchmarkResult`."""
+  results = []
+  for size in sizes:
+    results.append(benchmark_spi_uploader(size, baudrate))
+    results.append(benchmark_spi_uploader(size, baudrate, eeprom=True))
+    results.append(benchmark_multicog_uploader(
+        size, baudrate, bootloader_version=LOCKSTEP_PROTOCOL_VERSION))
+    for window_size in (1, DEFAULT_WINDOW_SIZE):
+      results.append(benchmark_multicog_uploader(size, baudrate,
+                                                 window_size=window_size))
+  return results
+
+def print_results(results, output=sys.stdout):
+  output.write("%-40s %8s %10s %10s %12s\n" %
+               ("LOADER", "SIZE", "CONNECT", "UPLOAD", "THROUGHPUT"))
+  for result in results:
+    output.write("%-40s %8d %9.3fs %9.3fs %8.1f KB/s\n" %
+                 (result.name, result.size, result.connect_time,
+                  result.upload_time, result.get_throughput() / 1024))
+
+def main(argv):
+  parser = optparse.OptionParser()
+  parser.add_option("--baudrate", type="int", default=None, dest="baudrate",
+                    help="simulate serial line of BAUDRATE", metavar="BAUDRATE")
+  parser.add_option("--size", type="int", action="append", dest="sizes",
+                    help="image size in bytes, can be repeated",
+                    metavar="SIZE")
+  (options, args) = parser.parse_args(argv[1:])
+  print_results(run_benchmarks(options.sizes or DEFAULT_SIZES,
+                               options.baudrate))
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv))
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Timestamped binary capture of the data received by
+:class:`~bb.tools.loaders.propler.terminal.Terminal`.
+
+The capture file has a fixed size and is mapped to memory. The received
+chunks are written to it as records of timestamp, length and data one after
+another. When the end of the file is reached, the writing continues from the
+beginning and the oldest records are overwritten, so a long soak test keeps
+the latest `size` bytes of its log::
+
+  with CaptureFile("board1.cap", size=64 << 20) as capture:
+    capture.write(data)
+
+  for timestamp, data in read_capture("board1.cap"):
+    ...
+
+The capture can be printed with::
+
+  $ python -m bb.tools.loaders.propler.capture --timestamps board1.cap
+"""
+
+__all__ = ["CaptureFile", "read_capture"]
+
+import mmap
+import optparse
+import os
+import struct
+import sys
+import time
+
+MAGIC = "PRPLCAP1"
+# Magic, size of the data area, offsets of the next and of the oldest
+# records, number of records
+HEADER = struct.Struct("<8sIIII")
+HEADER_SIZE = 32
+# Timestamp and length of the data
+RECORD_HEADER = struct.Struct("<dI")
+# Length of the record, that tells that the next record is at the beginning
+WRAP_MARKER = 0xFFFFFFFF
+MAX_RECORD_SIZE = 1 << 16
+DEFAULT_CAPTURE_SIZE = 64 << 20
+MIN_CAPTURE_SIZE = 4 * (RECORD_HEADER.size + MAX_RECORD_SIZE)
+
+class CaptureFile(object):
+  """Ring buffer of timestamped records in file `filename` of `size`
+  bytes. The file is truncated.
+  """
+
+  def __init__(self, filename, size=DEFAULT_CAPTURE_SIZE):
+    if size < MIN_CAPTURE_SIZE:
+      raise ValueError("Capture size has to be at least %d bytes" %
+                       MIN_CAPTURE_SIZE)
+    self._filename = filename
+    self._capacity = size - HEADER_SIZE
+    self._head = 0
+    self._tail = 0
+    self._count = 0
+    self._total = 0
+    with open(filename, "w+b") as fh:
+      fh.truncate(size)
+      self._mmap = mmap.mmap(fh.fileno(), size)
+    self._update_header()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def get_filename(self):
+    return self._filename
+
+  def get_total_size(self):
+    """Returns number of bytes written, including the overwritten ones."""
+    return self._total
+
+  def close(self):
+    if self._mmap:
+      self._mmap.flush()
+      self._mmap.close()
+      self._mmap = None
+
+  def _update_header(self):
+    HEADER.pack_into(self._mmap, 0, MAGIC, self._capacity, self._head,
+                     self._tail, self._count)
+
+  def _drop_oldest(self):
+    length = RECORD_HEADER.unpack_from(self._mmap,
+                                       HEADER_SIZE + self._tail)[1]
+    self._tail = _next_record(self._mmap, self._capacity,
+                              self._tail + RECORD_HEADER.size + length)
+    self._count -= 1
+
+  def write(self, data, timestamp=None):
+    """Writes `data` received at `timestamp`, current time by default."""
+    if timestamp is None:
+      timestamp = time.time()
+    self._total += len(data)
+    for start in range(0, len(data), MAX_RECORD_SIZE):
+      self._write_record(timestamp, data[start:start + MAX_RECORD_SIZE])
+    self._update_header()
+
+  def _write_record(self, timestamp, data):
+    size = RECORD_HEADER.size + len(data)
+    if self._head + size > self._capacity:
+      # The rest of the area is skipped, as well as the records there
+      while self._count and self._tail >= self._head:
+        self._drop_oldest()
+      if self._head + RECORD_HEADER.size <= self._capacity:
+        RECORD_HEADER.pack_into(self._mmap, HEADER_SIZE + self._head, 0,
+                                WRAP_MARKER)
+      self._head = 0
+    while self._count and self._head <= self._tail < self._head + size:
+      self._drop_oldest()
+    if not self._count:
+      self._tail = self._head
+    offset = HEADER_SIZE + self._head
+    RECORD_HEADER.pack_into(self._mmap, offset, timestamp, len(data))
+    offset += RECORD_HEADER.size
+    self._mmap[offset:offset + len(data)] = data
+    self._head += size
+    self._count += 1
+
+def _next_record(data, capacity, offset):
+  """Returns offset of the record that follows the record ending at
+  `offset`.
+  """
+  if offset + RECORD_HEADER.size > capacity:
+    return 0
+  if RECORD_HEADER.unpack_from(data, HEADER_SIZE + offset)[1] == WRAP_MARKER:
+    return 0
+  return offset
+
+def read_capture(filename):
+  """Yields ``(timestamp, data)`` records of capture file `filename` from the
+  oldest to the latest.
+  """
+  with open(filename, "rb") as fh:
+    data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+  try:
+    magic, capacity, head, tail, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+      raise IOError("%s is not a capture file" % filename)
+    offset = tail
+    for i in range(count):
+      timestamp, length = RECORD_HEADER.unpack_from(data, HEADER_SIZE + offset)
+      start = HEADER_SIZE + offset + RECORD_HEADER.size
+      yield (timestamp, data[start:start + length])
+      offset = _next_record(data, capacity,
+                            offset + RECORD_HEADER.size + length)
+  finally:
+    data.close()
+
+def main(argv):
+  parser = optparse.OptionParser(usage="%prog [options] FILE")
+  parser.add_option("--timestamps", action="store_true", default=False,
+                    dest="timestamps", help="print time of each received chunk")
+  (options, args) = parser.parse_args(argv[1:])
+  if len(args) != 1:
+    parser.error("capture file is required")
+  new_line = True
+  for timestamp, data in read_capture(args[0]):
+    if options.timestamps:
+      sys.stdout.write("%s[%s.%06d] " % (
+          not new_line and "\n" or "",
+          time.strftime("%H:%M:%S", time.localtime(timestamp)),
+          (timestamp % 1) * 1000000))
+      new_line = data.endswith("\n")
+    sys.stdout.write(data)
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv))
@@ -0,0 +1,64 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.loaders.propler import capture
+from bb.tools.loaders.propler.capture import CaptureFile
+from bb.tools.loaders.propler.capture import read_capture
+
+class CaptureFileTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.filename = os.path.join(self.tmpdir, "board.cap")
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_write_and_read(self):
+    with CaptureFile(self.filename, capture.MIN_CAPTURE_SIZE) as cap:
+      cap.write("hello", timestamp=1.5)
+      # Nothing is recorded for empty data
+      cap.write("", timestamp=2.0)
+      cap.write("world\x00", timestamp=2.5)
+    self.assert_equal(list(read_capture(self.filename)),
+                      [(1.5, "hello"), (2.5, "world\x00")])
+    self.assert_equal(os.path.getsize(self.filename), capture.MIN_CAPTURE_SIZE)
+
+  def test_large_write_is_split(self):
+    data = os.urandom(capture.MAX_RECORD_SIZE * 2 + 10)
+    with CaptureFile(self.filename, capture.MIN_CAPTURE_SIZE) as cap:
+      cap.write(data, timestamp=1.0)
+    records = list(read_capture(self.filename))
+    self.assert_equal([len(record) for timestamp, record in records],
+                      [capture.MAX_RECORD_SIZE, capture.MAX_RECORD_SIZE, 10])
+    self.assert_equal("".join([record for timestamp, record in records]), data)
+
+  def test_ring_keeps_latest_records(self):
+    size = capture.MIN_CAPTURE_SIZE
+    chunk_size = 1000
+    chunks = ["%05d" % i + "x" * (chunk_size - 5) for i in range(2000)]
+    with CaptureFile(self.filename, size) as cap:
+      for i, chunk in enumerate(chunks):
+        cap.write(chunk, timestamp=float(i))
+        if i in (300, 1000):
+          records = list(read_capture(self.filename))
+          self.assert_equal(records[-1], (float(i), chunk))
+      self.assert_equal(cap.get_total_size(), chunk_size * len(chunks))
+    records = list(read_capture(self.filename))
+    first = int(records[0][1][:5])
+    self.assert_equal(records, [(float(i), chunks[i])
+                                for i in range(first, len(chunks))])
+    # Almost the whole file is used
+    self.assert_true(len(records) * (chunk_size + 12) >
+                     size - capture.HEADER_SIZE - 2 * (chunk_size + 12))
+
+  def test_too_small(self):
+    with self.assert_raises(ValueError):
+      CaptureFile(self.filename, 1024)
@@ -1,798 +1,782 @@
 #!/usr/bin/env python
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A Spin bytecode disassembler.
+
+:class:`SpinDisassembler` decodes an image into a stream of
+:class:`Instruction` records, text is produced separately by
+:func:`format_instructions`::
+
+  disassembler = SpinDisassembler(Image.extract_from_file("hello.binary"))
+  for instruction in disassembler.disassemble():
+    if instruction.section == SECTION_SPIN:
+      print instruction.mnemonic, instruction.operand
+
+The disassembler keeps no state between calls of
+:meth:`SpinDisassembler.disassemble`, so any number of images can be
+disassembled at the same time, from threads or from processes::
+
+  $ python -m bb.tools.loaders.propler.disasm --jobs=4 *.binary
+"""
 
 __copyright__ = "Copyright (c) 2012 Sladeware LLC"
 
-__all__ = ["disasm_image", "disasm_image_file"]
-
-"""A Spin bytecode disassebler."""
+__all__ = ["Instruction", "SpinDisassembler", "disasm_image",
+           "disasm_image_file", "format_instruction", "format_instructions"]
 
+import collections
+import multiprocessing
+import optparse
+import struct
 import sys
-
+import types
+
+from bb.tools.loaders.propler.image import Image
+
+# Instruction sections
+SECTION_HEADER = "header"
+SECTION_CLASS = "class"
+SECTION_METHOD = "method"
+SECTION_OBJECT = "object"
+SECTION_DAT = "dat"
+SECTION_SPIN = "spin"
+SECTION_DATA = "data"
+
+# An instruction (or a table entry, or a chunk of data) of the image. `data` is
+# a string of its bytes, `operand` is the text of its operands and `refs` is a
+# tuple of ``(address, label)`` pairs for the hub addresses it refers to.
+Instruction = collections.namedtuple("Instruction", "section address data "
+                                     "mnemonic operand refs comment")
+
+# Spin operand types
 (OP_NONE,
- OP_BYTE_ADDRESS,
- OP_LOC_DO,
- OP_DO,
+ OP_EFFECT,
+ OP_SIGNED_OFFSET,
  OP_PACKED_LITERAL,
+ OP_UNSIGNED_OFFSET,
+ OP_UNSIGNED_EFFECTED_OFFSET,
  OP_BYTE_LITERAL,
  OP_WORD_LITERAL,
- OP_SEMILONG_LITERAL,
+ OP_NEAR_LONG_LITERAL,
  OP_LONG_LITERAL,
- OP_BYTE_METHOD_NUMBER,
- OP_UNSIGNED_OFFSET,
- OP_OBJECT_OFFSET,
- OP_BRANCH,
- OP_COG_REGISTER_OPERATION,
- OP_UNSIGNED_EFFECTED_OFFSET,
- ) = range(15)
-
-(ASM_OP_NONE, ASM_OP_JMP, ASM_OP_RD_WR_HUB, ASM_OP_NOP,)=range(4)
-
-FOLLOW_ON = 0
-SEPARATE_BLANK = 1
-SEPARATE_COMMENT = 2
-
-buffer=[]
-p=0
-cog_p=0
-object_start = 0x10
-_main=0
-label_table = []
-label_dict = {}
-cog_label_table = []
-cog_label_dict = {}
-object_table = []
-object_dict = {}
-class_table = []
-class_dict = {}
-output=True
-
-dict = {
-    0x00 : ("FRAME_CALL_RETURN",                  OP_NONE), # x := Method(y)
-    0x01 : ("FRAME_CALL_NORETURN",                OP_NONE), # Method(y)
-    0x02 : ("FRAME_CALL_ABORT",                   OP_NONE), # x := \Method(y)
-    0x03 : ("FRAME_CALL_TRASHABORT",              OP_NONE), # \Method(y)
-    0x04 : ("BRANCH",                             OP_BRANCH),
-    0x05 : ("CALL",                               OP_BYTE_METHOD_NUMBER), #followed by a byte that indexes the method number from 1
-    0x08 : ("LOOP_START",                         OP_BRANCH),
-    0x09 : ("LOOP_CONTINUE",                      OP_BRANCH),
-    0x0a : ("BRANCH_IF_FALSE",                    OP_BRANCH),
-    0x0b : ("BRANCH_IF_TRUE",                     OP_BRANCH),
-    0x0c : ("JUMP_FROM_STACK",                    OP_NONE),
-    0x0d : ("COMPARE_CASE",                       OP_BRANCH),
-    0x0e : ("COMPARE_CASE_RANGE",                 OP_BRANCH),
-    0x0f : ("LOOK_ABORT",                         OP_NONE),
-    0x10 : ("LOOKUP_COMPARE",                     OP_NONE),
-    0x11 : ("LOOKDOWN_COMPARE",                   OP_NONE),
-    0x12 : ("LOOKUPRANGE_COMPARE",                OP_NONE),
-    0x13 : ("LOOKDOWNRANGE_COMPARE",              OP_NONE),
-    0x15 : ("MARK_INTERPRETED",                   OP_NONE),
-    0x16 : ("STRSIZE",                            OP_NONE),
-    0x21 : ("COGSTOP",                            OP_NONE),
-    0x23 : ("WAITCNT",                            OP_NONE),
-    0x28 : ("COGINIT_RETURNS",                    OP_NONE),
-    0x2c : ("COGINIT",                            OP_NONE),
-    0x30 : ("ABORT",OP_NONE),
-    0x32 : ("RETURN",OP_NONE),
-    0x33 : ("POP_RETURN",                         OP_NONE),
-    0x34 : ("PUSH_NEG1",                          OP_NONE),
-    0x35 : ("PUSH_0",                             OP_NONE),
-    0x36 : ("PUSH_1",                             OP_NONE),
-    0x37 : ("PUSH_PACKED_LIT",                    OP_PACKED_LITERAL),
-    0x38 : ("PUSH_BYTE_LIT",                      OP_BYTE_LITERAL),
-    0x39 : ("PUSH_WORD_LIT",                      OP_WORD_LITERAL),
-    0x3a : ("PUSH_MID_LIT",                       OP_SEMILONG_LITERAL),
-    0x3b : ("PUSH_LONG_LIT",                      OP_LONG_LITERAL),
-    0x3d : ("BITFIELD_COG_REGISTER_OP",           OP_COG_REGISTER_OPERATION),
-    0x3f : ("COG_REGISTER_OP",                    OP_COG_REGISTER_OPERATION),
-    0x40 : ("PUSH_VARMEM_LONG_0",                 OP_NONE),
-    0x41 : ("POP_VARMEM_LONG_0",                  OP_NONE),
-    0x42 : ("EFFECT_VARMEM_LONG_0",               OP_DO),
-    0x43 : ("REFERENCE_VARMEM_LONG_0",            OP_NONE),
-    0x44 : ("PUSH_VARMEM_LONG_1",                 OP_NONE),
-    0x45 : ("POP_VARMEM_LONG_1",                  OP_NONE),
-    0x46 : ("EFFECT_VARMEM_LONG_1",               OP_DO),
-    0x47 : ("REFERENCE_VARMEM_LONG_1",            OP_NONE),
-    0x48 : ("PUSH_VARMEM_LONG_2",                 OP_NONE),
-    0x49 : ("POP_VARMEM_LONG_2",                  OP_NONE),
-    0x4a : ("EFFECT_VARMEM_LONG_2",               OP_DO),
-    0x4b : ("REFERENCE_VARMEM_LONG_2",            OP_NONE),
-    0x4c : ("PUSH_VARMEM_LONG_3",                 OP_NONE),
-    0x4d : ("POP_VARMEM_LONG_3",                  OP_NONE),
-    0x4e : ("EFFECT_VARMEM_LONG_3",               OP_DO),
-    0x4f : ("REFERENCE_VARMEM_LONG_3",            OP_NONE),
-    0x50 : ("PUSH_VARMEM_LONG_4",                 OP_NONE),
-    0x51 : ("POP_VARMEM_LONG_4",                  OP_NONE),
-    0x52 : ("EFFECT_VARMEM_LONG_4",               OP_DO),
-    0x53 : ("REFERENCE_VARMEM_LONG_4",            OP_NONE),
-    0x54 : ("PUSH_VARMEM_LONG_5",                 OP_NONE),
-    0x55 : ("POP_VARMEM_LONG_5",                  OP_NONE),
-    0x56 : ("EFFECT_VARMEM_LONG_5",               OP_DO),
-    0x57 : ("REFERENCE_VARMEM_LONG_5",            OP_NONE),
-    0x58 : ("PUSH_VARMEM_LONG_6",                 OP_NONE),
-    0x59 : ("POP_VARMEM_LONG_6",                  OP_NONE),
-    0x5a : ("EFFECT_VARMEM_LONG_6",               OP_DO),
-    0x5b : ("REFERENCE_VARMEM_LONG_6",            OP_NONE),
-    0x5c : ("PUSH_VARMEM_LONG_7",                 OP_NONE),
-    0x5d : ("POP_VARMEM_LONG_7",                  OP_NONE),
-    0x5e : ("EFFECT_VARMEM_LONG_7",               OP_DO),
-    0x5f : ("REFERENCE_VARMEM_LONG_7",            OP_NONE),
-    0x60 : ("PUSH_LOCALMEM_LONG_0",               OP_NONE),
-    0x61 : ("POP_LOCALMEM_LONG_0",                OP_NONE),
-    0x62 : ("EFFECT_LOCALMEM_LONG_0",             OP_DO),
-    0x63 : ("REFERENCE_LOCALMEM_LONG_0",          OP_NONE),
-    0x64 : ("PUSH_LOCALMEM_LONG_1",               OP_NONE),
-    0x65 : ("POP_LOCALMEM_LONG_1",                OP_NONE),
-    0x66 : ("EFFECT_LOCALMEM_LONG_1",             OP_DO),
-    0x67 : ("REFERENCE_LOCALMEM_LONG_1",          OP_NONE),
-    0x68 : ("PUSH_LOCALMEM_LONG_2",               OP_NONE),
-    0x69 : ("POP_LOCALMEM_LONG_2",                OP_NONE),
-    0x6a : ("EFFECT_LOCALMEM_LONG_2",             OP_DO),
-    0x6b : ("REFERENCE_LOCALMEM_LONG_2",          OP_NONE),
-    0x6c : ("PUSH_LOCALMEM_LONG_3",               OP_NONE),
-    0x6d : ("POP_LOCALMEM_LONG_3",                OP_NONE),
-    0x6e : ("EFFECT_LOCALMEM_LONG_3",             OP_DO),
-    0x6f : ("REFERENCE_LOCALMEM_LONG_3",          OP_NONE),
-    0x70 : ("PUSH_LOCALMEM_LONG_4",               OP_NONE),
-    0x71 : ("POP_LOCALMEM_LONG_4",                OP_NONE),
-    0x72 : ("EFFECT_LOCALMEM_LONG_4",             OP_DO),
-    0x73 : ("REFERENCE_LOCALMEM_LONG_4",          OP_NONE),
-    0x74 : ("PUSH_LOCALMEM_LONG_5",               OP_NONE),
-    0x75 : ("POP_LOCALMEM_LONG_5",                OP_NONE),
-    0x76 : ("EFFECT_LOCALMEM_LONG_5",             OP_DO),
-    0x77 : ("REFERENCE_LOCALMEM_LONG_5",          OP_NONE),
-    0x78 : ("PUSH_LOCALMEM_LONG_6",               OP_NONE),
-    0x79 : ("POP_LOCALMEM_LONG_6",                OP_NONE),
-    0x7a : ("EFFECT_LOCALMEM_LONG_6",             OP_DO),
-    0x7b : ("REFERENCE_LOCALMEM_LONG_6",          OP_NONE),
-    0x7c : ("PUSH_LOCALMEM_LONG_7",               OP_NONE),
-    0x7d : ("POP_LOCALMEM_LONG_7",                OP_NONE),
-    0x7e : ("EFFECT_LOCALMEM_LONG_7",             OP_DO),
-    0x7f : ("REFERENCE_LOCALMEM_LONG_7",          OP_NONE),
-#byte addressing 0x80 - 0x9f
-    0x87 : ("REFERENCE_OBJECTMEM_BYTE",           OP_UNSIGNED_OFFSET), #Byte offset from beginning of object
-#word addressing 0xa0 - 0xbf
-    0x91 : ("POP_INDEXED_MAINMEM_BYTE",           OP_NONE),
-    0x94 : ("PUSH_INDEXED_OBJECTMEM_BYTE",        OP_UNSIGNED_OFFSET),
-    0x98 : ("PUSH_INDEXED_VARIABLEMEM_BYTE",      OP_UNSIGNED_OFFSET),
-    0x99 : ("POP_INDEXED_VARIABLEMEM_BYTE",       OP_UNSIGNED_OFFSET),
-    0xa8 : ("PUSH_VARIABLEMEM_WORD",              OP_UNSIGNED_OFFSET),
-    0xa9 : ("POP_VARIABLEMEM_WORD",               OP_UNSIGNED_OFFSET),
-    0xaa : ("do_word_var_@",OP_LOC_DO),
-    0xab : ("push_word_var_adr",OP_UNSIGNED_OFFSET),
-#long addressing 0xc0 - 0xdf
-    0xb4 : ("PUSH_INDEXED_OBJECTMEM_WORD",        OP_UNSIGNED_OFFSET),
-    0xb6 : ("EFFECT_INDEXED_OBJECTMEM_WORD",      OP_UNSIGNED_EFFECTED_OFFSET),
-    0xc7 : ("REFERENCE_OBJECTMEM_LONG",           OP_OBJECT_OFFSET),
-    0xc8 : ("PUSH_VARIABLEMEM_LONG",              OP_UNSIGNED_OFFSET),
-    0xc9 : ("POP_VARIABLEMEM_LONG",               OP_UNSIGNED_OFFSET),
-#operators
-    0xd8 : ("PUSH_INDEXED_VARIABLEMEM_LONG",      OP_UNSIGNED_OFFSET),
-    0xd9 : ("POP_INDEXED_VARIABLEMEM_LONG",       OP_UNSIGNED_OFFSET),
-    0xdb : ("REFERENCE_INDEXED_VARIABLEMEM_LONG", OP_UNSIGNED_OFFSET),
-    0xe0 : ("->",OP_NONE),
-    0xe1 : ("<-",OP_NONE),
-    0xe2 : (">>",OP_NONE),
-    0xe3 : ("<<",OP_NONE),
-    0xe4 : ("#>",OP_NONE),
-    0xe5 : ("<#",OP_NONE),
-    0xe6 : ("negate",OP_NONE),
-    0xe7 : ("!",OP_NONE),
-    0xe8 : ("&",OP_NONE),
-    0xea : ("|",OP_NONE),
-    0xeb : ("^",OP_NONE),
-    0xec : ("+",OP_NONE),
-    0xed : ("-",OP_NONE),
-    0xee : ("~>",OP_NONE),
-    0xef : ("><",OP_NONE),
-    0xf0 : ("AND",OP_NONE),
-    0xf2 : ("OR",OP_NONE),
-    0xf4 : ("*",OP_NONE),
-    0xf5 : ("**",OP_NONE),
-    0xf6 : ("/",OP_NONE),
-    0xf7 : ("//",OP_NONE),
-    0xf9 : ("<",OP_NONE),
-    0xfa : (">",OP_NONE),
-    0xfb : ("<>",OP_NONE),
-    0xfc : ("==",OP_NONE),
-    0xfd : ("=<",OP_NONE),
-    0xfe : ("=>",OP_NONE),
-    }
-
-do_dict = {
-    0x00 : "COPY",
-    0X02 : "REPEAT_COMPARE",
-    0X08 : "PRE_RND",
-    0X0C : "POST_RND",
-    0X10 : "SIGN_EXTEND_BYTE",
-    0X14 : "SIGN_EXTEND_WORD",
-    0X18 : "POST_CLEAR",
-    0X1C : "POST_SET_TRUE",
-    0X24 : "PRE_INCREMENT",
-    0X2C : "POST_INCREMENT",
-    0x2E : "POST_INCREMENT_LONG",
-    0X34 : "PRE_DECREMENT",
-    0X3C : "POST_DECREMENT",
-    0X47 : "BITWISE_NOT",
-    0X49 : "ABS",
-    0X4C : "+=",
-    0X51 : "ENCODE",
-    0X53 : "DECODE",
-    0X58 : "SQR",
-    0X5F : "LOGICAL_NOT",
-    }
-
-cog_register_dict = {
-    0x00 : "R0",
-    0x01 : "R1",
-    0x02 : "R2",
-    0x03 : "R3",
-    0x04 : "R4",
-    0x05 : "R5",
-    0x06 : "R6",
-    0x07 : "R7",
-    0x08 : "R8",
-    0x09 : "R9",
-    0x0a : "R10",
-    0x0b : "R11",
-    0x0c : "R12",
-    0x0d : "R13",
-    0x0e : "R14",
-    0x0f : "R15",
-    0x10 : "PAR",
-    0x11 : "CNT",
-    0x12 : "INA",
-    0x13 : "INB",
-    0x14 : "OUTA",
-    0x15 : "OUTB",
-    0x16 : "DIRA",
-    0x17 : "DIRB",
-    0x18 : "CTRA",
-    0x19 : "CTRB",
-    0x1a : "FRQA",
-    0x1b : "FRQB",
-    0x1c : "PHSA",
-    0x1d : "PHSB",
-    0x1e : "VCFG",
-    0x1f : "VSCL",
-    }
-
-
-asm_dict = {
-    0x00 : ("byte",ASM_OP_RD_WR_HUB), #prepend "rd" or "wr" as appropriate late
-    0x01 : ("word",ASM_OP_RD_WR_HUB),
-    0x02 : ("long",ASM_OP_RD_WR_HUB),
-    0x03 : ("hubop",ASM_OP_NONE),
-    0x04 : ("mul",ASM_OP_NONE),
-    0x05 : ("muls",ASM_OP_NONE),
-    0x06 : ("enc",ASM_OP_NONE),
-    0x07 : ("ones",ASM_OP_NONE),
-    0x08 : ("ror",ASM_OP_NONE),
-    0x09 : ("rol",ASM_OP_NONE),
-    0x0a : ("shr",ASM_OP_NONE),
-    0x0b : ("shl",ASM_OP_NONE),
-    0x0c : ("rcr",ASM_OP_NONE),
-    0x0d : ("rcl",ASM_OP_NONE),
-    0x0e : ("sar",ASM_OP_NONE),
-    0x0f : ("rev",ASM_OP_NONE),
-    0x10 : ("mins",ASM_OP_NONE),
-    0x11 : ("maxs",ASM_OP_NONE),
-    0x12 : ("min",ASM_OP_NONE),
-    0x13 : ("max",ASM_OP_NONE),
-    0x14 : ("movs",ASM_OP_NONE),
-    0x15 : ("movd",ASM_OP_NONE),
-    0x16 : ("movi",ASM_OP_NONE),
-    0x17 : ("jmp",ASM_OP_JMP),
-    0x18 : ("and",ASM_OP_NONE),
-    0x19 : ("andn",ASM_OP_NONE),
-    0x1a : ("or",ASM_OP_NONE),
-    0x1b : ("xor",ASM_OP_NONE),
-    0x1c : ("muxc",ASM_OP_NONE),
-    0x1d : ("muxnc",ASM_OP_NONE),
-    0x1e : ("muxz",ASM_OP_NONE),
-    0x1f : ("muxnz",ASM_OP_NONE),
-    0x20 : ("add",ASM_OP_NONE),
-    0x21 : ("sub",ASM_OP_NONE),
-    0x22 : ("addabs",ASM_OP_NONE),
-    0x23 : ("subabs",ASM_OP_NONE),
-    0x24 : ("sumc",ASM_OP_NONE),
-    0x25 : ("sumnc",ASM_OP_NONE),
-    0x26 : ("sumz",ASM_OP_NONE),
-    0x27 : ("sumnz",ASM_OP_NONE),
-    0x28 : ("mov",ASM_OP_NONE),
-    0x29 : ("neg",ASM_OP_NONE),
-    0x2a : ("abs",ASM_OP_NONE),
-    0x2b : ("absneg",ASM_OP_NONE),
-    0x2c : ("negc",ASM_OP_NONE),
-    0x2d : ("negnc",ASM_OP_NONE),
-    0x2e : ("negz",ASM_OP_NONE),
-    0x2f : ("negnz",ASM_OP_NONE),
-    0x30 : ("cmps",ASM_OP_NONE),
-    0x31 : ("cmpsx",ASM_OP_NONE),
-    0x32 : ("addx",ASM_OP_NONE),
-    0x33 : ("subx",ASM_OP_NONE),
-    0x34 : ("adds",ASM_OP_NONE),
-    0x35 : ("subs",ASM_OP_NONE),
-    0x36 : ("addsx",ASM_OP_NONE),
-    0x37 : ("subsx",ASM_OP_NONE),
-    0x38 : ("cmpsub",ASM_OP_NONE),
-    0x39 : ("djnz",ASM_OP_NONE),
-    0x3a : ("tjnz",ASM_OP_NONE),
-    0x3b : ("tjz",ASM_OP_NONE),
-    0x3c : ("waitpeq",ASM_OP_NONE),
-    0x3d : ("waitpne",ASM_OP_NONE),
-    0x3e : ("waitcnt",ASM_OP_NONE),
-    0x3f : ("waitvid",ASM_OP_NONE),
-    }
-
-condition_dict = {
-    0x0 : "if_never",
-    0x1 : "if_nz_and_nc",
-    0x2 : "if_z_and_nc",
-    0x3 : "if_nc",
-    0x4 : "if_nz_and_c",
-    0x5 : "if_nz",
-    0x6 : "if_z_ne_c",
-    0x7 : "if_nz_or_nc",
-    0x8 : "if_z_and_c",
-    0x9 : "if_z_eq_c",
-    0xa : "if_z",
-    0xb : "if_z_or_nc",
-    0xc : "if_c",
-    0xd : "if_nz_or_c",
-    0xe : "if_z_or_c",
-    0xf : "",
+ OP_METHOD_NUMBER,
+ OP_OBJECT_METHOD_NUMBER,
+ OP_MEMORY_OPERATION,
+ ) = range(13)
+
+# PASM operand types
+(ASM_OP_NONE, ASM_OP_JMP, ASM_OP_RD_WR_HUB, ASM_OP_NOP) = range(4)
+
+def _make_spin_opcodes():
+  opcodes = {
+    0x00: ("FRAME_CALL_RETURN",                  OP_NONE),
+    0x01: ("FRAME_CALL_NORETURN",                OP_NONE),
+    0x02: ("FRAME_CALL_ABORT",                   OP_NONE),
+    0x03: ("FRAME_CALL_TRASHABORT",              OP_NONE),
+    0x04: ("BRANCH",                             OP_SIGNED_OFFSET),
+    0x05: ("CALL",                               OP_METHOD_NUMBER),
+    0x06: ("OBJCALL",                            OP_OBJECT_METHOD_NUMBER),
+    0x08: ("LOOP_START",                         OP_SIGNED_OFFSET),
+    0x09: ("LOOP_CONTINUE",                      OP_SIGNED_OFFSET),
+    0x0A: ("JUMP_IF_FALSE",                      OP_SIGNED_OFFSET),
+    0x0B: ("JUMP_IF_TRUE",                       OP_SIGNED_OFFSET),
+    0x0C: ("JUMP_FROM_STACK",                    OP_NONE),
+    0x0D: ("COMPARE_CASE",                       OP_SIGNED_OFFSET),
+    0x0E: ("COMPARE_CASE_RANGE",                 OP_SIGNED_OFFSET),
+    0x0F: ("LOOK_ABORT",                         OP_NONE),
+    0x10: ("LOOKUP_COMPARE",                     OP_NONE),
+    0x11: ("LOOKDOWN_COMPARE",                   OP_NONE),
+    0x12: ("LOOKUPRANGE_COMPARE",                OP_NONE),
+    0x13: ("LOOKDOWNRANGE_COMPARE",              OP_NONE),
+    0x14: ("QUIT",                               OP_NONE),
+    0x15: ("MARK_INTERPRETED",                   OP_NONE),
+    0x16: ("STRSIZE",                            OP_NONE),
+    0x17: ("STRCOMP",                            OP_NONE),
+    0x18: ("BYTEFILL",                           OP_NONE),
+    0x19: ("WORDFILL",                           OP_NONE),
+    0x1A: ("LONGFILL",                           OP_NONE),
+    0x1B: ("WAITPEQ",                            OP_NONE),
+    0x1C: ("BYTEMOVE",                           OP_NONE),
+    0x1D: ("WORDMOVE",                           OP_NONE),
+    0x1E: ("LONGMOVE",                           OP_NONE),
+    0x1F: ("WAITPNE",                            OP_NONE),
+    0x20: ("CLKSET",                             OP_NONE),
+    0x21: ("COGSTOP",                            OP_NONE),
+    0x22: ("LOCKRET",                            OP_NONE),
+    0x23: ("WAITCNT",                            OP_NONE),
+    0x24: ("READ_INDEXED_SPR",                   OP_NONE),
+    0x25: ("WRITE_INDEXED_SPR",                  OP_NONE),
+    0x26: ("EFFECT_INDEXED_SPR",                 OP_EFFECT),
+    0x27: ("WAITVID",                            OP_NONE),
+    0x28: ("COGINIT_RETURNS",                    OP_NONE),
+    0x29: ("LOCKNEW_RETURNS",                    OP_NONE),
+    0x2A: ("LOCKSET_RETURNS",                    OP_NONE),
+    0x2B: ("LOCKCLR_RETURNS",                    OP_NONE),
+    0x2C: ("COGINIT",                            OP_NONE),
+    0x2D: ("LOCKNEW",                            OP_NONE),
+    0x2E: ("LOCKSET",                            OP_NONE),
+    0x2F: ("LOCKCLR",                            OP_NONE),
+    0x30: ("ABORT",                              OP_NONE),
+    0x31: ("ABORT_WITH_RETURN",                  OP_NONE),
+    0x32: ("RETURN",                             OP_NONE),
+    0x33: ("POP_RETURN",                         OP_NONE),
+    0x34: ("PUSH_NEG1",                          OP_NONE),
+    0x35: ("PUSH_0",                             OP_NONE),
+    0x36: ("PUSH_1",                             OP_NONE),
+    0x37: ("PUSH_PACKED_LIT",                    OP_PACKED_LITERAL),
+    0x38: ("PUSH_BYTE_LIT",                      OP_BYTE_LITERAL),
+    0x39: ("PUSH_WORD_LIT",                      OP_WORD_LITERAL),
+    0x3A: ("PUSH_MID_LIT",                       OP_NEAR_LONG_LITERAL),
+    0x3B: ("PUSH_LONG_LIT",                      OP_LONG_LITERAL),
+    0x3D: ("INDEXED_MEM_OP",                     OP_MEMORY_OPERATION),
+    0x3E: ("INDEXED_RANGE_MEM_OP",               OP_MEMORY_OPERATION),
+    0x3F: ("MEMORY_OP",                          OP_MEMORY_OPERATION),
+    0xE0: ("ROTATE_RIGHT",                       OP_NONE),
+    0xE1: ("ROTATE_LEFT",                        OP_NONE),
+    0xE2: ("SHIFT_RIGHT",                        OP_NONE),
+    0xE3: ("SHIFT_LEFT",                         OP_NONE),
+    0xE4: ("LIMIT_MIN",                          OP_NONE),
+    0xE5: ("LIMIT_MAX",                          OP_NONE),
+    0xE6: ("NEGATE",                             OP_NONE),
+    0xE7: ("COMPLEMENT",                         OP_NONE),
+    0xE8: ("BIT_AND",                            OP_NONE),
+    0xE9: ("ABSOLUTE_VALUE",                     OP_NONE),
+    0xEA: ("BIT_OR",                             OP_NONE),
+    0xEB: ("BIT_XOR",                            OP_NONE),
+    0xEC: ("ADD",                                OP_NONE),
+    0xED: ("SUBTRACT",                           OP_NONE),
+    0xEE: ("ARITH_SHIFT_RIGHT",                  OP_NONE),
+    0xEF: ("BIT_REVERSE",                        OP_NONE),
+    0xF0: ("LOGICAL_AND",                        OP_NONE),
+    0xF1: ("ENCODE",                             OP_NONE),
+    0xF2: ("LOGICAL_OR",                         OP_NONE),
+    0xF3: ("DECODE",                             OP_NONE),
+    0xF4: ("MULTIPLY",                           OP_NONE),
+    0xF5: ("MULTIPLY_HI",                        OP_NONE),
+    0xF6: ("DIVIDE",                             OP_NONE),
+    0xF7: ("MODULO",                             OP_NONE),
+    0xF8: ("SQUARE_ROOT",                        OP_NONE),
+    0xF9: ("LESS",                               OP_NONE),
+    0xFA: ("GREATER",                            OP_NONE),
+    0xFB: ("NOT_EQUAL",                          OP_NONE),
+    0xFC: ("EQUAL",                              OP_NONE),
+    0xFD: ("LESS_EQUAL",                         OP_NONE),
+    0xFE: ("GREATER_EQUAL",                      OP_NONE),
+    0xFF: ("LOGICAL_NOT",                        OP_NONE),
     }
+  # Variable and local long blocks, 0x40 - 0x7F
+  for i in range(8):
+    opcodes[0x40 + i * 4] = ("PUSH_VARMEM_LONG_%d" % i, OP_NONE)
+    opcodes[0x41 + i * 4] = ("POP_VARMEM_LONG_%d" % i, OP_NONE)
+    opcodes[0x42 + i * 4] = ("EFFECT_VARMEM_LONG_%d" % i, OP_EFFECT)
+    opcodes[0x43 + i * 4] = ("REFERENCE_VARMEM_LONG_%d" % i, OP_NONE)
+    opcodes[0x60 + i * 4] = ("PUSH_LOCALMEM_LONG_%d" % i, OP_NONE)
+    opcodes[0x61 + i * 4] = ("POP_LOCALMEM_LONG_%d" % i, OP_NONE)
+    opcodes[0x62 + i * 4] = ("EFFECT_LOCALMEM_LONG_%d" % i, OP_EFFECT)
+    opcodes[0x63 + i * 4] = ("REFERENCE_LOCALMEM_LONG_%d" % i, OP_NONE)
+  # Memory access, 0x80 - 0xDF: size, index, base and operation are bit
+  # fields of the opcode
+  for size, size_name in enumerate(("BYTE", "WORD", "LONG")):
+    for indexed in range(2):
+      for base, base_name in enumerate(("MAINMEM", "OBJECTMEM", "VARIABLEMEM",
+                                        "LOCALMEM")):
+        for operation, operation_name in enumerate(("PUSH", "POP", "EFFECT",
+                                                    "REFERENCE")):
+          opcode = 0x80 | (size << 5) | (indexed << 4) | (base << 2) | operation
+          name = "_".join([operation_name] + indexed * ["INDEXED"] +
+                          [base_name, size_name])
+          if base_name == "MAINMEM":
+            operand_type = operation_name == "EFFECT" and OP_EFFECT or OP_NONE
+          elif operation_name == "EFFECT":
+            operand_type = OP_UNSIGNED_EFFECTED_OFFSET
+          else:
+            operand_type = OP_UNSIGNED_OFFSET
+          opcodes[opcode] = (name, operand_type)
+  return tuple(opcodes.get(opcode, ("BYTE", OP_NONE))
+               for opcode in range(0x100))
+
+SPIN_OPCODES = _make_spin_opcodes()
+
+# Operations of the EFFECT instructions, the bit 7 asks to push the result
+EFFECT_OPERATIONS = {
+  0x00: "COPY",
+  0x02: "REPEAT_COMPARE",
+  0x06: "REPEAT_COMPARE_STEP",
+  0x08: "PRE_RANDOM",
+  0x0C: "POST_RANDOM",
+  0x10: "PRE_EXTEND_8",
+  0x14: "PRE_EXTEND_16",
+  0x18: "POST_EXTEND_8",
+  0x1C: "POST_EXTEND_16",
+  0x20: "PRE_INCREMENT_COGMEM",
+  0x22: "PRE_INCREMENT_BYTE",
+  0x24: "PRE_INCREMENT_WORD",
+  0x26: "PRE_INCREMENT_LONG",
+  0x28: "POST_INCREMENT_COGMEM",
+  0x2A: "POST_INCREMENT_BYTE",
+  0x2C: "POST_INCREMENT_WORD",
+  0x2E: "POST_INCREMENT_LONG",
+  0x30: "PRE_DECREMENT_COGMEM",
+  0x32: "PRE_DECREMENT_BYTE",
+  0x34: "PRE_DECREMENT_WORD",
+  0x36: "PRE_DECREMENT_LONG",
+  0x38: "POST_DECREMENT_COGMEM",
+  0x3A: "POST_DECREMENT_BYTE",
+  0x3C: "POST_DECREMENT_WORD",
+  0x3E: "POST_DECREMENT_LONG",
+  0x40: "ROTATE_RIGHT",
+  0x41: "ROTATE_LEFT",
+  0x42: "SHIFT_RIGHT",
+  0x43: "SHIFT_LEFT",
+  0x44: "MINIMUM",
+  0x45: "MAXIMUM",
+  0x46: "NEGATE",
+  0x47: "COMPLEMENT",
+  0x48: "BIT_AND",
+  0x49: "ABSOLUTE_VALUE",
+  0x4A: "BIT_OR",
+  0x4B: "BIT_XOR",
+  0x4C: "ADD",
+  0x4D: "SUBTRACT",
+  0x4E: "ARITH_SHIFT_RIGHT",
+  0x4F: "BIT_REVERSE",
+  0x50: "LOGICAL_AND",
+  0x51: "ENCODE",
+  0x52: "LOGICAL_OR",
+  0x53: "DECODE",
+  0x54: "MULTIPLY",
+  0x55: "MULTIPLY_HI",
+  0x56: "DIVIDE",
+  0x57: "MODULO",
+  0x58: "SQUARE_ROOT",
+  0x59: "LESS",
+  0x5A: "GREATER",
+  0x5B: "NOT_EQUAL",
+  0x5C: "EQUAL",
+  0x5D: "LESS_EQUAL",
+  0x5E: "GREATER_EQUAL",
+  0x5F: "NOT",
+  }
+
+# Special purpose registers as seen by Spin
+SPIN_REGISTERS = ("R0", "R1", "R2", "R3", "R4", "R5", "R6", "R7", "R8", "R9",
+                  "R10", "R11", "R12", "R13", "R14", "R15", "PAR", "CNT",
+                  "INA", "INB", "OUTA", "OUTB", "DIRA", "DIRB", "CTRA", "CTRB",
+                  "FRQA", "FRQB", "PHSA", "PHSB", "VCFG", "VSCL")
+
+ASM_INSTRUCTIONS = (
+  # "rd" or "wr" is prepended to the first three
+  ("byte", ASM_OP_RD_WR_HUB), ("word", ASM_OP_RD_WR_HUB),
+  ("long", ASM_OP_RD_WR_HUB), ("hubop", ASM_OP_NONE),
+  ("mul", ASM_OP_NONE), ("muls", ASM_OP_NONE),
+  ("enc", ASM_OP_NONE), ("ones", ASM_OP_NONE),
+  ("ror", ASM_OP_NONE), ("rol", ASM_OP_NONE),
+  ("shr", ASM_OP_NONE), ("shl", ASM_OP_NONE),
+  ("rcr", ASM_OP_NONE), ("rcl", ASM_OP_NONE),
+  ("sar", ASM_OP_NONE), ("rev", ASM_OP_NONE),
+  ("mins", ASM_OP_NONE), ("maxs", ASM_OP_NONE),
+  ("min", ASM_OP_NONE), ("max", ASM_OP_NONE),
+  ("movs", ASM_OP_NONE), ("movd", ASM_OP_NONE),
+  ("movi", ASM_OP_NONE), ("jmp", ASM_OP_JMP),
+  ("and", ASM_OP_NONE), ("andn", ASM_OP_NONE),
+  ("or", ASM_OP_NONE), ("xor", ASM_OP_NONE),
+  ("muxc", ASM_OP_NONE), ("muxnc", ASM_OP_NONE),
+  ("muxz", ASM_OP_NONE), ("muxnz", ASM_OP_NONE),
+  ("add", ASM_OP_NONE), ("sub", ASM_OP_NONE),
+  ("addabs", ASM_OP_NONE), ("subabs", ASM_OP_NONE),
+  ("sumc", ASM_OP_NONE), ("sumnc", ASM_OP_NONE),
+  ("sumz", ASM_OP_NONE), ("sumnz", ASM_OP_NONE),
+  ("mov", ASM_OP_NONE), ("neg", ASM_OP_NONE),
+  ("abs", ASM_OP_NONE), ("absneg", ASM_OP_NONE),
+  ("negc", ASM_OP_NONE), ("negnc", ASM_OP_NONE),
+  ("negz", ASM_OP_NONE), ("negnz", ASM_OP_NONE),
+  ("cmps", ASM_OP_NONE), ("cmpsx", ASM_OP_NONE),
+  ("addx", ASM_OP_NONE), ("subx", ASM_OP_NONE),
+  ("adds", ASM_OP_NONE), ("subs", ASM_OP_NONE),
+  ("addsx", ASM_OP_NONE), ("subsx", ASM_OP_NONE),
+  ("cmpsub", ASM_OP_NONE), ("djnz", ASM_OP_NONE),
+  ("tjnz", ASM_OP_NONE), ("tjz", ASM_OP_NONE),
+  ("waitpeq", ASM_OP_NONE), ("waitpne", ASM_OP_NONE),
+  ("waitcnt", ASM_OP_NONE), ("waitvid", ASM_OP_NONE),
+  )
+
+ASM_CONDITIONS = ("if_never", "if_nz_and_nc", "if_z_and_nc", "if_nc",
+                  "if_nz_and_c", "if_nz", "if_z_ne_c", "if_nz_or_nc",
+                  "if_z_and_c", "if_z_eq_c", "if_z", "if_z_or_nc", "if_c",
+                  "if_nz_or_c", "if_z_or_c", "")
+
+# Special purpose registers as seen by PASM, 0x1F0 - 0x1FF
+ASM_REGISTERS = ("par", "cnt", "ina", "inb", "outa", "outb", "dira", "dirb",
+                 "ctra", "ctrb", "frqa", "frqb", "phsa", "phsb", "vcfg", "vscl")
+
+# Name, directive, offset and size of the fields of Spin header
+SPIN_HEADER_FIELDS = (("clkfreq", "long", 0, 4), ("clkmode", "byte", 4, 1),
+                      ("checksum", "byte", 5, 1), ("pbase", "word", 6, 2),
+                      ("vbase", "word", 8, 2), ("dbase", "word", 10, 2),
+                      ("pcurr", "word", 12, 2), ("dcurr", "word", 14, 2))
+SPIN_HEADER_SIZE = 16
+
+_LONG = struct.Struct("<I")
+_WORD = struct.Struct("<H")
+_BIG_WORD = struct.Struct(">H")
+_BIG_LONG = struct.Struct(">I")
+_SPIN_HEADER = struct.Struct("<IBBHHHHH")
+
+# Opcodes after which the rest of a method can be data, e.g. strings
+_SPIN_RETURNS = (0x32, 0x33)
+DATA_CHUNK_SIZE = 4
+
+def hexa(number, digits=2, prefix="$"):
+  if number < 0:
+    return "-%s%0*X" % (prefix, digits, -number)
+  return "%s%0*X" % (prefix, digits, number)
+
+# Class frame: `methods` is a list of ``(address, locals_size, name)`` and
+# `objects` is a list of ``(class_address, var_offset, name)``.
+_ClassFrame = collections.namedtuple("_ClassFrame", "index address size name "
+                                     "table_size methods objects")
+
+class SpinDisassembler(object):
+  """Disassembles Spin image `image`, which is a string, a bytearray or any
+  object supporting the buffer protocol. Class frames and their method and
+  object tables are read on construction, the code is decoded by
+  :meth:`disassemble` on demand.
+  """
+
+  def __init__(self, image):
+    # NOTE: bytearray is indexed by integers on both Python 2 and 3, while a
+    # memoryview yields characters on Python 2. A bytearray is used without a
+    # copy.
+    if not isinstance(image, bytearray):
+      image = bytearray(image)
+    self._data = image
+    self._header = None
+    self._frames = []
+    self._end = len(image)
+    if len(image) >= SPIN_HEADER_SIZE:
+      self._header = _SPIN_HEADER.unpack_from(image, 0)
+      vbase = self._header[4]
+      if SPIN_HEADER_SIZE <= vbase < self._end:
+        self._end = vbase
+      self._frames = self._read_class_frames(self._header[3])
+    self._frames_by_address = dict((frame.address, frame)
+                                   for frame in self._frames)
+
+  def get_image(self):
+    return self._data
+
+  def get_class_frames(self):
+    return list(self._frames)
+
+  def _read_class_frames(self, pbase):
+    data = self._data
+    # Classes follow one another, their names are known before their tables
+    # are read, since a table can refer to the next classes
+    addresses = []
+    address = pbase
+    while address + 4 <= self._end:
+      size = _WORD.unpack_from(data, address)[0]
+      if size < 4 or address + size > self._end:
+        break
+      addresses.append(address)
+      address += size
+    names = dict((address, "Class%d" % (i + 1))
+                 for i, address in enumerate(addresses))
+    frames = []
+    for i, address in enumerate(addresses):
+      size = _WORD.unpack_from(data, address)[0]
+      num_longs = max(data[address + 2], 1)
+      num_objects = data[address + 3]
+      table_size = min(4 * (num_longs + num_objects), size)
+      name = names[address]
+      methods = []
+      for m in range(1, num_longs):
+        entry = address + 4 * m
+        if entry + 4 > address + table_size:
+          break
+        start, locals_size = struct.unpack_from("<HH", data, entry)
+        methods.append((address + start, locals_size,
+                        "%sMethod%d" % (name, m)))
+      objects = []
+      for o in range(num_objects):
+        entry = address + 4 * (num_longs + o)
+        if entry + 4 > address + table_size:
+          break
+        offset, var_offset = struct.unpack_from("<HH", data, entry)
+        objects.append((address + offset, var_offset,
+                        "%sObject%d" % (name, o + 1)))
+      frames.append(_ClassFrame(i, address, size, name, table_size, methods,
+                                objects))
+    return frames
+
+  def get_class_name(self, address):
+    frame = self._frames_by_address.get(address)
+    return frame and frame.name or "UnknownClass"
+
+  def disassemble(self):
+    """Yields :class:`Instruction` records in the order of addresses."""
+    data = self._data
+    if not self._header:
+      for instruction in self._decode_data(0, len(data), SECTION_DATA):
+        yield instruction
+      return
+    for i, (name, directive, address, size) in enumerate(SPIN_HEADER_FIELDS):
+      yield Instruction(SECTION_HEADER, address,
+                        str(data[address:address + size]), directive,
+                        hexa(self._header[i], 2 * size), (), name)
+    address = SPIN_HEADER_SIZE
+    for frame in self._frames:
+      if address < frame.address:
+        for instruction in self._decode_data(address, frame.address):
+          yield instruction
+      for instruction in self._decode_class_frame(frame):
+        yield instruction
+      address = frame.address + frame.size
+    for instruction in self._decode_data(address, self._end):
+      yield instruction
+
+  def _decode_class_frame(self, frame):
+    data = self._data
+    address = frame.address
+    yield Instruction(SECTION_CLASS, address, str(data[address:address + 4]),
+                      "CLASS", ",".join((frame.name, str(frame.size),
+                                         hexa(data[address + 2]),
+                                         str(data[address + 3]))),
+                      ((address, frame.name),), "")
+    end = frame.address + frame.size
+    for i, (start, locals_size, name) in enumerate(frame.methods):
+      entry = address + 4 * (i + 1)
+      yield Instruction(SECTION_METHOD, entry, str(data[entry:entry + 4]),
+                        "DECLARE_METHOD", ",".join((name, hexa(start, 4),
+                                                    str(locals_size / 4))),
+                        ((start, name),), "")
+    num_longs = max(data[address + 2], 1)
+    for i, (class_address, var_offset, name) in enumerate(frame.objects):
+      entry = address + 4 * (num_longs + i)
+      yield Instruction(SECTION_OBJECT, entry, str(data[entry:entry + 4]),
+                        "DECLARE_OBJECT",
+                        ",".join((name, self.get_class_name(class_address),
+                                  hexa(var_offset))),
+                        ((class_address, self.get_class_name(class_address)),),
+                        "")
+    # DAT section lies between the tables and the first method
+    starts = sorted(set(start for start, _, _ in frame.methods
+                        if address + frame.table_size <= start < end))
+    dat_start = address + frame.table_size
+    dat_end = starts and starts[0] or end
+    for instruction in self._decode_dat(frame, dat_start, dat_end):
+      yield instruction
+    for start, method_end in zip(starts, starts[1:] + [end]):
+      for instruction in self._decode_spin(frame, start, method_end):
+        yield instruction
+
+  def _decode_data(self, start, end, section=SECTION_DATA):
+    data = self._data
+    for address in range(start, end, DATA_CHUNK_SIZE):
+      chunk = data[address:min(address + DATA_CHUNK_SIZE, end)]
+      yield Instruction(section, address, str(chunk), "byte",
+                        ",".join([hexa(byte) for byte in chunk]), (), "")
+
+  def _decode_dat(self, frame, start, end):
+    data = self._data
+    is_code = True
+    address = start
+    while address + 4 <= end:
+      cog_address = (address - start) / 4
+      instruction = _LONG.unpack_from(data, address)[0]
+      conditions = (instruction >> 18) & 0xF
+      if conditions == 0 and instruction != 0:
+        # IF_NEVER acts as NOP, but instruction isn't NOP. Probably data.
+        is_code = False
+      refs = []
+      if is_code:
+        opcode, operand_type = ASM_INSTRUCTIONS[instruction >> 26]
+        effects = (instruction >> 22) & 0xF
+        if operand_type == ASM_OP_RD_WR_HUB:
+          if conditions == 0:
+            opcode = "nop"
+            operand_type = ASM_OP_NOP
+            conditions = 0xF  # suppress "if_never" output
+          elif effects & 0x02:
+            opcode = "rd" + opcode
+          else:
+            opcode = "wr" + opcode
+        elif operand_type == ASM_OP_JMP:
+          # Code usually ends with a jump, data follows
+          is_code = False
+        mnemonic = " ".join(filter(None, (ASM_CONDITIONS[conditions], opcode)))
+        operand = self._decode_asm_operand(frame, start, end, instruction,
+                                           operand_type, effects, refs)
+      else:
+        mnemonic = "long"
+        operand = hexa(instruction, 8)
+      yield Instruction(SECTION_DAT, address, str(data[address:address + 4]),
+                        mnemonic, operand, tuple(refs), "[%03X]" % cog_address)
+      address += 4
+    for instruction in self._decode_data(address, end):
+      yield instruction
+
+  def _get_cog_label(self, frame, start, end, prefix, cog_address, refs):
+    label = "%s%d_%03X" % (prefix, frame.index, cog_address)
+    address = start + 4 * cog_address
+    if address < end:
+      refs.append((address, label))
+    return label
 
-register_dict = {
-    0x1f0 : "par",
-    0x1f1 : "cnt",
-    0x1f2 : "ina",
-    0x1f3 : "inb",
-    0x1f4 : "outa",
-    0x1f5 : "outb",
-    0x1f6 : "dira",
-    0x1f7 : "dirb",
-    0x1f8 : "ctra",
-    0x1f9 : "ctrb",
-    0x1fa : "frqa",
-    0x1fb : "frqb",
-    0x1fc : "phsa",
-    0x1fd : "phsb",
-    0x1fe : "vcfg",
-    0x1ff : "vscl",
-}
-
-def hexa(number,digits=2,prefix="$"):
-    if number<0:
-        return ("-"+prefix+"%0"+str(digits)+"X") % -number
-    else:
-        return (prefix+"%0"+str(digits)+"X") % number
-
-def printo(*args):
-    if output:
-        for i in args:
-            print i,
-        print
-
-def printo_(*args):
-    if output:
-        for i in args:
-            print i,
-
-def disasm_image(image):
-    global _data
-    global buffer
-    global p
-    global cog_p
-    global dat_is_code
-    global cog_index
-
-    buffer = list(image)
-    p=0
-    cog_p = 0
-    cog_index = 0
-    dat_is_code = True
-    DecodeProgramFrame()
-    AddClassLabel("Class", p)
-    while p < len(buffer):
-        DecodeClassFrame()
-
-def disasm_image_file(filename_or_stream):
-    global _data
-    global buffer
-    global p
-    global cog_p
-    global dat_is_code
-    global cog_index
-
-    print type(filename_or_stream)
-    exit(0)
-
-    fh = open(filename, "rb")
-    buffer = fh.read()
-
-    p=0
-    cog_p = 0
-    cog_index = 0
-    dat_is_code = True
-    DecodeProgramFrame()
-    AddClassLabel("Class",p)
-    while p<len(buffer):
-        DecodeClassFrame()
-
-    fh.close()
-
-def DecodeProgramFrame():
-    global _main
-    printo(hexa(p,4),"\t_long_freq\t\t\tLONG\t",GetLong())
-    printo(hexa(p,4),"\t_clk\t\t\t\tBYTE\t",GetByte())
-    printo(hexa(p,4),"\t_checksum\t\t\tBYTE\t",hexa(GetByte()))
-    printo(hexa(p,4),"\t_program_base_address\t\tWORD\t",hexa(GetWord(),4),"\t(always $0010)?")
-    printo(hexa(p,4),"\t_variable_space\t\t\tWORD\t",hexa(GetWord(),4))
-    printo(hexa(p,4),"\t_stack_space\t\t\tWORD\t",hexa(GetWord(),4))
-    printo_(hexa(p,4))
-    _main = GetWord()
-    printo("\t_main\t\t\t\tWORD\t",hexa(_main,4))
-    printo(hexa(p,4),"\t_top_of_stack\t\t\tWORD\t",hexa(GetWord(),4))
-
-def DecodeClassFrame():
-    global p
-    global class_frame_name
-    global class_frame_data_start
-    global class_frame_member_objects
-    global class_frame_address
-
-    class_frame_address = p
-    class_frame_size = GetWord()
-    AddClassLabel("Class",class_frame_address+class_frame_size)
-    class_frame_name = class_table[class_dict[class_frame_address]]
-    class_frame_data_start = GetByte()
-    class_frame_member_objects = GetByte()
-
-    PrintClassFrame(class_frame_address, class_frame_name, class_frame_size, class_frame_data_start, class_frame_member_objects)
-
-    DecodeMethodTable()
-    DecodeObjectTable()
-    while Decode() and (not class_dict.has_key(p)):
-        pass
-
-def DecodeMethodTable():
-    global _main
-    global class_frame_data_start
-    global class_frame_name
-    global class_frame_address
-
-    if class_frame_data_start>1:
-        printo("' Method table                            Name,Start,Num_locals")
-        printo("' ------------                            ---------------------------")
-        m=1
-        # _data gives number of words before data starts.  One word already taken, so _data-1 gives number of methods.
-        for i in range(1,class_frame_data_start):
-            address = p
-            method = GetWord()
-            locals = GetWord()
-            methodName = AddMethodLabel(class_frame_name+"Method"+str(m), method+class_frame_address, locals)
-            PrintMethodTableLine(address,methodName,method,locals)
-            m+=1
-        printo()
-
-def DecodeObjectTable():
-    global _main
-    global class_frame_member_objects
-    global class_frame_name
-    if class_frame_member_objects>0:
-        printo("' Object table                            Name,Start,Var_base")
-        printo("' ------------                            -------------------")
-        m=1
-        for i in range(class_frame_member_objects):
-            address=p
-            start = GetWord()
-            var_base = GetWord()
-            objectName = AddObjectLabel(class_frame_name+"Object", start+0x10, var_base)
-            try:
-                objectType = class_table[class_dict[start+0x10]]
-            except:
-                objectType = "UnknownClass"
-            PrintObjectTableLine(address,objectName,objectType,start,var_base)
-            m+=1
-        printo
-
-def Decode():
-    global p
-    global _main
-    global seperate
-    if p<_main:
-        separate=DecodeDat()
-    else:
-        separate=DecodeSpin()
-    if separate == SEPARATE_BLANK:
-        printo("\n")
-    elif separate == SEPARATE_COMMENT:
-        printo("                                                                    '")
-    return p<len(buffer)
-
-def Operand(instruction,operand_type,effects):
+  def _decode_asm_operand(self, frame, start, end, instruction, operand_type,
+                          effects, refs):
     if operand_type == ASM_OP_NOP:
-        return ""
+      return ""
     source = instruction & 0x1FF
-    if operand_type==ASM_OP_JMP:
-        dest = ""
-    else:
-        dest = (instruction>>9) & 0x1FF
-        if dest>=0x1F0:
-            dest = register_dict.get(dest,hexa(dest,3))+","
-        else:
-            dest = AddCogLabel("CD",cog_index,dest)+","
-
-    operand = dest
-    if effects&0x1:
-        operand+="#"
-        if operand_type==ASM_OP_JMP:
-            source = AddCogLabel("CC",cog_index,source)
-        else:
-            source = hexa(source,0)
-    else:
-        if source>=0x1F0:
-            source = register_dict.get(source,hexa(source,3))
-        else:
-            source = AddCogLabel("CD",cog_index,source)
-
-    operand+=source
-    return operand
-
-def DecodeDat():
-    global p
-    global cog_p
-    global dat_is_code
-    address = p
-    if label_dict.has_key(p):
-        printo(label_table[label_dict[p]][0])
-    if cog_label_dict.has_key((cog_index,cog_p)):
-        printo(cog_label_table[cog_label_dict[(cog_index,cog_p)]][0])
-    instruction=GetLong()
-    conditions = (instruction>>18) & 0xF
-    if conditions==0 and instruction!=0:
-        #IF_NEVER acts as NOP, but instruction isn't NOP.  Probably data.
-        dat_is_code = False
-
-    if dat_is_code:
-        (opcode,operand_type) = asm_dict.get(instruction>>26, ("long",ASM_OP_NONE) )
-        effects = (instruction>>22) & 0xF
-
-        if operand_type==ASM_OP_RD_WR_HUB:
-            if conditions==0:
-                opcode = "nop"
-                operand_type = ASM_OP_NOP
-                conditions = 0xf #suppress "IF_NEVER" output
-            elif effects&0x02:
-                opcode = "rd"+opcode
-            else:
-                opcode = "wr"+opcode
-        elif operand_type==ASM_OP_JMP:
-            dat_is_code = False
-
-        operand = Operand(instruction,operand_type,effects)
-        PrintDatCodeLine(address,cog_p,instruction,condition_dict[conditions],opcode,operand)
-    else:
-        PrintDatDataLine(address,cog_p,instruction)
-    cog_p+=1
-    return FOLLOW_ON
-
-def PrintClassFrame(address,name,size,start_of_data,num_objects):
-    printo
-    printo(  "' *******************************************************************************************************")
-    printo(  "'                                         Name,Size,End_Method_Table_Offset,Num_Objects")
-    printo( ("                CLASS                     %-25s ' %04X: %02X %02X %02X %02X" % (
-        ",".join((name,str(size),hexa(start_of_data),str(num_objects))),address,size&0xFF,size>>8,start_of_data,num_objects)))
-    printo(  "' *******************************************************************************************************")
-
-def PrintMethodTableLine(address,name,start,length_of_local_variables):
-    printo( ("                DECLARE_METHOD            %-25s ' %04X: %02X %02X %02X %02X" % (",".join((name,hexa(start+0x10,4),str(length_of_local_variables/4))),address,start&0xFF,start>>8,length_of_local_variables&0xFF,length_of_local_variables>>8)))
-
-def PrintObjectTableLine(address,name,objectType,start,var_base):
-    #print name,hexa(start+0x10,4),hexa(unknown)
-    operand = ",".join( (name,objectType,hexa(var_base)) )
-    #print class_dict
-    #print class_table
-    printo( ("                DECLARE_OBJECT            %-25s ' %04X: %02X %02X %02X %02X" % (
-        operand,
-        address,
-        start&0xFF,
-        start>>8,
-        var_base&0xFF,
-        var_base>>8
-        )) )
-
-def PrintDatCodeLine(address,cog_address,the_long,conditions,opcode,operand):
-    printo("   %-12s %-25s %-25s ' %04X [%03X]: %02X_%02X_%02X_%02X" % (conditions,opcode,operand,address,cog_address,(the_long>>24)&0xFF,(the_long>>16)&0xFF,(the_long>>8)&0xFF,(the_long)&0xFF))
-
-def PrintDatDataLine(address,cog_address,the_long):
-    printo("                long                      $%08X                 ' %04X [%03X]: %02X_%02X_%02X_%02X" % (the_long,address,cog_address,(the_long>>24)&0xFF,(the_long>>16)&0xFF,(the_long>>8)&0xFF,(the_long)&0xFF))
-
-def PrintSpinLine(address,bytes,opcode,operand,comment):
-    #symbols max 30 chars
-    global output
-    if output:
-        t_bytes = []
-        for byte in bytes:
-            t_bytes.append("%02X" % byte)
-        t_bytes.extend( ("","","","","") )
-        printo("                %-25s %-25s ' %04X: %2s %2s %2s %2s %2s    %-20s" % (opcode,operand,address,t_bytes[0],t_bytes[1],t_bytes[2],t_bytes[3],t_bytes[4],comment))
-
-def DecodeSpin():
-    global p
-    global _main
-    global _data
     operand = ""
-    comment = ""
-    if label_dict.has_key(p):
-        printo("\n"+label_table[label_dict[p]][0])
-    address = p
-    bytes = [GetByte()]
-    (opcode,operand_type) = dict.get(bytes[0], ("BYTE",OP_NONE) )
-    if operand_type==OP_PACKED_LITERAL:
-        bytes.append(GetByte())
-        pow2=bytes[1] & 0x1f
-        diff=bytes[1]>>5 & 0x1
-        complement=bytes[1]>>6
-        #print pow2,diff,complement
-        if complement:
-            operand = hexa(~(1<<(pow2+1))+diff)
-        else:
-            operand = hexa((1<<(pow2+1))-diff)
-    elif operand_type==OP_BYTE_LITERAL:
-        bytes.append(GetByte())
-        operand=str(bytes[1])
-    elif operand_type==OP_WORD_LITERAL:
-        bytes.append(GetByte())
-        bytes.append(GetByte())
-        operand=str((bytes[1]<<8)+bytes[2])
-    elif operand_type==OP_SEMILONG_LITERAL:
-        bytes.append(GetByte())
-        bytes.append(GetByte())
-        bytes.append(GetByte())
-        operand=str( (bytes[1]<<16) + (bytes[2]<<8) + bytes[3] )
-    elif operand_type==OP_LONG_LITERAL:
-        bytes.append(GetByte())
-        bytes.append(GetByte())
-        bytes.append(GetByte())
-        bytes.append(GetByte())
-        operand=str( (bytes[1]<<24) + (bytes[2]<<16) + (bytes[3]<<8) + bytes[4] )
-    elif operand_type == OP_BYTE_METHOD_NUMBER:
-        bytes.append(GetByte())
-        operand = label_table[bytes[1]-1][0]
-    elif operand_type == OP_BYTE_ADDRESS:
-        bytes.append(GetByte())
-        operand=hex(bytes[1])
-    elif operand_type==OP_DO:
-        bytes.append(GetByte())
-        operand = do_dict.get(bytes[1]&0x7F, "Unknown op" )
-        if operand == "repeat_compare":
-            bytes.append(GetByte())
-            offset = bytes[2]
-            if bytes[2]&0x40:
-                offset -= 128
-            if bytes[2]&0x80:
-                bytes.append(GetByte)
-                offset = (var<<8) | bytes[3]
-            operand+=","+hexa(offset)
-    elif operand_type==OP_LOC_DO:
-        bytes.append(GetByte())
-        bytes.append(GetByte())
-        var = hex(bytes[1])
-        operand = do_dict.get(bytes[2], "Unknown op" )
-        if operand == "repeat_compare":
-            bytes.append(GetByte())
-            offset = bytes[3]
-            if bytes[3]&0x40:
-                offset -= 128
-            if bytes[3]&0x80:
-                bytes.append(GetByte)
-                offset = (var<<8) | bytes[4]
-            operand+=","+hexa(offset)
-        opcode += var
-    elif operand_type==OP_BRANCH:
-        bytes.append(GetByte())
-        offset = bytes[1]
-        if bytes[1]&0x40:
-            offset -= 128
-        if bytes[1]&0x80:
-            bytes.append(GetByte())
-            offset = (offset<<8) | bytes[2]
-        operand = AddLabel("H",p+offset)
-    elif operand_type==OP_UNSIGNED_OFFSET:
-        bytes.append(GetByte())
-        offset = bytes[1] & 0x7f
-        if bytes[1]&0x80:
-            bytes.append(GetByte())
-            offset = (offset<<8) | bytes[2]
-        if offset<0:
-            operand = "$%02X" % -offset
-        else:
-            operand = "$%02X" % offset
-    elif operand_type==OP_OBJECT_OFFSET:
-        bytes.append(GetByte())
-        offset = bytes[1] & 0x7f
-        if bytes[1]&0x80:
-            bytes.append(GetByte())
-            offset = (offset<<8) | bytes[2]
-        operand = AddLabel("H",object_start+offset)
-    elif operand_type==OP_COG_REGISTER_OPERATION:
-        bytes.append(GetByte())
-        operation = bytes[1]&0xE0
-        if operation==0x80:
-            operand="PUSH"
-        elif operation==0xA0:
-            operand="POP"
-        elif operation==0xC0:
-            bytes.append(GetByte())
-            operand=do_dict[bytes[2]]
-        else:
-            operand="UNKNOWN"
-        operand += " "+cog_register_dict[bytes[1]&0x1F]
-
-    elif opcode == "BYTE":
-        operand = hexa(bytes[0])
-    PrintSpinLine(address,bytes,opcode,operand,comment)
-    if opcode == "RETURN":
-        return SEPARATE_BLANK
-    elif opcode.startswith("pop") or opcode=="branch":
-        return SEPARATE_COMMENT
-    return FOLLOW_ON
-
-def AddCogLabel(label,cog_index,cog_p):
-    label = label+str(cog_index)+"_"+("%03X")%cog_p
-    if not cog_label_dict.has_key( (cog_index,cog_p) ):
-        cog_label_dict[(cog_index,cog_p)] = len(cog_label_table)
-        cog_label_table.append( (label, -1) )
-    return label
-
-def AddLabel(label,address):
-    #print label,hex(address),locals
-    label = label+("%04X")%address
-    if not label_dict.has_key(address):
-        label_dict[address] = len(label_table)
-        label_table.append( (label, -1) )
-    return label
-
-def AddMethodLabel(label,address,locals):
-    #print label,hex(address),locals
-    if not label_dict.has_key(address):
-        label_dict[address] = len(label_table)
-        label_table.append( (label, locals) )
-    return label
-
-def AddObjectLabel(label,address,var_base):
-    key = (address,var_base)
-    if object_dict.has_key( key ):
-        return object_table[object_dict[key]]
+    if operand_type != ASM_OP_JMP:
+      dest = (instruction >> 9) & 0x1FF
+      if dest >= 0x1F0:
+        operand = ASM_REGISTERS[dest - 0x1F0] + ","
+      else:
+        operand = self._get_cog_label(frame, start, end, "CD", dest,
+                                      refs) + ","
+    if effects & 0x1:
+      operand += "#"
+      if operand_type == ASM_OP_JMP:
+        operand += self._get_cog_label(frame, start, end, "CC", source, refs)
+      else:
+        operand += hexa(source, 0)
+    elif source >= 0x1F0:
+      operand += ASM_REGISTERS[source - 0x1F0]
     else:
-        label = label+str(len(object_table))
-        object_dict[key] = len(object_table)
-        object_table.append(label)
-        return label
-
-def AddClassLabel(label,address):
-    key = address
-    if class_dict.has_key( key ):
-        return class_table[class_dict[key]]
-    else:
-        label = label+str(len(class_table)+1)
-        class_dict[key] = len(class_table)
-        class_table.append(label)
-        return label
-
-def GetLong():
-    return GetByte()+GetByte()*0x100+GetByte()*0x10000+GetByte()*0x1000000
-
-def GetWord():
-    return GetByte()+GetByte()*0x100
-
-def GetByte():
-    global buffer
-    global p
-    ret = ord(buffer[p])
-    p += 1
-    return ret
+      operand += self._get_cog_label(frame, start, end, "CD", source, refs)
+    return operand
 
+  def _decode_spin(self, frame, start, end):
+    data = self._data
+    decoders = self._OPERAND_DECODERS
+    furthest = start
+    address = start
+    while address < end:
+      opcode = data[address]
+      mnemonic, operand_type = SPIN_OPCODES[opcode]
+      refs = []
+      try:
+        operand, next_address = decoders[operand_type](self, frame,
+                                                       address + 1, refs)
+      except (IndexError, struct.error):
+        next_address = end + 1
+      if next_address > end:
+        # Truncated instruction
+        break
+      if mnemonic == "BYTE":
+        # Not an opcode
+        operand = hexa(opcode)
+      for target, label in refs:
+        if target < end:
+          furthest = max(furthest, target)
+      yield Instruction(SECTION_SPIN, address, str(data[address:next_address]),
+                        mnemonic, operand, tuple(refs), "")
+      address = next_address
+      if opcode in _SPIN_RETURNS and address > furthest:
+        # Nothing jumps over the return, the rest are strings and padding
+        break
+    for instruction in self._decode_data(address, end):
+      yield instruction
+
+  def _decode_none(self, frame, address, refs):
+    return "", address
+
+  def _decode_signed_offset(self, frame, address, refs):
+    data = self._data
+    offset = data[address]
+    address += 1
+    if offset & 0x80:
+      offset = ((offset & 0x7F) << 8) | data[address]
+      address += 1
+      if offset & 0x4000:
+        offset -= 0x8000
+    elif offset & 0x40:
+      offset -= 0x80
+    label = "H%04X" % (address + offset)
+    refs.append((address + offset, label))
+    return label, address
+
+  def _decode_unsigned_offset(self, frame, address, refs):
+    data = self._data
+    offset = data[address] & 0x7F
+    if data[address] & 0x80:
+      address += 1
+      offset = (offset << 8) | data[address]
+    return hexa(offset), address + 1
+
+  def _decode_effect(self, frame, address, refs):
+    operation = self._data[address]
+    name = EFFECT_OPERATIONS.get(operation & 0x7F, "UNKNOWN")
+    address += 1
+    if operation & 0x7F in (0x02, 0x06):
+      label, address = self._decode_signed_offset(frame, address, refs)
+      name += "," + label
+    if operation & 0x80:
+      name += ",PUSH"
+    return name, address
+
+  def _decode_unsigned_effected_offset(self, frame, address, refs):
+    offset, address = self._decode_unsigned_offset(frame, address, refs)
+    operation, address = self._decode_effect(frame, address, refs)
+    return offset + "," + operation, address
+
+  def _decode_packed_literal(self, frame, address, refs):
+    packed = self._data[address]
+    value = 2 << (packed & 0x1F)
+    if packed & 0x20:
+      value -= 1
+    if packed & 0x40:
+      value = ~value
+    return hexa(value & 0xFFFFFFFF), address + 1
+
+  def _decode_byte_literal(self, frame, address, refs):
+    return str(self._data[address]), address + 1
+
+  def _decode_word_literal(self, frame, address, refs):
+    return str(_BIG_WORD.unpack_from(self._data, address)[0]), address + 2
+
+  def _decode_near_long_literal(self, frame, address, refs):
+    data = self._data
+    return str((data[address] << 16) | (data[address + 1] << 8) |
+               data[address + 2]), address + 3
+
+  def _decode_long_literal(self, frame, address, refs):
+    return str(_BIG_LONG.unpack_from(self._data, address)[0]), address + 4
+
+  def _get_method(self, frame, number, refs):
+    if not 0 < number <= len(frame.methods):
+      return str(number)
+    start, locals_size, name = frame.methods[number - 1]
+    refs.append((start, name))
+    return name
+
+  def _decode_method_number(self, frame, address, refs):
+    return self._get_method(frame, self._data[address], refs), address + 1
+
+  def _decode_object_method_number(self, frame, address, refs):
+    data = self._data
+    index, number = data[address], data[address + 1]
+    # Objects follow methods in the table of longs
+    i = index - max(data[frame.address + 2], 1)
+    if 0 <= i < len(frame.objects):
+      class_address, var_offset, name = frame.objects[i]
+      target_frame = self._frames_by_address.get(class_address)
+      if target_frame:
+        return "%s.%s" % (name, self._get_method(target_frame, number,
+                                                 refs)), address + 2
+    return "%d.%d" % (index, number), address + 2
+
+  def _decode_memory_operation(self, frame, address, refs):
+    operation = self._data[address]
+    register = SPIN_REGISTERS[operation & 0x1F]
+    style = operation & 0xE0
+    address += 1
+    if style == 0x80:
+      return "PUSH " + register, address
+    elif style == 0xA0:
+      return "POP " + register, address
+    elif style == 0xC0:
+      effect, address = self._decode_effect(frame, address, refs)
+      return "EFFECT %s,%s" % (register, effect), address
+    return "UNKNOWN " + register, address
+
+  _OPERAND_DECODERS = {
+    OP_NONE: _decode_none,
+    OP_EFFECT: _decode_effect,
+    OP_SIGNED_OFFSET: _decode_signed_offset,
+    OP_PACKED_LITERAL: _decode_packed_literal,
+    OP_UNSIGNED_OFFSET: _decode_unsigned_offset,
+    OP_UNSIGNED_EFFECTED_OFFSET: _decode_unsigned_effected_offset,
+    OP_BYTE_LITERAL: _decode_byte_literal,
+    OP_WORD_LITERAL: _decode_word_literal,
+    OP_NEAR_LONG_LITERAL: _decode_near_long_literal,
+    OP_LONG_LITERAL: _decode_long_literal,
+    OP_METHOD_NUMBER: _decode_method_number,
+    OP_OBJECT_METHOD_NUMBER: _decode_object_method_number,
+    OP_MEMORY_OPERATION: _decode_memory_operation,
+    }
 
+def format_instruction(instruction):
+  """Returns text line for `instruction`."""
+  line = "%04X: %-14s  %-28s %-28s" % (
+    instruction.address,
+    " ".join(["%02X" % byte for byte in bytearray(instruction.data)]),
+    instruction.mnemonic, instruction.operand)
+  if instruction.comment:
+    line += " ' " + instruction.comment
+  return line.rstrip()
+
+def format_instructions(instructions):
+  """Yields text lines for `instructions`, with labels for the addresses the
+  instructions refer to.
+  """
+  instructions = list(instructions)
+  labels = dict()
+  for instruction in instructions:
+    for address, label in instruction.refs:
+      labels.setdefault(address, label)
+  for instruction in instructions:
+    if instruction.section != SECTION_HEADER and \
+          instruction.address in labels:
+      yield ""
+      yield labels[instruction.address]
+    yield format_instruction(instruction)
+
+def disasm_image(image, output=sys.stdout):
+  """Writes disassembly of `image` to `output`."""
+  disassembler = SpinDisassembler(image)
+  for line in format_instructions(disassembler.disassemble()):
+    output.write(line + "\n")
+
+def disasm_image_file(filename_or_stream, output=sys.stdout):
+  """Writes disassembly of a binary or ELF file, or of a stream, to
+  `output`.
+  """
+  if isinstance(filename_or_stream, types.StringTypes):
+    image = Image.extract_from_file(filename_or_stream)
+  else:
+    image = filename_or_stream.read()
+  disasm_image(image, output)
+
+def _disasm_file_to_text(filename):
+  image = Image.extract_from_file(filename)
+  return "\n".join(format_instructions(
+      SpinDisassembler(image).disassemble())) + "\n"
+
+def main(argv):
+  parser = optparse.OptionParser(usage="%prog [options] FILE...")
+  parser.add_option("-j", "--jobs", type="int", default=1, dest="jobs",
+                    help="disassemble JOBS files at once", metavar="JOBS")
+  (options, filenames) = parser.parse_args(argv[1:])
+  if not filenames:
+    parser.error("no files to disassemble")
+  if options.jobs > 1 and len(filenames) > 1:
+    pool = multiprocessing.Pool(options.jobs)
+    texts = pool.imap(_disasm_file_to_text, filenames)
+  else:
+    pool = None
+    texts = (_disasm_file_to_text(filename) for filename in filenames)
+  for filename, text in zip(filenames, texts):
+    if len(filenames) > 1:
+      sys.stdout.write("' %s\n" % filename)
+    sys.stdout.write(text)
+  if pool:
+    pool.close()
+    pool.join()
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv))
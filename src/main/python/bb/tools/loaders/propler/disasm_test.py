@@ -0,0 +1,161 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import StringIO
+
+from bb.utils.testing import unittest
+from bb.tools.loaders.propler import disasm
+from bb.tools.loaders.propler.disasm import SpinDisassembler
+from bb.tools.loaders.propler.disasm import disasm_image_file
+from bb.tools.loaders.propler.disasm import format_instructions
+
+def asm(opcode, effects, dest, source, conditions=0xF):
+  return struct.pack("<I", (opcode << 26) | (effects << 22) |
+                     (conditions << 18) | (dest << 9) | source)
+
+def make_image(code="\x36\x32"):
+  """Returns an image of two classes. The first class has a DAT section and a
+  method that calls itself and the method of the second class, whose `code`
+  is the second argument.
+  """
+  code += "\x00" * (-len(code) % 4)
+  vbase = 0x3C + len(code)
+  header = struct.pack("<IBBHHHHH", 80000000, 0x6F, 0, 0x10, vbase, vbase + 8,
+                       0x24, vbase + 12)
+  class1 = (struct.pack("<HBB", 0x24, 2, 1) +
+            struct.pack("<HH", 0x14, 0) +   # method 1
+            struct.pack("<HH", 0x24, 0) +   # object 1 is class 2
+            asm(0x28, 0x3, 0x1F6, 1) +      # mov dira, #1
+            asm(0x17, 0x1, 0, 0) +          # jmp #0
+            "\x38\x05"                      # PUSH_BYTE_LIT 5
+            "\x0a\x02"                      # JUMP_IF_FALSE +2
+            "\x05\x01"                      # CALL 1
+            "\x06\x02\x01"                  # OBJCALL 2.1
+            "\x32"                          # RETURN
+            "hi\x00\x00\x00\x00")
+  class2 = (struct.pack("<HBB", 8 + len(code), 2, 0) +
+            struct.pack("<HH", 0x08, 4) +
+            code)
+  return header + class1 + class2
+
+class SpinDisassemblerTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.image = make_image()
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def get_instructions(self, section):
+    return [instruction for instruction in
+            SpinDisassembler(self.image).disassemble()
+            if instruction.section == section]
+
+  def test_class_frames(self):
+    frames = SpinDisassembler(self.image).get_class_frames()
+    self.assert_equal([(frame.address, frame.size, frame.name)
+                       for frame in frames],
+                      [(0x10, 0x24, "Class1"), (0x34, 0x0C, "Class2")])
+    self.assert_equal(frames[0].methods, [(0x24, 0, "Class1Method1")])
+    self.assert_equal(frames[0].objects, [(0x34, 0, "Class1Object1")])
+    header = self.get_instructions(disasm.SECTION_HEADER)
+    self.assert_equal([(instruction.address, instruction.comment)
+                       for instruction in header][-2:],
+                      [(12, "pcurr"), (14, "dcurr")])
+    self.assert_equal(header[3].operand, "$0010")
+
+  def test_decode_spin(self):
+    spin = self.get_instructions(disasm.SECTION_SPIN)
+    self.assert_equal([(instruction.address, instruction.mnemonic,
+                        instruction.operand) for instruction in spin],
+                      [(0x24, "PUSH_BYTE_LIT", "5"),
+                       (0x26, "JUMP_IF_FALSE", "H002A"),
+                       (0x28, "CALL", "Class1Method1"),
+                       (0x2A, "OBJCALL", "Class1Object1.Class2Method1"),
+                       (0x2D, "RETURN", ""),
+                       (0x3C, "PUSH_1", ""),
+                       (0x3D, "RETURN", "")])
+    self.assert_equal(spin[1].refs, ((0x2A, "H002A"),))
+    self.assert_equal(spin[3].refs, ((0x3C, "Class2Method1"),))
+    self.assert_equal(spin[3].data, "\x06\x02\x01")
+    # Strings after the last return are data
+    data = self.get_instructions(disasm.SECTION_DATA)
+    self.assert_equal([instruction.address for instruction in data],
+                      [0x2E, 0x32, 0x3E])
+    self.assert_equal(data[0].operand, "$68,$69,$00,$00")
+
+  def test_decode_dat(self):
+    dat = self.get_instructions(disasm.SECTION_DAT)
+    self.assert_equal([(instruction.mnemonic, instruction.operand,
+                        instruction.comment) for instruction in dat],
+                      [("mov", "dira,#$1", "[000]"),
+                       ("jmp", "#CC0_000", "[001]")])
+    self.assert_equal(dat[1].refs, ((0x1C, "CC0_000"),))
+
+  def test_decode_operands(self):
+    def decode(code):
+      image = make_image(code)
+      return [(instruction.mnemonic, instruction.operand) for instruction in
+              SpinDisassembler(image).disassemble()
+              if instruction.section == disasm.SECTION_SPIN
+              and instruction.address == 0x3C][0]
+    self.assert_equal(decode("\x37\x00"), ("PUSH_PACKED_LIT", "$02"))
+    self.assert_equal(decode("\x37\x61"), ("PUSH_PACKED_LIT", "$FFFFFFFC"))
+    self.assert_equal(decode("\x39\x12\x34"), ("PUSH_WORD_LIT", "4660"))
+    self.assert_equal(decode("\x3b\x00\x01\x00\x00"),
+                      ("PUSH_LONG_LIT", "65536"))
+    self.assert_equal(decode("\x04\x80\x01"), ("BRANCH", "H0040"))
+    self.assert_equal(decode("\x04\xff\xfd"), ("BRANCH", "H003C"))
+    self.assert_equal(decode("\x04\x7e"), ("BRANCH", "H003C"))
+    self.assert_equal(decode("\xa8\x81\x02"), ("PUSH_VARIABLEMEM_WORD",
+                                               "$102"))
+    self.assert_equal(decode("\x62\xae"), ("EFFECT_LOCALMEM_LONG_0",
+                                           "POST_INCREMENT_LONG,PUSH"))
+    self.assert_equal(decode("\x3f\x91"), ("MEMORY_OP", "PUSH CNT"))
+    self.assert_equal(decode("\x07"), ("BYTE", "$07"))
+
+  def test_truncated_image(self):
+    for size in (0, 8, 0x12, 0x27, 0x3D):
+      instructions = list(SpinDisassembler(self.image[:size]).disassemble())
+      self.assert_equal(sum([len(instruction.data)
+                             for instruction in instructions]), size)
+
+  def test_format_instructions(self):
+    lines = list(format_instructions(
+        SpinDisassembler(self.image).disassemble()))
+    self.assert_true("H002A" in lines)
+    self.assert_equal(lines[lines.index("Class1Method1") + 1],
+                      "0024: 38 05           PUSH_BYTE_LIT                5")
+
+  def test_disasm_image_file(self):
+    path = os.path.join(self.tmpdir, "a.binary")
+    with open(path, "wb") as fh:
+      fh.write(self.image)
+    output = StringIO.StringIO()
+    disasm_image_file(path, output)
+    with open(path, "rb") as fh:
+      stream_output = StringIO.StringIO()
+      disasm_image_file(fh, stream_output)
+    self.assert_equal(output.getvalue(), stream_output.getvalue())
+    self.assert_true("OBJCALL" in output.getvalue())
+
+  def test_concurrent_disassembly(self):
+    expected = list(SpinDisassembler(self.image).disassemble())
+    disassembler = SpinDisassembler(self.image)
+    results = []
+    def run():
+      results.append(list(disassembler.disassemble()))
+    threads = [threading.Thread(target=run) for i in range(8)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+    self.assert_equal(results, [expected] * len(threads))
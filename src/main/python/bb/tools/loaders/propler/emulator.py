@@ -0,0 +1,304 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Software Propeller that speaks the loader protocols over a pseudo-terminal,
+so the uploaders can be tested and benchmarked without a board::
+
+  emulator = PropellerEmulator(baudrate=115200)
+  emulator.start()
+  uploader = SPIUploader(port=emulator.get_port())
+  uploader.connect()
+  uploader.upload_file("hello.binary")
+  uploader.disconnect()
+  emulator.stop()
+
+The emulator speaks the ROM loader side of :class:`SPIUploader` (the LFSR
+handshake, the encoded longs and the checksum acknowledgement) and the multicog
+bootloader side of :class:`MulticogSPIUploader` (pages and LRC-checksums).
+The reset done by DTR cannot be seen on a pseudo-terminal, so the emulator
+recognizes the protocol by the first byte it receives: 0xF9 starts the
+handshake with the ROM loader and 0xFF starts a sync signal of the multicog
+bootloader.
+
+If `baudrate` is set, the emulator reads no faster than a serial line of this
+baudrate would transmit, so the timings are close to the real ones.
+"""
+
+__all__ = ["PropellerEmulator"]
+
+import collections
+import os
+import pty
+import select
+import struct
+import threading
+import time
+import tty
+
+from bb.tools.loaders.propler.uploader import HELLO_SIGNAL
+from bb.tools.loaders.propler.uploader import MARKER
+from bb.tools.loaders.propler.uploader import SPIUploaderInterface
+from bb.tools.loaders.propler.uploader import VERSION_BITS
+from bb.tools.loaders.propler.uploader import WINDOWED_PROTOCOL_VERSION
+from bb.tools.loaders.propler.uploader import get_handshake
+from bb.tools.loaders.propler.uploader import get_lrc
+from bb.tools.loaders.propler.uploader import stuff
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+HUB_RAM_SIZE = 1 << 15
+# Sum of the two stack markers 0xFFF9FFFF put by the ROM loader
+STACK_MARKERS_SUM = 2 * (0xFF + 0xFF + 0xF9 + 0xFF)
+
+SHUTDOWN = 0
+LOAD_TO_RAM_AND_RUN = 1
+LOAD_TO_EEPROM = 2
+LOAD_TO_EEPROM_AND_RUN = 3
+
+def decode_long(data):
+  """Decodes a long encoded by :func:`uploader.encode_long`. Returns
+  ``None`` if `data` is not a valid encoded long.
+  """
+  value = 0
+  for i, byte in enumerate(bytearray(data)):
+    if i < len(data) - 1:
+      if byte & ~0x49 != 0x92:
+        return None
+      group = (byte & 1) | ((byte >> 2) & 2) | ((byte >> 4) & 4)
+    else:
+      if byte & ~0x09 != 0xF2:
+        return None
+      group = (byte & 1) | ((byte >> 2) & 2)
+    value |= group << (3 * i)
+  return value
+
+class PropellerEmulator(object):
+  """Emulates a Propeller connected to a pseudo-terminal. `version` is the
+  chip version reported by the ROM loader and `bootloader_version` is the
+  protocol version of the multicog bootloader. The acknowledgements of the
+  pages whose addresses are listed in `corrupt_pages` report a wrong
+  LRC-checksum once.
+  """
+
+  def __init__(self, baudrate=None, version=1,
+               bootloader_version=WINDOWED_PROTOCOL_VERSION, corrupt_pages=()):
+    self._baudrate = baudrate
+    self._version = version
+    self._bootloader_version = bootloader_version
+    self._corrupt_pages = set(corrupt_pages)
+    self._master = None
+    self._slave = None
+    self._thread = None
+    self._output = bytearray()
+    self.ram = bytearray(HUB_RAM_SIZE)
+    self.eeprom = bytearray(HUB_RAM_SIZE)
+    # Statistics: number of images loaded by the ROM loader, and number of
+    # times each page was received by the multicog bootloader
+    self.loads = 0
+    self.packets = collections.defaultdict(int)
+
+  def get_port(self):
+    """Returns name of the pseudo-terminal to be used as serial port."""
+    return os.ttyname(self._slave)
+
+  def is_alive(self):
+    return bool(self._thread and self._thread.is_alive())
+
+  def start(self):
+    self._master, self._slave = pty.openpty()
+    # NOTE: the slave is kept open by the emulator, so the master doesn't get
+    # EIO while the uploader reopens the port.
+    tty.setraw(self._slave)
+    self._thread = threading.Thread(target=self._run, name="propler-emulator")
+    self._thread.daemon = True
+    self._thread.start()
+
+  def stop(self):
+    if not self._thread:
+      return
+    master, self._master = self._master, None
+    self._thread.join()
+    self._thread = None
+    os.close(master)
+    os.close(self._slave)
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.stop()
+
+  def _write(self, data):
+    self._output += data
+
+  def _run(self):
+    parser = self._parse()
+    next(parser)
+    master = self._master
+    while self._master is not None:
+      if not select.select([master], [], [], 0.05)[0]:
+        continue
+      try:
+        data = os.read(master, 4096)
+      except OSError:
+        break
+      if self._baudrate:
+        # 10 bits per byte: start bit, 8 data bits and stop bit
+        time.sleep(len(data) * 10.0 / self._baudrate)
+      for byte in data:
+        parser.send(ord(byte))
+      if self._output:
+        os.write(master, str(self._output))
+        self._output = bytearray()
+
+  def _parse(self):
+    """Consumes received bytes one by one. The byte that cannot be handled
+    by the current protocol is handled again from the idle state.
+    """
+    byte = yield
+    while True:
+      if byte == 0xF9:
+        handler = self._rom_loader()
+      elif byte == 0xFF:
+        handler = self._multicog_bootloader()
+      else:
+        byte = yield
+        continue
+      next(handler)
+      while True:
+        byte = yield
+        try:
+          unhandled = handler.send(byte)
+        except StopIteration:
+          byte = yield
+          break
+        if unhandled is not None:
+          byte = unhandled
+          break
+
+  def _rom_loader(self):
+    """Handles bytes received by the ROM loader after the calibration pulse.
+    Yields the byte that doesn't belong to the protocol.
+    """
+    request, reply = get_handshake(SPIUploaderInterface.LFSR_SEED,
+                                   SPIUploaderInterface.LFSR_REQUEST_LEN,
+                                   SPIUploaderInterface.LFSR_REPLY_LEN)
+    bits = bytearray(request[1:1 + SPIUploaderInterface.LFSR_REQUEST_LEN])
+    byte = yield
+    # The LFSR bit stream sent by the host after the calibration pulse
+    for expected in bits:
+      if byte != expected:
+        logger.debug("Emulator: LFSR mismatch")
+        yield byte
+        return
+      byte = yield
+    # Reply the LFSR bits and the chip version on each 0xF9 sent by the host
+    replies = bytearray(reply)
+    replies += bytearray(0xFE | ((self._version >> i) & 1)
+                         for i in range(VERSION_BITS))
+    for reply in replies:
+      if byte != 0xF9:
+        yield byte
+        return
+      self._write(chr(reply))
+      byte = yield
+    # Command, size and the image, each long is encoded by 11 bytes
+    longs = []
+    data = bytearray()
+    while True:
+      data.append(byte)
+      if len(data) == 11:
+        value = decode_long(data)
+        if value is None:
+          yield data[0]
+          return
+        longs.append(value)
+        data = bytearray()
+        if longs[0] == SHUTDOWN or len(longs) > 1 and \
+              len(longs) == 2 + longs[1]:
+          break
+      elif decode_long(data + "\x92" * (10 - len(data)) + "\xf2") is None:
+        # Not an encoded long, e.g. the sync signal of multicog bootloader
+        # after reset
+        yield data[0]
+        return
+      byte = yield
+    command = longs[0]
+    if command == SHUTDOWN:
+      return
+    image = struct.pack("<%dI" % longs[1], *longs[2:])
+    ok = (sum(bytearray(image)) + STACK_MARKERS_SUM) & 0xFF == 0
+    if ok:
+      self.loads += 1
+      self.ram[:] = image + "\x00" * (HUB_RAM_SIZE - len(image))
+      if command in (LOAD_TO_EEPROM, LOAD_TO_EEPROM_AND_RUN):
+        self.eeprom[:] = self.ram
+    # Checksum status is sent on the next 0xF9
+    byte = yield
+    while byte != 0xF9:
+      byte = yield
+    self._write(chr(0xFE | (not ok)))
+
+  def _multicog_bootloader(self):
+    """Handles bytes received by the multicog bootloader after the first byte
+    of sync signal.
+    """
+    byte = yield
+    if byte == 0x00:
+      return
+    images_left = byte
+    if self._bootloader_version >= WINDOWED_PROTOCOL_VERSION:
+      self._write(HELLO_SIGNAL + chr(self._bootloader_version))
+    while images_left:
+      # Wait for sync signal with COG id
+      byte = yield
+      if byte != 0xFF:
+        continue
+      cogid = yield
+      if cogid == 0x00:
+        continue
+      images_left -= 1
+      while True:
+        data = bytearray()
+        size = 8
+        while len(data) < size:
+          byte = yield
+          if byte == 0xFF and (yield) != 0x00:
+            logger.debug("Emulator: unexpected sync signal")
+            return
+          data.append(byte)
+          if len(data) == 8:
+            addr, size = struct.unpack("<II", str(data))
+            size = 8 + min(size, HUB_RAM_SIZE)
+        addr &= 0xFFFFFF
+        if addr == MARKER:
+          break
+        page = data[8:]
+        self.packets[addr] += 1
+        if addr + len(page) <= HUB_RAM_SIZE:
+          self.ram[addr:addr + len(page)] = page
+        lrc = get_lrc(page)
+        if addr in self._corrupt_pages:
+          self._corrupt_pages.remove(addr)
+          lrc ^= 0x01
+        self._write("\xff" + chr(cogid))
+        if self._bootloader_version >= WINDOWED_PROTOCOL_VERSION:
+          self._write(stuff(struct.pack("<H", addr & 0xFFFF)))
+        self._write(stuff(chr(lrc)))
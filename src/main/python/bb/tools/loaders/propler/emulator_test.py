@@ -0,0 +1,87 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.utils import logging
+from bb.tools.loaders.propler import uploader
+from bb.tools.loaders.propler.benchmark import make_spin_image
+from bb.tools.loaders.propler.emulator import PropellerEmulator
+from bb.tools.loaders.propler.emulator import decode_long
+from bb.tools.loaders.propler.uploader import MulticogSPIUploader
+from bb.tools.loaders.propler.uploader import SPIUploader
+from bb.tools.loaders.propler.uploader import encode_long
+
+# Turn off logging
+logger = logging.get_logger("bb")
+logger.propagate = False
+
+class EmulatorTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_decode_long(self):
+    for value in (0, 1, 0x12345678, 0xffffffff):
+      self.assert_equal(decode_long(encode_long(value)), value)
+    self.assert_is_none(decode_long("\xff" + encode_long(0)[1:]))
+
+  def upload(self, image, eeprom=False):
+    with PropellerEmulator(version=1) as emulator:
+      loader = SPIUploader(port=emulator.get_port())
+      self.assert_true(loader.connect())
+      self.assert_equal(loader.get_config().get_chip_version(), 1)
+      self.assert_true(loader.upload_image(image, eeprom=eeprom,
+                                           progress=False))
+      loader.serial.close()
+    self.assert_equal(emulator.loads, 1)
+    return emulator
+
+  def test_upload_to_ram(self):
+    image = make_spin_image(1024)
+    emulator = self.upload(image)
+    self.assert_equal(str(emulator.ram[:len(image)]), image)
+    self.assert_false(any(emulator.eeprom))
+
+  def test_upload_to_eeprom(self):
+    image = make_spin_image(2048)
+    emulator = self.upload(image, eeprom=True)
+    self.assert_equal(str(emulator.eeprom[:len(image)]), image)
+
+  def multicog_upload(self, emulator, **kwargs):
+    images = dict()
+    mapping = dict()
+    for cogid, size in ((1, 2 * uploader.PAGE_SIZE + 64), (2, 256)):
+      images[cogid] = make_spin_image(size)
+      mapping[cogid] = os.path.join(self.tmpdir, "cog%d.binary" % cogid)
+      with open(mapping[cogid], "wb") as fh:
+        fh.write(images[cogid])
+    loader = MulticogSPIUploader(port=emulator.get_port(), **kwargs)
+    loader.serial.open()
+    loader.upload(mapping, progress=False)
+    loader.serial.close()
+    # Spin headers are fixed by the uploader
+    size = len(images[1])
+    self.assert_equal(str(emulator.ram[16:size]), images[1][16:])
+    self.assert_equal(str(emulator.ram[size + 16:size + len(images[2])]),
+                      images[2][16:])
+    return loader
+
+  def test_windowed_multicog_upload(self):
+    with PropellerEmulator(corrupt_pages=[uploader.PAGE_SIZE]) as emulator:
+      loader = self.multicog_upload(emulator, window_size=2)
+    self.assert_equal(loader.get_protocol_version(), 2)
+    self.assert_equal(emulator.packets[uploader.PAGE_SIZE], 2)
+
+  def test_lockstep_multicog_upload(self):
+    with PropellerEmulator(bootloader_version=1) as emulator:
+      loader = self.multicog_upload(emulator)
+    self.assert_equal(loader.get_protocol_version(), 1)
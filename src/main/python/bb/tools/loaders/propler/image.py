@@ -15,12 +15,21 @@
 __copyright__ = "Copyright (c) 2012 Sladeware LLC"
 __author__ = "Oleksandr Sviridenko"
 
+import mmap
+import os
 import types
 from ctypes import *
 
 from bb.tools.loaders.propler.chips import *
+from bb.utils import logging
 
-__all__ = ["Image", "SpinHeader", "ElfHeader", "ElfContext", "ElfSectionHeader"]
+__all__ = ["Image", "ImageError", "SpinHeader", "ElfHeader", "ElfContext",
+           "ElfSectionHeader", "ElfSymbol"]
+
+logger = logging.get_logger("bb")
+
+class ImageError(Exception):
+  """Indicates that the image cannot be built from the ELF file."""
 
 class Image(object):
   """This class represents binary image."""
@@ -32,100 +41,76 @@ class Image(object):
   def dump_binary_header(cls, data):
     """Dump binary header."""
     print "Size : %d (bytes)" % len(data)
-    hdr = None
     ctx = ElfContext()
     ctx.parse_data(data)
     if ctx.hdr.is_valid():
-      hdr = ElfHeader()
-      memmove(addressof(hdr), data, sizeof(ElfHeader))
-      image = cls.extract_from_file(fname)
-      hdr = SpinHeader()
-      memmove(addressof(hdr), image, sizeof(SpinHeader))
-    else:
-      hdr = SpinHeader()
-      memmove(addressof(hdr), data, sizeof(SpinHeader))
-      print str(hdr)
+      print str(ctx.hdr)
+      data = cls.extract_from_context(ctx)
+    print str(SpinHeader.from_buffer_copy(data))
 
   @classmethod
   def dump_file_header(cls, fname):
     """Dump image file header. See also :func:`dump_binary_header`."""
     # http://forums.parallax.com/showthread.php?117526-eeprom-file-format
     print "Binary file : %s" % fname
-    fh = open(fname)
-    data = ''.join(fh.readlines())
-    print "File : %s" % fname
-    fh = open(fname)
-    cls.dump_binary_header(data)
-    data = ''.join(fh.readlines())
-    fh.close()
+    with ElfContext(fname) as ctx:
+      cls.dump_binary_header(ctx.get_data())
 
   @classmethod
   def extract_from_file(cls, filename):
     """Extract image from file `filename`. Developed for extracting
-    image from ELF binary.
+    image from ELF binary. Returns the image as bytearray.
+    """
+    with ElfContext(filename) as ctx:
+      if not ctx.hdr.is_valid():
+        return bytearray(buffer(ctx.get_data()))
+      return cls.extract_from_context(ctx)
+
+  @classmethod
+  def extract_from_context(cls, ctx):
+    """Builds image from the program segments of ELF context `ctx`. The
+    segments are copied from the file directly to their place in the image.
+    Raises :class:`ImageError` if a segment doesn't fit into the image.
     """
-    ctx = ElfContext()
-    ctx.parse_file(filename)
-    # Verify ELF context
-    if not ctx.hdr.is_valid():
-      fh = open(filename, "rb")
-      img = fh.read()
-      fh.close()
-      return img
     (start, image_size) = ctx.get_program_size()
     start = 0 # TODO: fix this
-    image_buf = [chr(0)] * image_size
-    # Experemental!
-    #pos = 0
-    #for i in range(ctx.hdr.shnum):
-    #  section = ctx.load_section_table_entry(i)
-    #  if not section:
-    #    print "Can not load section table entry %d" % i
-    #  if section.type not in (ElfSectionHeader.SHT_PROGBITS,
-    #                          ElfSectionHeader.SHT_NOBITS):
-    #    continue
-    #  buf = ctx.load_section_segment(section)
-    #  for j in range(section.size):
-    #    image_buf[pos - start + j] = buf[j]
-    #  pos += section.size
+    image = bytearray(image_size)
     # load each program section
     for i in range(ctx.hdr.phnum):
       program = ctx.load_program_table_entry(i)
-      if not program:
-        print "Can not load program table entry %d" % i
-      buf = ctx.load_program_segment(program)
-      if not buf:
-        print "Cannot load program section %d" % i
-      for j in range(program.filesz):
-        image_buf[program.paddr - start + j] = buf[j]
-    img = ''.join(image_buf)
+      # Cog driver overlays are not part of the image, see
+      # ElfContext.get_program_size()
+      if program.paddr >= ElfContext.COG_DRIVER_IMAGE_BASE:
+        logger.warning("Skip cog driver overlay segment %d at 0x%08x, %d "
+                       "byte(s)" % (i, program.paddr, program.filesz))
+        continue
+      offset = program.paddr - start
+      if offset + program.filesz > image_size:
+        raise ImageError("Segment %d at 0x%08x, %d byte(s), exceeds the image "
+                         "of %d byte(s)" % (i, program.paddr, program.filesz,
+                                            image_size))
+      image[offset:offset + program.filesz] = ctx.load_program_segment(program)
     # Fixup the header to point past the spin bytecodes and generated
     # PASM code
-    x = c_char_p(img)
-    hdr_p = cast(x, POINTER(SpinHeader))
+    hdr = SpinHeader.from_buffer(image)
     # TODO: connect clkfreq and clkmode with chip config
-    hdr_p.contents.clkfreq = 80000000
-    hdr_p.contents.clkmode = 0x6F
-    hdr_p.contents.vbase = image_size
-    hdr_p.contents.dbase = image_size + 2 * 4 # stack markers
-    hdr_p.contents.dcurr = hdr_p.contents.dbase + 4
+    hdr.clkfreq = 80000000
+    hdr.clkmode = 0x6F
+    hdr.vbase = image_size
+    hdr.dbase = image_size + 2 * 4 # stack markers
+    hdr.dcurr = hdr.dbase + 4
+    del hdr # release the buffer of the image
     # update checksum
-    img = cls.update_binary_checksum(img)
-    return img
+    return cls.update_binary_checksum(image)
 
   @classmethod
   def update_binary_checksum(cls, image):
-    """Update checksum in binary."""
-    checksum = 0
-    x = c_char_p(image)
-    hdr_p = cast(x, POINTER(SpinHeader))
+    """Update checksum in binary. `image` has to be a bytearray."""
+    hdr = SpinHeader.from_buffer(image)
     # first zero out the checksum
-    hdr_p.contents.checksum = 0
-    # compute the checksum
-    for char in list(image):
-      checksum += ord(char)
+    hdr.checksum = 0
     # store the checksum in the header
-    hdr_p.contents.checksum = cls.SPIN_TARGET_CHECKSUM - checksum
+    hdr.checksum = (cls.SPIN_TARGET_CHECKSUM - sum(image)) & 0xFF
     return image
 
   @classmethod
@@ -133,11 +118,8 @@ class Image(object):
     """Takes file name and returns ``True`` if it is valid binary
     file. See also :func:`is_valid_binary`.
     """
-    fh = open(filename)
-    data = ''.join(fh.readlines())
-    is_valid = cls.is_valid_binary(data)
-    fh.close()
-    return is_valid
+    with open(filename, "rb") as fh:
+      return cls.is_valid_binary(fh.read())
 
   @classmethod
   def is_valid_binary(cls, data):
@@ -149,8 +131,7 @@ class Image(object):
     ``FFF9`` when it terminates. The code at ``FFF9`` contains a few Spin
     bytecode instructions to get the cog ID and issue a cogstop.
     """
-    bytes = bytearray(data)
-    calc_checksum = reduce(lambda a, b: a + b, bytes)
+    calc_checksum = sum(bytearray(data))
     calc_checksum += 2 * (0xFF + 0xFF + 0xF9 + 0xFF)
     if not (calc_checksum & 0xFF):
       return True
@@ -161,10 +142,11 @@ class Image(object):
     """Return image size contained in file `filename`. Supports
     SPIN and ELF images.
     """
-    ctx = ElfContext()
-    ctx.parse_file(filename)
-    (start, image_size) = ctx.get_program_size()
-    return image_size
+    with ElfContext(filename) as ctx:
+      if not ctx.hdr.is_valid():
+        return os.path.getsize(filename)
+      (start, image_size) = ctx.get_program_size()
+      return image_size
 
 class SpinHeader(Structure):
   """
@@ -211,16 +193,31 @@ assert sizeof(SpinHeader) == 16, \
     "Size of spin header must be 16 bytes!"
 
 class ElfContext(object):
-  """This class represents ELF context."""
+  """This class represents ELF context. The file is mapped to memory, so the
+  headers are read from the mapping and the segments are returned as buffers
+  of the mapping without copying. The context has to be closed, see
+  :func:`close`, or used as context manager::
+
+    with ElfContext("hello.elf") as ctx:
+      print ctx.hdr
+  """
 
   # base address of cog driver overlays to be loaded into eeprom
   COG_DRIVER_IMAGE_BASE = 0xC0000000
 
-  def __init__(self):
+  def __init__(self, filename=None):
     self.__fname = None
-    self.__fh = None
+    self.__mmap = None
     self.__data = None
     self.__hdr = None
+    if filename:
+      self.parse_file(filename)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
 
   @property
   def hdr(self):
@@ -229,20 +226,37 @@ class ElfContext(object):
 
   def parse_file(self, filename):
     """Parse file. See also `parse_data`."""
+    self.close()
     self.__fname = filename
-    self.__fh = open(filename)
-    self.parse_data(''.join(self.__fh.readlines()))
-    self.__fh.close()
+    with open(filename, "rb") as fh:
+      if os.fstat(fh.fileno()).st_size:
+        self.__mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    self.parse_data(self.__mmap or "")
 
   def parse_data(self, data):
-    """Parse data."""
-    self.__hdr = ElfHeader()
+    """Parse data: a string, bytearray or any other object that supports
+    buffer interface.
+    """
     self.__data = data
-    memmove(addressof(self.__hdr), self.__data, sizeof(ElfHeader))
+    if len(data) >= sizeof(ElfHeader):
+      self.__hdr = ElfHeader.from_buffer_copy(data)
+    else:
+      self.__hdr = ElfHeader()
+
+  def close(self):
+    """Unmaps the file. The segments returned before become invalid."""
+    if self.__mmap:
+      self.__mmap.close()
+      self.__mmap = None
+    self.__data = None
 
   def get_filename(self):
     return self.__fname
 
+  def get_data(self):
+    """Returns the whole content of the file."""
+    return self.__data
+
   def get_program_size(self):
     """Return `start` and `end` of the program."""
     # The following implemetation reflects implementation from
@@ -274,24 +288,48 @@ class ElfContext(object):
   def load_section_table_entry(self, i):
     """Load i-th section table entry and return `ElfSectionHeader` instance."""
     offset = self.hdr.shoff + (i * self.hdr.shentsize)
-    hdr = ElfSectionHeader()
-    memmove(addressof(hdr),
-            self.__data[offset:offset + sizeof(ElfSectionHeader)],
-            sizeof(ElfSectionHeader))
-    return hdr
+    return ElfSectionHeader.from_buffer_copy(self.__data, offset)
 
   def load_section_segment(self, section):
-    return self.__data[section.offset:section.offset + section.size]
+    """Returns buffer of the section content."""
+    return buffer(self.__data, section.offset, section.size)
+
+  def get_string(self, section, offset):
+    """Returns zero-terminated string at `offset` of string table
+    `section`.
+    """
+    start = section.offset + offset
+    limit = section.offset + section.size
+    end = self.__data.find("\x00", start, limit)
+    if end < 0:
+      end = limit
+    return str(self.__data[start:end])
+
+  def get_symbols(self):
+    """Yields ``(name, symbol)`` for each named symbol of the symbol tables,
+    where `symbol` is `ElfSymbol` instance.
+    """
+    sections = [self.load_section_table_entry(i)
+                for i in range(self.hdr.shnum)]
+    for section in sections:
+      if section.type != ElfSectionHeader.SHT_SYMTAB or \
+            section.link >= len(sections):
+        continue
+      strtab = sections[section.link]
+      entsize = section.entsize or sizeof(ElfSymbol)
+      for offset in range(section.offset, section.offset + section.size,
+                          entsize):
+        symbol = ElfSymbol.from_buffer_copy(self.__data, offset)
+        if symbol.name:
+          yield (self.get_string(strtab, symbol.name), symbol)
 
   def load_program_table_entry(self, i):
     o = self.hdr.phoff + (i * self.hdr.phentsize)
-    hdr = ElfProgramHeader()
-    memmove(addressof(hdr), self.__data[o:o + sizeof(ElfProgramHeader)],
-            sizeof(ElfProgramHeader))
-    return hdr
+    return ElfProgramHeader.from_buffer_copy(self.__data, o)
 
   def load_program_segment(self, program):
-    return self.__data[program.offset:program.offset + program.filesz]
+    """Returns buffer of the program segment."""
+    return buffer(self.__data, program.offset, program.filesz)
 
 class ElfSectionHeader(Structure):
   SHT_NULL     = 0
@@ -322,6 +360,26 @@ class ElfSectionHeader(Structure):
               ("addralign" , c_uint32),
               ("entsize"   , c_uint32)]
 
+class ElfSymbol(Structure):
+  """Entry of a symbol table."""
+  STT_NOTYPE  = 0
+  STT_OBJECT  = 1
+  STT_FUNC    = 2
+  STT_SECTION = 3
+  STT_FILE    = 4
+
+  SHN_UNDEF   = 0
+
+  _fields_ = [("name"  , c_uint32),
+              ("value" , c_uint32),
+              ("size"  , c_uint32),
+              ("info"  , c_uint8),
+              ("other" , c_uint8),
+              ("shndx" , c_uint16)]
+
+  def get_type(self):
+    return self.info & 0xF
+
 class ElfProgramHeader(Structure):
   """An executable or shared object file's program header table is an array of
   structures, each describing a segment or other information the system needs to
@@ -0,0 +1,82 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import struct
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.loaders.propler.image import ElfContext
+from bb.tools.loaders.propler.image import Image
+from bb.tools.loaders.propler.image import ImageError
+from bb.tools.loaders.propler.image import SpinHeader
+
+def make_elf(segments):
+  """Returns ELF file content with program segments, `segments` is a list of
+  ``(paddr, data)`` tuples.
+  """
+  phoff = 52
+  offset = phoff + 32 * len(segments)
+  headers = ""
+  body = ""
+  for paddr, data in segments:
+    headers += struct.pack("<8I", 1, offset + len(body), paddr, paddr,
+                           len(data), len(data), 0x5, 4)
+    body += data
+  ident = "\x7fELF\x01\x01\x01" + "\x00" * 9
+  header = ident + struct.pack("<HHIIIIIHHHHHH", 2, 0x5072, 1, 0, phoff, 0, 0,
+                               52, 32, len(segments), 40, 0, 0)
+  return header + headers + body
+
+class ImageTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def write(self, filename, content):
+    path = os.path.join(self.tmpdir, filename)
+    with open(path, "wb") as fh:
+      fh.write(content)
+    return path
+
+  def test_extract_from_elf_file(self):
+    code = "".join([chr(i & 0xff) for i in range(100)])
+    data = "\x07" * 28
+    path = self.write("a.elf", make_elf([(0, "\x00" * 16 + code),
+                                         (116, data),
+                                         (0xC0000000, "cog driver")]))
+    with ElfContext(path) as ctx:
+      self.assert_true(ctx.hdr.is_valid())
+      self.assert_equal(ctx.get_program_size(), (0, 144))
+      program = ctx.load_program_table_entry(1)
+      self.assert_equal(program.paddr, 116)
+      self.assert_equal(str(ctx.load_program_segment(program)), data)
+    image = Image.extract_from_file(path)
+    self.assert_true(isinstance(image, bytearray))
+    self.assert_equal(len(image), 144)
+    self.assert_equal(str(image[16:116]), code)
+    self.assert_equal(str(image[116:]), data)
+    hdr = SpinHeader.from_buffer_copy(image)
+    self.assert_equal((hdr.clkfreq, hdr.vbase, hdr.dbase, hdr.dcurr),
+                      (80000000, 144, 152, 156))
+    self.assert_true(Image.is_valid_binary(image))
+    self.assert_equal(Image.get_file_size(path), 144)
+
+  def test_segment_out_of_image(self):
+    # The image is supposed to start at 0
+    path = self.write("a.elf", make_elf([(16, "\x00" * 32)]))
+    self.assert_raises(ImageError, Image.extract_from_file, path)
+
+  def test_extract_from_binary_file(self):
+    content = "\x00" * 16 + "spin"
+    path = self.write("a.binary", content)
+    self.assert_equal(Image.extract_from_file(path), bytearray(content))
+    self.assert_equal(Image.get_file_size(path), len(content))
+    path = self.write("empty.binary", "")
+    self.assert_equal(Image.extract_from_file(path), bytearray())
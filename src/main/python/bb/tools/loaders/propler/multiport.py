@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Loads binaries to many Propeller boards at once, one worker thread per
+serial port. A board that cannot be loaded doesn't stop the others::
+
+  results = upload_to_ports({"/dev/ttyUSB0": "a.elf", "/dev/ttyUSB1": "b.elf"})
+  print_results(results)
+
+Output::
+
+  +--------------+----------+--------+---------+---------+
+  | PORT         | BINARY   | RESULT | CONNECT |  UPLOAD |
+  +--------------+----------+--------+---------+---------+
+  | /dev/ttyUSB0 | a.elf    | OK     |  0.412s |  2.301s |
+  | /dev/ttyUSB1 | b.elf    | FAILED |  0.804s |  0.000s |
+  +--------------+----------+--------+---------+---------+
+"""
+
+__all__ = ["PortResult", "expand_ports", "upload_to_ports", "print_results"]
+
+import glob
+import os
+import sys
+import threading
+import time
+import traceback
+
+from bb.tools.loaders.propler.uploader import SPIUploader
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+class PortResult(object):
+  """Result of loading `filename` to the board connected to `port`. Times are
+  in seconds.
+  """
+
+  def __init__(self, port, filename):
+    self.port = port
+    self.filename = filename
+    self.ok = False
+    self.error = None
+    self.connect_time = 0.0
+    self.upload_time = 0.0
+
+  def get_total_time(self):
+    return self.connect_time + self.upload_time
+
+  def __str__(self):
+    if self.ok:
+      return "%s: OK, %.3fs" % (self.port, self.get_total_time())
+    return "%s: FAILED, %s" % (self.port, self.error)
+
+def expand_ports(ports):
+  """Returns a sorted list of ports matched by `ports`, a pattern or a list of
+  ports and patterns, e.g. ``"/dev/ttyUSB*"``. Ports that don't contain
+  wildcards are returned even if they don't exist.
+  """
+  if isinstance(ports, basestring):
+    ports = [ports]
+  result = set()
+  for port in ports:
+    if glob.has_magic(port):
+      result.update(glob.glob(port))
+    else:
+      result.add(port)
+  return sorted(result)
+
+def _upload(result, uploader_class, baudrate, run, eeprom, progress):
+  kwargs = dict(port=result.port)
+  if baudrate:
+    kwargs["baudrate"] = baudrate
+  uploader = uploader_class(**kwargs)
+  start_time = time.time()
+  try:
+    connected = uploader.connect()
+    result.connect_time = time.time() - start_time
+    if not connected:
+      result.error = "No hardware found"
+      return
+    start_time = time.time()
+    result.ok = bool(uploader.upload_file(result.filename, run=run,
+                                          eeprom=eeprom, progress=progress))
+    result.upload_time = time.time() - start_time
+    if not result.ok:
+      result.error = "Checksum error"
+  finally:
+    uploader.disconnect()
+
+def upload_to_ports(port_to_filename, baudrate=None, run=True, eeprom=False,
+                    uploader_class=SPIUploader):
+  """Uploads binaries to the boards described by `port_to_filename` mapping
+  concurrently. Returns a list of :class:`PortResult` sorted by port. A single
+  board is loaded in the current thread with progress bar.
+  """
+  results = [PortResult(port, filename) for port, filename
+             in sorted(port_to_filename.items())]
+  progress = len(results) == 1
+  def work(result):
+    try:
+      _upload(result, uploader_class, baudrate, run, eeprom, progress)
+    except Exception, e:
+      logger.debug(traceback.format_exc())
+      result.error = str(e) or e.__class__.__name__
+    if not result.ok:
+      logger.error("Cannot load %s to '%s': %s" %
+                   (result.filename, result.port, result.error))
+  if progress:
+    work(results[0])
+    return results
+  workers = [threading.Thread(target=work, args=(result,),
+                              name="propler-%s" % os.path.basename(result.port))
+             for result in results]
+  for worker in workers:
+    worker.daemon = True
+    worker.start()
+  for worker in workers:
+    # NOTE: join() without timeout cannot be interrupted by KeyboardInterrupt
+    # in Python 2.
+    while worker.is_alive():
+      worker.join(0.1)
+  return results
+
+def print_results(results, output=sys.stdout):
+  """Prints a table of the `results` returned by :func:`upload_to_ports`."""
+  rows = [("PORT", "BINARY", "RESULT", "CONNECT", "UPLOAD")]
+  for result in results:
+    rows.append((result.port, os.path.basename(result.filename),
+                 result.ok and "OK" or "FAILED",
+                 "%.3fs" % result.connect_time, "%.3fs" % result.upload_time))
+  widths = [max([len(row[i]) for row in rows]) for i in range(len(rows[0]))]
+  line = "+" + "+".join(["-" * (width + 2) for width in widths]) + "+\n"
+  def format_row(row):
+    cells = [row[i].ljust(widths[i]) if i < 3 else row[i].rjust(widths[i])
+             for i in range(len(row))]
+    return "| " + " | ".join(cells) + " |\n"
+  output.write(line + format_row(rows[0]) + line)
+  for row in rows[1:]:
+    output.write(format_row(row))
+  output.write(line)
+  failed = len([result for result in results if not result.ok])
+  output.write("%d board(s) loaded, %d failed\n" %
+               (len(results) - failed, failed))
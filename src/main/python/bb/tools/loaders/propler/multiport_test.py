@@ -0,0 +1,91 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import StringIO
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.utils import logging
+from bb.tools.loaders.propler.multiport import expand_ports
+from bb.tools.loaders.propler.multiport import upload_to_ports
+from bb.tools.loaders.propler.multiport import print_results
+
+# Turn off logging
+logger = logging.get_logger("bb")
+logger.propagate = False
+
+class FakeUploader(object):
+  """Uploader that doesn't find hardware on ports ending with "x" and fails
+  checksum on ports ending with "c".
+  """
+
+  disconnected = []
+
+  def __init__(self, port, baudrate=None):
+    self.port = port
+
+  def connect(self):
+    return not self.port.endswith("x")
+
+  def upload_file(self, filename, run=True, eeprom=False, progress=True):
+    if self.port.endswith("e"):
+      raise IOError("Broken pipe")
+    return not self.port.endswith("c")
+
+  def disconnect(self):
+    FakeUploader.disconnected.append(self.port)
+
+class MultiportTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    FakeUploader.disconnected = []
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def test_expand_ports(self):
+    for name in ("ttyUSB1", "ttyUSB0", "ttyS0"):
+      open(os.path.join(self.tmpdir, name), "w").close()
+    pattern = os.path.join(self.tmpdir, "ttyUSB*")
+    self.assert_equal(expand_ports(pattern),
+                      [os.path.join(self.tmpdir, "ttyUSB0"),
+                       os.path.join(self.tmpdir, "ttyUSB1")])
+    self.assert_equal(expand_ports([pattern, "/dev/ttyA", "/dev/ttyA"]),
+                      ["/dev/ttyA", os.path.join(self.tmpdir, "ttyUSB0"),
+                       os.path.join(self.tmpdir, "ttyUSB1")])
+    self.assert_equal(expand_ports(os.path.join(self.tmpdir, "ttyACM*")), [])
+
+  def test_upload_to_ports(self):
+    ports = dict([(port, port + ".elf") for port in ("p1", "p2x", "p3c",
+                                                     "p4e", "p5")])
+    results = upload_to_ports(ports, uploader_class=FakeUploader)
+    self.assert_equal([result.port for result in results],
+                      ["p1", "p2x", "p3c", "p4e", "p5"])
+    self.assert_equal([result.ok for result in results],
+                      [True, False, False, False, True])
+    self.assert_equal(results[1].error, "No hardware found")
+    self.assert_equal(results[2].error, "Checksum error")
+    self.assert_equal(results[3].error, "Broken pipe")
+    self.assert_equal(sorted(FakeUploader.disconnected), sorted(ports.keys()))
+
+  def test_upload_to_single_port(self):
+    results = upload_to_ports({"p1": "a.elf"}, uploader_class=FakeUploader)
+    self.assert_equal(len(results), 1)
+    self.assert_true(results[0].ok)
+    self.assert_equal(results[0].filename, "a.elf")
+
+  def test_print_results(self):
+    results = upload_to_ports({"p1": "/tmp/a.elf", "p2x": "b.elf"},
+                              uploader_class=FakeUploader)
+    output = StringIO.StringIO()
+    print_results(results, output)
+    lines = output.getvalue().splitlines()
+    self.assert_equal(len(lines), 7)
+    self.assert_true(lines[3].startswith("| p1   | a.elf  | OK     |"))
+    self.assert_true(lines[4].startswith("| p2x  | b.elf  | FAILED |"))
+    self.assert_equal(lines[-1], "1 board(s) loaded, 1 failed")
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Symbols of an image indexed by address, so the addresses of PC and stack
+dumps can be named::
+
+  symbols = load_symbol_map("hello.elf")
+  print symbols.format_address(0x05B0)  # prints "Class1Method1+0x4"
+
+The symbols are read from the symbol tables of ELF files, and from the class
+frames and method tables of Spin images. The maps are cached in memory and
+saved to ``~/.bbsymbols`` by the SHA-1 digest of the content, so the same
+image is indexed once::
+
+  $ python -m bb.tools.loaders.propler.symbols hello.binary 0x05B0 0x0614
+"""
+
+__all__ = ["Symbol", "SymbolMap", "get_symbol_map", "load_symbol_map"]
+
+import bisect
+import collections
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from bb.tools.loaders.propler.disasm import SpinDisassembler
+from bb.tools.loaders.propler.image import ElfContext
+from bb.tools.loaders.propler.image import ElfSymbol
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+Symbol = collections.namedtuple("Symbol", "address name size kind")
+
+KIND_FUNCTION = "function"
+KIND_METHOD = "method"
+KIND_OBJECT = "object"
+KIND_CLASS = "class"
+KIND_LABEL = "label"
+
+# When a few symbols have the same address, the first kind is kept
+KINDS = (KIND_FUNCTION, KIND_METHOD, KIND_OBJECT, KIND_CLASS, KIND_LABEL)
+
+_ELF_SYMBOL_KINDS = {
+  ElfSymbol.STT_NOTYPE: KIND_LABEL,
+  ElfSymbol.STT_OBJECT: KIND_OBJECT,
+  ElfSymbol.STT_FUNC: KIND_FUNCTION,
+  }
+
+CACHE_SIZE = 32
+DEFAULT_CACHE_DIR = os.path.join("~", ".bbsymbols")
+# Version of the saved maps, has to be changed once the indexing is changed
+CACHE_VERSION = 1
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+_cache_dir = DEFAULT_CACHE_DIR
+
+class SymbolMap(object):
+  """Sorted index of symbols. The map isn't changed after construction, so
+  it can be shared between threads.
+  """
+
+  def __init__(self, symbols=()):
+    by_address = dict()
+    for symbol in sorted(symbols, key=lambda symbol: (
+        symbol.address, KINDS.index(symbol.kind), symbol.name)):
+      by_address.setdefault(symbol.address, symbol)
+    self._symbols = sorted(by_address.values())
+    self._addresses = [symbol.address for symbol in self._symbols]
+
+  def __len__(self):
+    return len(self._symbols)
+
+  def __iter__(self):
+    return iter(self._symbols)
+
+  def get(self, address):
+    """Returns symbol at `address` or ``None``."""
+    i = bisect.bisect_left(self._addresses, address)
+    if i < len(self._addresses) and self._addresses[i] == address:
+      return self._symbols[i]
+    return None
+
+  def lookup(self, address):
+    """Returns the nearest symbol at or below `address`, or ``None`` if
+    `address` precedes all the symbols or lies past the end of the nearest
+    symbol. A symbol without size extends to the next symbol.
+    """
+    i = bisect.bisect_right(self._addresses, address)
+    if not i:
+      return None
+    symbol = self._symbols[i - 1]
+    if symbol.size and address >= symbol.address + symbol.size:
+      return None
+    return symbol
+
+  def format_address(self, address):
+    """Returns `address` as ``name+offset`` of the nearest symbol, or as a
+    plain number if `address` is outside of any symbol (see :func:`lookup`).
+    """
+    symbol = self.lookup(address)
+    if not symbol:
+      return "0x%04X" % address
+    if address == symbol.address:
+      return symbol.name
+    return "%s+0x%X" % (symbol.name, address - symbol.address)
+
+  @classmethod
+  def from_elf_context(cls, ctx):
+    """Builds the map from the symbol tables of ELF context `ctx`."""
+    symbols = []
+    for name, symbol in ctx.get_symbols():
+      kind = _ELF_SYMBOL_KINDS.get(symbol.get_type())
+      if kind and symbol.shndx != ElfSymbol.SHN_UNDEF:
+        symbols.append(Symbol(symbol.value, name, symbol.size, kind))
+    return cls(symbols)
+
+  @classmethod
+  def from_spin_image(cls, image):
+    """Builds the map from the class frames and method tables of Spin image
+    `image`.
+    """
+    symbols = []
+    for frame in SpinDisassembler(image).get_class_frames():
+      end = frame.address + frame.size
+      symbols.append(Symbol(frame.address, frame.name, frame.size,
+                            KIND_CLASS))
+      starts = sorted(set([start for start, _, _ in frame.methods] + [end]))
+      for start, locals_size, name in frame.methods:
+        size = starts[bisect.bisect_right(starts, start)] - start \
+            if start < end else 0
+        symbols.append(Symbol(start, name, size, KIND_METHOD))
+    return cls(symbols)
+
+def set_cache_dir(path):
+  """Sets directory where the symbol maps are saved. The maps are not saved
+  if `path` is ``None``.
+  """
+  global _cache_dir
+  _cache_dir = path
+
+def _get_saved_path(digest):
+  if not _cache_dir:
+    return None
+  return os.path.join(os.path.expanduser(_cache_dir), digest + ".json")
+
+def _load_saved(digest):
+  path = _get_saved_path(digest)
+  if not path:
+    return None
+  try:
+    with open(path) as fh:
+      data = json.load(fh)
+    if data["version"] != CACHE_VERSION:
+      return None
+    return SymbolMap([Symbol(address, name.encode("utf-8"), size,
+                             kind.encode("utf-8"))
+                      for address, name, size, kind in data["symbols"]])
+  except (IOError, ValueError, KeyError, TypeError):
+    return None
+
+def _save(digest, symbols):
+  path = _get_saved_path(digest)
+  if not path:
+    return
+  data = {"version": CACHE_VERSION, "symbols": list(symbols)}
+  try:
+    if not os.path.isdir(os.path.dirname(path)):
+      os.makedirs(os.path.dirname(path))
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "w") as fh:
+      json.dump(data, fh)
+    os.rename(tmp_path, path)
+  except (IOError, OSError), e:
+    logger.debug("Cannot save symbols to %s: %s" % (path, e))
+
+def _get_cached(digest, build):
+  with _cache_lock:
+    symbols = _cache.pop(digest, None)
+    if symbols is not None:
+      _cache[digest] = symbols
+      return symbols
+  # The map is loaded or built without the lock, so the maps of other images
+  # can be looked up meanwhile. If the image is indexed by a few threads at
+  # once, the first map put to the cache is kept.
+  symbols = _load_saved(digest)
+  if symbols is None:
+    symbols = build()
+    _save(digest, symbols)
+  with _cache_lock:
+    symbols = _cache.pop(digest, symbols)
+    _cache[digest] = symbols
+    while len(_cache) > CACHE_SIZE:
+      _cache.popitem(last=False)
+    return symbols
+
+def _build(ctx, data):
+  if ctx.hdr.is_valid():
+    return SymbolMap.from_elf_context(ctx)
+  return SymbolMap.from_spin_image(data)
+
+def get_symbol_map(image):
+  """Returns :class:`SymbolMap` of ELF or Spin image `image`."""
+  ctx = ElfContext()
+  ctx.parse_data(image)
+  return _get_cached(hashlib.sha1(image).hexdigest(),
+                     lambda: _build(ctx, image))
+
+def load_symbol_map(filename):
+  """Returns :class:`SymbolMap` of ELF or binary file `filename`."""
+  with ElfContext(filename) as ctx:
+    data = ctx.get_data()
+    return _get_cached(hashlib.sha1(data).hexdigest(),
+                       lambda: _build(ctx, data))
+
+def main(argv):
+  if len(argv) < 2:
+    sys.stderr.write("Usage: %s FILE [ADDRESS...]\n" % argv[0])
+    return 1
+  symbols = load_symbol_map(argv[1])
+  if len(argv) == 2:
+    for symbol in symbols:
+      print "%04X %6d %-8s %s" % (symbol.address, symbol.size, symbol.kind,
+                                  symbol.name)
+  for address in argv[2:]:
+    address = int(address, 0)
+    print "%04X %s" % (address, symbols.format_address(address))
+  return 0
+
+if __name__ == "__main__":
+  sys.exit(main(sys.argv))
@@ -0,0 +1,136 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import hashlib
+import json
+import os
+import shutil
+import struct
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.tools.loaders.propler import symbols as symbols_module
+from bb.tools.loaders.propler.disasm_test import make_image
+from bb.tools.loaders.propler.image import ElfContext
+from bb.tools.loaders.propler.image import ElfSymbol
+from bb.tools.loaders.propler.symbols import Symbol
+from bb.tools.loaders.propler.symbols import SymbolMap
+from bb.tools.loaders.propler.symbols import get_symbol_map
+from bb.tools.loaders.propler.symbols import load_symbol_map
+
+def make_elf_with_symbols(symbols):
+  """Returns ELF file content with a symbol table of `symbols`, a list of
+  ``(name, value, size, type)`` tuples.
+  """
+  strtab = "\x00"
+  symtab = "\x00" * 16
+  for name, value, size, type_ in symbols:
+    symtab += struct.pack("<IIIBBH", len(strtab), value, size, type_, 0, 1)
+    strtab += name + "\x00"
+  strtab += "\x00" * (-len(strtab) % 4)
+  strtab_offset = 52
+  symtab_offset = strtab_offset + len(strtab)
+  shoff = symtab_offset + len(symtab)
+  sections = (struct.pack("<10I", *([0] * 10)) +
+              struct.pack("<10I", 0, 2, 0, 0, symtab_offset, len(symtab), 2, 1,
+                          4, 16) +
+              struct.pack("<10I", 0, 3, 0, 0, strtab_offset, len(strtab), 0, 0,
+                          1, 0))
+  ident = "\x7fELF\x01\x01\x01" + "\x00" * 9
+  header = ident + struct.pack("<HHIIIIIHHHHHH", 2, 0x5072, 1, 0, 0, shoff, 0,
+                               52, 32, 0, 40, 3, 0)
+  return header + strtab + symtab + sections
+
+class SymbolMapTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    symbols_module._cache.clear()
+    symbols_module.set_cache_dir(os.path.join(self.tmpdir, "symbols"))
+
+  def teardown(self):
+    symbols_module.set_cache_dir(symbols_module.DEFAULT_CACHE_DIR)
+    shutil.rmtree(self.tmpdir)
+
+  def test_lookup(self):
+    symbols = SymbolMap([Symbol(0x20, "b", 0x10, "function"),
+                         Symbol(0x10, "a", 0x10, "function"),
+                         Symbol(0x20, "b_label", 0, "label")])
+    self.assert_equal(len(symbols), 2)
+    self.assert_is_none(symbols.lookup(0x0F))
+    self.assert_equal(symbols.lookup(0x10).name, "a")
+    self.assert_equal(symbols.lookup(0x1F).name, "a")
+    self.assert_equal(symbols.lookup(0x20).name, "b")
+    self.assert_equal(symbols.lookup(0x2F).name, "b")
+    # Past the end of the last symbol
+    self.assert_is_none(symbols.lookup(0x30))
+    self.assert_equal(symbols.format_address(0x1000), "0x1000")
+    self.assert_equal(symbols.get(0x20).name, "b")
+    self.assert_is_none(symbols.get(0x21))
+    self.assert_equal(symbols.format_address(0x24), "b+0x4")
+    self.assert_equal(symbols.format_address(0x10), "a")
+    self.assert_equal(symbols.format_address(0x0F), "0x000F")
+
+  def test_lookup_sizeless_symbol(self):
+    symbols = SymbolMap([Symbol(0x10, "a", 0x4, "function"),
+                         Symbol(0x20, "start", 0, "label")])
+    self.assert_is_none(symbols.lookup(0x14))
+    self.assert_equal(symbols.format_address(0x1C), "0x001C")
+    self.assert_equal(symbols.format_address(0x1000), "start+0xFE0")
+
+  def test_spin_image(self):
+    symbols = get_symbol_map(make_image())
+    self.assert_equal([(symbol.address, symbol.name, symbol.size, symbol.kind)
+                       for symbol in symbols],
+                      [(0x10, "Class1", 0x24, "class"),
+                       (0x24, "Class1Method1", 0x10, "method"),
+                       (0x34, "Class2", 0x0C, "class"),
+                       (0x3C, "Class2Method1", 0x04, "method")])
+    self.assert_equal(symbols.format_address(0x2D), "Class1Method1+0x9")
+    self.assert_equal(symbols.format_address(0x1C), "Class1+0xC")
+
+  def test_elf_file(self):
+    path = os.path.join(self.tmpdir, "a.elf")
+    with open(path, "wb") as fh:
+      fh.write(make_elf_with_symbols([
+            ("main", 0x100, 0x40, ElfSymbol.STT_FUNC),
+            ("counter", 0x200, 4, ElfSymbol.STT_OBJECT),
+            ("a.c", 0, 0, ElfSymbol.STT_FILE)]))
+    with ElfContext(path) as ctx:
+      self.assert_equal([name for name, symbol in ctx.get_symbols()],
+                        ["main", "counter", "a.c"])
+    symbols = load_symbol_map(path)
+    self.assert_equal([(symbol.name, symbol.kind) for symbol in symbols],
+                      [("main", "function"), ("counter", "object")])
+    self.assert_equal(symbols.format_address(0x11C), "main+0x1C")
+
+  def test_cache(self):
+    image = make_image()
+    symbols = get_symbol_map(image)
+    self.assert_true(get_symbol_map(bytearray(image)) is symbols)
+    path = os.path.join(self.tmpdir, "a.binary")
+    with open(path, "wb") as fh:
+      fh.write(image)
+    self.assert_true(load_symbol_map(path) is symbols)
+    for i in range(symbols_module.CACHE_SIZE):
+      get_symbol_map(image + "\x00" * (i + 1))
+    self.assert_false(load_symbol_map(path) is symbols)
+
+  def test_saved_cache(self):
+    image = make_image()
+    symbols = get_symbol_map(image)
+    symbols_module._cache.clear()
+    saved = get_symbol_map(image)
+    self.assert_false(saved is symbols)
+    self.assert_equal(list(saved), list(symbols))
+    self.assert_true(all([type(symbol.name) is str for symbol in saved]))
+    # The saved map is used instead of indexing the image again
+    path = symbols_module._get_saved_path(hashlib.sha1(image).hexdigest())
+    with open(path, "w") as fh:
+      json.dump({"version": symbols_module.CACHE_VERSION,
+                 "symbols": [[0x10, "saved", 4, "function"]]}, fh)
+    symbols_module._cache.clear()
+    self.assert_equal(get_symbol_map(image).format_address(0x12),
+                      "saved+0x2")
@@ -8,21 +8,19 @@ application."""
 
 __all__ = ['Terminal']
 
+import collections
 import os
+import select
 import sys
-import threading
+import types
 try:
   import serial
 except ImportError:
   print >>sys.stderr, "Please install pyserial."
   exit(0)
 
-if sys.version_info >= (3, 0):
-  def character(b):
-    return b.decode('latin1')
-else:
-  def character(b):
-    return b
+from bb.tools.loaders.propler.capture import CaptureFile
+from bb.tools.loaders.propler.capture import DEFAULT_CAPTURE_SIZE
 
 # First choose a platform dependant way to read single characters from
 # the console
@@ -71,14 +69,17 @@ elif os.name == 'posix':
       return c
 
     def cleanup(self):
-      termios.tcsetattr(self.fd, termios.TCSAFLUSH, self.old)
+      if getattr(self, "old", None):
+        termios.tcsetattr(self.fd, termios.TCSAFLUSH, self.old)
 
   console = Console()
 
   def cleanup_console():
     console.cleanup()
 
-  console.setup()
+  # NOTE: stdin is not a terminal when propler is used by scripts and tests
+  if os.isatty(console.fd):
+    console.setup()
   sys.exitfunc = cleanup_console # terminal modes have to be restored on exit
 else:
     raise NotImplementedError("Sorry no implementation for your " \
@@ -86,86 +87,160 @@ else:
 
 EXIT_CHARACTER = chr(3)
 
+# Maximum number of bytes read from serial port at once
+READ_SIZE = 1 << 16
+# Maximum number of bytes written to console at once, so the write doesn't
+# block for long
+CONSOLE_WRITE_SIZE = 1 << 12
+# Received bytes not yet written to console are dropped from console above
+# this limit; they are still captured
+CONSOLE_BACKLOG_SIZE = 1 << 20
+POLL_INTERVAL = 0.1
 
 class Terminal(object):
-  """Propler terminal for serial communications."""
-
-  class Transmitter(threading.Thread):
-    """Thread-transmitter. Transmit data from device."""
-    def __init__(self, terminal):
-      threading.Thread.__init__(self)
-      self.terminal = terminal
-
-    def run(self):
-      try:
-        while self.terminal.is_alive():
-          try:
-            b = console.getkey()
-          except KeyboardInterrupt:
-            b = serial.to_bytes([3])
-            raise
-          c = character(b)
-          self.terminal.sio.write(b)
-          if c == EXIT_CHARACTER:
-            self.terminal.stop()
-            break
-      except serial.SerialException, e:
-        self.terminal.stop()
-        raise
-      except KeyboardInterrupt:
-        self.terminal.stop()
-        raise
-
-  class Receiver(threading.Thread):
-    """Thread-receiver."""
-    def __init__(self, terminal):
-      threading.Thread.__init__(self)
-      self.terminal = terminal
-
-    def run(self):
-      try:
-        while self.terminal.is_alive():
-          c = self.terminal.sio.read()
-          if c == '\0': # does nothing
-            continue
-          sys.stdout.flush()
-          sys.stdout.write(c)
-      except serial.SerialException, e:
-        self.terminal.stop()
-        raise
-      except KeyboardInterrupt:
-        self.terminal.stop()
-        raise
-
-  def __init__(self, port, baudrate=115200, timeout=2):
-    self.sio = serial.Serial(port=port, baudrate=baudrate, timeout=timeout)
-    self.sio.open()
-    self._is_alive = True
-    self.receiver_thread = None
-    self.transmitter_thread = None
+  """Propler terminal for serial communications. The port, the keyboard and
+  the console are served by one loop: the port is read by large nonblocking
+  reads, and the received data is passed to the capture, if any, at once and
+  to the console as it can take it. If the console falls behind by more than
+  `CONSOLE_BACKLOG_SIZE` bytes, the oldest data is not shown, while the
+  capture gets everything.
+
+  `capture` is :class:`~bb.tools.loaders.propler.capture.CaptureFile` or the
+  name of capture file of `capture_size` bytes. If `interactive` is
+  ``False``, the keyboard is not read and the terminal works until
+  :func:`stop` is called, e.g. from another thread.
+  """
+
+  def __init__(self, port, baudrate=115200, timeout=2, capture=None,
+               capture_size=DEFAULT_CAPTURE_SIZE, output=None,
+               interactive=True):
+    # NOTE: timeout is kept for compatibility, the port is read without
+    # blocking
+    self.sio = serial.Serial(port=port, baudrate=baudrate,
+                             timeout=os.name == "nt" and POLL_INTERVAL or 0)
+    if isinstance(capture, types.StringTypes):
+      capture = CaptureFile(capture, capture_size)
+    self._capture = capture
+    self._output = output or sys.stdout
+    self._interactive = interactive
+    self._is_alive = False
+    self._backlog = collections.deque()
+    self._backlog_size = 0
+    self._skipped_size = 0
+    self._received_size = 0
+
+  def get_capture(self):
+    return self._capture
+
+  def get_received_size(self):
+    """Returns number of bytes received from the port."""
+    return self._received_size
 
   def is_alive(self):
     """Return whether terminal *is alive* or not."""
     return self._is_alive
 
   def start(self):
-    """Start terminal: start transmitter and receiver threads."""
-    # Start receiver
-    self.receiver_thread = self.Receiver(self)
-    self.receiver_thread.daemon = True
-    self.receiver_thread.start()
-    # Start transmitter
-    self.transmitter_thread = self.Transmitter(self)
-    self.transmitter_thread.daemon = True
-    self.transmitter_thread.start()
-    # While alive...
+    """Runs terminal until exit character is typed or :func:`stop` is
+    called. The port is closed on exit.
+    """
+    self._is_alive = True
     try:
-      self.receiver_thread.join()
-      self.transmitter_thread.join()
+      while self._is_alive:
+        self._poll()
     except KeyboardInterrupt:
       print "Interrupted"
+    finally:
+      self._is_alive = False
+      self._flush_console(block=True)
+      self.sio.close()
+      if self._capture:
+        self._capture.close()
 
   def stop(self):
     """Stop terminal."""
     self._is_alive = False
-    self.sio.close()
+
+  def _get_output_fd(self):
+    try:
+      return self._output.fileno()
+    except (AttributeError, IOError):
+      return None
+
+  def _poll(self):
+    if os.name == "nt":
+      self._receive(self.sio.read(self.sio.inWaiting() or 1))
+      while self._interactive and msvcrt.kbhit():
+        self._transmit(console.getkey())
+      self._flush_console()
+      return
+    port_fd = self.sio.fileno()
+    rlist = [port_fd]
+    if self._interactive:
+      rlist.append(console.fd)
+    output_fd = self._get_output_fd()
+    wlist = []
+    if self._backlog and output_fd is not None:
+      wlist.append(output_fd)
+    rlist, wlist, xlist = select.select(rlist, wlist, [], POLL_INTERVAL)
+    if port_fd in rlist:
+      data = os.read(port_fd, READ_SIZE)
+      if not data:
+        raise serial.SerialException("Port %s was closed" % self.sio.port)
+      self._receive(data)
+    if console.fd in rlist:
+      keys = os.read(console.fd, 64)
+      if not keys:
+        # End of input, e.g. stdin is not a terminal
+        self._interactive = False
+      self._transmit(keys)
+    if wlist or output_fd is None:
+      self._flush_console()
+
+  def _receive(self, data):
+    if not data:
+      return
+    self._received_size += len(data)
+    if self._capture:
+      self._capture.write(data)
+    data = data.replace("\0", "")
+    if not data:
+      return
+    self._backlog.append(data)
+    self._backlog_size += len(data)
+    while self._backlog_size > CONSOLE_BACKLOG_SIZE:
+      chunk = self._backlog.popleft()
+      self._backlog_size -= len(chunk)
+      self._skipped_size += len(chunk)
+
+  def _transmit(self, keys):
+    if EXIT_CHARACTER in keys:
+      keys = keys[:keys.index(EXIT_CHARACTER)]
+      self.stop()
+    if keys:
+      self.sio.write(keys)
+
+  def _flush_console(self, block=False):
+    """Writes to console as much as it can take without blocking, or
+    everything if `block` is ``True``.
+    """
+    output_fd = self._get_output_fd()
+    if self._skipped_size:
+      self._backlog.appendleft("\n[%d bytes skipped]\n" % self._skipped_size)
+      self._backlog_size += len(self._backlog[0])
+      self._skipped_size = 0
+    if output_fd is None or block:
+      data = "".join(self._backlog)
+      self._backlog.clear()
+      self._backlog_size = 0
+      self._output.write(data)
+      self._output.flush()
+      return
+    if not self._backlog:
+      return
+    self._output.flush()
+    chunk = self._backlog.popleft()
+    written = os.write(output_fd, chunk[:CONSOLE_WRITE_SIZE])
+    self._backlog_size -= written
+    if written < len(chunk):
+      self._backlog.appendleft(chunk[written:])
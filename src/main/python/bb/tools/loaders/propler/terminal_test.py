@@ -0,0 +1,87 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import pty
+import shutil
+import tempfile
+import threading
+import time
+import tty
+import StringIO
+
+from bb.utils.testing import unittest
+from bb.tools.loaders.propler import terminal
+from bb.tools.loaders.propler.capture import read_capture
+from bb.tools.loaders.propler.terminal import Terminal
+
+class TerminalTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.master, self.slave = pty.openpty()
+    tty.setraw(self.slave)
+
+  def teardown(self):
+    os.close(self.master)
+    os.close(self.slave)
+    shutil.rmtree(self.tmpdir)
+
+  def run_terminal(self, data, **kwargs):
+    term = Terminal(os.ttyname(self.slave), interactive=False, **kwargs)
+    thread = threading.Thread(target=term.start)
+    thread.start()
+    for i in range(0, len(data), 4096):
+      os.write(self.master, data[i:i + 4096])
+    deadline = time.time() + 10
+    while term.get_received_size() < len(data) and time.time() < deadline:
+      time.sleep(0.01)
+    term.stop()
+    thread.join()
+    self.assert_false(term.is_alive())
+    self.assert_equal(term.get_received_size(), len(data))
+    return term
+
+  def test_output_and_capture(self):
+    data = "".join(["line %d\n\x00" % i for i in range(5000)])
+    output = StringIO.StringIO()
+    filename = os.path.join(self.tmpdir, "board.cap")
+    self.run_terminal(data, output=output, capture=filename,
+                      capture_size=1 << 20)
+    self.assert_equal(output.getvalue(), data.replace("\x00", ""))
+    self.assert_equal("".join([chunk for timestamp, chunk in
+                               read_capture(filename)]), data)
+
+  def test_slow_console_does_not_lose_capture(self):
+    read_fd, write_fd = os.pipe()
+    output = os.fdopen(write_fd, "w")
+    shown = []
+    def read_console():
+      # The console is slow to take the data
+      while True:
+        time.sleep(0.01)
+        chunk = os.read(read_fd, 1024)
+        if not chunk:
+          break
+        shown.append(chunk)
+    reader = threading.Thread(target=read_console)
+    reader.start()
+    filename = os.path.join(self.tmpdir, "board.cap")
+    backlog_size = terminal.CONSOLE_BACKLOG_SIZE
+    terminal.CONSOLE_BACKLOG_SIZE = 1 << 14
+    try:
+      data = os.urandom(1 << 18).replace("\x00", "\x01")
+      self.run_terminal(data, output=output, capture=filename,
+                        capture_size=1 << 20)
+    finally:
+      terminal.CONSOLE_BACKLOG_SIZE = backlog_size
+      output.close()
+      reader.join()
+      os.close(read_fd)
+    self.assert_equal("".join([chunk for timestamp, chunk in
+                               read_capture(filename)]), data)
+    shown = "".join(shown)
+    self.assert_true("bytes skipped]" in shown)
+    self.assert_true(len(shown) < len(data))
@@ -16,6 +16,8 @@
 #
 # Author: Oleksandr Sviridenko
 
+import collections
+import itertools
 import os
 import os.path
 import operator
@@ -25,6 +27,7 @@ except ImportError:
   print >>sys.stderr, 'Please install pyserial.'
   exit(0)
 import signal
+import struct
 import sys
 import time
 import types
@@ -62,11 +65,118 @@ class UploadingError(UploaderException):
 PAGE_SIZE = 1 << 9
 
 BYTE_DELAY = float(1) / float(6000)
+# Delay before each page sent to the multicog bootloader of version 1
+PAGE_SENDING_DELAY = 0.050
 # End of page marker
 MARKER = 0xFFFFFE
 
+# Protocol versions of the multicog bootloader. Version 1 acknowledges each page
+# by [0xFF|COG|LRC], so the pages are sent one by one. Version 2 announces
+# itself by [0xFF|0xFE|VERSION] once the number of images has been received
+# and adds the low 16 bits of the page address to the acknowledgement
+# [0xFF|COG|ADDR_LO|ADDR_HI|LRC], so many pages can be in flight.
+LOCKSTEP_PROTOCOL_VERSION = 1
+WINDOWED_PROTOCOL_VERSION = 2
+HELLO_SIGNAL = "\xff\xfe"
+# Time to wait for the protocol version in seconds
+HELLO_TIMEOUT = 0.5
+# Max number of pages sent to the bootloader of version 2 without
+# acknowledgement
+DEFAULT_WINDOW_SIZE = 4
+# Number of times a page is sent again if the bootloader received it corrupted
+MAX_PAGE_RETRIES = 3
+
 HOME_DIR = os.path.dirname(os.path.realpath(__file__))
 
+# The encoded image is written by chunks of this size, so the progress can be
+# shown while the serial port is busy
+WRITE_CHUNK_SIZE = 1 << 12
+# Min time between two redraws of the progress bar in seconds
+PROGRESS_INTERVAL = 0.1
+
+# DTR is held for RESET_PULSE seconds to reset the chip, then the ROM loader
+# needs RESET_DELAY seconds to start listening. The Propeller Tool uses the same
+# values; boards with a slower reset circuit can be given longer ones, see
+# SPIUploaderInterface.set_reset_timings().
+RESET_PULSE = 0.025
+RESET_DELAY = 0.090
+# Time the chip may take to reply on the last byte of the handshake, on top of
+# the time the handshake takes on the wire
+HANDSHAKE_TIMEOUT = 0.100
+# Delay between two attempts to connect
+CONNECT_RETRY_DELAY = 0.100
+# Number of bits of chip version sent after the LFSR reply
+VERSION_BITS = 8
+
+_handshakes = dict()
+
+def get_handshake(seed, request_len, reply_len):
+  """Returns a tuple of the handshake sent to the ROM loader and of the LFSR
+  reply expected from it. The handshake consists of the calibration pulse,
+  `request_len` LFSR bits and one 0xF9 byte for each bit of the reply and of
+  the chip version, that clocks it out. Each reply bit is received as 0xFE or
+  0xFF byte. The streams are computed once for each `seed` and lengths.
+  """
+  key = (seed, request_len, reply_len)
+  if key not in _handshakes:
+    bits = bytearray(0xFE | bit for bit in
+                     itertools.islice(lfsr(seed), request_len + reply_len))
+    request = ("\xf9" + str(bits[:request_len]) +
+               "\xf9" * (reply_len + VERSION_BITS))
+    _handshakes[key] = (request, str(bits[request_len:]))
+  return _handshakes[key]
+
+# Each long is transmitted as 11 bytes: ten 3-bit groups and one 2-bit group,
+# LSB first. Every bit is encoded as a short (1) or long (0) pulse.
+ENCODED_LONG_SIZE = 11
+
+def _encode_groups(value, count, last=0x92):
+  result = bytearray()
+  for i in range(count):
+    base = last if i == count - 1 else 0x92
+    result.append(base | (value & 1) | ((value & 2) << 2) | ((value & 4) << 4))
+    value >>= 3
+  return str(result)
+
+# Encoded 12-bit values (4 groups) for bits 0..23, and encoded 8-bit values for
+# bits 24..31 (two 3-bit groups and the final 2-bit group)
+_LOW_GROUPS = [_encode_groups(value, 4) for value in range(1 << 12)]
+_HIGH_GROUPS = [_encode_groups(value, 3, last=0xf2) for value in range(1 << 8)]
+
+def encode_long(value):
+  """Encodes a 32-bit long as short/long pulses. Returns a string of
+  :const:`ENCODED_LONG_SIZE` bytes.
+  """
+  return (_LOW_GROUPS[value & 0xfff] + _LOW_GROUPS[(value >> 12) & 0xfff] +
+          _HIGH_GROUPS[(value >> 24) & 0xff])
+
+def encode_longs(data):
+  """Encodes `data`, a string of little-endian longs, as :func:`encode_long`
+  does for each long. Returns a bytearray.
+  """
+  if len(data) % 4:
+    raise ValueError("Data size must be a multiple of 4")
+  values = struct.unpack_from("<%dI" % (len(data) // 4), data)
+  return bytearray("".join([_LOW_GROUPS[value & 0xfff] +
+                            _LOW_GROUPS[(value >> 12) & 0xfff] +
+                            _HIGH_GROUPS[value >> 24] for value in values]))
+
+def stuff(data):
+  """Returns `data` with each 0xFF byte stuffed as 0xFF 0x00, so the data can
+  never be taken for a sync signal.
+  """
+  return data.replace("\xff", "\xff\x00")
+
+def get_lrc(data):
+  """Returns LRC-checksum (xor of each byte) of `data`."""
+  return reduce(operator.xor, bytearray(data), 0)
+
+def print_progress(done):
+  """Redraws the progress bar, `done` is a fraction from 0 to 1."""
+  sys.stdout.write("Downloading [{0:50s}] {1:.1f}%\r".format(
+      "#" * int(done * 50), done * 100))
+  sys.stdout.flush()
+
 class SPIUploaderInterface(object):
   """Base class for SPI uploaders. Learn more about transmission protocol from
   discussion of `"serial boot loader"
@@ -78,8 +188,11 @@ class SPIUploaderInterface(object):
   LFSR_REPLY_LEN = 250
   LFSR_SEED = ord("P") # P is for Propeller
 
-  def __init__(self, port=None, baudrate=9600, timeout=0, config=None):
+  def __init__(self, port=None, baudrate=9600, timeout=0, config=None,
+               reset_pulse=RESET_PULSE, reset_delay=RESET_DELAY):
     self.__config = None
+    self.__reset_pulse = reset_pulse
+    self.__reset_delay = reset_delay
     # Setup serial
     if not port:
       port = raw_input("Please select port: ")
@@ -101,29 +214,43 @@ class SPIUploaderInterface(object):
     """Return used :class:`Config`."""
     return self.__config
 
-  def bin_to_eeprom(self, image):
+  def set_reset_timings(self, pulse=RESET_PULSE, delay=RESET_DELAY):
+    """Sets time in seconds the DTR line is held to reset the chip and time
+    the ROM loader takes to start after reset. See :const:`RESET_PULSE` and
+    :const:`RESET_DELAY`.
+    """
+    self.__reset_pulse = pulse
+    self.__reset_delay = delay
+
+  def get_reset_timings(self):
+    """Returns a tuple of reset pulse and reset delay in seconds."""
+    return (self.__reset_pulse, self.__reset_delay)
+
+  def check_eeprom_image(self, image):
+    """Raises :class:`UploadingError` if `image` doesn't fit EEPROM."""
     if len(image) > self.get_config().get_eeprom_size() - 8:
       raise UploadingError("Code too long for EEPROM (max %d bytes)"
                            % (self.get_config().get_eeprom_size() - 8))
-    dbase = ord(image[0x0A]) + (ord(image[0x0B]) << 8)
+    dbase = struct.unpack_from("<H", image, 0x0A)[0]
     if dbase > self.get_config().get_eeprom_size():
       raise UploadingError("Invalid binary format")
-    image += "".join(chr(0x00) * (dbase - 8 - len(image)))
-    image += "".join(chr(each) for each in [0xFF, 0xFF, 0xF9, 0xFF,
-                                            0xFF, 0xFF, 0xF9, 0xFF])
-    image += "".join(chr(0x00) * (self.get_config().get_eeprom_size() - len(image)))
-    return image
+
+  def bin_to_eeprom(self, image):
+    """Returns EEPROM image as bytearray: `image` followed by the stack
+    markers and padded to the EEPROM size.
+    """
+    self.check_eeprom_image(image)
+    dbase = struct.unpack_from("<H", image, 0x0A)[0]
+    eeprom_image = bytearray(self.get_config().get_eeprom_size())
+    eeprom_image[:len(image)] = image
+    eeprom_image[dbase - 8:dbase] = "\xff\xff\xf9\xff\xff\xff\xf9\xff"
+    return eeprom_image
 
   @property
   def serial(self):
     """Return instance of :class:`serial.Serial` that controls serial port."""
     return self.__serial
 
-  def __calibrate(self):
-    """Send calibration pulse."""
-    if self.send_byte(0xF9) != 1:
-      raise Exception("The calibration byte wasn't written.")
-
   def receive_bit(self, echo, timeout):
     """Receive response from hardware via echoed byte."""
     start = time.time()
@@ -139,6 +266,20 @@ class SPIUploaderInterface(object):
         #    raise Exception("Bad reply")
     raise Exception("Timeout error")
 
+  def __receive_reply(self, n, deadline):
+    """Receives `n` reply bits, 0xFE or 0xFF bytes, till `deadline`. Other
+    bytes are skipped. Returns a string of the received bits, that is shorter
+    than `n` on timeout.
+    """
+    reply = ""
+    while len(reply) < n:
+      timeout = deadline - time.time()
+      if timeout <= 0:
+        break
+      data = self.receive(n - len(reply), timeout)
+      reply += "".join([byte for byte in data if byte in "\xfe\xff"])
+    return reply
+
   def __connect(self, config=None):
     """Actual connect implementation."""
     if config:
@@ -147,32 +288,37 @@ class SPIUploaderInterface(object):
     self.serial.close()
     if not self.serial.isOpen():
       self.serial.open()
+    start = time.time()
     self.reset()
-    logger.debug("Send the calibration pulse")
-    self.__calibrate()
-    seq = []
-    for (i, value) in zip(range(self.LFSR_REQUEST_LEN + self.LFSR_REPLY_LEN),
-                          lfsr(self.LFSR_SEED)):
-      seq.append(value)
-    logger.debug("Send the magic propeller LFSR byte stream")
-    self.serial.write("".join(chr(each | 0xFE) for each in seq[0:self.LFSR_REQUEST_LEN]))
-    # Send gobs of 0xF9 for id sync-up - these clock out the LSFR bits and the
-    # id
-    self.serial.write(chr(0xF9) * (self.LFSR_REPLY_LEN + 8))
-    # Wait for response so we know we have a Propeller. Count passed bits to
-    # provide more useful information for dubuging
-    n = self.LFSR_REPLY_LEN
-    ok = 0
-    for i in range(self.LFSR_REQUEST_LEN, self.LFSR_REQUEST_LEN + n):
-      bit = self.receive_bit(False, 0.100) # 0.110?
-      if bit != seq[i]:
-        raise Exception("No hardware found")
-      ok += 1
+    request, expected_reply = get_handshake(self.LFSR_SEED,
+                                            self.LFSR_REQUEST_LEN,
+                                            self.LFSR_REPLY_LEN)
+    logger.debug("Send the calibration pulse and the magic propeller LFSR "
+                 "byte stream")
+    # 10 bits per byte: start bit, 8 data bits and stop bit
+    deadline = (time.time() + len(request) * 10.0 / self.serial.baudrate +
+                HANDSHAKE_TIMEOUT)
+    self.serial.write(request)
+    # The whole reply is received at once. Count passed bits to provide more
+    # useful information for debugging.
+    reply = self.__receive_reply(len(expected_reply) + VERSION_BITS, deadline)
+    for ok, (bit, expected_bit) in enumerate(zip(reply, expected_reply)):
+      if bit != expected_bit:
+        break
+    else:
+      ok = min(len(reply), len(expected_reply))
+    if ok < len(expected_reply):
+      raise Exception("No hardware found (%d of %d LFSR bits received)"
+                      % (ok, len(expected_reply)))
+    if len(reply) < len(expected_reply) + VERSION_BITS:
+      raise Exception("Timeout error while receiving chip version")
     version = 0
-    for i in range(8):
-      version = ((version >> 1) & 0x7F) | ((self.receive_bit(False, 0.050) << 7))
+    for i, bit in enumerate(reply[len(expected_reply):]):
+      version |= (ord(bit) & 0x01) << i
+    logger.debug("Handshake took %.3fs (reset %.3fs)"
+                 % (time.time() - start, sum(self.get_reset_timings())))
     logger.info("Connecting to device v%d on '%s' with baudrate=%d" \
-                  % (version, self.__serial.port, self.__serial.baudrate))
+                  % (version, self.serial.port, self.serial.baudrate))
     # Update chip version for board config
     if self.get_config():
       self.get_config().set_chip_version(version)
@@ -181,9 +327,10 @@ class SPIUploaderInterface(object):
     self.disconnect()
     return False
 
-  def connect(self, config=None, attempts=2):
+  def connect(self, config=None, attempts=2, retry_delay=CONNECT_RETRY_DELAY):
     """Find propeller device on port using sync-up sequence. Return
-    ``False`` on error.
+    ``False`` on error. Each attempt resets the chip, so `retry_delay` between
+    attempts can be short.
     """
     result = False
     while attempts:
@@ -194,21 +341,26 @@ class SPIUploaderInterface(object):
       if result:
         break
       attempts -= 1
-      time.sleep(1)
+      if attempts:
+        time.sleep(retry_delay)
     return result
 
   def reset(self):
-    """Reset propeller chip."""
+    """Reset propeller chip. See :meth:`set_reset_timings`."""
     self.serial.flushOutput()
     # TODO: mac os
-    self.serial.setDTR(1)
-    time.sleep(0.025) # 0.010?
-    self.serial.setDTR(0)
-    time.sleep(0.090)
+    try:
+      self.serial.setDTR(1)
+      time.sleep(self.__reset_pulse)
+      self.serial.setDTR(0)
+    except IOError, e:
+      # The port has no modem control lines, e.g. pseudo-terminal
+      logger.debug("Cannot reset propeller on '%s': %s" % (self.serial.port, e))
+    time.sleep(self.__reset_delay)
     self.serial.flushInput()
 
   def send(self, data, timeout=None):
-    self.__serial.write(data)
+    self.serial.write(data)
 
   def send_byte(self, byte, timeout=None):
     """Send a `byte` to the serial with sepcified `timeout`. Return number
@@ -216,7 +368,7 @@ class SPIUploaderInterface(object):
     """
     if not type(byte) is types.StringType:
       byte = chr(byte)
-    n = self.__serial.write(byte)
+    n = self.serial.write(byte)
     if timeout:
       time.sleep(timeout)
     return n
@@ -226,11 +378,11 @@ class SPIUploaderInterface(object):
     bytes that was successfully received.
     """
     # Save previous value of read timeout
-    old_timeout = self.__serial.timeout
+    old_timeout = self.serial.timeout
     if timeout is None or timeout > 0:
-      self.__serial.timeout = timeout
-    n = self.__serial.read(n)
-    self.__serial.timeout = old_timeout
+      self.serial.timeout = timeout
+    n = self.serial.read(n)
+    self.serial.timeout = old_timeout
     return n
 
   def disconnect(self):
@@ -265,63 +417,67 @@ class SPIUploader(SPIUploaderInterface):
   def __init__(self, *args, **kargs):
     SPIUploaderInterface.__init__(self, *args, **kargs)
 
-  def upload_file(self, filename, run=True, eeprom=False):
+  def upload_file(self, filename, run=True, eeprom=False, progress=True):
     image = Image.extract_from_file(filename)
-    self.upload_image(image, run, eeprom)
+    return self.upload_image(image, run, eeprom, progress)
 
   @classmethod
   def verify_image(cls, image, eeprom=False):
     """Verify `image`. Check its checksum."""
     if len(image) % 4 != 0:
       raise Exception("Invalid image size: must be a multiple of 4")
-    checksum = reduce(lambda a, b: a + b, (ord(each) for each in image))
+    checksum = sum(bytearray(image))
     if not eeprom:
       checksum += 2 * (0xff + 0xff + 0xf9 + 0xff)
     checksum &= 0xff
     if checksum != 0:
       raise Exception("Code checksum error: 0x%.2x" % checksum)
 
-  def upload_image(self, image, run=True, eeprom=False):
+  def upload_image(self, image, run=True, eeprom=False, progress=True):
+    """Uploads `image` and returns ``True`` if the propeller has verified it.
+    If `progress` is ``False``, nothing is printed, e.g. when many boards are
+    loaded at once.
+    """
     self.verify_image(image)
+    # The ROM loader clears the rest of RAM and puts the stack markers itself
+    # before it programs the whole EEPROM, so the padded EEPROM image (see
+    # bin_to_eeprom()) doesn't have to be transmitted.
     if eeprom:
-      image = self.bin_to_eeprom(image)
+      self.check_eeprom_image(image)
     count_bytes = len(image)
     count_longs = count_bytes // 4
-    print 'Ready to transmit', count_bytes, 'byte(s)'
+    if progress:
+      print 'Ready to transmit', count_bytes, 'byte(s)'
     command = BootloaderCommands.get_code_list()[eeprom * 2 + run]
-    self.send_long(command)
-    self.send_long(count_longs)
-    for i in range(0, count_bytes, 4):
-      self.send_long(ord(image[i]) | (ord(image[i + 1]) << 8) |
-                     (ord(image[i + 2]) << 16) | (ord(image[i + 3]) << 24))
-      done = float(i + 4) / float(count_bytes)
-      sys.stdout.write('Downloading [{0:50s}] {1:.1f}%'.format('#' * int(done * 50), done * 100))
-      sys.stdout.write('\r')
-      sys.stdout.flush()
-    print # Escape from progress bar.
+    data = encode_longs(struct.pack("<II", command, count_longs) + image)
+    last_time = 0
+    for i in range(0, len(data), WRITE_CHUNK_SIZE):
+      self.serial.write(data[i:i + WRITE_CHUNK_SIZE])
+      if progress and time.time() - last_time >= PROGRESS_INTERVAL:
+        print_progress(float(i) / len(data))
+        last_time = time.time()
+    if progress:
+      print_progress(1.0)
+      print # Escape from progress bar.
     # Wait for checksum calculation on Propeller ... 95ms is minimum.
     time.sleep(0.15)
-    sys.stdout.write('Verifying... ')
-    sys.stdout.flush()
+    if progress:
+      sys.stdout.write('Verifying... ')
+      sys.stdout.flush()
     if self.receive_bit(True, 8):
-      print "RAM checksum error"
-      return
-    print "OK"
+      logger.error("RAM checksum error on '%s'" % self.serial.port)
+      return False
+    if progress:
+      print "OK"
+    return True
 
   def send_long(self, value):
     """Transmit an encoded long word to propeller."""
     self.serial.write(self.encode_long(value))
 
   def encode_long(self, value):
-    """Make an encoded long word to string. Encode a 32-bit long
-    as short/long pulses.
-    """
-    result = []
-    for i in range(10):
-      result.append(chr(0x92 | (value & 0x01) | ((value & 2) << 2) | ((value & 4) << 4)))
-      value >>= 3
-    result.append(chr(0xf2 | (value & 0x01) | ((value & 2) << 2)))
-    return ''.join(result)
+    """Make an encoded long word to string. See :func:`encode_long`."""
+    return encode_long(value)
 
 class MulticogBootloaderCommands(BootloaderCommands):
   pass
@@ -333,11 +489,27 @@ class MulticogSPIUploader(SPIUploaderInterface):
   # clock speeds and modes?
 
   def __init__(self, *args, **kargs):
+    window_size = kargs.pop("window_size", DEFAULT_WINDOW_SIZE)
     SPIUploaderInterface.__init__(self, *args, **kargs)
     self.__offset = 0
     self.__total_upload_size = 0
+    self.__window_size = window_size
+    self.__protocol_version = None
+
+  def get_window_size(self):
+    return self.__window_size
+
+  def get_protocol_version(self):
+    """Returns protocol version of the bootloader, or ``None`` if it's not
+    known yet.
+    """
+    return self.__protocol_version
 
-  def upload(self, cogid_to_filename_mapping, run=True, eeprom=False):
+  def upload(self, cogid_to_filename_mapping, run=True, eeprom=False,
+             progress=True):
+    """Uploads the images to the cogs. If `progress` is ``False``, nothing is
+    printed, e.g. in tests.
+    """
     # Very important to select right timeout. Non-blocking mode is not allowed.
     self.serial.timeout = 5
     self.__total_upload_size = 0
@@ -352,18 +524,21 @@ class MulticogSPIUploader(SPIUploaderInterface):
         path = cogid_to_filename_mapping[cogid]
         logging.info("\t%s => COG #%d", path, cogid)
         self.__total_upload_size += Image.get_file_size(path)
-      print "Total upload size: %d (bytes)" % self.__total_upload_size
+      if progress:
+        print "Total upload size: %d (bytes)" % self.__total_upload_size
     # Send the command that will describe the further steps
     command = MulticogBootloaderCommands.get_code_list()[eeprom * 2 + run]
     # self.send_byte(command)
     # Send synch signal in order to describe target
     # number of images to be sent
     self.__send_sync_signal(len(cogid_to_filename_mapping))
+    self.__protocol_version = self.__receive_hello()
+    logger.debug("Bootloader protocol version: %d" % self.__protocol_version)
     # Start uploading images on cogs one by one
     i = 0
     for cogid in target_cogids:
       filename = cogid_to_filename_mapping.get(cogid)
-      if not self.__upload_to_cog(i, cogid, filename):
+      if not self.__upload_to_cog(i, cogid, filename, progress):
         raise UploadingError("Uploading has been broken.")
       i += 1
 
@@ -393,15 +568,25 @@ class MulticogSPIUploader(SPIUploaderInterface):
     for byte in bytes:
       self.stuff_and_send_byte(byte)
 
-  def __upload_to_cog(self, i, cogid, filename):
+  def __receive_hello(self):
+    """Returns protocol version announced by the bootloader. The bootloader of
+    version 1 doesn't announce itself.
+    """
+    reply = self.receive(len(HELLO_SIGNAL) + 1, HELLO_TIMEOUT)
+    if len(reply) == len(HELLO_SIGNAL) + 1 and reply.startswith(HELLO_SIGNAL):
+      return ord(reply[-1])
+    return LOCKSTEP_PROTOCOL_VERSION
+
+  def __upload_to_cog(self, i, cogid, filename, progress=True):
     # Extract image from the file
     data = Image.extract_from_file(filename)
     sz = len(data)
     if sz % 4 != 0:
       raise Exception("Invalid code size: must be a multiple of 4")
     logging.info("Uploading %s (%d bytes) on COG#%d" % (filename, sz, cogid))
-    print "Uploading %s (%d bytes) on COG#%d to 0x%08x" \
-        % (filename, sz, cogid, self.__offset)
+    if progress:
+      print "Uploading %s (%d bytes) on COG#%d to 0x%08x" \
+          % (filename, sz, cogid, self.__offset)
     # The following blocks aims to edit binary image
     vars_size = 512 # 16
     stack_size = 1024 # 128
@@ -410,15 +595,14 @@ class MulticogSPIUploader(SPIUploaderInterface):
     # Read and fix header
     # XXX: do we need to recalculate checksum value once the
     #      header has been updated?
-    data_p = c_char_p(data)
-    hdr_p = cast(data_p, POINTER(SpinHeader))
-    hdr_p.contents.pbase = self.__offset + hdr_p.contents.pbase
-    hdr_p.contents.vbase = offset + 0
-    hdr_p.contents.dbase = offset + vars_size
-    hdr_p.contents.pcurr = self.__offset + hdr_p.contents.pcurr
-    hdr_p.contents.dcurr = offset + vars_size + 4
-    logging.info(str(hdr_p.contents))
-    data = list(data)
+    hdr = SpinHeader.from_buffer(data)
+    hdr.pbase = self.__offset + hdr.pbase
+    hdr.vbase = offset + 0
+    hdr.dbase = offset + vars_size
+    hdr.pcurr = self.__offset + hdr.pcurr
+    hdr.dcurr = offset + vars_size + 4
+    logging.info(str(hdr))
+    del hdr
     # The data may be changed till this point, thus we have to double
     # check its size
     assert(len(data) == sz)
@@ -431,87 +615,109 @@ class MulticogSPIUploader(SPIUploaderInterface):
     # Send sync signal to start binary transmitting
     self.__send_sync_signal(cogid)
     # Note, that only a max of PAGE_SIZE will actually get loaded, thus
-    # we split data on chunks and send them in pages
-    chunks = [PAGE_SIZE] * (sz / PAGE_SIZE)
-    if sz % PAGE_SIZE:
-      chunks.append(sz % PAGE_SIZE)
-    i = 1
-    addr = 0
-    page_sending_delay = 0.050
+    # we split data on chunks and send them in pages. Do not forget about
+    # total offset.
+    pages = [(self.__offset + addr, data[addr:addr + PAGE_SIZE])
+             for addr in range(0, sz, PAGE_SIZE)]
+    window_size = 1
+    if self.__protocol_version >= WINDOWED_PROTOCOL_VERSION:
+      window_size = max(1, self.__window_size)
     try:
-      for size in chunks:
-        page = data[addr:addr + size]
-        done = float(i) / float(len(chunks))
-        sys.stdout.write("Downloading [{0:50s}] {1:.1f}%".format('#' * int(done * 50), done * 100))
-        sys.stdout.write("\r")
-        sys.stdout.flush()
-        # Do not forget about total offset
-        time.sleep(page_sending_delay)
-        self.__send_page(cogid, i, self.__offset + addr, page, size)
-        i += 1
-        addr += size
-      print
-      self.__send_page(cogid, i, MARKER, '', 0)
-    except UploadingError:
+      self.__send_pages(cogid, pages, window_size, progress)
+      if progress:
+        print # Escape from progress bar.
+      self.__send_packet(cogid, MARKER, "")
+      self.send_byte(chr(cogid))
+    except UploadingError, e:
+      if progress:
+        print
+      logger.error(str(e))
       return False
     finally:
       self.__offset += sz
     return True
 
-  def __send_page(self, cogid, seq_no, addr, buf, size):
-    """Send bytes that have to be stored to Hub RAM. Return True it
-    the data from was successfully transmitted (data LRC-checksum
-    should be equal to result LRC-checksum recevied from device).
+  def __send_pages(self, cogid, pages, window_size, progress=True):
+    """Sends `pages`, a list of ``(addr, data)`` tuples, to Hub RAM. Up to
+    `window_size` pages are sent before the bootloader acknowledges the first
+    of them. A page that the bootloader received corrupted (its LRC-checksum
+    doesn't match) is sent again. The progress bar is drawn if `progress` is
+    ``True``.
     """
-    logging.info('Sending packet #%d [COG=%d, ADDR=0x%08x, SIZE=%d]' \
-                   % (seq_no, cogid, addr, size))
-    # 4-bytes address: [COG_ID |    ADDR   ]
-    addr_hdr = (addr & 0xFFFFFF) | (cogid << 24)
-    logging.info("Sending header: 0x%08x 0x%08x"
-                 % (Long.reverse_bytes(addr_hdr), Long.reverse_bytes(size)))
-    self.stuff_and_send_long(Long.reverse_bytes(addr_hdr))
-    # Sending page 4 bytes size
-    self.stuff_and_send_long(Long.reverse_bytes(size))
-    # IF
-    if addr == MARKER:
-      self.send_byte(chr(cogid))
+    pending = collections.deque(pages)
+    # Pages waiting for acknowledgement by the low 16 bits of address
+    in_flight = collections.OrderedDict()
+    retries = collections.defaultdict(int)
+    done = 0
+    last_time = 0
+    while pending or in_flight:
+      while pending and len(in_flight) < window_size:
+        addr, page = pending.popleft()
+        self.__send_packet(cogid, addr, page)
+        in_flight[addr & 0xFFFF] = (addr, page)
+      ack_addr, lrc_checksum = self.__receive_ack(cogid)
+      if ack_addr is None:
+        ack_addr = next(iter(in_flight))
+      if ack_addr not in in_flight:
+        raise UploadingError("Unexpected acknowledgement of page 0x%04x" %
+                             ack_addr)
+      addr, page = in_flight.pop(ack_addr)
+      if lrc_checksum != get_lrc(page):
+        retries[addr] += 1
+        if retries[addr] > MAX_PAGE_RETRIES:
+          raise UploadingError("LRC-checksum of page 0x%08x didn't match" %
+                               addr)
+        logger.warning("LRC-checksum of page 0x%08x didn't match, send it "
+                       "again" % addr)
+        pending.appendleft((addr, page))
+        continue
+      done += 1
+      if not progress:
+        continue
+      if time.time() - last_time >= PROGRESS_INTERVAL or done == len(pages):
+        print_progress(float(done) / len(pages))
+        last_time = time.time()
+
+  def __send_packet(self, cogid, addr, page):
+    """Sends a packet that has to be stored to Hub RAM at `addr`: 4-bytes
+    address [COG_ID|ADDR], 4-bytes size and the page itself. The packet is
+    stuffed at once. The bootloader of version 1 requires delays between
+    pages and bytes.
+    """
+    logger.debug("Sending packet [COG=%d, ADDR=0x%08x, SIZE=%d]" %
+                 (cogid, addr, len(page)))
+    header = struct.pack("<II", (addr & 0xFFFFFF) | (cogid << 24), len(page))
+    packet = stuff(header + page)
+    if self.__protocol_version >= WINDOWED_PROTOCOL_VERSION:
+      self.send(packet)
       return
-    # LRC-checksum value (xor of each byte)
-    lrc_checksum = 0x00
-    # Start transmitting page bytes
-    i = 0
-    while i < size:
-      self.stuff_and_send_byte(buf[i], timeout=BYTE_DELAY)
-      # Calculate the XOR value for this byte
-      lrc_checksum = operator.xor(lrc_checksum, ord(buf[i]))
-      i += 1
-    # Wait for calculation LRC value
-    # Waiting for sync
-    logging.info("Waiting for sync...")
-    # Receive and verify first sync byte, should be 0xFF
-    ff = self.receive(1, None)
-    if not ff:
-      logging.error("Timeout while expecting for '0xFF' value.")
-      raise UploadingError()
-    elif not ord(ff) == 0xFF:
-      logging.error("PACKET#%d: expecting '0xFF' value as the first byte of "
-                    "sync signal, but received '%d'", seq_no, ord(ff))
-      raise UploadingError()
-    # Receive and verify second sync byte. Should be our COG id.
-    result_cog_id = self.receive(1) # timeout=None <== wait
-    if ord(result_cog_id) != cogid:
-      logging.error("Waiting for %d but received %d", cogid, ord(result_cog_id))
-      raise UploadingError()
-    # Receive and verify LRC value
-    logging.info("Waiting for result LRC checksum value... ")
-    result_lrc_checksum = ord(self.receive(1))
-    logging.info("Result LRC checksum value: %d", result_lrc_checksum)
-    # Compare our LRC value and result LRC value from device
-    logging.info("Verifying LRC-checksum: %d and %d" \
-                   % (lrc_checksum, result_lrc_checksum))
-    if not lrc_checksum == result_lrc_checksum:
-      logging.error("LRC-checksum didn't match.")
-      raise UploadingError()
+    time.sleep(PAGE_SENDING_DELAY)
+    for byte in packet:
+      self.send_byte(byte, timeout=BYTE_DELAY)
+
+  def __receive_stuffed_byte(self):
+    byte = self.receive(1)
+    if not byte:
+      raise UploadingError("Timeout while waiting for acknowledgement")
+    if byte == "\xff":
+      if self.receive(1) != "\x00":
+        raise UploadingError("Unexpected sync signal")
+    return ord(byte)
+
+  def __receive_ack(self, cogid):
+    """Receives acknowledgement of a page. Returns a tuple of the low 16 bits of
+    page address (``None`` for the bootloader of version 1) and LRC-checksum
+    of the received page.
+    """
+    sync = self.receive(2)
+    if sync != chr(0xFF) + chr(cogid):
+      raise UploadingError("Expecting sync signal of COG#%d, but received %r" %
+                           (cogid, sync))
+    addr = None
+    if self.__protocol_version >= WINDOWED_PROTOCOL_VERSION:
+      addr = self.__receive_stuffed_byte()
+      addr |= self.__receive_stuffed_byte() << 8
+    return addr, self.__receive_stuffed_byte()
 
 def ctrlc(sig, frame):
     raise KeyboardInterrupt("CTRL-C!")
@@ -520,7 +726,8 @@ signal.signal(signal.SIGINT, ctrlc)
 
 def multicog_spi_upload(cogid_to_filename_mapping, serial_port,
                         run=True, eeprom=False,
-                        force=False, bootloader_settle_delay=5):
+                        force=False, bootloader_settle_delay=5,
+                        window_size=DEFAULT_WINDOW_SIZE):
     """Start multicog upload, instanciate uploader
     :class:`MulticogSPIUploader` and connect to the target
     device. `cogid_to_filename_mapping` represents mapping of cog to
@@ -535,6 +742,9 @@ def multicog_spi_upload(cogid_to_filename_mapping, serial_port,
     You can set ``force`` as True, then uploader will try to continue
     uploading images until success.
 
+    The bootloader of protocol version 2 receives up to ``window_size`` pages
+    before it acknowledges the first of them.
+
     Note, the multicog bootloader has to be uploaded first before you
     will start transmitting images. See :func:`upload_bootloader`.
     """
@@ -552,7 +762,7 @@ def multicog_spi_upload(cogid_to_filename_mapping, serial_port,
     print "                                                        +----------------------+"
     # Create uploader instance and pass mapping of images
     ok = False
-    uploader = MulticogSPIUploader(port=serial_port)
+    uploader = MulticogSPIUploader(port=serial_port, window_size=window_size)
     while True:
         try:
             try:
@@ -608,7 +818,7 @@ def upload_bootloader(port="/dev/ttyUSB0", config=None, rebuild=False):
         spawn(["homespun", bootloader_src, "-b",
                "-L", "/usr/local/lib/catalina/target/",
                "-D", catalina_config,
-               "-o", bootloader_binary], verbose=True)
+               "-o", bootloader_binary], debug=True)
     # Fix binary name, since '.binary' will be added automatically
     #bootloader_binary += ".binary"
     uploader = SPIUploader(port=port)
@@ -0,0 +1,250 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import collections
+import itertools
+import os
+import pty
+import shutil
+import struct
+import tempfile
+import time
+import tty
+
+from bb.utils.testing import unittest
+from bb.utils import logging
+from bb.tools.loaders.propler import uploader
+from bb.tools.loaders.propler.bitwise_op import lfsr
+from bb.tools.loaders.propler.uploader import MulticogSPIUploader
+from bb.tools.loaders.propler.uploader import SPIUploader
+from bb.tools.loaders.propler.uploader import encode_long
+from bb.tools.loaders.propler.uploader import encode_longs
+from bb.tools.loaders.propler.uploader import get_handshake
+from bb.tools.loaders.propler.uploader import get_lrc
+from bb.tools.loaders.propler.uploader import stuff
+
+# Turn off logging
+logger = logging.get_logger("bb")
+logger.propagate = False
+
+def reference_encode_long(value):
+  result = []
+  for i in range(10):
+    result.append(chr(0x92 | (value & 0x01) | ((value & 2) << 2) |
+                      ((value & 4) << 4)))
+    value >>= 3
+  result.append(chr(0xf2 | (value & 0x01) | ((value & 2) << 2)))
+  return "".join(result)
+
+class FakeSerial(object):
+  """Records written data and replies with 0xFE (checksum OK)."""
+
+  port = "/dev/fake"
+  baudrate = 115200
+
+  def __init__(self):
+    self.writes = []
+
+  def write(self, data):
+    self.writes.append(str(data))
+    return len(data)
+
+  def read(self, n=1):
+    return chr(0xFE) * n
+
+class FakeMulticogBootloader(FakeSerial):
+  """Speaks the multicog bootloader protocol of the given `version`. The
+  acknowledgements of the pages whose addresses are listed in `corrupt` report
+  wrong LRC-checksum once.
+  """
+
+  def __init__(self, version=2, corrupt=()):
+    FakeSerial.__init__(self)
+    self.version = version
+    self.corrupt = set(corrupt)
+    self.output = ""
+    self.timeout = None
+    # Received pages by address, and the number of times each page was sent
+    self.pages = dict()
+    self.packets = collections.defaultdict(int)
+    self.parser = self.parse()
+    next(self.parser)
+
+  def write(self, data):
+    FakeSerial.write(self, data)
+    for byte in str(data):
+      self.parser.send(byte)
+    return len(data)
+
+  def read(self, n=1):
+    data, self.output = self.output[:n], self.output[n:]
+    return data
+
+  def parse(self):
+    """Consumes the written bytes one by one."""
+    cogid = None
+    images_left = None
+    while True:
+      # Wait for sync signal
+      byte = yield
+      if byte != "\xff":
+        continue
+      byte = yield
+      if byte == "\x00":
+        continue
+      if images_left is None:
+        images_left = ord(byte)
+        if self.version > 1:
+          self.output += "\xff\xfe" + chr(self.version)
+        continue
+      cogid = ord(byte)
+      while True:
+        # Receive a page
+        data = ""
+        size = 8
+        while len(data) < size:
+          byte = yield
+          if byte == "\xff" and (yield) != "\x00":
+            raise Exception("Unexpected sync signal")
+          data += byte
+          if len(data) == 8 and size == 8:
+            addr, size = struct.unpack("<II", data)
+            size += 8
+        addr &= 0xFFFFFF
+        if addr == uploader.MARKER:
+          break
+        page = data[8:]
+        self.pages[addr] = page
+        self.packets[addr] += 1
+        lrc = get_lrc(page)
+        if addr in self.corrupt:
+          self.corrupt.remove(addr)
+          lrc ^= 0x01
+        self.output += "\xff" + chr(cogid)
+        if self.version > 1:
+          self.output += stuff(struct.pack("<H", addr & 0xFFFF))
+        self.output += stuff(chr(lrc))
+
+def make_uploader(uploader_class, fake_serial, **kwargs):
+  class FakeSerialUploader(uploader_class):
+    serial = property(lambda self: fake_serial)
+  return FakeSerialUploader(port="/dev/fake", **kwargs)
+
+# A valid RAM image: the sum of its bytes and the initial stack frame is 0
+IMAGE = "\x14" + "\x00" * (uploader.WRITE_CHUNK_SIZE - 1)
+
+class UploaderTest(unittest.TestCase):
+
+  def test_encode_long(self):
+    for value in (0, 1, 2, 7, 0x12345678, 0x7fffffff, 0x80000000, 0xffffffff):
+      self.assert_equal(encode_long(value), reference_encode_long(value))
+
+  def test_encode_longs(self):
+    values = [0, 0xdeadbeef, 0xffffffff, 0x01020304]
+    data = struct.pack("<4I", *values)
+    self.assert_equal(str(encode_longs(data)),
+                      "".join([reference_encode_long(value)
+                               for value in values]))
+    self.assert_equal(encode_longs(bytearray(data)), encode_longs(data))
+    self.assert_raises(ValueError, encode_longs, "abc")
+
+  def test_upload_image(self):
+    loader = make_uploader(SPIUploader, FakeSerial())
+    self.assert_true(loader.upload_image(IMAGE, progress=False))
+    data = "".join(loader.serial.writes)
+    expected = "".join([reference_encode_long(value) for value in
+                        [1, len(IMAGE) // 4] +
+                        list(struct.unpack("<%dI" % (len(IMAGE) // 4), IMAGE))])
+    # The image is sent by a few large writes followed by the echo byte
+    self.assert_equal(data, expected + chr(0xF9))
+    self.assert_equal(len(loader.serial.writes),
+                      len(expected) // uploader.WRITE_CHUNK_SIZE + 2)
+
+  def test_upload_image_to_eeprom(self):
+    loader = make_uploader(SPIUploader, FakeSerial())
+    self.assert_true(loader.upload_image(IMAGE, eeprom=True, progress=False))
+    data = "".join(loader.serial.writes)
+    # Only the image is transmitted, not the whole EEPROM
+    self.assert_equal(data[:2 * uploader.ENCODED_LONG_SIZE],
+                      reference_encode_long(3) +
+                      reference_encode_long(len(IMAGE) // 4))
+    self.assert_equal(len(data), (len(IMAGE) // 4 + 2) *
+                      uploader.ENCODED_LONG_SIZE + 1)
+    self.assert_raises(uploader.UploadingError, loader.upload_image,
+                       IMAGE + "\x00" * (1 << 15), eeprom=True,
+                       progress=False)
+
+  def test_handshake(self):
+    seed = SPIUploader.LFSR_SEED
+    request, reply = get_handshake(seed, 250, 250)
+    bits = list(itertools.islice(lfsr(seed), 500))
+    self.assert_equal(request, "\xf9" +
+                      "".join([chr(0xFE | bit) for bit in bits[:250]]) +
+                      "\xf9" * 258)
+    self.assert_equal(reply, "".join([chr(0xFE | bit) for bit in bits[250:]]))
+    self.assert_true(get_handshake(seed, 250, 250)[0] is request)
+
+  def test_connect_without_chip(self):
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    try:
+      loader = SPIUploader(port=os.ttyname(slave), baudrate=115200,
+                           reset_pulse=0, reset_delay=0.01)
+      self.assert_equal(loader.get_reset_timings(), (0, 0.01))
+      start = time.time()
+      self.assert_false(loader.connect(attempts=2, retry_delay=0.01))
+      # One deadline for the whole reply of each attempt
+      self.assert_true(time.time() - start < 1.0)
+      loader.serial.close()
+    finally:
+      os.close(master)
+      os.close(slave)
+
+  def test_stuff(self):
+    self.assert_equal(stuff("a\xffb\xff"), "a\xff\x00b\xff\x00")
+    self.assert_equal(get_lrc("\x01\x02\x04"), 0x07)
+
+class MulticogUploaderTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.images = dict()
+    for cogid, size in ((1, 3 * uploader.PAGE_SIZE + 64), (2, 256)):
+      # Spin header: clock frequency and mode, the rest is fixed by uploader
+      image = struct.pack("<IBB", 80000000, 0x6F, 0) + "\x00" * 10
+      image += "".join([chr((i * 7 + cogid) & 0xff)
+                        for i in range(size - len(image))])
+      path = os.path.join(self.tmpdir, "cog%d.binary" % cogid)
+      with open(path, "wb") as fh:
+        fh.write(image)
+      self.images[cogid] = (path, image)
+
+  def teardown(self):
+    shutil.rmtree(self.tmpdir)
+
+  def upload(self, bootloader, **kwargs):
+    loader = make_uploader(MulticogSPIUploader, bootloader, **kwargs)
+    loader.upload(dict([(cogid, path) for cogid, (path, _)
+                        in self.images.items()]), progress=False)
+    self.assert_equal(loader.get_protocol_version(), bootloader.version)
+    # The images are placed one after another. Spin header (first 16 bytes) is
+    # fixed by the uploader.
+    received = "".join([bootloader.pages[addr]
+                        for addr in sorted(bootloader.pages)])
+    image1, image2 = self.images[1][1], self.images[2][1]
+    self.assert_equal(len(received), len(image1) + len(image2))
+    self.assert_equal(received[16:len(image1)], image1[16:])
+    self.assert_equal(received[len(image1) + 16:], image2[16:])
+
+  def test_windowed_upload(self):
+    bootloader = FakeMulticogBootloader(corrupt=[uploader.PAGE_SIZE])
+    self.upload(bootloader, window_size=3)
+    self.assert_equal(bootloader.packets[uploader.PAGE_SIZE], 2)
+    self.assert_equal(sum(bootloader.packets.values()), 6)
+
+  def test_lockstep_upload(self):
+    bootloader = FakeMulticogBootloader(version=1, corrupt=[0])
+    self.upload(bootloader)
+    self.assert_equal(bootloader.packets[0], 2)
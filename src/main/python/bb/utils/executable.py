@@ -31,7 +31,8 @@ import types
 
 from bb.utils.containers import DictWrapper
 from bb.utils import typecheck
-from bb.utils import spawn
+from bb.utils import probe_cache
+from bb.utils import process
 from bb.utils import path_utils
 
 param_handlers_cache = {}
@@ -214,15 +215,18 @@ class ExecutableWrapper(object):
     """Checks executable. All of them has to exist. Print warning if some
     executable was specified but not defined.
     """
-    if not self._executable or not spawn.which(self._executable):
+    if not self._executable or not probe_cache.which(self._executable):
       return False
     return True
 
-  def run(self, dry_run=False):
+  def run(self, dry_run=False, output=None, timeout=None):
+    """Runs the executable with the options and returns
+    :class:`bb.utils.process.ProcessResult`. See :func:`bb.utils.process.run`.
+    """
     dry_run = self.is_dry_run_mode_enabled() or dry_run
     exe = self.get_executable()
     try:
-      spawn.spawn([exe] + self.get_options(),
-                  debug=self.get_verbosity_level(), dry_run=dry_run)
-    except spawn.ExecutionError, msg:
+      return process.run([exe] + self.get_options(), output=output,
+                         timeout=timeout, dry_run=dry_run)
+    except process.ExecutionError, msg:
       raise Exception(msg)
@@ -15,6 +15,7 @@
 #
 # Author: Oleksandr Sviridenko
 
+import errno
 import inspect
 import os
 from os.path import *
@@ -121,6 +122,8 @@ def mkpath(name, mode=0777, verbose=0, dry_run=False):
         os.mkdir(head)
         created_dirs.append(head)
       except OSError, exc:
-        raise OSError("could not create '%s': %s" % (head, exc[-1]))
+        # The directory may be created meanwhile by a concurrent build worker
+        if exc.errno != errno.EEXIST or not isdir(head):
+          raise OSError("could not create '%s': %s" % (head, exc[-1]))
     _path_created[abs_head] = 1
   return created_dirs
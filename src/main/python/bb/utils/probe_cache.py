@@ -0,0 +1,173 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Probe cache remembers what has been learned about the toolchains installed
+on this machine: where the executables are located and what they report about
+themselves (version, supported memory models, default include directories,
+etc.). The cache is shared by the whole process and saved to
+``~/.bbprobes``, so every compiler object and every build can reuse it::
+
+  path = probe_cache.which("propeller-elf-gcc")
+  version = probe_cache.probe("propeller-elf-gcc", "version", get_version)
+
+Each probe result is bound to size and modification time of the executable,
+so the probes are repeated once the toolchain has been reinstalled. The
+location of an executable found in ``$PATH`` is trusted while the executable
+exists.
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+from bb.utils import logging
+from bb.utils import spawn
+
+logger = logging.get_logger("bb")
+
+DEFAULT_PATH = os.path.join("~", ".bbprobes")
+
+def get_stamp(path):
+  """Returns ``[size, mtime]`` of the file `path` or ``None`` if the file
+  doesn't exist.
+  """
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return [stat.st_size, stat.st_mtime]
+
+class ProbeCache(object):
+  """Cache of the probes, saved to JSON file `path`. Thread-safe."""
+
+  def __init__(self, path=DEFAULT_PATH):
+    self._path = os.path.abspath(os.path.expanduser(path))
+    self._locations = None
+    self._probes = None
+    self._lock = threading.RLock()
+
+  def get_path(self):
+    return self._path
+
+  def _load(self, reload=False):
+    """Loads the cache from file. The file is read again on `reload`, since
+    the probes could be done by other processes, e.g. the children of the
+    build server.
+    """
+    if self._probes is not None and not reload:
+      return
+    self._locations = dict()
+    self._probes = dict()
+    try:
+      with open(self._path) as fh:
+        data = json.load(fh)
+      self._locations = data["locations"]
+      self._probes = data["probes"]
+    except (IOError, ValueError, KeyError, TypeError):
+      pass
+
+  def _save(self):
+    data = {"locations": self._locations, "probes": self._probes}
+    dirname = os.path.dirname(self._path)
+    try:
+      fd, tmp_path = tempfile.mkstemp(dir=dirname)
+      with os.fdopen(fd, "w") as fh:
+        json.dump(data, fh)
+      os.rename(tmp_path, self._path)
+    except (IOError, OSError), e:
+      logger.debug("Cannot save probe cache %s: %s" % (self._path, e))
+
+  def which(self, program):
+    """Returns path to executable `program` as :func:`bb.utils.spawn.which`
+    does, or ``None`` if the program cannot be found.
+    """
+    key = "%s\0%s" % (os.environ.get("PATH", ""), program)
+    with self._lock:
+      for reload in (False, True):
+        self._load(reload)
+        path = self._locations.get(key)
+        if path and os.access(path, os.X_OK):
+          return path
+      path = spawn.which(program)
+      if path:
+        path = os.path.abspath(path)
+        self._locations[key] = path
+        self._save()
+      return path
+
+  def probe(self, program, name, func):
+    """Returns the result of probe `name` of the executable `program`. The
+    probe is done by calling ``func(path)`` with path to the executable, only
+    if the executable has been changed since the last call. The result has to
+    be JSON-serializable. Returns ``None`` if the executable cannot be found.
+    """
+    path = self.which(program)
+    if not path:
+      return None
+    stamp = get_stamp(path)
+    with self._lock:
+      for reload in (False, True):
+        self._load(reload)
+        entry = self._probes.get(path)
+        if entry and entry["stamp"] == stamp and name in entry["results"]:
+          return entry["results"][name]
+    logger.debug("Probe %s of %s" % (name, path))
+    result = func(path)
+    with self._lock:
+      entry = self._probes.get(path)
+      if not entry or entry["stamp"] != stamp:
+        entry = self._probes[path] = {"stamp": stamp, "results": dict()}
+      entry["results"][name] = result
+      self._save()
+    return result
+
+  def clear(self):
+    with self._lock:
+      self._locations = dict()
+      self._probes = dict()
+      self._save()
+
+_probe_cache = None
+_probe_cache_lock = threading.Lock()
+
+def get_probe_cache():
+  """Returns the probe cache shared by the process."""
+  global _probe_cache
+  with _probe_cache_lock:
+    if not _probe_cache:
+      _probe_cache = ProbeCache()
+    return _probe_cache
+
+def set_probe_cache(cache):
+  """Replaces the probe cache shared by the process, e.g. to keep the probes
+  of tests away from the user's cache. The default cache is used again if
+  `cache` is ``None``.
+  """
+  global _probe_cache
+  with _probe_cache_lock:
+    _probe_cache = cache
+
+def which(program):
+  """See :func:`ProbeCache.which`."""
+  return get_probe_cache().which(program)
+
+def probe(program, name, func):
+  """See :func:`ProbeCache.probe`."""
+  return get_probe_cache().probe(program, name, func)
@@ -0,0 +1,64 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.utils.probe_cache import ProbeCache
+
+class ProbeCacheTest(unittest.TestCase):
+
+  def setup(self):
+    self.tmpdir = tempfile.mkdtemp()
+    self.bindir = os.path.join(self.tmpdir, "bin")
+    os.mkdir(self.bindir)
+    self.gcc = os.path.join(self.bindir, "propeller-elf-gcc")
+    with open(self.gcc, "w") as fh:
+      fh.write("#!/bin/sh\necho 4.6.1\n")
+    os.chmod(self.gcc, 0755)
+    self.saved_path = os.environ["PATH"]
+    os.environ["PATH"] = os.pathsep.join([self.bindir, self.saved_path])
+    self.cache_path = os.path.join(self.tmpdir, "probes")
+    self.probes = []
+
+  def teardown(self):
+    os.environ["PATH"] = self.saved_path
+    shutil.rmtree(self.tmpdir)
+
+  def get_version(self, path):
+    self.probes.append(path)
+    return "4.6.1"
+
+  def test_which(self):
+    cache = ProbeCache(self.cache_path)
+    self.assert_equal(cache.which("propeller-elf-gcc"), self.gcc)
+    self.assert_is_none(cache.which("nonexistent-gcc"))
+    os.remove(self.gcc)
+    self.assert_is_none(ProbeCache(self.cache_path).which("propeller-elf-gcc"))
+
+  def test_probe(self):
+    cache = ProbeCache(self.cache_path)
+    for _ in range(2):
+      self.assert_equal(cache.probe("propeller-elf-gcc", "version",
+                                    self.get_version), "4.6.1")
+    self.assert_equal(self.probes, [self.gcc])
+    self.assert_is_none(cache.probe("nonexistent-gcc", "version",
+                                    self.get_version))
+    # The probes are shared through the file
+    self.assert_equal(ProbeCache(self.cache_path).probe(
+        "propeller-elf-gcc", "version", self.get_version), "4.6.1")
+    self.assert_equal(self.probes, [self.gcc])
+
+  def test_probe_is_invalidated_by_mtime(self):
+    cache = ProbeCache(self.cache_path)
+    cache.probe("propeller-elf-gcc", "version", self.get_version)
+    os.utime(self.gcc, (0, 0))
+    cache.probe("propeller-elf-gcc", "version", self.get_version)
+    self.assert_equal(self.probes, [self.gcc, self.gcc])
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,364 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Process runner. Starts programs in child processes, streams their output
+without blocking and collects resource usage of every child::
+
+  result = process.run(["propeller-elf-gcc", "-c", "main.c"], timeout=60)
+  print(result.wall_time, result.user_time, result.max_rss)
+
+Many children can be in flight at once; their output is multiplexed with
+:func:`select.select` by :func:`wait_all`::
+
+  processes = [process.Process(cmd, output=fh).start() for cmd in cmds]
+  for result in process.wait_all(processes):
+    result.check()
+
+Children are reaped with :func:`os.wait4`, so the runner knows CPU time and
+peak memory usage of each of them.
+"""
+
+import errno
+import fcntl
+import os
+import select
+import signal
+import sys
+import threading
+import time
+import types
+
+from bb.utils import logging
+
+logger = logging.get_logger("bb")
+
+BUFFER_SIZE = 4096
+# Max time between checks of the children that don't send output to the
+# runner, in seconds
+POLL_INTERVAL = 0.05
+
+class ExecutionError(Exception):
+  """Execution error."""
+
+class TimeoutError(ExecutionError):
+  """The program didn't finish in time and was killed."""
+
+# Functions called with ProcessResult of each finished process
+_observers = []
+
+def add_observer(func):
+  """Adds function that will be called with :class:`ProcessResult` of every
+  finished process, e.g. to profile the build.
+  """
+  _observers.append(func)
+
+def remove_observer(func):
+  _observers.remove(func)
+
+# Pipes have to be created and marked close-on-exec atomically with respect to
+# forks made by the other threads, otherwise their children would inherit
+# write ends of the pipes and the runner would never see EOF.
+_fork_lock = threading.Lock()
+
+def _set_cloexec(fd):
+  flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+  fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+
+def _set_nonblocking(fd):
+  flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+  fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+def _retry_on_eintr(func, *args):
+  while True:
+    try:
+      return func(*args)
+    except (OSError, select.error), e:
+      if e.args[0] != errno.EINTR:
+        raise
+
+class ProcessResult(object):
+  """Result of the finished process: exit code, output (if captured) and
+  resource usage. Times are in seconds, `max_rss` is in kilobytes.
+  """
+
+  def __init__(self, cmd, pid, status, start_time, end_time, rusage,
+               output=None, timed_out=False):
+    self.cmd = cmd
+    self.pid = pid
+    self.status = status
+    self.start_time = start_time
+    self.end_time = end_time
+    self.wall_time = end_time - start_time
+    self.user_time = rusage.ru_utime
+    self.system_time = rusage.ru_stime
+    self.max_rss = rusage.ru_maxrss
+    self.output = output
+    self.timed_out = timed_out
+
+  def get_cpu_time(self):
+    return self.user_time + self.system_time
+
+  def get_exit_code(self):
+    """Returns exit code of the program or ``None`` if it was terminated by a
+    signal.
+    """
+    if os.WIFEXITED(self.status):
+      return os.WEXITSTATUS(self.status)
+    return None
+
+  def is_successful(self):
+    return self.get_exit_code() == 0
+
+  def check(self):
+    """Raises :class:`ExecutionError` if the program didn't succeed."""
+    if self.timed_out:
+      raise TimeoutError("Command '%s' timed out after %.1f seconds"
+                         % (self.cmd[0], self.wall_time))
+    if os.WIFSIGNALED(self.status):
+      raise ExecutionError("Command '%s' terminated by signal %d"
+                           % (self.cmd[0], os.WTERMSIG(self.status)))
+    if self.get_exit_code():
+      raise ExecutionError("Command '%s' failed with exit status %d"
+                           % (self.cmd[0], self.get_exit_code()))
+    return self
+
+class Process(object):
+  """Program `cmd` running in a child process.
+
+  If `output` file-like object is provided, or `capture_output` is ``True``,
+  the standard output and error of the program are sent to the runner through
+  a pipe, written to `output` as they come and, with `capture_output`, kept in
+  the result. Otherwise the child shares standard output and error of the
+  runner. `timeout` is in
+  seconds; once it expires, the program will be killed.
+  """
+
+  def __init__(self, cmd, search_path=True, output=None, capture_output=False,
+               timeout=None, cwd=None, env=None):
+    if not type(cmd) is types.ListType:
+      raise TypeError("'cmd' must be a list")
+    self._cmd = [str(arg) for arg in cmd]
+    self._search_path = search_path
+    self._output = output
+    self._capture_output = capture_output
+    self._timeout = timeout
+    self._cwd = cwd
+    self._env = env
+    self._pid = None
+    self._fd = None
+    self._chunks = []
+    self._start_time = None
+    self._deadline = None
+    self._timed_out = False
+    self._result = None
+
+  def __str__(self):
+    return " ".join(self._cmd)
+
+  def get_cmd(self):
+    return self._cmd
+
+  def get_pid(self):
+    return self._pid
+
+  def get_result(self):
+    """Returns :class:`ProcessResult` or ``None`` if the process is still
+    running.
+    """
+    return self._result
+
+  def fileno(self):
+    """Returns descriptor of the output pipe, or ``None`` if the output isn't
+    redirected to the runner or the pipe is already closed.
+    """
+    return self._fd
+
+  def start(self):
+    if self._pid:
+      raise ExecutionError("Process has been already started: %s" % self)
+    use_pipe = self._output is not None or self._capture_output
+    with _fork_lock:
+      if use_pipe:
+        read_fd, write_fd = os.pipe()
+        _set_cloexec(read_fd)
+        _set_cloexec(write_fd)
+      self._start_time = time.time()
+      pid = os.fork()
+      if not pid: # in a new child
+        self._exec_child(use_pipe and write_fd)
+    self._pid = pid
+    if self._timeout is not None:
+      self._deadline = self._start_time + self._timeout
+    if use_pipe:
+      os.close(write_fd)
+      _set_nonblocking(read_fd)
+      self._fd = read_fd
+    return self
+
+  def _exec_child(self, write_fd):
+    try:
+      if write_fd:
+        os.dup2(write_fd, 1)
+        os.dup2(write_fd, 2)
+      if self._cwd:
+        os.chdir(self._cwd)
+      if self._env is not None:
+        exec_fn = self._search_path and os.execvpe or os.execve
+        exec_fn(self._cmd[0], self._cmd, self._env)
+      else:
+        exec_fn = self._search_path and os.execvp or os.execv
+        exec_fn(self._cmd[0], self._cmd)
+    except OSError, e:
+      os.write(2, "unable to execute %s: %s\n" % (self._cmd[0], e.strerror))
+    finally:
+      os._exit(127)
+
+  def _read(self):
+    """Reads the output available in the pipe."""
+    try:
+      data = os.read(self._fd, BUFFER_SIZE)
+    except OSError, e:
+      if e.errno in (errno.EAGAIN, errno.EINTR):
+        return
+      raise
+    if not data:
+      os.close(self._fd)
+      self._fd = None
+      return
+    if self._output is not None:
+      self._output.write(data)
+      self._output.flush()
+    if self._capture_output:
+      self._chunks.append(data)
+
+  def _reap(self, block=False):
+    """Collects exit status of the child once its output has been read.
+    Returns ``True`` if the process has finished.
+    """
+    if self._result:
+      return True
+    if self._fd is not None:
+      return False
+    options = 0 if block else os.WNOHANG
+    pid, status, rusage = _retry_on_eintr(os.wait4, self._pid, options)
+    if not pid:
+      return False
+    output = "".join(self._chunks) if self._capture_output else None
+    self._result = ProcessResult(self._cmd, self._pid, status, self._start_time,
+                                 time.time(), rusage, output, self._timed_out)
+    self._chunks = []
+    for observer in list(_observers):
+      observer(self._result)
+    return True
+
+  def _check_deadline(self, now):
+    """Kills the process if its deadline has been passed. Returns the time left
+    or ``None`` if there is no deadline.
+    """
+    if self._deadline is None or self._result:
+      return None
+    if self._timed_out:
+      return None
+    if now >= self._deadline:
+      logger.debug("Kill %s: timed out" % self)
+      self.kill(signal.SIGKILL)
+      self._timed_out = True
+      # Don't wait for the output from the children of the program
+      if self._fd is not None:
+        os.close(self._fd)
+        self._fd = None
+      return None
+    return self._deadline - now
+
+  def kill(self, sig=signal.SIGTERM):
+    if self._pid and not self._result:
+      try:
+        os.kill(self._pid, sig)
+      except OSError, e:
+        if e.errno != errno.ESRCH:
+          raise
+
+  def wait(self):
+    """Waits for the process to finish and returns :class:`ProcessResult`."""
+    return wait_all([self])[0]
+
+def wait_any(processes, timeout=None):
+  """Waits until at least one of the processes has finished, or `timeout`
+  seconds. Handles the output of all of them meanwhile. Returns a list of
+  finished processes.
+  """
+  end_time = timeout is not None and time.time() + timeout
+  poll_interval = 0.001
+  while True:
+    finished = [p for p in processes if p._reap()]
+    if finished:
+      return finished
+    now = time.time()
+    if end_time is not False and now >= end_time:
+      return []
+    # Choose how long to wait for the output
+    waits = [p._check_deadline(now) for p in processes]
+    waits = [wait for wait in waits if wait is not None]
+    if end_time is not False:
+      waits.append(end_time - now)
+    fds = [p.fileno() for p in processes if p.fileno() is not None]
+    silent = [p for p in processes if p.fileno() is None]
+    if len(silent) == 1 and not fds and not waits:
+      # The only thing to do is to wait for this process
+      silent[0]._reap(block=True)
+      continue
+    if silent:
+      waits.append(poll_interval)
+      poll_interval = min(poll_interval * 2, POLL_INTERVAL)
+    wait = min(waits) if waits else None
+    if not fds:
+      time.sleep(wait)
+      continue
+    readable, _, _ = _retry_on_eintr(select.select, fds, [], [], wait)
+    for p in processes:
+      if p.fileno() in readable:
+        p._read()
+
+def wait_all(processes):
+  """Waits for all the processes to finish and returns a list of their
+  :class:`ProcessResult` in the same order.
+  """
+  pending = list(processes)
+  while pending:
+    for p in wait_any(pending):
+      pending.remove(p)
+  return [p.get_result() for p in processes]
+
+def run(cmd, search_path=True, output=None, capture_output=False, timeout=None,
+        cwd=None, env=None, dry_run=False):
+  """Runs program `cmd`, waits for it and returns :class:`ProcessResult`, or
+  ``None`` in dry run mode. Raises :class:`ExecutionError` if the program
+  failed. See :class:`Process` for the description of the arguments.
+  """
+  process = Process(cmd, search_path=search_path, output=output,
+                    capture_output=capture_output, timeout=timeout, cwd=cwd,
+                    env=env)
+  logger.debug(str(process))
+  if dry_run:
+    return None
+  result = process.start().wait()
+  logger.debug("%s: %.3fs wall, %.3fs cpu, %d KB max RSS" %
+               (process.get_cmd()[0], result.wall_time,
+                result.get_cpu_time(), result.max_rss))
+  return result.check()
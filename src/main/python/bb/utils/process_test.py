@@ -0,0 +1,49 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import StringIO
+import time
+
+from bb.utils.testing import unittest
+from bb.utils import process
+
+class ProcessTest(unittest.TestCase):
+
+  def test_run(self):
+    output = StringIO.StringIO()
+    result = process.run(["sh", "-c", "echo out; echo err >&2"], output=output,
+                         capture_output=True)
+    self.assert_equal(result.get_exit_code(), 0)
+    self.assert_equal(sorted(output.getvalue().split()), ["err", "out"])
+    self.assert_equal(result.output, output.getvalue())
+    self.assert_true(result.wall_time >= 0)
+    self.assert_true(result.max_rss > 0)
+
+  def test_failure(self):
+    self.assert_raises(process.ExecutionError, process.run, ["false"])
+    self.assert_raises(process.ExecutionError, process.run,
+                       ["/nonexistent/program"], capture_output=True)
+
+  def test_timeout(self):
+    start = time.time()
+    self.assert_raises(process.TimeoutError, process.run, ["sleep", "10"],
+                       timeout=0.2)
+    self.assert_true(time.time() - start < 5)
+
+  def test_many_processes(self):
+    # The output larger than pipe buffer must not block the children
+    cmd = ["sh", "-c", "head -c 200000 /dev/zero; sleep 0.1"]
+    processes = [process.Process(cmd, capture_output=True).start()
+                 for _ in range(4)]
+    processes.append(process.Process(["sleep", "0.1"]).start())
+    start = time.time()
+    results = process.wait_all(processes)
+    self.assert_true(time.time() - start < 1.0)
+    self.assert_true(all([result.is_successful() for result in results]))
+    self.assert_equal([len(result.output) for result in results[:4]],
+                      [200000] * 4)
+
+if __name__ == "__main__":
+  unittest.main()
@@ -17,20 +17,19 @@
 #
 # Author: Oleksandr Sviridenko
 
+"""Compatibility layer on top of :mod:`bb.utils.process`."""
+
 import os
-import sys
-import types
 
 from bb.utils import logging
+from bb.utils import process
+from bb.utils.process import ExecutionError
 
 logger = logging.get_logger("bb")
 
 class PlatformError(Exception):
   """Platform error."""
 
-class ExecutionError(Exception):
-  """Execution error."""
-
 def which(program):
   def is_exe(fpath):
     return os.path.exists(fpath) and os.access(fpath, os.X_OK)
@@ -45,7 +44,8 @@ def which(program):
         return exe_file
   return None
 
-def spawn(cmd, search_path=True, debug=False, dry_run=False):
+def spawn(cmd, search_path=True, debug=False, dry_run=False, output=None,
+          timeout=None):
   """Run another program, specified as a command list `cmd`, in a new
   process. `cmd` is just the argument list for the new process, ie. ``cmd[0]``
   is the program to run and ``cmd[1:]`` are the rest of its arguments. There is
@@ -54,77 +54,16 @@ def spawn(cmd, search_path=True, debug=False, dry_run=False):
   If `search_path` is true (the default), the system's executable search path
   will be used to find the program; otherwise, cmd[0] must be the exact path to
   the executable. If 'dry_run' is true, the command will not actually be run.
+  If `output` file object is provided, the standard output and error of the
+  program will be redirected to it. The program will be killed if it doesn't
+  finish in `timeout` seconds. The command line is always logged at debug
+  level, `debug` is kept for compatibility.
 
-  Raise :class:`ExecutionError` if running the program fails in any way; just
-  return on success.
+  Raise :class:`ExecutionError` if running the program fails in any way; return
+  :class:`bb.utils.process.ProcessResult` on success.
   """
-  debug = False
-  if not type(cmd) is types.ListType:
-    raise types.TypeError("'cmd' must be a list")
-  for i in range(len(cmd)):
-    if not type(cmd[i]) is types.StringType:
-      cmd[i] = str(cmd[i])
-  if debug:
-    logger.debug(" ".join(cmd))
-  if dry_run:
-    return
-  if os.name == "posix":
-    _spawn_posix(cmd, search_path, debug)
-  else:
+  if os.name != "posix":
     raise PlatformError("Don't know how to spawn programs on platform '%s'" %
                         os.name)
-
-# TODO: replace _std*_fd with sys.std*.fileno()
-_stdin_fd = sys.stdin.fileno()
-_stdout_fd = sys.stdout.fileno()
-_stderr_fd = sys.stderr.fileno()
-
-def _spawn_posix(cmd, search_path=True, debug=False):
-  exec_fn = search_path and os.execvp or os.execcv
-  if not debug:
-    child_stdin, parent_stdout = os.pipe()
-    parent_stdin, child_stdout = os.pipe()
-    (_, child_stderr) = os.pipe()
-  pid = os.fork()
-  if not pid: # in a new child
-    # Redirect STDIN, STDOUT and STDERR
-    if not debug:
-      #os.dup2(child_stdin , _stdin_fd)
-      #os.dup2(child_stdout, _stdout_fd)
-      #os.dup2(child_stderr, _stderr_fd)
-      pass
-    try:
-      exec_fn(cmd[0], cmd)
-    except OSError, e:
-      sys.stderr.write("unable to execute %s: %s\n" % (cmd[0],e.strerror))
-      os._exit(1)
-  else: # inside the parent
-        # Loop until the child either exits or is terminated by a signal
-        # (ie. keep waiting if it's merely stopped)
-    while 1:
-      try:
-        (pid, status) = os.waitpid(pid, 0)
-      except OSError, exc:
-        import errno
-        if exc.errno == errno.EINTR:
-          continue
-        raise ExecutionError("Command '%s' failed: %s" % (cmd[0], exc[-1]))
-      if os.WIFSIGNALED(status):
-        raise ExecutionError("Command '%s' terminated by signal %d"
-                             % (cmd[0], os.WTERMSIG(status)))
-      elif os.WIFEXITED(status):
-        exit_status = os.WEXITSTATUS(status)
-        if exit_status == 0:
-          return # hey, it succeeded!
-        else:
-          raise ExecutionError("Command '%s' failed with exit status %d"
-                               % (cmd[0], exit_status))
-      elif os.WIFSTOPPED(status):
-        continue
-      else:
-        raise ExecutionError("Unknown error executing %s: termination status %d"
-                             % (cmd[0], status))
-      if not debug:
-        os.close(child_stdin)
-        os.close(child_stdout)
-        os.close(child_stderr)
+  return process.run(cmd, search_path=search_path, output=output,
+                     timeout=timeout, dry_run=dry_run)
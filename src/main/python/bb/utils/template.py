@@ -0,0 +1,300 @@
+# -*- coding: utf-8; -*-
+#
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Author: Oleksandr Sviridenko
+
+"""Lightweight template engine for code generation. It supports the subset of
+Django template language used by BBOS templates:
+
+* ``{{ var }}`` and ``{{ var.attr.method }}``, where each part is looked up as
+  a dict key, an attribute or a list index, and callables are called;
+* ``{% for x in seq %}``, ``{% for x, y in seq reversed %}`` with ``{% empty
+  %}`` and the ``forloop`` variable (``counter``, ``counter0``,
+  ``revcounter``, ``revcounter0``, ``first``, ``last``, ``parentloop``);
+* ``{% if %}``, ``{% elif %}``, ``{% else %}`` with ``not``, ``and`` and
+  ``or``;
+* ``{# comments #}``.
+
+As in Django, variables that cannot be resolved are rendered as empty strings.
+Unlike Django, the output is not HTML-escaped, since it's C code.
+
+Each template is compiled once into a Python function. Use :func:`load` to
+get a template from file; the compiled templates are cached per process::
+
+  template = template.load("config_autogen.h.in")
+  output = template.render({"threads": threads})
+"""
+
+import os
+import re
+import threading
+
+class TemplateSyntaxError(Exception):
+  """Template syntax error."""
+
+_TOKEN_RE = re.compile(r"(\{\{.*?\}\}|\{%.*?%\}|\{#.*?#\})")
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_VAR_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z0-9_]+)*$")
+_IF_OPERATORS = ("not", "and", "or")
+
+_MISSING = object()
+
+def _lookup(obj, bit):
+  """Looks up `bit` in `obj` the same way Django does: as a dict key, an
+  attribute and a list index.
+  """
+  try:
+    return obj[bit]
+  except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+    pass
+  try:
+    return getattr(obj, bit)
+  except (TypeError, AttributeError):
+    pass
+  try:
+    return obj[int(bit)]
+  except (IndexError, ValueError, KeyError, TypeError):
+    pass
+  return _MISSING
+
+def _call(value):
+  if callable(value):
+    try:
+      return value()
+    except TypeError:
+      # The callable requires arguments
+      return _MISSING
+  return value
+
+def _resolve(value, path):
+  value = _call(value)
+  for bit in path:
+    if value is _MISSING:
+      break
+    value = _call(_lookup(value, bit))
+  if value is _MISSING:
+    return ""
+  return value
+
+def _resolve_name(context, name, path):
+  return _resolve(context.get(name, _MISSING), path)
+
+def _iterate(value):
+  if not value:
+    return []
+  return list(value)
+
+def _to_unicode(value):
+  if isinstance(value, unicode):
+    return value
+  if isinstance(value, str):
+    return value.decode("utf-8")
+  return unicode(value)
+
+class _Compiler(object):
+  """Translates template source into the source of Python function
+  ``render(context)``.
+  """
+
+  def __init__(self, source, name):
+    if isinstance(source, str):
+      source = source.decode("utf-8")
+    self._tokens = _TOKEN_RE.split(source)
+    self._name = name
+    self._pos = 0
+    self._lines = []
+    self._indent = 1
+    self._num_loops = 0
+    # Maps variable names to the names of local variables of the render
+    # function, e.g. loop variables and forloop.
+    self._scopes = [dict()]
+
+  def _error(self, message):
+    raise TemplateSyntaxError("%s: %s" % (self._name, message))
+
+  def _emit(self, line):
+    self._lines.append("  " * self._indent + line)
+
+  def _gen_var(self, expr):
+    if not _VAR_RE.match(expr):
+      self._error("unsupported expression '%s'" % expr)
+    bits = expr.split(".")
+    name, path = bits[0], tuple(bits[1:])
+    local = self._scopes[-1].get(name)
+    if local:
+      return "_resolve(%s, %r)" % (local, path)
+    return "_resolve_name(context, %r, %r)" % (name, path)
+
+  def _gen_condition(self, expr):
+    parts = []
+    for word in expr.split():
+      if word in _IF_OPERATORS:
+        parts.append(word)
+      else:
+        parts.append(self._gen_var(word))
+    if not parts:
+      self._error("'if' requires a condition")
+    return " ".join(parts)
+
+  def compile(self):
+    end = self._compile_block(())
+    if end:
+      self._error("unexpected '%s'" % end)
+    header = ["def render(context):",
+              "  _output = []",
+              "  _write = _output.append"]
+    footer = ["  return u''.join(_output)"]
+    return "\n".join(header + self._lines + footer) + "\n"
+
+  def _compile_block(self, terminators):
+    """Compiles tokens until one of `terminators` tags. Returns the tag that
+    terminated the block or ``None`` at the end of the template.
+    """
+    while self._pos < len(self._tokens):
+      token = self._tokens[self._pos]
+      self._pos += 1
+      if token.startswith("{{") and token.endswith("}}"):
+        expr = token[2:-2].strip()
+        if "|" in expr:
+          self._error("filters are not supported: %s" % token)
+        self._emit("_write(_to_unicode(%s))" % self._gen_var(expr))
+      elif token.startswith("{%") and token.endswith("%}"):
+        tag = token[2:-2].strip()
+        keyword = tag.split(None, 1)[0] if tag else ""
+        if keyword in terminators:
+          return tag
+        elif keyword == "for":
+          self._compile_for(tag)
+        elif keyword == "if":
+          self._compile_if(tag)
+        else:
+          self._error("unexpected tag '%s'" % token)
+      elif token.startswith("{#") and token.endswith("#}"):
+        continue
+      elif token:
+        self._emit("_write(%r)" % token)
+    if terminators:
+      self._error("missing '%s'" % "' or '".join(terminators))
+    return None
+
+  def _compile_for(self, tag):
+    match = re.match(r"^for\s+(.+?)\s+in\s+(\S+)(\s+reversed)?$", tag)
+    if not match:
+      self._error("malformed tag '%s'" % tag)
+    names = [name.strip() for name in match.group(1).split(",")]
+    if not all([_NAME_RE.match(name) for name in names]):
+      self._error("malformed tag '%s'" % tag)
+    self._num_loops += 1
+    n = self._num_loops
+    seq, loop = "_seq%d" % n, "_loop%d" % n
+    parent_loop = self._scopes[-1].get("forloop", "{}")
+    self._emit("%s = _iterate(%s)" % (seq, self._gen_var(match.group(2))))
+    if match.group(3):
+      self._emit("%s.reverse()" % seq)
+    self._emit("%s = {'parentloop': %s}" % (loop, parent_loop))
+    item_locals = ["_item%d_%d" % (n, i) for i in range(len(names))]
+    if len(names) == 1:
+      target = item_locals[0]
+    else:
+      target = "(%s)" % ", ".join(item_locals)
+    self._emit("for _i%d, %s in enumerate(%s):" % (n, target, seq))
+    self._indent += 1
+    self._emit("%s.update(counter0=_i%d, counter=_i%d + 1, "
+               "revcounter=len(%s) - _i%d, revcounter0=len(%s) - _i%d - 1, "
+               "first=_i%d == 0, last=_i%d == len(%s) - 1)"
+               % (loop, n, n, seq, n, seq, n, n, n, seq))
+    scope = dict(self._scopes[-1])
+    scope.update(zip(names, item_locals))
+    scope["forloop"] = loop
+    self._scopes.append(scope)
+    self._emit("pass")
+    end = self._compile_block(("empty", "endfor"))
+    self._scopes.pop()
+    self._indent -= 1
+    if end == "empty":
+      self._emit("if not %s:" % seq)
+      self._indent += 1
+      self._emit("pass")
+      end = self._compile_block(("endfor",))
+      self._indent -= 1
+    if end != "endfor":
+      self._error("malformed tag '%s'" % end)
+
+  def _compile_if(self, tag):
+    self._emit("if %s:" % self._gen_condition(tag[len("if"):]))
+    while True:
+      self._indent += 1
+      self._emit("pass")
+      end = self._compile_block(("elif", "else", "endif"))
+      self._indent -= 1
+      if end.startswith("elif"):
+        self._emit("elif %s:" % self._gen_condition(end[len("elif"):]))
+      elif end == "else":
+        self._emit("else:")
+        self._indent += 1
+        self._emit("pass")
+        end = self._compile_block(("endif",))
+        self._indent -= 1
+        break
+      else:
+        break
+    if end != "endif":
+      self._error("malformed tag '%s'" % end)
+
+class Template(object):
+  """Compiled template."""
+
+  def __init__(self, source, name="<template>"):
+    self._name = name
+    self._code = _Compiler(source, name).compile()
+    namespace = dict(_resolve=_resolve, _resolve_name=_resolve_name,
+                     _iterate=_iterate, _to_unicode=_to_unicode)
+    exec compile(self._code, name, "exec") in namespace
+    self._render = namespace["render"]
+
+  def get_name(self):
+    return self._name
+
+  def get_code(self):
+    """Returns Python source of the compiled template."""
+    return self._code
+
+  def render(self, context=None):
+    """Renders the template with `context` dict and returns a unicode
+    string.
+    """
+    return self._render(context or dict())
+
+# Maps absolute path of the template file to (mtime, template)
+_cache = dict()
+_cache_lock = threading.Lock()
+
+def load(path):
+  """Returns :class:`Template` compiled from file `path`. The template is
+  compiled again only if the file has been modified.
+  """
+  path = os.path.abspath(path)
+  mtime = os.stat(path).st_mtime
+  with _cache_lock:
+    entry = _cache.get(path)
+  if entry and entry[0] == mtime:
+    return entry[1]
+  with open(path) as fh:
+    template = Template(fh.read(), name=path)
+  with _cache_lock:
+    _cache[path] = (mtime, template)
+  return template
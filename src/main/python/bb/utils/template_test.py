@@ -0,0 +1,89 @@
+# http://www.bionicbunny.org/
+# Copyright (c) 2013 Sladeware LLC
+#
+# Author: Oleksandr Sviridenko
+
+import os
+import shutil
+import tempfile
+
+from bb.utils.testing import unittest
+from bb.utils import template
+
+class Thread(object):
+
+  def __init__(self, name):
+    self.name = name
+
+  def get_name(self):
+    return self.name
+
+class TemplateTest(unittest.TestCase):
+
+  def render(self, source, **context):
+    return template.Template(source).render(context)
+
+  def test_variables(self):
+    self.assert_equal(self.render("#define {{ name }} {{ value }}\n",
+                                  name="A", value=1),
+                      u"#define A 1\n")
+    self.assert_equal(self.render("{{ thread.get_name }} {{ threads.0.name }}",
+                                  thread=Thread("a"), threads=[Thread("b")]),
+                      u"a b")
+    self.assert_equal(self.render("{{ config.threads }}",
+                                  config={"threads": 2}), u"2")
+
+  def test_missing_variables(self):
+    self.assert_equal(self.render("[{{ missing }}][{{ thread.missing }}]",
+                                  thread=Thread("a")), u"[][]")
+
+  def test_for(self):
+    source = ("{% for thread in threads %}{{ forloop.counter0 }}:{{ thread.name }}"
+              "{% if not forloop.last %},{% endif %}{% empty %}none{% endfor %}")
+    self.assert_equal(self.render(source, threads=[Thread("a"), Thread("b")]),
+                      u"0:a,1:b")
+    self.assert_equal(self.render(source, threads=[]), u"none")
+    self.assert_equal(self.render("{% for k, v in items reversed %}{{ k }}={{ v }} "
+                                  "{% endfor %}", items=[("a", 1), ("b", 2)]),
+                      u"b=2 a=1 ")
+
+  def test_nested_for(self):
+    source = ("{% for row in rows %}{% for x in row %}"
+              "{{ forloop.parentloop.counter }}{{ x }}{% endfor %}{% endfor %}")
+    self.assert_equal(self.render(source, rows=[["a"], ["b", "c"]]),
+                      u"1a2b2c")
+
+  def test_if(self):
+    source = ("{% if a and not b %}1{% elif b or c %}2{% else %}3{% endif %}"
+              "{# comment #}")
+    self.assert_equal(self.render(source, a=True, b=False), u"1")
+    self.assert_equal(self.render(source, a=True, b=True), u"2")
+    self.assert_equal(self.render(source, c=True), u"2")
+    self.assert_equal(self.render(source), u"3")
+
+  def test_syntax_errors(self):
+    for source in ("{{ name|upper }}", "{% for x in xs %}", "{% endif %}",
+                   "{% include 'a.h' %}", "{% if a %}{% endfor %}"):
+      self.assert_raises(template.TemplateSyntaxError, template.Template,
+                         source)
+
+  def test_load(self):
+    tmpdir = tempfile.mkdtemp()
+    try:
+      path = os.path.join(tmpdir, "config.h.in")
+      with open(path, "w") as fh:
+        fh.write("#define A {{ a }}\n")
+      first = template.load(path)
+      self.assert_true(template.load(path) is first)
+      self.assert_equal(first.render({"a": 1}), u"#define A 1\n")
+      with open(path, "w") as fh:
+        fh.write("#define B {{ a }}\n")
+      os.utime(path, (0, 0))
+      second = template.load(path)
+      self.assert_false(second is first)
+      self.assert_equal(second.render({"a": 1}), u"#define B 1\n")
+    finally:
+      shutil.rmtree(tmpdir)
+
+if __name__ == "__main__":
+  unittest.main()